@@ -3,6 +3,8 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 import os
 
+from app.utils.firestore_metrics import instrument_firestore
+
 # Path to your Firebase service account
 FIREBASE_CONFIG_PATH = os.path.join(
     os.path.dirname(__file__),
@@ -14,5 +16,8 @@ if not firebase_admin._apps:
     cred = credentials.Certificate(FIREBASE_CONFIG_PATH)
     firebase_admin.initialize_app(cred)
 
+# Time every Firestore call for /metrics
+instrument_firestore()
+
 # Export Firestore client for other modules
 db = firestore.client()
@@ -2,7 +2,8 @@
 Price monitoring and alerting API routes (Firebase Firestore version)
 """
 
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse
 from typing import List, Optional
 from datetime import datetime, timedelta
 
@@ -15,6 +16,9 @@ from app.schemas.monitoring import (
 )
 from app.services.alert_service import AlertService
 from app.services.monitoring_service import MonitoringService
+from app.services.run_checkpoint import RunCheckpointStore
+from app.tasks.scheduler import NotLeaderError
+from app.utils.parse_pool import parse_pool
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,6 +26,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 alert_service = AlertService()
 monitoring_service = MonitoringService()
+run_store = RunCheckpointStore()
 
 
 @router.post("/alerts", response_model=PriceAlertResponse, status_code=status.HTTP_201_CREATED)
@@ -181,3 +186,93 @@ async def get_price_change_trends(
         days, threshold_percentage, limit
     )
     return trends
+
+
+@router.get("/schedule", response_model=dict)
+async def get_scrape_schedule(
+    limit: int = Query(100, ge=1, le=1000),
+    reason: Optional[str] = None,
+):
+    """
+    Inspect the adaptive scrape interval chosen for each tracked product
+    """
+    return await monitoring_service.get_scrape_schedule(limit, reason)
+
+
+@router.get("/pipeline", response_model=dict)
+async def get_scrape_pipeline_stats():
+    """
+    Parse pool utilisation and queue depth for this worker
+    """
+    return parse_pool.get_stats()
+
+
+@router.get("/shards", response_model=dict)
+async def get_shard_status():
+    """
+    Monitoring shards, their ring ownership and per-shard progress
+    """
+    return await monitoring_service.get_shard_status()
+
+
+@router.get("/runs", response_model=List[dict])
+async def list_monitoring_runs(limit: int = Query(20, ge=1, le=100)):
+    """
+    Recent monitoring runs with progress, resumes and throughput
+    """
+    try:
+        return await run_store.recent_runs(limit)
+    except Exception as e:
+        logger.error(f"Failed to list monitoring runs: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list monitoring runs")
+
+
+PROFILABLE_TASKS = ("price_monitor", "alert_checker", "cleanup", "monitoring_snapshot")
+
+
+@router.post("/profiles/{task_name}", response_model=dict)
+async def profile_task(
+    task_name: str,
+    request: Request,
+    run_now: bool = Query(False, description="Run the task now instead of profiling its next scheduled run"),
+):
+    """
+    Profile the next scheduled run of a background task, or run it now under the profiler
+    """
+    if task_name not in PROFILABLE_TASKS:
+        raise HTTPException(status_code=404, detail=f"Unknown task '{task_name}'")
+    scheduler = request.app.state.scheduler
+    if run_now:
+        result = await scheduler.run_task(task_name, profile=True)
+        return {**result, "instance": scheduler.instance, "profiles": scheduler.profiler.list_profiles(limit=2)}
+    try:
+        instance = scheduler.profile_next_run(task_name)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except NotLeaderError as e:
+        # Profiles are kept by the replica that ran the task; arm it on the leader instead
+        raise HTTPException(
+            status_code=409,
+            detail={"message": str(e), "instance": scheduler.instance, "leader": await scheduler.leader_instance()},
+        )
+    return {"task_name": task_name, "armed": True, "instance": instance, "profiler": scheduler.profiler.engine}
+
+
+@router.get("/profiles", response_model=List[dict])
+async def list_profiles(request: Request, limit: int = Query(20, ge=1, le=100)):
+    """
+    Recent task profiles recorded on this instance, newest first
+    """
+    scheduler = request.app.state.scheduler
+    return [{**profile, "instance": scheduler.instance} for profile in scheduler.profiler.list_profiles(limit)]
+
+
+@router.get("/profiles/files/{filename}")
+async def download_profile(filename: str, request: Request):
+    """
+    Download a profile report (HTML flame graph, pstats dump or text summary)
+    """
+    path = request.app.state.scheduler.profiler.report_path(filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=filename)
@@ -285,7 +285,7 @@ async def cleanup_old_prices(
         price_service = PriceService(db)
         
         cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
-        deleted_count = await price_service.cleanup_old_prices(cutoff_date)
+        deleted_count = await price_service.cleanup_old_prices(days_to_keep)
         
         logger.info(f"Cleaned up {deleted_count} old price records")
         return {
@@ -88,6 +88,7 @@ class MonitoringStatsResponse(BaseModel):
     tracked_products: int
     recent_price_changes: int
     alert_types: Dict[str, int]
+    timings_ms: Optional[Dict[str, float]] = None  # per-stat latency, DEBUG only
     
     class Config:
         from_attributes = True
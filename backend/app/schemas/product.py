@@ -109,6 +109,7 @@ class ProductResponse(BaseModel):
     price_change_percentage: Optional[float] = None
     is_on_sale: Optional[bool] = None
     price_trend: Optional[str] = None
+    recent_prices: Optional[List[Dict[str, Any]]] = None  # latest price runs, oldest first (sparklines)
     
     class Config:
         from_attributes = True
@@ -3,15 +3,29 @@ Alert service for managing price alerts and notifications (Firestore version)
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional
 from datetime import datetime, timedelta
 from firebase_admin import firestore
 
 from app.services.notification_service import NotificationService
+from app.services.product_cache import product_cache
+from app.utils.aggregations import count_of, run_aggregations
+from app.utils.metrics import ALERT_EVALUATION_SECONDS, ALERT_TRIGGERS
+from app.utils.tracing import traced
+from config import settings
+from app.services.counter_service import (
+    CounterService,
+    ALERTS_TOTAL,
+    ALERTS_ACTIVE,
+    ALERTS_TRIGGERED,
+    daily_counter,
+)
 
 logger = logging.getLogger(__name__)
 db = firestore.client()
 
+IN_QUERY_LIMIT = 30  # values Firestore accepts in one "in" filter
+
 
 class AlertService:
     """
@@ -28,19 +42,19 @@ class AlertService:
         self.notification_service = NotificationService(db)  # ✅ pass db here
         self.alerts_ref = db.collection("alerts")
         self.products_ref = db.collection("products")
+        self.counters = CounterService()
 
     # ---------------------------------------------------
     # Create & Retrieve Alerts
     # ---------------------------------------------------
+    @traced()
     async def create_alert(self, user_id: str, alert_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Create a new price alert for a user
         """
         try:
             # Verify product exists
-            product_ref = self.products_ref.document(alert_data["product_id"])
-            product_doc = product_ref.get()
-            if not product_doc.exists:
+            if await product_cache.aget(alert_data["product_id"]) is None:
                 raise ValueError("Product not found")
 
             alert = {
@@ -62,6 +76,7 @@ class AlertService:
 
             alert_ref = self.alerts_ref.document()
             alert_ref.set(alert)
+            await self.counters.increment_many({ALERTS_TOTAL: 1, ALERTS_ACTIVE: 1})
 
             logger.info(f"✅ Created alert {alert_ref.id} for user {user_id}")
             return {"id": alert_ref.id, **alert}
@@ -70,6 +85,7 @@ class AlertService:
             logger.error(f"❌ Failed to create alert: {e}")
             raise
 
+    @traced()
     async def get_alert(self, alert_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a specific alert by ID
@@ -81,6 +97,7 @@ class AlertService:
             logger.error(f"Failed to fetch alert {alert_id}: {e}")
             raise
 
+    @traced()
     async def list_user_alerts(self, user_id: str) -> List[Dict[str, Any]]:
         """
         List all active alerts for a user
@@ -95,41 +112,71 @@ class AlertService:
     # ---------------------------------------------------
     # Update, Toggle, and Delete Alerts
     # ---------------------------------------------------
+    @traced()
     async def update_alert(self, alert_id: str, alert_data: Dict[str, Any]) -> bool:
         try:
             update_data = {**alert_data, "updated_at": datetime.utcnow()}
+            previous = None
+            if "is_active" in alert_data:
+                previous = self.alerts_ref.document(alert_id).get()
             self.alerts_ref.document(alert_id).update(update_data)
+            if previous is not None and previous.exists:
+                await self._count_active_change(previous.to_dict(), alert_data["is_active"])
             logger.info(f"Updated alert {alert_id}")
             return True
         except Exception as e:
             logger.error(f"Failed to update alert {alert_id}: {e}")
             return False
 
+    @traced()
     async def toggle_alert(self, alert_id: str, is_active: bool) -> bool:
         try:
+            previous = self.alerts_ref.document(alert_id).get()
             self.alerts_ref.document(alert_id).update({"is_active": is_active, "updated_at": datetime.utcnow()})
+            if previous.exists:
+                await self._count_active_change(previous.to_dict(), is_active)
             logger.info(f"Toggled alert {alert_id} to {is_active}")
             return True
         except Exception as e:
             logger.error(f"Failed to toggle alert {alert_id}: {e}")
             return False
 
+    @traced()
     async def delete_alert(self, alert_id: str) -> bool:
         try:
+            previous = self.alerts_ref.document(alert_id).get()
             self.alerts_ref.document(alert_id).delete()
+            if previous.exists:
+                alert = previous.to_dict()
+                await self.counters.increment_many(
+                    {
+                        ALERTS_TOTAL: -1,
+                        ALERTS_ACTIVE: -1 if alert.get("is_active") else 0,
+                        ALERTS_TRIGGERED: -1 if alert.get("is_triggered") else 0,
+                    }
+                )
             logger.info(f"Deleted alert {alert_id}")
             return True
         except Exception as e:
             logger.error(f"Failed to delete alert {alert_id}: {e}")
             return False
 
+    async def _count_active_change(self, previous: Dict[str, Any], is_active: bool):
+        if bool(previous.get("is_active")) != bool(is_active):
+            await self.counters.increment(ALERTS_ACTIVE, 1 if is_active else -1)
+
     # ---------------------------------------------------
     # Core Alert Checking Logic
     # ---------------------------------------------------
+    @traced()
     async def check_price_alerts(self, product_id: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
         """
         Check all active price alerts and trigger notifications if needed
         """
+        with ALERT_EVALUATION_SECONDS.time(scope="product" if product_id else "all"):
+            return await self._check_price_alerts(product_id, force)
+
+    async def _check_price_alerts(self, product_id: Optional[str], force: bool) -> Dict[str, Any]:
         try:
             if product_id:
                 alerts = self.alerts_ref.where("product_id", "==", product_id).where("is_active", "==", True).stream()
@@ -146,11 +193,10 @@ class AlertService:
                 if not force and not self._should_check_alert(alert):
                     continue
 
-                product_doc = self.products_ref.document(alert["product_id"]).get()
-                if not product_doc.exists:
+                product = await product_cache.aget(alert["product_id"])
+                if product is None:
                     continue
 
-                product = product_doc.to_dict()
                 current_price = product.get("current_price")
                 if current_price is None:
                     continue
@@ -164,6 +210,7 @@ class AlertService:
                 self.alerts_ref.document(alert_id).update({"last_checked": datetime.utcnow()})
                 checked_count += 1
 
+            ALERT_TRIGGERS.inc(triggered_count)
             logger.info(f"Checked {checked_count} alerts, triggered {triggered_count}")
             return {
                 "checked_count": checked_count,
@@ -175,30 +222,44 @@ class AlertService:
             logger.error(f"Failed to check price alerts: {e}")
             return {"success": False, "error": str(e)}
 
-    async def check_product_alerts(self, product_id: str) -> List[Dict[str, Any]]:
+    @traced()
+    async def check_product_alerts(
+        self,
+        product_id: str,
+        product: Optional[Dict[str, Any]] = None,
+        linked_ids: Iterable[str] = (),
+    ) -> List[Dict[str, Any]]:
         """
         Check and trigger alerts for a single product
+        (pass a current ``product`` snapshot to skip reading it). ``linked_ids`` are
+        other products on the same listing, which share its price; their alerts are
+        looked up in the same queries.
         """
         try:
-            product_doc = self.products_ref.document(product_id).get()
-            if not product_doc.exists:
-                return []
+            if product is None:
+                product = await product_cache.aget(product_id)
+                if product is None:
+                    return []
 
-            product = product_doc.to_dict()
             current_price = product.get("current_price")
             if current_price is None:
                 return []
 
-            alerts = self.alerts_ref.where("product_id", "==", product_id).where("is_active", "==", True).stream()
-
+            product_ids = [product_id, *linked_ids]
             triggered_alerts = []
-            for alert_doc in alerts:
-                alert = alert_doc.to_dict()
-                alert_id = alert_doc.id
-
-                if await self._should_trigger(alert, current_price):
-                    result = await self._trigger_alert(alert_id, alert, product)
-                    triggered_alerts.append(result)
+            for start in range(0, len(product_ids), IN_QUERY_LIMIT):
+                ids = product_ids[start:start + IN_QUERY_LIMIT]
+                if len(ids) == 1:
+                    query = self.alerts_ref.where("product_id", "==", ids[0])
+                else:
+                    query = self.alerts_ref.where("product_id", "in", ids)
+                for alert_doc in query.where("is_active", "==", True).stream():
+                    alert = alert_doc.to_dict()
+                    alert_id = alert_doc.id
+
+                    if await self._should_trigger(alert, current_price):
+                        result = await self._trigger_alert(alert_id, alert, product)
+                        triggered_alerts.append(result)
 
             return triggered_alerts
         except Exception as e:
@@ -240,6 +301,7 @@ class AlertService:
 
         return False
 
+    @traced()
     async def _trigger_alert(self, alert_id: str, alert: Dict[str, Any], product: Dict[str, Any]) -> Dict[str, Any]:
         """
         Trigger an alert and send notifications
@@ -252,6 +314,12 @@ class AlertService:
                 "updated_at": now,
             }
             self.alerts_ref.document(alert_id).update(alert_update)
+            await self.counters.increment_many(
+                {
+                    ALERTS_TRIGGERED: 0 if alert.get("is_triggered") else 1,
+                    daily_counter(ALERTS_TRIGGERED, now): 1,
+                }
+            )
 
             notification_data = {
                 "alert_id": alert_id,
@@ -280,37 +348,35 @@ class AlertService:
             logger.error(f"Failed to trigger alert {alert_id}: {e}")
             return {}
 
+    @traced()
     async def get_alert_stats(self, user_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Compute alert statistics for all users or a specific user
+        Counts run as concurrent server-side aggregation queries.
         """
         try:
-            if user_id:
-                alerts = self.alerts_ref.where("user_id", "==", user_id).stream()
-            else:
-                alerts = self.alerts_ref.stream()
-
-            total_alerts = 0
-            active_alerts = 0
-            triggered_alerts = 0
-            by_type = {"price_drop": 0, "price_increase": 0, "target_price": 0}
-
-            for doc in alerts:
-                alert = doc.to_dict()
-                total_alerts += 1
-                if alert.get("is_active"):
-                    active_alerts += 1
-                if alert.get("is_triggered"):
-                    triggered_alerts += 1
-                if alert.get("alert_type") in by_type:
-                    by_type[alert["alert_type"]] += 1
+            alerts = self.alerts_ref.where("user_id", "==", user_id) if user_id else self.alerts_ref
+            by_type = ["price_drop", "price_increase", "target_price"]
 
-            return {
-                "total_alerts": total_alerts,
-                "active_alerts": active_alerts,
-                "triggered_alerts": triggered_alerts,
-                "by_type": by_type,
+            queries = {
+                "total_alerts": count_of(alerts),
+                "active_alerts": count_of(alerts.where("is_active", "==", True)),
+                "triggered_alerts": count_of(alerts.where("is_triggered", "==", True)),
+            }
+            for alert_type in by_type:
+                queries[alert_type] = count_of(alerts.where("alert_type", "==", alert_type))
+
+            values, timings = await run_aggregations(queries)
+
+            stats = {
+                "total_alerts": values["total_alerts"],
+                "active_alerts": values["active_alerts"],
+                "triggered_alerts": values["triggered_alerts"],
+                "by_type": {alert_type: values[alert_type] for alert_type in by_type},
             }
+            if settings.DEBUG:
+                stats["timings_ms"] = timings
+            return stats
 
         except Exception as e:
             logger.error(f"Failed to compute alert stats: {e}")
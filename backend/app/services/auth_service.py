@@ -1,20 +1,267 @@
+"""
+Firebase ID token verification
+Tokens are verified against Google's signing certificates (preloaded and refreshed in
+the background), in a worker thread so the RSA check never blocks the event loop, and
+each verified token is cached by its hash until it expires
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+import jwt
+from cryptography.x509 import load_pem_x509_certificate
 from fastapi import HTTPException
 from firebase_admin import auth as firebase_auth
-import logging
+
+from app.utils.metrics import AUTH_TOKEN_CACHE_REQUESTS, AUTH_VERIFY_SECONDS
+from config import settings
 
 logger = logging.getLogger(__name__)
 
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+FIREBASE_ISSUER = "https://securetoken.google.com/"
+FORCED_REFRESH_SECONDS = 60  # an unknown key id refetches the certs at most this often
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleCertSource:
+    """
+    Firebase token signing certificates (key id -> PEM), fetched from Google and kept
+    until the response's ``Cache-Control: max-age`` runs out
+    """
+
+    def __init__(self, url: str = FIREBASE_CERTS_URL, max_age: int = 3600):
+        self.url = url
+        self.max_age = max_age
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def expires_at(self) -> float:
+        return self._expires_at
+
+    def certs(self) -> Dict[str, str]:
+        if not self._certs or time.time() >= self._expires_at:
+            self.refresh()
+        return self._certs
+
+    def refresh(self) -> Dict[str, str]:
+        with self._lock:
+            response = httpx.get(self.url, timeout=10.0)
+            response.raise_for_status()
+            match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+            max_age = int(match.group(1)) if match else self.max_age
+            self._certs = dict(response.json())
+            self._expires_at = time.time() + min(max_age, self.max_age)
+            logger.info(f"Loaded {len(self._certs)} Firebase signing certificates")
+            return self._certs
+
+
+class FirebaseTokenVerifier:
+    """
+    Verifies Firebase ID tokens and caches the decoded claims by token hash until the
+    token's ``exp``. Concurrent requests carrying the same uncached token share one
+    verification.
+    """
+
+    def __init__(
+        self,
+        cert_source: Any,
+        project_id: Optional[str] = None,
+        max_entries: int = 10000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.cert_source = cert_source
+        self._project_id = project_id
+        self.max_entries = max_entries
+        self.clock = clock
+        self._cache: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._keys: Dict[Tuple[str, str], Any] = {}
+        self._forced_refresh_at = 0.0
+        self._refresher: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    @property
+    def project_id(self) -> str:
+        if self._project_id is None:
+            import firebase_admin
+
+            self._project_id = firebase_admin.get_app().project_id
+            if not self._project_id:
+                # Without it the audience check would be skipped
+                raise RuntimeError("Firebase project id unknown; set FIREBASE_PROJECT_ID")
+        return self._project_id
+
+    # ---------------------------------
+    # Lookup
+    # ---------------------------------
+    async def verify(self, id_token: str) -> Dict[str, Any]:
+        """
+        Decoded claims of a valid token; raises ``jwt.InvalidTokenError`` otherwise
+        """
+        key = hashlib.sha256(id_token.encode()).hexdigest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            claims, expires_at = cached
+            if self.clock() < expires_at:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                AUTH_TOKEN_CACHE_REQUESTS.inc(result="hit")
+                return dict(claims)
+            del self._cache[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            AUTH_TOKEN_CACHE_REQUESTS.inc(result="coalesced")
+            return dict(await asyncio.shield(inflight))
+
+        self.stats["misses"] += 1
+        AUTH_TOKEN_CACHE_REQUESTS.inc(result="miss")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            with AUTH_VERIFY_SECONDS.time():
+                claims = await asyncio.to_thread(self._verify, id_token)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        else:
+            self._store(key, claims)
+            future.set_result(claims)
+            return dict(claims)
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: str, claims: Dict[str, Any]):
+        self._cache[key] = (claims, float(claims["exp"]))
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    # ---------------------------------
+    # Verification (worker thread)
+    # ---------------------------------
+    def _verify(self, id_token: str) -> Dict[str, Any]:
+        if os.getenv("FIREBASE_AUTH_EMULATOR_HOST"):
+            # Emulator tokens are unsigned; the Admin SDK knows how to check them
+            return firebase_auth.verify_id_token(id_token)
+
+        header = jwt.get_unverified_header(id_token)
+        if header.get("alg") != "RS256":
+            raise jwt.InvalidAlgorithmError("Firebase ID tokens are signed with RS256")
+        claims = jwt.decode(
+            id_token,
+            self._public_key(header.get("kid")),
+            algorithms=["RS256"],
+            audience=self.project_id,
+            issuer=f"{FIREBASE_ISSUER}{self.project_id}",
+            # Times are checked below against the same clock the cache expires by
+            options={"require": ["exp", "iat", "sub"], "verify_exp": False, "verify_iat": False},
+        )
+        now = self.clock()
+        if claims["exp"] <= now:
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        if claims["iat"] > now or claims.get("auth_time", 0) > now:
+            raise jwt.ImmatureSignatureError("Issued or authenticated in the future")
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise jwt.InvalidTokenError("Invalid subject")
+        claims["uid"] = subject
+        return claims
+
+    def _public_key(self, kid: Optional[str]):
+        certs = self.cert_source.certs()
+        if kid not in certs and self.clock() >= self._forced_refresh_at:
+            # Keys rotate: look again, but do not let unknown key ids hammer the endpoint
+            self._forced_refresh_at = self.clock() + FORCED_REFRESH_SECONDS
+            certs = self.cert_source.refresh()
+        pem = certs.get(kid)
+        if pem is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key {kid}")
+        key = self._keys.get((kid, pem))
+        if key is None:
+            key = self._keys[(kid, pem)] = load_pem_x509_certificate(pem.encode()).public_key()
+        return key
+
+    # ---------------------------------
+    # Certificate refresh
+    # ---------------------------------
+    async def start(self):
+        """
+        Load the signing certificates and keep refreshing them before they expire
+        """
+        if self._refresher is not None:
+            return
+        try:
+            await asyncio.to_thread(self.cert_source.refresh)
+        except Exception as e:
+            logger.error(f"Failed to preload Firebase signing certificates: {e}")
+        self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            expires_at = getattr(self.cert_source, "expires_at", 0.0)
+            # Refresh shortly before expiry; retry a failed fetch after a minute
+            await asyncio.sleep(max(expires_at - time.time() - 60, 60))
+            try:
+                await asyncio.to_thread(self.cert_source.refresh)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to refresh Firebase signing certificates: {e}")
+
+    async def stop(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "entries": len(self._cache),
+            "hit_rate": round((self.stats["hits"] + self.stats["coalesced"]) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Process-wide verifier shared by every route
+token_verifier = FirebaseTokenVerifier(
+    GoogleCertSource(max_age=settings.AUTH_CERT_REFRESH_SECONDS),
+    project_id=settings.FIREBASE_PROJECT_ID,
+    max_entries=settings.AUTH_TOKEN_CACHE_SIZE,
+)
+
+
 class AuthService:
+    def __init__(self, verifier: Optional[FirebaseTokenVerifier] = None):
+        self.verifier = verifier or token_verifier
+
     async def verify_firebase_token(self, id_token: str):
         """
         Verify Firebase ID Token from frontend
         """
         try:
-            decoded_token = firebase_auth.verify_id_token(id_token)
+            decoded_token = await self.verifier.verify(id_token)
             return decoded_token  # contains uid, email, name, etc.
-        except firebase_auth.ExpiredIdTokenError:
+        except (jwt.ExpiredSignatureError, firebase_auth.ExpiredIdTokenError):
             raise HTTPException(status_code=401, detail="Token expired")
-        except firebase_auth.InvalidIdTokenError:
+        except (jwt.InvalidTokenError, firebase_auth.InvalidIdTokenError):
             raise HTTPException(status_code=401, detail="Invalid token")
         except Exception as e:
             logger.error(f"Token verification failed: {e}")
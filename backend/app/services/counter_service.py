@@ -0,0 +1,147 @@
+"""
+Sharded counter service for materialised monitoring statistics (Firebase Firestore version)
+"""
+
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from firebase_admin import firestore
+from config import settings
+
+logger = logging.getLogger(__name__)
+db = firestore.client()
+
+# Absolute counters, kept in step by the create/delete/toggle/trigger paths
+PRODUCTS_TOTAL = "products_total"
+PRODUCTS_TRACKING = "products_tracking"
+ALERTS_TOTAL = "alerts_total"
+ALERTS_ACTIVE = "alerts_active"
+ALERTS_TRIGGERED = "alerts_triggered"
+
+ABSOLUTE_COUNTERS = [
+    PRODUCTS_TOTAL,
+    PRODUCTS_TRACKING,
+    ALERTS_TOTAL,
+    ALERTS_ACTIVE,
+    ALERTS_TRIGGERED,
+]
+
+
+def daily_counter(name: str, day: Optional[datetime] = None) -> str:
+    """
+    Name of the per-day bucket of an event counter (UTC)
+    """
+    return f"{name}:{(day or datetime.utcnow()).strftime('%Y-%m-%d')}"
+
+
+class CounterService:
+    """
+    Firestore sharded counters.
+
+    Each counter is spread over ``num_shards`` documents in ``counter_shards`` so that
+    bursts of increments don't contend on a single document; reads sum the shards.
+    """
+
+    COLLECTION = "counter_shards"
+
+    def __init__(self, num_shards: Optional[int] = None):
+        self.num_shards = num_shards or settings.COUNTER_SHARDS
+        self.shards_ref = db.collection(self.COLLECTION)
+
+    def _shard_ref(self, name: str, shard: int):
+        return self.shards_ref.document(f"{name}__{shard}")
+
+    # ---------------------------------
+    # Writes
+    # ---------------------------------
+    async def increment(self, name: str, amount: int = 1):
+        """
+        Increment a counter on a random shard
+        """
+        await self.increment_many({name: amount})
+
+    async def increment_many(self, deltas: Dict[str, int]):
+        """
+        Apply several counter deltas in one batched write
+        """
+        try:
+            batch = db.batch()
+            has_writes = False
+            for name, amount in deltas.items():
+                if not amount:
+                    continue
+                shard = random.randrange(self.num_shards)
+                data = {"name": name, "shard": shard, "count": firestore.Increment(amount)}
+                if ":" in name:
+                    data["day"] = name.rsplit(":", 1)[1]
+                batch.set(self._shard_ref(name, shard), data, merge=True)
+                has_writes = True
+            if has_writes:
+                batch.commit()
+        except Exception as e:
+            # Counters are reconciled by the snapshot job, so a lost increment is not fatal
+            logger.error(f"Failed to update counters {list(deltas)}: {e}")
+
+    async def reconcile(self, name: str, exact: int) -> int:
+        """
+        Move a counter to an exact value by applying the difference to shard 0.
+        Applying a delta (rather than overwriting) keeps increments made after the shard
+        read intact.
+
+        Not transactional, by design: ``exact`` comes from a count query taken earlier,
+        which a transaction over the shards could not include. An increment that lands
+        between that count and the shard read is cancelled by the delta, leaving the
+        counter off by that window's writes until the next reconcile corrects it.
+        """
+        current = (await self.get_counts([name])).get(name, 0)
+        delta = exact - current
+        if delta:
+            self._shard_ref(name, 0).set(
+                {"name": name, "shard": 0, "count": firestore.Increment(delta)}, merge=True
+            )
+            logger.info(f"Reconciled counter {name}: {current} -> {exact}")
+        return delta
+
+    async def prune_daily(self, keep_days: int = 8) -> int:
+        """
+        Delete per-day counter buckets older than ``keep_days``
+        """
+        try:
+            cutoff = (datetime.utcnow() - timedelta(days=keep_days)).strftime("%Y-%m-%d")
+            deleted = 0
+            for doc in self.shards_ref.where("day", "<", cutoff).stream():
+                doc.reference.delete()
+                deleted += 1
+            return deleted
+        except Exception as e:
+            logger.error(f"Failed to prune daily counters: {e}")
+            return 0
+
+    # ---------------------------------
+    # Reads
+    # ---------------------------------
+    def shard_refs(self, names: Iterable[str]) -> List:
+        return [self._shard_ref(name, shard) for name in names for shard in range(self.num_shards)]
+
+    @staticmethod
+    def sum_shards(snapshots: Iterable) -> Dict[str, int]:
+        """
+        Fold shard snapshots (as returned by ``get_all``) into per-counter totals
+        """
+        totals: Dict[str, int] = {}
+        for snap in snapshots:
+            if not snap.exists:
+                continue
+            data = snap.to_dict()
+            totals[data["name"]] = totals.get(data["name"], 0) + int(data.get("count") or 0)
+        return totals
+
+    async def get_counts(self, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Read the current value of several counters in one batched lookup
+        """
+        names = list(names)
+        totals = self.sum_shards(db.get_all(self.shard_refs(names)))
+        return {name: totals.get(name, 0) for name in names}
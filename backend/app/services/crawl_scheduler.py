@@ -0,0 +1,361 @@
+"""
+Crawl scheduler for price monitoring (Firebase Firestore version)
+Keeps a priority queue of next-due scrape times per tracked product
+"""
+
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from firebase_admin import firestore
+from app.services.interval_model import AdaptiveIntervalModel
+from app.services.listing_service import listing_key
+from app.services.product_record import MONITORED_FIELDS, ProductRecord
+from app.utils.metrics import SCRAPE_RETRIES
+from app.utils.timestamps import to_epoch
+from config import settings
+
+logger = logging.getLogger(__name__)
+db = firestore.client()
+
+# Relative weight of one active alert by the alert owner's plan
+TIER_WEIGHTS = {"free": 1.0, "pro": 2.0, "premium": 3.0}
+ALERT_WEIGHT = 1.0
+VOLATILITY_WEIGHT = 50.0  # a 2% average move per scrape is worth one free-tier alert
+RETRY_DELAY_SECONDS = 900  # failed scrapes come back after 15 minutes at most
+
+
+def compute_priority(alert_weight: float, volatility: float) -> float:
+    """
+    Crawl priority: baseline 1, plus tier-weighted active alerts, plus observed volatility
+    """
+    return 1.0 + ALERT_WEIGHT * alert_weight + VOLATILITY_WEIGHT * min(volatility or 0.0, 0.2)
+
+
+@dataclass(slots=True)
+class ScheduleEntry:
+    """Scheduling state for one product"""
+    product: Dict[str, Any]
+    next_due: float
+    interval: float
+    priority: float = 1.0
+    alert_weight: float = 0.0
+    in_flight: bool = False
+    version: int = 0
+    last_completed: Optional[float] = None
+    failures: int = 0
+    target_prices: List[float] = field(default_factory=list)
+    reason: str = "base"
+
+
+class CrawlScheduler:
+    """
+    Priority-based, staleness-aware crawl scheduler.
+
+    Products sit in a min-heap keyed by their next-due time. Each batch takes the due
+    products with the highest score, where the score is the product priority (alerts,
+    owner tier, volatility) boosted by how overdue it is, so low-priority products age
+    into a batch instead of starving behind an endless stream of high-priority ones.
+
+    Each product's interval comes from the adaptive interval model and is re-chosen after
+    every successful scrape; changed intervals are written back to the product document
+    so they survive restarts and can be inspected.
+    """
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        refresh_seconds: Optional[float] = None,
+        owns: Optional[Callable[[str], bool]] = None,
+    ):
+        self.interval = interval or settings.PRICE_CHECK_INTERVAL
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else settings.CRAWL_REFRESH_SECONDS
+        self.products_ref = db.collection("products")
+        self.alerts_ref = db.collection("alerts")
+        self.users_ref = db.collection("users")
+        self.interval_model = AdaptiveIntervalModel(base_interval=self.interval)
+        # Shard filter (by listing key): only listings this worker owns are queued
+        self.owns = owns
+
+        self.entries: Dict[str, ScheduleEntry] = {}
+        self._heap: List = []
+        self._seq = itertools.count()
+        self._interval_updates: Dict[str, Dict[str, Any]] = {}
+        self.last_refresh: Optional[float] = None
+
+    # ---------------------------------
+    # Queue Maintenance
+    # ---------------------------------
+    def _push(self, product_id: str, entry: ScheduleEntry):
+        # Versions come from a global sequence so a re-added product never matches stale heap items
+        entry.version = next(self._seq)
+        heapq.heappush(self._heap, (entry.next_due, entry.version, product_id))
+
+    def upsert(
+        self,
+        product: Dict[str, Any],
+        alert_weight: float = 0.0,
+        next_due: Optional[float] = None,
+        target_prices: Optional[List[float]] = None,
+    ) -> ScheduleEntry:
+        """
+        Add a product or update its priority inputs, keeping any in-memory due time
+        """
+        product_id = product["id"]
+        volatility = product.get("price_volatility") or 0.0
+        priority = compute_priority(alert_weight, volatility)
+        entry = self.entries.get(product_id)
+        target_prices = target_prices or []
+
+        if entry is None:
+            interval = product.get("scrape_interval") or self.interval
+            if next_due is None:
+                last = to_epoch(product.get("last_scraped"))
+                next_due = (last + interval) if last else time.time()
+            entry = ScheduleEntry(
+                product, next_due, interval, priority, alert_weight,
+                target_prices=target_prices, reason=product.get("interval_reason", "base"),
+            )
+            self.entries[product_id] = entry
+            self._push(product_id, entry)
+            return entry
+
+        entry.product = product
+        entry.priority = priority
+        entry.alert_weight = alert_weight
+        entry.target_prices = target_prices
+        return entry
+
+    def remove(self, product_id: str):
+        """
+        Stop scheduling a product (stale heap items are skipped lazily)
+        """
+        self.entries.pop(product_id, None)
+
+    def load(
+        self,
+        products: Iterable[Dict[str, Any]],
+        alert_weights: Dict[str, float],
+        target_prices: Optional[Dict[str, List[float]]] = None,
+    ):
+        """
+        Reconcile the queue with the current set of tracked products
+        (listings owned by other shards are dropped).
+
+        Products on the same listing are scraped once: the one with the lowest id is
+        queued and carries the others as ``linked_ids``, with the alert weight and
+        target prices of the whole listing.
+        """
+        target_prices = target_prices or {}
+        listings: Dict[str, List[Dict[str, Any]]] = {}
+        for product in products:
+            if not product.get("id"):
+                continue
+            key = listing_key(product)
+            if self.owns and not self.owns(key):
+                continue
+            listings.setdefault(key, []).append(product)
+
+        seen = set()
+        for group in listings.values():
+            group.sort(key=lambda p: p["id"])
+            product, linked = group[0], group[1:]
+            product_ids = [p["id"] for p in group]
+            product["linked_ids"] = [p["id"] for p in linked]
+            seen.add(product["id"])
+            self.upsert(
+                product,
+                sum(alert_weights.get(pid, 0.0) for pid in product_ids),
+                target_prices=[t for pid in product_ids for t in target_prices.get(pid) or []],
+            )
+
+        for product_id in list(self.entries):
+            if product_id not in seen and not self.entries[product_id].in_flight:
+                self.remove(product_id)
+
+    async def refresh(self, force: bool = False):
+        """
+        Reload tracked products (as compact records), active alerts and owner tiers from
+        Firestore. Runs at most every ``refresh_seconds``; between refreshes the queue is memory-only.
+        """
+        now = time.time()
+        if not force and self.last_refresh and now - self.last_refresh < self.refresh_seconds:
+            return
+
+        try:
+            products_query = self.products_ref.where("is_tracking", "==", True).select(list(MONITORED_FIELDS))
+            products = [ProductRecord.from_snapshot(doc) for doc in products_query.stream()]
+
+            alerts_by_product: Dict[str, List[str]] = {}
+            targets_by_product: Dict[str, List[float]] = {}
+            alerts_query = self.alerts_ref.where("is_active", "==", True).select(
+                ["product_id", "user_id", "alert_type", "target_price"]
+            )
+            for doc in alerts_query.stream():
+                alert = doc.to_dict()
+                product_id = alert.get("product_id")
+                if not product_id:
+                    continue
+                alerts_by_product.setdefault(product_id, []).append(alert.get("user_id"))
+                if alert.get("alert_type") == "target_price" and alert.get("target_price"):
+                    targets_by_product.setdefault(product_id, []).append(alert["target_price"])
+
+            user_ids = {uid for uids in alerts_by_product.values() for uid in uids if uid}
+            tiers = await self._load_user_tiers(user_ids)
+            alert_weights = {
+                product_id: sum(TIER_WEIGHTS.get(tiers.get(uid, "free"), 1.0) for uid in uids)
+                for product_id, uids in alerts_by_product.items()
+            }
+
+            self.load(products, alert_weights, targets_by_product)
+            self.last_refresh = now
+            logger.info(f"🗓️ Crawl scheduler refreshed: {len(self.entries)} products queued")
+        except Exception as e:
+            logger.error(f"Failed to refresh crawl scheduler: {e}")
+
+    async def _load_user_tiers(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        refs = [self.users_ref.document(uid) for uid in user_ids]
+        if not refs:
+            return {}
+        tiers = {}
+        for snap in db.get_all(refs, field_paths=["tier"]):
+            if snap.exists:
+                tiers[snap.id] = (snap.to_dict() or {}).get("tier", "free")
+        return tiers
+
+    # ---------------------------------
+    # Draining
+    # ---------------------------------
+    def _score(self, entry: ScheduleEntry, now: float) -> float:
+        overdue = max(0.0, now - entry.next_due)
+        return entry.priority * (1.0 + overdue / max(entry.interval, 1.0))
+
+    def due_count(self, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        return sum(1 for e in self.entries.values() if not e.in_flight and e.next_due <= now)
+
+    def pop_due(self, limit: int, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Take up to ``limit`` due products, highest score first, and mark them in flight
+        """
+        now = now or time.time()
+        due: List[str] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, version, product_id = heapq.heappop(self._heap)
+            entry = self.entries.get(product_id)
+            if entry is None or entry.version != version or entry.in_flight:
+                continue
+            due.append(product_id)
+
+        due.sort(key=lambda pid: self._score(self.entries[pid], now), reverse=True)
+        selected, deferred = due[:limit], due[limit:]
+
+        for product_id in deferred:
+            entry = self.entries[product_id]
+            heapq.heappush(self._heap, (entry.next_due, entry.version, product_id))
+        for product_id in selected:
+            self.entries[product_id].in_flight = True
+        return [self.entries[pid].product for pid in selected]
+
+    def release(self, product_ids: Iterable[str]):
+        """
+        Hand popped products back untouched; they keep their due time (and the priority
+        boost from being overdue) for the next batch
+        """
+        for product_id in product_ids:
+            entry = self.entries.get(product_id)
+            if entry is None or not entry.in_flight:
+                continue
+            entry.in_flight = False
+            self._push(product_id, entry)
+
+    def complete(
+        self,
+        product_id: str,
+        success: bool,
+        interval: Optional[float] = None,
+        now: Optional[float] = None,
+    ):
+        """
+        Reschedule a product after a scrape attempt
+        """
+        entry = self.entries.get(product_id)
+        if entry is None:
+            return
+        now = now or time.time()
+        entry.in_flight = False
+        if interval:
+            entry.interval = interval
+        elif success:
+            self._choose_interval(product_id, entry)
+        if success:
+            entry.failures = 0
+            entry.last_completed = now
+            entry.next_due = now + entry.interval
+        else:
+            entry.failures += 1
+            entry.next_due = now + min(entry.interval, RETRY_DELAY_SECONDS * entry.failures)
+            SCRAPE_RETRIES.inc(source="scheduler")
+        self._push(product_id, entry)
+
+    def _choose_interval(self, product_id: str, entry: ScheduleEntry):
+        decision = self.interval_model.decide(entry.product, entry.target_prices)
+        entry.interval = decision.interval
+        entry.reason = decision.reason
+        product = entry.product
+        if product.get("scrape_interval") != decision.interval or product.get("interval_reason") != decision.reason:
+            product["scrape_interval"] = decision.interval
+            product["interval_reason"] = decision.reason
+            self._interval_updates[product_id] = {
+                "scrape_interval": decision.interval,
+                "interval_reason": decision.reason,
+            }
+
+    def persist_intervals(self) -> int:
+        """
+        Write changed intervals back to the product documents in one batch
+        """
+        if not self._interval_updates:
+            return 0
+        updates, self._interval_updates = self._interval_updates, {}
+        try:
+            items = list(updates.items())
+            for start in range(0, len(items), 500):  # Firestore batch write limit
+                batch = db.batch()
+                for product_id, fields in items[start:start + 500]:
+                    batch.update(self.products_ref.document(product_id), fields)
+                batch.commit()
+            return len(items)
+        except Exception as e:
+            logger.error(f"Failed to persist scrape intervals: {e}")
+            return 0
+
+    def interval_histogram(self) -> Dict[str, Any]:
+        """
+        Product counts per interval reason and the implied scrape volume per day
+        """
+        by_reason: Dict[str, int] = {}
+        for entry in self.entries.values():
+            by_reason[entry.reason] = by_reason.get(entry.reason, 0) + 1
+        scrapes_per_day = sum(86400 / max(e.interval, 1.0) for e in self.entries.values())
+        return {"by_reason": by_reason, "scrapes_per_day": round(scrapes_per_day, 1)}
+
+    def capacity(self, window_seconds: float) -> int:
+        """
+        Number of scrapes the configured scrape rate allows in a window
+        """
+        return max(1, int(settings.SCRAPE_RATE_PER_MINUTE * window_seconds / 60))
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "queued_products": len(self.entries),
+            "due_products": self.due_count(now),
+            "in_flight": sum(1 for e in self.entries.values() if e.in_flight),
+            "intervals": self.interval_histogram(),
+            "last_refresh": datetime.utcfromtimestamp(self.last_refresh).isoformat() if self.last_refresh else None,
+        }
@@ -0,0 +1,128 @@
+"""
+Adaptive scrape interval model
+Chooses a per-product check interval from observed price changes and nearby alert thresholds
+"""
+
+import logging
+import math
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.utils.timestamps import as_utc
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANGE_RATE_ALPHA = 0.1  # weight of the latest scrape in the change-rate average
+CHANGE_EPSILON = 0.005  # moves below 0.5% are treated as unchanged
+NEAR_THRESHOLD_RATIO = 0.05  # within 5% of a target price counts as "near"
+STABLE_BACKOFF_DAYS = 7  # interval doubles for every week without a change
+
+
+@dataclass
+class IntervalDecision:
+    """Chosen interval and the inputs that produced it"""
+    interval: int
+    reason: str
+    change_rate: float
+    stable_days: float
+    near_threshold: bool
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _changed(old: Optional[float], new: Optional[float]) -> bool:
+    if not old or not new:
+        return False
+    return abs(new - old) / old >= CHANGE_EPSILON
+
+
+def update_change_stats(product: Dict[str, Any], new_price: Optional[float], now: datetime) -> Dict[str, Any]:
+    """
+    Incrementally update the change statistics stored on a product after a scrape
+    """
+    previous = product.get("current_price")
+    rate = product.get("price_change_rate")
+    if rate is None:
+        rate = 0.0
+    changed = _changed(previous, new_price)
+
+    updates = {"price_change_rate": round((1 - CHANGE_RATE_ALPHA) * rate + CHANGE_RATE_ALPHA * (1.0 if changed else 0.0), 6)}
+    if changed or not product.get("last_price_change_at"):
+        updates["last_price_change_at"] = now
+    return updates
+
+
+def change_stats_from_history(history: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Bootstrap change statistics from stored price history (any order)
+    """
+    points = sorted(
+        (p for p in history if p.get("price") and as_utc(p.get("created_at"))),
+        key=lambda p: as_utc(p["created_at"]),
+    )
+    rate = 0.0
+    last_change = points[0]["created_at"] if points else None
+    for prev, cur in zip(points, points[1:]):
+        changed = _changed(prev["price"], cur["price"])
+        rate = (1 - CHANGE_RATE_ALPHA) * rate + CHANGE_RATE_ALPHA * (1.0 if changed else 0.0)
+        if changed:
+            last_change = cur["created_at"]
+    return {"price_change_rate": round(rate, 6), "last_price_change_at": last_change}
+
+
+class AdaptiveIntervalModel:
+    """
+    Per-product scrape interval.
+
+    * Products whose price changes often are checked up to ``base / (1 + 4 * rate)``,
+      down to ``min_interval``.
+    * Products within 5% of an active target-price alert are checked at ``min_interval``.
+    * Products with no change for weeks back off exponentially, doubling each stable week,
+      up to ``max_interval``.
+    """
+
+    def __init__(
+        self,
+        base_interval: Optional[int] = None,
+        min_interval: Optional[int] = None,
+        max_interval: Optional[int] = None,
+    ):
+        self.base_interval = base_interval or settings.PRICE_CHECK_INTERVAL
+        self.min_interval = min_interval or settings.ADAPTIVE_MIN_INTERVAL
+        self.max_interval = max_interval or settings.ADAPTIVE_MAX_INTERVAL
+
+    def decide(
+        self,
+        product: Dict[str, Any],
+        target_prices: Iterable[float] = (),
+        now: Optional[datetime] = None,
+    ) -> IntervalDecision:
+        now = now or datetime.now(timezone.utc)
+        rate = product.get("price_change_rate") or 0.0
+        current = product.get("current_price")
+
+        near = bool(current) and any(
+            t and abs(current - t) / t <= NEAR_THRESHOLD_RATIO for t in target_prices
+        )
+
+        last_change = as_utc(product.get("last_price_change_at"))
+        stable_days = (now - last_change).total_seconds() / 86400 if last_change else 0.0
+
+        if near:
+            return IntervalDecision(self.min_interval, "near_alert_threshold", rate, stable_days, True)
+
+        if rate > 0.05:
+            interval = self.base_interval / (1 + 4 * rate)
+            reason = "volatile"
+        elif stable_days >= STABLE_BACKOFF_DAYS:
+            interval = self.base_interval * math.pow(2, int(stable_days // STABLE_BACKOFF_DAYS))
+            reason = "stable_backoff"
+        else:
+            interval = self.base_interval
+            reason = "base"
+
+        interval = int(min(self.max_interval, max(self.min_interval, interval)))
+        return IntervalDecision(interval, reason, rate, stable_days, False)
@@ -0,0 +1,95 @@
+"""
+Canonical listing registry (Firebase Firestore version)
+Every user-facing product points at one listing per retailer item, so products that
+track the same item share one scrape target
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from firebase_admin import firestore
+from app.utils.validators import canonical_listing
+
+logger = logging.getLogger(__name__)
+db = firestore.client()
+
+
+def listing_key(product: Dict[str, Any]) -> str:
+    """
+    Listing a product belongs to; products saved before listings existed get theirs
+    from their URL, so they share scrapes without a migration (a product without a
+    URL is its own listing)
+    """
+    listing_id = product.get("listing_id")
+    if listing_id:
+        return listing_id
+    url = product.get("product_url")
+    if not url:
+        return product["id"]
+    return canonical_listing(url, product.get("platform"))[0]
+
+
+def scrape_url(product: Dict[str, Any]) -> Optional[str]:
+    """
+    URL the product is fetched from: its listing's canonical URL, or the URL the user
+    submitted for products saved before ``canonical_url`` was stored
+    """
+    return product.get("canonical_url") or product.get("product_url")
+
+
+class ListingService:
+    """
+    ``listings/{listing_id}`` documents: the canonical URL, the products that
+    reference the listing and its price state (current price, run in progress,
+    recent prices and change statistics); the listing's price runs live in
+    ``listings/{listing_id}/prices``
+    """
+
+    COLLECTION = "listings"
+
+    def __init__(self):
+        self.listings_ref = db.collection(self.COLLECTION)
+
+    def link(
+        self, product_id: str, url: str, platform: Optional[str] = None, linked_ids: Iterable[str] = ()
+    ) -> Tuple[str, str]:
+        """
+        Register a product (and ``linked_ids``, other products on the same item) against
+        its listing (created on first use); returns the listing id and canonical URL
+        """
+        listing_id, canonical_url = canonical_listing(url, platform)
+        self.listings_ref.document(listing_id).set(
+            {
+                "listing_id": listing_id,
+                "platform": platform,
+                "canonical_url": canonical_url,
+                "product_ids": firestore.ArrayUnion([product_id, *linked_ids]),
+                "updated_at": datetime.utcnow(),
+            },
+            merge=True,
+        )
+        return listing_id, canonical_url
+
+    def unlink(self, listing_id: Optional[str], product_id: str):
+        """
+        Drop a deleted product from its listing
+        """
+        if not listing_id:
+            return
+        try:
+            self.listings_ref.document(listing_id).update(
+                {"product_ids": firestore.ArrayRemove([product_id]), "updated_at": datetime.utcnow()}
+            )
+        except Exception as e:
+            logger.error(f"Failed to unlink product {product_id} from listing {listing_id}: {e}")
+
+    def get(self, listing_id: str) -> Optional[Dict[str, Any]]:
+        snap = self.listings_ref.document(listing_id).get()
+        return snap.to_dict() if snap.exists else None
+
+    def record_price(self, batch, listing_id: str, updates: Dict[str, Any]):
+        """
+        Add the listing's price state after a scrape to a write batch
+        """
+        batch.set(self.listings_ref.document(listing_id), updates, merge=True)
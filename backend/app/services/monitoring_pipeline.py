@@ -0,0 +1,199 @@
+"""
+Streaming pipeline for monitoring runs
+Due products flow from a producer through fetch, parse, persist and alert stages
+connected by bounded queues, so a run only holds the products in flight and each
+product's alerts are checked as soon as its price is stored
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.utils.metrics import PIPELINE_QUEUE_ITEMS
+from app.utils.parse_pool import parse_pool
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+STOP = None  # end-of-stream marker, one per downstream worker
+
+Chunk = Tuple[int, List[Dict[str, Any]]]
+
+
+class ChunkProgress:
+    """
+    Results of one checkpoint chunk, reported once every product has passed all stages
+    """
+
+    __slots__ = ("index", "products", "results", "remaining")
+
+    def __init__(self, index: int, products: List[Dict[str, Any]]):
+        self.index = index
+        self.products = products
+        self.results: List[Optional[Dict[str, Any]]] = [None] * len(products)
+        self.remaining = len(products)
+
+
+class PipelineItem:
+    """
+    One product on its way through the stages
+    """
+
+    __slots__ = ("chunk", "position", "product", "session", "page", "result")
+
+    def __init__(self, chunk: ChunkProgress, position: int, product: Dict[str, Any]):
+        self.chunk = chunk
+        self.position = position
+        self.product = product
+        self.session: Optional[Dict[str, Any]] = None
+        self.page: Optional[Dict[str, Any]] = None
+        self.result: Optional[Dict[str, Any]] = None
+
+
+class MonitoringPipeline:
+    """
+    producer → fetch → parse → persist → alerts.
+
+    Each stage runs a fixed number of workers reading from a queue of at most
+    ``queue_size`` items, so a slow stage holds back the ones before it instead of
+    letting fetched pages pile up. ``on_chunk(index, products, results)`` is awaited
+    when the last product of a chunk leaves the alert stage. An exception escaping a
+    stage (the services handle expected scrape failures themselves) stops the whole
+    pipeline and is re-raised; ``unfinished()`` then lists the products not done.
+    """
+
+    def __init__(
+        self,
+        price_monitor,
+        run_id: Optional[str] = None,
+        on_chunk: Optional[Callable[[int, List[Dict[str, Any]], List[Dict[str, Any]]], Awaitable[None]]] = None,
+        queue_size: Optional[int] = None,
+    ):
+        self.price_monitor = price_monitor
+        self.scraping_service = price_monitor.scraping_service
+        self.run_id = run_id
+        self.on_chunk = on_chunk
+        self.queue_size = queue_size or settings.PIPELINE_QUEUE_SIZE
+        self.workers = {
+            "fetch": max(settings.SCRAPE_CONCURRENCY, 1),
+            "parse": max(parse_pool.size, 1),
+            "persist": max(settings.PIPELINE_PERSIST_WORKERS, 1),
+            "alert": max(settings.PIPELINE_ALERT_WORKERS, 1),
+        }
+        self.pending: Dict[int, ChunkProgress] = {}
+        self.chunks: Sequence[Chunk] = []
+        self.fed = 0
+        self.carried: List[Dict[str, Any]] = []
+
+    async def run(
+        self,
+        chunks: Sequence[Chunk],
+        admit: Optional[Callable[[List[Dict[str, Any]]], bool]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Stream the chunks through the stages. Before each chunk after the first,
+        ``admit(products)`` may refuse it; that chunk and the rest are not scraped
+        and are returned as carried over.
+        """
+        self.chunks = chunks
+        inboxes = {stage: asyncio.Queue(self.queue_size) for stage in self.workers}
+        tasks = [
+            asyncio.create_task(self._produce(admit, inboxes["fetch"])),
+            asyncio.create_task(self._stage("fetch", inboxes["fetch"], inboxes["parse"], "parse", self._fetch)),
+            asyncio.create_task(self._stage("parse", inboxes["parse"], inboxes["persist"], "persist", self._parse)),
+            asyncio.create_task(self._stage("persist", inboxes["persist"], inboxes["alert"], "alert", self._persist)),
+            asyncio.create_task(self._stage("alert", inboxes["alert"], None, None, self._alert)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return self.carried
+
+    def in_flight(self) -> List[Dict[str, Any]]:
+        """
+        Products fed to the stages that have not come out of the alert stage yet
+        """
+        return [
+            product
+            for chunk in self.pending.values()
+            for product, result in zip(chunk.products, chunk.results)
+            if result is None
+        ]
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """
+        Products of chunks that were not completed (including those never fed)
+        """
+        pending = [product for chunk in self.pending.values() for product in chunk.products]
+        return pending + [product for _, products in self.chunks[self.fed:] for product in products]
+
+    # ---------------------------------
+    # Stages
+    # ---------------------------------
+    async def _produce(self, admit, outbox: asyncio.Queue):
+        for position, (index, products) in enumerate(self.chunks):
+            if admit is not None and position and not admit(products):
+                self.carried = [p for _, chunk in self.chunks[position:] for p in chunk]
+                self.fed = len(self.chunks)
+                break
+            self.fed = position + 1
+            if not products:
+                await self._report(ChunkProgress(index, []))
+                continue
+            chunk = ChunkProgress(index, products)
+            self.pending[index] = chunk
+            for i, product in enumerate(products):
+                await outbox.put(PipelineItem(chunk, i, product))
+        for _ in range(self.workers["fetch"]):
+            await outbox.put(STOP)
+
+    async def _stage(
+        self,
+        name: str,
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        downstream: Optional[str],
+        handle: Callable[[PipelineItem], Awaitable[None]],
+    ):
+        async def worker():
+            while True:
+                item = await inbox.get()
+                PIPELINE_QUEUE_ITEMS.set(inbox.qsize(), stage=name)
+                if item is STOP:
+                    return
+                await handle(item)
+                if outbox is not None:
+                    await outbox.put(item)
+
+        await asyncio.gather(*(worker() for _ in range(self.workers[name])))
+        if outbox is not None:
+            for _ in range(self.workers[downstream]):
+                await outbox.put(STOP)
+
+    async def _fetch(self, item: PipelineItem):
+        item.session = self.scraping_service.start_session(item.product, self.run_id)
+        item.page = await self.scraping_service.fetch_page(item.product)
+
+    async def _parse(self, item: PipelineItem):
+        item.result = await self.scraping_service.parse_page(item.product, item.page)
+        item.page = None  # release the page bytes as soon as they are parsed
+
+    async def _persist(self, item: PipelineItem):
+        item.result = await self.scraping_service.store_result(item.product, item.result, item.session)
+
+    async def _alert(self, item: PipelineItem):
+        await self.price_monitor._process_result(item.result)
+        chunk = item.chunk
+        chunk.results[item.position] = item.result
+        chunk.remaining -= 1
+        if chunk.remaining == 0:
+            self.pending.pop(chunk.index, None)
+            await self._report(chunk)
+
+    async def _report(self, chunk: ChunkProgress):
+        if self.on_chunk is not None:
+            await self.on_chunk(chunk.index, chunk.products, chunk.results)
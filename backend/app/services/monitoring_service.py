@@ -2,15 +2,42 @@
 Monitoring service for price tracking and analytics (Firebase Firestore version)
 """
 
+import asyncio
 from firebase_admin import firestore
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
 import statistics
+import time
+
+from app.utils.cache import response_cache
+from app.utils.aggregations import count_of, run_aggregations, sum_of
+from app.utils.price_runs import expand_price_runs
+from app.utils.tracing import traced
+from app.services.alert_service import IN_QUERY_LIMIT
+from app.services.price_history import PriceHistoryService
+from app.services.product_cache import product_cache
+from app.services.shard_service import WORKERS_COLLECTION
+from app.services.counter_service import (
+    CounterService,
+    ABSOLUTE_COUNTERS,
+    PRODUCTS_TOTAL,
+    PRODUCTS_TRACKING,
+    ALERTS_TOTAL,
+    ALERTS_ACTIVE,
+    ALERTS_TRIGGERED,
+    daily_counter,
+)
+from config import settings
 
 logger = logging.getLogger(__name__)
 db = firestore.client()
 
+SNAPSHOT_COLLECTION = "monitoring_snapshots"
+OVERVIEW_SNAPSHOT = "overview"
+ALERT_TYPES = ["price_drop", "price_increase", "target_price"]
+UNSET_VALUES = (None, "")  # product field values grouped under the default name
+
 
 class MonitoringService:
     """
@@ -19,13 +46,17 @@ class MonitoringService:
 
     def __init__(self):
         self.products_ref = db.collection("products")
-        self.prices_ref = db.collection("prices")
+        self.price_history = PriceHistoryService()
         self.alerts_ref = db.collection("alerts")
         self.users_ref = db.collection("users")
+        self.snapshots_ref = db.collection(SNAPSHOT_COLLECTION)
+        self.workers_ref = db.collection(WORKERS_COLLECTION)
+        self.counters = CounterService()
 
     # -----------------------------
     # Product Price History
     # -----------------------------
+    @traced()
     async def get_product_price_history(
         self, product_id: str, days: int = 30, limit: int = 100
     ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
@@ -36,19 +67,9 @@ class MonitoringService:
             end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=days)
 
-            query = (
-                self.prices_ref.where("product_id", "==", product_id)
-                .order_by("created_at", direction=firestore.Query.DESCENDING)
-                .limit(limit)
-            )
-            docs = query.stream()
-            history = []
-            for doc in docs:
-                data = doc.to_dict()
-                created_at = data.get("created_at")
-                if created_at and isinstance(created_at, datetime):
-                    if start_date <= created_at <= end_date:
-                        history.append(data)
+            product = await product_cache.aget(product_id)
+            runs = self.price_history.window(product_id, start_date, limit, product=product)
+            history = expand_price_runs(runs, start_date, end_date, limit)
 
             stats = await self._calculate_history_stats(history)
             return history, stats
@@ -107,51 +128,71 @@ class MonitoringService:
     # -----------------------------
     # User Monitoring Statistics
     # -----------------------------
+    @traced()
+    def _user_price_owners(self, user_alerts) -> Tuple[List[str], List[str]]:
+        """
+        Ids of the products a user has alerts on and of the listings their prices are stored under
+        """
+        product_ids = sorted({doc.to_dict().get("product_id") for doc in user_alerts.select(["product_id"]).stream()})
+        refs = [self.products_ref.document(product_id) for product_id in product_ids if product_id]
+        listing_ids = {
+            snap.to_dict().get("listing_id")
+            for snap in db.get_all(refs, field_paths=["listing_id"])
+            if snap.exists
+        }
+        return product_ids, sorted(listing_id for listing_id in listing_ids if listing_id)
+
     async def get_user_monitoring_stats(self, user_id: str) -> Dict[str, Any]:
         """
         Get monitoring summary for a Firebase user
+        Every figure is a server-side aggregation query; they run concurrently.
+        Price changes count only the products the user has alerts on.
         """
         try:
-            # Alerts
-            alerts = [
-                doc.to_dict()
-                for doc in self.alerts_ref.where("user_id", "==", user_id).stream()
-            ]
-            total_alerts = len(alerts)
-            active_alerts = len([a for a in alerts if a.get("is_active")])
-            triggered_alerts = len([a for a in alerts if a.get("is_triggered")])
-
-            # Products being tracked
-            tracked = [
-                doc.to_dict()
-                for doc in self.products_ref.where("is_tracking", "==", True).stream()
-            ]
-            tracked_products = len(tracked)
-
-            # Recent price changes (last 7 days)
+            user_alerts = self.alerts_ref.where("user_id", "==", user_id)
             recent_cutoff = datetime.utcnow() - timedelta(days=7)
-            prices = [
-                doc.to_dict()
-                for doc in self.prices_ref.stream()
-                if doc.to_dict().get("created_at")
-                and doc.to_dict()["created_at"] >= recent_cutoff
-            ]
-            recent_changes = len(prices)
-
-            # Alerts by type
-            alert_type_counts: Dict[str, int] = {}
-            for a in alerts:
-                t = a.get("alert_type", "unknown")
-                alert_type_counts[t] = alert_type_counts.get(t, 0) + 1
+            product_ids, listing_ids = await asyncio.to_thread(self._user_price_owners, user_alerts)
 
-            return {
-                "total_alerts": total_alerts,
-                "active_alerts": active_alerts,
-                "triggered_alerts": triggered_alerts,
-                "tracked_products": tracked_products,
-                "recent_price_changes": recent_changes,
-                "alert_types": alert_type_counts,
+            queries = {
+                "total_alerts": count_of(user_alerts),
+                "active_alerts": count_of(user_alerts.where("is_active", "==", True)),
+                "triggered_alerts": count_of(user_alerts.where("is_triggered", "==", True)),
+                "tracked_products": count_of(self.products_ref.where("is_tracking", "==", True)),
+            }
+            # Price changes of the products the user has alerts on, one count per "in" chunk
+            recent_prices = self.price_history.all_prices().where("created_at", ">=", recent_cutoff)
+            for start in range(0, len(product_ids), IN_QUERY_LIMIT):
+                ids = product_ids[start:start + IN_QUERY_LIMIT]
+                queries[f"recent_price_changes:{start}"] = count_of(recent_prices.where("product_id", "in", ids))
+            for start in range(0, len(listing_ids), IN_QUERY_LIMIT):
+                ids = listing_ids[start:start + IN_QUERY_LIMIT]
+                queries[f"recent_price_changes:listing:{start}"] = count_of(
+                    recent_prices.where("listing_id", "in", ids)
+                )
+            for alert_type in ALERT_TYPES:
+                queries[f"alert_type:{alert_type}"] = count_of(
+                    user_alerts.where("alert_type", "==", alert_type)
+                )
+
+            values, timings = await run_aggregations(queries)
+
+            stats = {
+                "total_alerts": values["total_alerts"],
+                "active_alerts": values["active_alerts"],
+                "triggered_alerts": values["triggered_alerts"],
+                "tracked_products": values["tracked_products"],
+                "recent_price_changes": sum(
+                    value for name, value in values.items() if name.startswith("recent_price_changes:")
+                ),
+                "alert_types": {
+                    t: values[f"alert_type:{t}"]
+                    for t in ALERT_TYPES
+                    if values[f"alert_type:{t}"]
+                },
             }
+            if settings.DEBUG:
+                stats["timings_ms"] = timings
+            return stats
 
         except Exception as e:
             logger.error(f"Failed to get monitoring stats for user {user_id}: {e}")
@@ -160,6 +201,7 @@ class MonitoringService:
     # -----------------------------
     # Price Change Trends
     # -----------------------------
+    @traced()
     async def get_price_change_trends(
         self, days: int = 7, threshold_percentage: float = 5.0, limit: int = 50
     ) -> List[Dict[str, Any]]:
@@ -170,7 +212,8 @@ class MonitoringService:
             end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=days)
 
-            products = [doc.to_dict() for doc in self.products_ref.stream()]
+            changed = self.products_ref.where("last_price_change_at", ">=", start_date)
+            products = [doc.to_dict() for doc in changed.stream()]
             trends = []
             for p in products:
                 current = p.get("current_price")
@@ -203,96 +246,298 @@ class MonitoringService:
             return []
 
     # -----------------------------
-    # Overview / Platform / Category Stats
+    # Adaptive Scrape Schedule
     # -----------------------------
-    async def get_monitoring_overview(self) -> Dict[str, Any]:
+    @traced()
+    async def get_scrape_schedule(
+        self, limit: int = 100, reason: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
-        Get overall monitoring summary (Firestore version)
+        Chosen scrape intervals for tracked products, soonest due first,
+        with the scrape volume they imply against the fixed-interval baseline
         """
         try:
-            products = [doc.to_dict() for doc in self.products_ref.stream()]
-            alerts = [doc.to_dict() for doc in self.alerts_ref.stream()]
-            users = [doc.to_dict() for doc in self.users_ref.stream()]
-            prices = [doc.to_dict() for doc in self.prices_ref.stream()]
-
-            total_products = len(products)
-            tracking_products = len([p for p in products if p.get("is_tracking")])
-            total_alerts = len(alerts)
-            active_alerts = len([a for a in alerts if a.get("is_active")])
-            total_users = len(users)
-            recent_cutoff = datetime.utcnow() - timedelta(days=7)
-            recent_price_changes = len(
+            query = self.products_ref.where("is_tracking", "==", True).select(
                 [
-                    pr
-                    for pr in prices
-                    if pr.get("created_at")
-                    and pr["created_at"] >= recent_cutoff
+                    "name", "platform", "current_price", "last_scraped", "scrape_interval",
+                    "interval_reason", "price_change_rate", "last_price_change_at",
                 ]
             )
-            recent_alerts_triggered = len(
-                [a for a in alerts if a.get("is_triggered")]
-            )
+            docs = await asyncio.to_thread(lambda: list(query.stream()))
 
-            # Group by platform
-            platforms: Dict[str, Dict[str, Any]] = {}
-            for p in products:
-                platform = p.get("platform", "unknown")
-                price = p.get("current_price")
-                if not price:
+            base = settings.PRICE_CHECK_INTERVAL
+            by_reason: Dict[str, int] = {}
+            scrapes_per_day = 0.0
+            rows = []
+            for doc in docs:
+                p = doc.to_dict()
+                interval = p.get("scrape_interval") or base
+                p_reason = p.get("interval_reason") or "base"
+                by_reason[p_reason] = by_reason.get(p_reason, 0) + 1
+                scrapes_per_day += 86400 / interval
+                if reason and p_reason != reason:
                     continue
-                platforms.setdefault(platform, {"count": 0, "prices": []})
-                platforms[platform]["count"] += 1
-                platforms[platform]["prices"].append(price)
-
-            platform_stats = {
-                k: {
-                    "product_count": v["count"],
-                    "avg_price": round(sum(v["prices"]) / len(v["prices"]), 2)
-                    if v["prices"]
-                    else None,
-                    "min_price": min(v["prices"]) if v["prices"] else None,
-                    "max_price": max(v["prices"]) if v["prices"] else None,
-                }
-                for k, v in platforms.items()
-            }
 
-            # Group by category
-            categories: Dict[str, Dict[str, Any]] = {}
-            for p in products:
-                cat = p.get("category", "Uncategorized")
-                price = p.get("current_price")
-                if not price:
-                    continue
-                categories.setdefault(cat, {"count": 0, "prices": []})
-                categories[cat]["count"] += 1
-                categories[cat]["prices"].append(price)
-
-            category_stats = {
-                k: {
-                    "product_count": v["count"],
-                    "avg_price": round(sum(v["prices"]) / len(v["prices"]), 2)
-                    if v["prices"]
-                    else None,
-                    "min_price": min(v["prices"]) if v["prices"] else None,
-                    "max_price": max(v["prices"]) if v["prices"] else None,
-                }
-                for k, v in categories.items()
+                last = p.get("last_scraped")
+                rows.append(
+                    {
+                        "product_id": doc.id,
+                        "product_name": p.get("name"),
+                        "platform": p.get("platform"),
+                        "current_price": p.get("current_price"),
+                        "scrape_interval": interval,
+                        "interval_reason": p_reason,
+                        "price_change_rate": p.get("price_change_rate"),
+                        "last_price_change_at": p.get("last_price_change_at"),
+                        "last_scraped": last,
+                        "next_scrape_at": last + timedelta(seconds=interval) if isinstance(last, datetime) else None,
+                    }
+                )
+
+            rows.sort(key=lambda r: r["next_scrape_at"].timestamp() if r["next_scrape_at"] else 0)
+            return {
+                "tracked_products": len(docs),
+                "by_reason": by_reason,
+                "scrapes_per_day": round(scrapes_per_day, 1),
+                "baseline_scrapes_per_day": round(len(docs) * 86400 / base, 1),
+                "products": rows[:limit],
             }
 
+        except Exception as e:
+            logger.error(f"Failed to get scrape schedule: {e}")
+            return {"tracked_products": 0, "by_reason": {}, "products": []}
+
+    # -----------------------------
+    # Shard Progress
+    # -----------------------------
+    @traced()
+    async def get_shard_status(self) -> Dict[str, Any]:
+        """
+        Live monitoring shards with their share of the ring and progress
+        """
+        try:
+            docs = await asyncio.to_thread(lambda: list(self.workers_ref.stream()))
+            now = time.time()
+            shards = []
+            for doc in docs:
+                worker = doc.to_dict()
+                age = now - (worker.get("heartbeat_at") or 0)
+                shards.append(
+                    {
+                        "worker_id": doc.id,
+                        "live": age <= settings.SHARD_HEARTBEAT_TTL,
+                        "heartbeat_age_seconds": round(age, 1),
+                        "ownership": worker.get("ownership"),
+                        "rebalances": worker.get("rebalances", 0),
+                        "progress": worker.get("progress", {}),
+                    }
+                )
+            shards.sort(key=lambda s: (not s["live"], s["worker_id"]))
             return {
+                "mode": settings.SCRAPE_MODE,
+                "live_workers": sum(1 for s in shards if s["live"]),
+                "shards": shards,
+            }
+        except Exception as e:
+            logger.error(f"Failed to get shard status: {e}")
+            return {"mode": settings.SCRAPE_MODE, "live_workers": 0, "shards": []}
+
+    # -----------------------------
+    # Overview / Platform / Category Stats
+    # -----------------------------
+    @traced()
+    async def get_monitoring_overview(self) -> Dict[str, Any]:
+        """
+        Get overall monitoring summary (Firestore version)
+        Assembled from sharded counters and the periodic overview snapshot, then served
+        from the response cache; aggregate views refresh on TTL rather than per product.
+        """
+        return await response_cache.get_or_load(
+            "monitoring:overview", self._read_monitoring_overview
+        )
+
+    @traced()
+    async def _read_monitoring_overview(self) -> Dict[str, Any]:
+        try:
+            stats = await self.get_materialised_stats()
+            if not stats:
+                return {}
+            overview = {
                 "overview": {
-                    "total_products": total_products,
-                    "tracking_products": tracking_products,
-                    "total_alerts": total_alerts,
-                    "active_alerts": active_alerts,
-                    "total_users": total_users,
-                    "recent_price_changes": recent_price_changes,
-                    "recent_alerts_triggered": recent_alerts_triggered,
+                    "total_products": stats["total_products"],
+                    "tracking_products": stats["tracking_products"],
+                    "total_alerts": stats["total_alerts"],
+                    "active_alerts": stats["active_alerts"],
+                    "total_users": stats["total_users"],
+                    "recent_price_changes": stats["recent_price_changes_7d"],
+                    "recent_alerts_triggered": stats["triggered_alerts"],
                 },
-                "platforms": platform_stats,
-                "categories": category_stats,
+                "platforms": stats["platforms"],
+                "categories": stats["categories"],
+                "snapshot_generated_at": stats["snapshot_generated_at"],
             }
-
+            if settings.DEBUG and stats.get("snapshot_timings_ms"):
+                overview["timings_ms"] = stats["snapshot_timings_ms"]
+            return overview
         except Exception as e:
             logger.error(f"Failed to get Firestore monitoring overview: {e}")
             return {}
+
+    # -----------------------------
+    # Materialised Counters & Snapshots
+    # -----------------------------
+    @traced()
+    async def get_materialised_stats(self) -> Dict[str, Any]:
+        """
+        Read live counters and the overview snapshot in one batched lookup.
+        Falls back to building the snapshot if the snapshot job hasn't run yet.
+        """
+        try:
+            today_triggered = daily_counter(ALERTS_TRIGGERED)
+            names = ABSOLUTE_COUNTERS + [today_triggered]
+            snapshot_ref = self.snapshots_ref.document(OVERVIEW_SNAPSHOT)
+
+            snapshot = None
+            counter_snaps = []
+            for snap in db.get_all([snapshot_ref] + self.counters.shard_refs(names)):
+                if snap.reference.parent.id == SNAPSHOT_COLLECTION:
+                    snapshot = snap.to_dict() if snap.exists else None
+                else:
+                    counter_snaps.append(snap)
+            counts = self.counters.sum_shards(counter_snaps)
+
+            if snapshot is None:
+                snapshot = await self.refresh_overview_snapshot()
+                counts = {**counts, **snapshot["counts"]}
+
+            return {
+                "total_products": counts.get(PRODUCTS_TOTAL, 0),
+                "tracking_products": counts.get(PRODUCTS_TRACKING, 0),
+                "total_alerts": counts.get(ALERTS_TOTAL, 0),
+                "active_alerts": counts.get(ALERTS_ACTIVE, 0),
+                "triggered_alerts": counts.get(ALERTS_TRIGGERED, 0),
+                "triggered_today": counts.get(today_triggered, 0),
+                "total_users": snapshot.get("total_users", 0),
+                "recent_price_changes_24h": snapshot.get("recent_price_changes_24h", 0),
+                "recent_price_changes_7d": snapshot.get("recent_price_changes_7d", 0),
+                "platforms": snapshot.get("platforms", {}),
+                "categories": snapshot.get("categories", {}),
+                "snapshot_generated_at": snapshot.get("generated_at"),
+                "snapshot_timings_ms": snapshot.get("timings_ms"),
+            }
+        except Exception as e:
+            logger.error(f"Failed to read materialised monitoring stats: {e}")
+            return {}
+
+    @traced()
+    async def refresh_overview_snapshot(self, reconcile: bool = False) -> Dict[str, Any]:
+        """
+        Recompute the overview snapshot from the collections and store it.
+        With ``reconcile`` the sharded counters are corrected to the exact totals.
+        """
+        snapshot = await self._scan_monitoring_overview()
+        self.snapshots_ref.document(OVERVIEW_SNAPSHOT).set(snapshot)
+
+        if reconcile:
+            for name, exact in snapshot["counts"].items():
+                await self.counters.reconcile(name, exact)
+        return snapshot
+
+    @traced()
+    async def _scan_monitoring_overview(self) -> Dict[str, Any]:
+        """
+        Compute the overview snapshot: counts and platform/category breakdowns via
+        aggregation queries
+        """
+        now = datetime.utcnow()
+        values, timings = await run_aggregations(
+            {
+                PRODUCTS_TOTAL: count_of(self.products_ref),
+                PRODUCTS_TRACKING: count_of(self.products_ref.where("is_tracking", "==", True)),
+                ALERTS_TOTAL: count_of(self.alerts_ref),
+                ALERTS_ACTIVE: count_of(self.alerts_ref.where("is_active", "==", True)),
+                ALERTS_TRIGGERED: count_of(self.alerts_ref.where("is_triggered", "==", True)),
+                "total_users": count_of(self.users_ref),
+                "recent_price_changes_24h": count_of(
+                    self.price_history.all_prices().where("created_at", ">=", now - timedelta(hours=24))
+                ),
+                "recent_price_changes_7d": count_of(
+                    self.price_history.all_prices().where("created_at", ">=", now - timedelta(days=7))
+                ),
+            }
+        )
+
+        snapshot = {
+            "generated_at": now,
+            "counts": {name: values[name] for name in ABSOLUTE_COUNTERS},
+            "total_users": values["total_users"],
+            "recent_price_changes_24h": values["recent_price_changes_24h"],
+            "recent_price_changes_7d": values["recent_price_changes_7d"],
+            "platforms": await self._group_price_stats("platform", "unknown"),
+            "categories": await self._group_price_stats("category", "Uncategorized"),
+        }
+        if settings.DEBUG:
+            snapshot["timings_ms"] = timings
+        return snapshot
+
+    def _distinct_values(self, field: str) -> List[str]:
+        """
+        The distinct non-empty string values of a product field, one single-document
+        read per value: each read jumps past the previous value in the field's index
+        """
+        values: List[str] = []
+        last = ""
+        while True:
+            query = self.products_ref.where(field, ">", last).order_by(field).select([field]).limit(1)
+            docs = list(query.stream())
+            if not docs:
+                return values
+            last = docs[0].to_dict()[field]
+            values.append(last)
+
+    def _price_bounds(self, priced, field: str, values: List[Any]) -> Tuple[float, float]:
+        """
+        Lowest and highest current price among priced products whose field is one of
+        ``values``: one ordered single-document read per value and direction
+        """
+        bounds = []
+        for value in values:
+            for direction in (firestore.Query.ASCENDING, firestore.Query.DESCENDING):
+                query = priced.where(field, "==", value).order_by("current_price", direction=direction)
+                bounds += [doc.to_dict()["current_price"] for doc in query.select(["current_price"]).limit(1).stream()]
+        return min(bounds), max(bounds)
+
+    async def _group_price_stats(self, field: str, default: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Current price stats of the priced products grouped by a product field
+        (platform, category): a count() and sum() per group, and the price bounds from
+        one ordered read each. Products without the field value fall under ``default``.
+        """
+        values = await asyncio.to_thread(self._distinct_values, field)
+        priced = self.products_ref.where("current_price", ">", 0)
+        members = {value: [value] for value in values}
+        members[default] = members.get(default, []) + list(UNSET_VALUES)
+
+        queries = {}
+        for name, group_values in members.items():
+            for i, value in enumerate(group_values):
+                query = priced.where(field, "==", value)
+                queries[(name, i, "count")] = count_of(query)
+                queries[(name, i, "sum")] = sum_of(query, "current_price")
+        totals, _ = await run_aggregations(queries)
+
+        stats = {}
+        for name, group_values in members.items():
+            live = [value for i, value in enumerate(group_values) if totals[(name, i, "count")]]
+            if not live:
+                continue
+            count = sum(totals[(name, i, "count")] for i in range(len(group_values)))
+            total = sum(totals[(name, i, "sum")] for i in range(len(group_values)))
+            low, high = await asyncio.to_thread(self._price_bounds, priced, field, live)
+            stats[name] = {
+                "product_count": count,
+                "avg_price": round(total / count, 2),
+                "min_price": low,
+                "max_price": high,
+            }
+        return stats
@@ -0,0 +1,272 @@
+"""
+Price history storage (Firebase Firestore version)
+Prices live under their product, ``products/{product_id}/prices/{run_id}_{product_id}``,
+so one product's history is a read of its own small subcollection instead of an
+indexed scan of one collection holding every product's prices. Reports across
+products query the ``prices`` collection group.
+
+Products that track the same retailer item share a listing, and the listing's runs
+live under it, ``listings/{listing_id}/prices/{run_id}_{listing_id}``: a product's
+history is its listing's runs plus any runs stored under the product before it had a
+listing.
+
+Until ``migrate_legacy`` has moved the old flat ``prices`` collection into the
+subcollections, ``PRICE_HISTORY_LEGACY_READS`` keeps per-product reads on the
+collection group, which spans both.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from firebase_admin import firestore
+from app.services.listing_service import ListingService
+from app.utils.price_runs import with_current_run
+from app.utils.timestamps import as_utc
+from config import settings
+
+logger = logging.getLogger(__name__)
+db = firestore.client()
+
+PRICES = "prices"
+MIGRATION_BATCH_DOCS = 200  # legacy price documents moved per batch (a set and a delete each)
+
+
+def price_doc_id(run_id: str, product_id: str) -> str:
+    return f"{run_id}_{product_id}"
+
+
+def recent_entry(doc_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ``recent_prices`` entry for a stored price document (run or legacy point)
+    """
+    first_seen = record.get("first_seen") or record.get("created_at")
+    return {
+        "run_id": doc_id.rpartition("_")[0] or doc_id,
+        "price": record.get("price"),
+        "availability": record.get("availability"),
+        "first_seen": first_seen,
+        "last_seen": record.get("last_seen") or first_seen,
+        "observations": int(record.get("observations") or 1),
+    }
+
+
+def _newest_first(runs: List[Dict[str, Any]], product_id: str) -> List[Dict[str, Any]]:
+    # Listing runs carry no product id; the product they are read for is theirs
+    runs = [run if run.get("product_id") else {**run, "product_id": product_id} for run in runs]
+    runs.sort(key=lambda run: as_utc(run.get("created_at")), reverse=True)
+    return runs
+
+
+class PriceHistoryService:
+    """
+    Where price documents are read and written
+    """
+
+    def __init__(self):
+        self.products_ref = db.collection("products")
+        self.listings_ref = db.collection(ListingService.COLLECTION)
+        self.legacy_ref = db.collection(PRICES)
+
+    def product_prices(self, product_id: str):
+        return self.products_ref.document(product_id).collection(PRICES)
+
+    def price_ref(self, product_id: str, price_id: str):
+        return self.product_prices(product_id).document(price_id)
+
+    def listing_prices(self, listing_id: str):
+        return self.listings_ref.document(listing_id).collection(PRICES)
+
+    def listing_price_ref(self, listing_id: str, price_id: str):
+        return self.listing_prices(listing_id).document(price_id)
+
+    def all_prices(self):
+        """
+        Every product's prices (the collection group also spans the legacy collection)
+        """
+        return db.collection_group(PRICES)
+
+    def by_last_seen(self, op: str, value: datetime, fields: Optional[List[str]] = None) -> Iterator[Any]:
+        """
+        Every product's price documents whose ``last_seen`` matches ``op value``.
+        Until ``PRICE_TIMESTAMPS_BACKFILLED`` is on, price points written before runs
+        existed (no ``last_seen``) are matched by their ``created_at`` instead.
+        """
+        query = self.all_prices().where("last_seen", op, value)
+        yield from (query if fields is None else query.select(fields)).stream()
+        yield from self.without_last_seen(op, value, fields)
+
+    def without_last_seen(self, op: str, value: datetime, fields: Optional[List[str]] = None) -> Iterator[Any]:
+        """
+        Price points lacking ``last_seen`` whose ``created_at`` matches ``op value``
+        (none once ``PRICE_TIMESTAMPS_BACKFILLED`` is on). Firestore cannot filter on a
+        missing field, so this streams the ``created_at`` range and skips the runs.
+        """
+        if settings.PRICE_TIMESTAMPS_BACKFILLED:
+            return
+        legacy = self.all_prices().where("created_at", op, value)
+        if fields is not None:
+            legacy = legacy.select(list(dict.fromkeys([*fields, "last_seen"])))
+        for doc in legacy.stream():
+            if (doc.to_dict() or {}).get("last_seen") is None:
+                yield doc
+
+    def product_query(self, product_id: str):
+        """
+        Query over one product's prices
+        """
+        if settings.PRICE_HISTORY_LEGACY_READS:
+            return self.all_prices().where("product_id", "==", product_id)
+        return self.product_prices(product_id)
+
+    def history_queries(self, product_id: str, product: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """
+        Queries over a product's price documents: its own and, for a product document
+        with a ``listing_id``, its listing's
+        """
+        queries = [self.product_query(product_id)]
+        listing_id = (product or {}).get("listing_id")
+        if listing_id:
+            queries.append(self.listing_prices(listing_id))
+        return queries
+
+    def runs(
+        self, product_id: str, limit: Optional[int] = None, product: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        A product's price documents, newest run first (pass the product document to
+        include its listing's runs)
+        """
+        runs = []
+        for query in self.history_queries(product_id, product):
+            query = query.order_by("created_at", direction=firestore.Query.DESCENDING)
+            if limit is not None:
+                query = query.limit(limit)
+            runs += [doc.to_dict() for doc in query.stream()]
+        return _newest_first(runs, product_id)[:limit]
+
+    def window(
+        self,
+        product_id: str,
+        start: datetime,
+        limit: Optional[int] = None,
+        product: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        A product's price documents overlapping [start, now], newest run first: the
+        runs started inside the window (an indexed range filter) plus the one run in
+        progress when it opened, since runs of one product or listing never overlap.
+        Pass the product document to include its listing's runs and bring its current
+        run up to date (see ``with_current_run``).
+        """
+        runs = []
+        for query in self.history_queries(product_id, product):
+            started = query.where("created_at", ">=", start).order_by(
+                "created_at", direction=firestore.Query.DESCENDING
+            )
+            if limit is not None:
+                started = started.limit(limit)
+            found = [doc.to_dict() for doc in started.stream()]
+            if limit is None or len(found) < limit:
+                before = query.where("created_at", "<", start).order_by(
+                    "created_at", direction=firestore.Query.DESCENDING
+                )
+                found += [doc.to_dict() for doc in before.limit(1).stream()]
+            runs += found
+        return with_current_run(_newest_first(runs, product_id), product)
+
+    def get(self, price_id: str) -> Optional[Dict[str, Any]]:
+        """
+        A price document by id (``{run_id}_{product_id}``, ``{run_id}_{listing_id}``,
+        or a legacy id not yet migrated)
+        """
+        product_id = price_id.rpartition("_")[2]
+        if product_id != price_id:
+            doc = self.price_ref(product_id, price_id).get()
+            if doc.exists:
+                return doc.to_dict()
+            doc = self.listing_price_ref(product_id, price_id).get()
+            if doc.exists:
+                return doc.to_dict()
+        if settings.PRICE_HISTORY_LEGACY_READS:
+            doc = self.legacy_ref.document(price_id).get()
+            if doc.exists:
+                return doc.to_dict()
+        return None
+
+    def delete_product_prices(self, product_id: str) -> int:
+        """
+        Delete a product's price subcollection (Firestore keeps it when the product goes)
+        """
+        deleted = 0
+        refs = [doc.reference for doc in self.product_prices(product_id).select([]).stream()]
+        for start in range(0, len(refs), MIGRATION_BATCH_DOCS):
+            batch = db.batch()
+            for ref in refs[start:start + MIGRATION_BATCH_DOCS]:
+                batch.delete(ref)
+            batch.commit()
+            deleted += len(refs[start:start + MIGRATION_BATCH_DOCS])
+        return deleted
+
+    # ---------------------------------
+    # Migration from the flat collection
+    # ---------------------------------
+    async def migrate_legacy(self, batch_docs: int = MIGRATION_BATCH_DOCS, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Move every document of the flat ``prices`` collection into its product's
+        subcollection (each move is a set and a delete in the same batch, so
+        readers never see a price twice), then seed ``recent_prices`` on products
+        that have none. Safe to re-run: moved documents are gone from the source.
+        """
+        moved = skipped = 0
+        product_ids = set()
+        batch, pending = db.batch(), 0
+
+        for doc in self.legacy_ref.stream():
+            data = doc.to_dict() or {}
+            product_id = data.get("product_id")
+            if not product_id:
+                skipped += 1
+                continue
+            doc_id = doc.id if doc.id.endswith(f"_{product_id}") else price_doc_id(doc.id, product_id)
+            product_ids.add(product_id)
+            moved += 1
+            if dry_run:
+                continue
+            batch.set(self.price_ref(product_id, doc_id), data)
+            batch.delete(doc.reference)
+            pending += 1
+            if pending >= batch_docs:
+                batch.commit()
+                batch, pending = db.batch(), 0
+                logger.info(f"Moved {moved} legacy price documents")
+        if pending:
+            batch.commit()
+
+        seeded = 0 if dry_run else self._seed_recent_prices(sorted(product_ids), batch_docs)
+        logger.info(f"Price history migration: {moved} moved, {skipped} without a product, {seeded} products seeded")
+        return {"moved": moved, "skipped": skipped, "products": len(product_ids), "recent_seeded": seeded}
+
+    def _seed_recent_prices(self, product_ids: List[str], batch_docs: int) -> int:
+        """
+        Fill ``recent_prices`` from the subcollection for products that lack it
+        """
+        seeded = 0
+        for start in range(0, len(product_ids), batch_docs):
+            chunk = product_ids[start:start + batch_docs]
+            refs = [self.products_ref.document(pid) for pid in chunk]
+            batch = db.batch()
+            for snap in db.get_all(refs, field_paths=["recent_prices"]):
+                if not snap.exists or (snap.to_dict() or {}).get("recent_prices"):
+                    continue
+                query = (
+                    self.product_prices(snap.id)
+                    .order_by("created_at", direction=firestore.Query.DESCENDING)
+                    .limit(settings.RECENT_PRICES_SIZE)
+                )
+                recent = [recent_entry(doc.id, doc.to_dict()) for doc in reversed(list(query.stream()))]
+                if recent:
+                    batch.update(snap.reference, {"recent_prices": recent})
+                    seeded += 1
+            batch.commit()
+        return seeded
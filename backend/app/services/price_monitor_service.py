@@ -3,13 +3,20 @@ Price monitoring service for automated price tracking and alerting (Firebase Fir
 """
 
 import asyncio
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import logging
 
 from firebase_admin import firestore
 from app.services.scraping_service import ScrapingService
 from app.services.alert_service import AlertService
+from app.services.monitoring_service import MonitoringService
+from app.services.crawl_scheduler import CrawlScheduler
+from app.services.price_history import PriceHistoryService
+from app.services.product_cache import product_cache
+from app.services.run_budget import HostCostEstimator, RunBudget, admit_within_budget
+from app.utils.job_queue import create_job_queue
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -21,12 +28,17 @@ class PriceMonitorService:
     Firebase Firestore-based Service class for automated price monitoring and alerting
     """
 
-    def __init__(self):
+    def __init__(self, shard=None):
         self.products_ref = db.collection("products")
-        self.prices_ref = db.collection("prices")
+        self.price_history = PriceHistoryService()
         self.alerts_ref = db.collection("alerts")
         self.scraping_service = ScrapingService()
         self.alert_service = AlertService()
+        self.monitoring_service = MonitoringService()
+        self.shard = shard
+        self.crawl_scheduler = CrawlScheduler(owns=shard.owns if shard else None)
+        self.cost_estimator = HostCostEstimator()
+        self._job_queue = None
         self.is_running = False
         self.monitoring_task = None
 
@@ -67,7 +79,7 @@ class PriceMonitorService:
     # ---------------------------------
     async def _monitoring_loop(self):
         """
-        Periodically check tracked products and update their prices
+        Continuously drain due products from the crawl scheduler, one tick at a time
         """
         while self.is_running:
             try:
@@ -76,104 +88,125 @@ class PriceMonitorService:
                     logger.info(f"🔎 Monitoring {len(products)} products...")
 
                     # Scrape product prices
-                    results = await self.scraping_service.scrape_multiple_products(products)
+                    results = await self.scraping_service.scrape_multiple_products(
+                        products, max_concurrent=settings.SCRAPE_CONCURRENCY
+                    )
+                    self.complete_batch(products, results)
 
                     # Process updated prices and trigger alerts
                     await self._process_monitoring_results(results)
                 else:
                     logger.info("No products eligible for monitoring right now.")
 
-                await asyncio.sleep(settings.PRICE_CHECK_INTERVAL)
+                await asyncio.sleep(settings.CRAWL_TICK_SECONDS)
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"❌ Error in monitoring loop: {e}")
                 await asyncio.sleep(60)
 
-    async def _get_products_for_monitoring(self) -> List[Dict[str, Any]]:
+    async def _get_products_for_monitoring(
+        self, limit: Optional[int] = None, budget: Optional[RunBudget] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Fetch products from Firestore that need to be monitored
+        Take the next batch of due products from the crawl scheduler.
+        The batch size follows scrape capacity for one tick unless ``limit`` is given;
+        with a ``budget`` the batch is cut, in priority order, to what the per-host cost
+        estimates say fits, and the rest stays queued for the next run.
         """
         try:
-            cutoff = datetime.utcnow() - timedelta(seconds=settings.PRICE_CHECK_INTERVAL)
-            products = []
-            for doc in self.products_ref.where("is_tracking", "==", True).stream():
-                p = doc.to_dict()
-                last_updated = p.get("updated_at")
-                if not last_updated or (
-                    isinstance(last_updated, datetime) and last_updated < cutoff
-                ):
-                    products.append(p)
-            return products[:100]  # Limit to prevent overload
+            await self.crawl_scheduler.refresh()
+            if limit is None:
+                limit = self.crawl_scheduler.capacity(settings.CRAWL_TICK_SECONDS)
+            products = self.crawl_scheduler.pop_due(limit)
+            if budget is None or not products:
+                return products
+
+            admitted, deferred, planned = admit_within_budget(
+                products, self.cost_estimator, budget.remaining(time.monotonic()), settings.SCRAPE_CONCURRENCY
+            )
+            self.crawl_scheduler.release(p["id"] for p in deferred)
+            budget.planned_seconds = round(planned, 2)
+            budget.carried_over += len(deferred)
+            return admitted
         except Exception as e:
             logger.error(f"Failed to fetch products for monitoring: {e}")
             return []
 
-    async def _process_monitoring_results(self, results: List[Dict[str, Any]]):
+    def complete_batch(self, products: List[Dict[str, Any]], results: List[Dict[str, Any]]):
         """
-        Process scraped results, update Firestore, and trigger alerts
+        Reschedule scraped products; results are in the same order as the products
+        and a missing result counts as a failed attempt
         """
-        try:
-            for result in results:
-                if not result.get("success"):
-                    continue
-
-                product_id = result.get("product_id")
-                if not product_id:
-                    continue
-
-                product_ref = self.products_ref.document(product_id)
-                product = product_ref.get()
-                if not product.exists:
-                    continue
-
-                product_data = product.to_dict()
-                price_changed = await self._check_price_change(product_data)
-
-                # Update product record
-                product_ref.update(
-                    {
-                        "updated_at": datetime.utcnow(),
-                        "last_monitored": datetime.utcnow(),
-                    }
-                )
+        self.cost_estimator.observe_results(products, results)
+        for i, product in enumerate(products):
+            result = results[i] if i < len(results) else None
+            self.crawl_scheduler.complete(product["id"], bool(result and result.get("success")))
+        self.crawl_scheduler.persist_intervals()
 
-                # Trigger alerts if price changed
-                if price_changed:
-                    await self.alert_service.check_product_alerts(product_id)
-        except Exception as e:
-            logger.error(f"Failed to process monitoring results: {e}")
+    # ---------------------------------
+    # Queue Mode
+    # ---------------------------------
+    @property
+    def job_queue(self):
+        if self._job_queue is None:
+            self._job_queue = create_job_queue()
+        return self._job_queue
 
-    async def _check_price_change(self, product: Dict[str, Any]) -> bool:
+    async def enqueue_products(self, products: List[Dict[str, Any]]) -> int:
         """
-        Check whether product price changed significantly
+        Hand due products to the scrape workers instead of scraping in this process.
+        The scheduler treats an enqueued product as handled; failed scrapes are retried
+        by the queue, and products already waiting in the queue are not added twice.
         """
         try:
-            product_id = product["id"]
-            current_price = product.get("current_price")
-            if not current_price:
-                return False
-
-            # Fetch recent price history
-            query = (
-                self.prices_ref.where("product_id", "==", product_id)
-                .order_by("created_at", direction=firestore.Query.DESCENDING)
-                .limit(2)
+            added = await self.job_queue.enqueue_many(
+                [{"type": "scrape", "product_id": p["id"]} for p in products], key_field="product_id"
             )
-            docs = [doc.to_dict() for doc in query.stream()]
-            if len(docs) < 2:
-                return True  # First price record
-
-            previous_price = docs[1]["price"]
-            if not previous_price:
-                return False
+        except Exception:
+            self.complete_batch(products, [])
+            raise
+        self.complete_batch(products, [{"success": True}] * len(products))
+        return added
 
-            change_percentage = abs(current_price - previous_price) / previous_price
-            return change_percentage >= settings.PRICE_CHANGE_THRESHOLD
+    async def _process_monitoring_results(self, results: List[Dict[str, Any]]):
+        """
+        Trigger alerts for scraped products whose price changed
+        """
+        for result in results:
+            await self._process_result(result)
 
+    async def _process_result(self, result: Dict[str, Any]):
+        """
+        Detect the change and dispatch alerts for one scrape result, from the product
+        snapshot and prices it carries (storing the price already updated the product).
+        A ``shared`` result took the price another scrape of the listing stored, and that
+        scrape's result dispatches the product's alerts.
+        """
+        product_id = result.get("product_id")
+        try:
+            if not result.get("success") or "product" not in result or result.get("shared"):
+                return
+            if self._price_changed(result):
+                await self.alert_service.check_product_alerts(
+                    product_id, product=result["product"], linked_ids=result.get("linked_ids") or ()
+                )
         except Exception as e:
-            logger.error(f"Failed to check price change for {product.get('id')}: {e}")
+            logger.error(f"Failed to process monitoring result for {product_id}: {e}")
+
+    def _price_changed(self, result: Dict[str, Any]) -> bool:
+        """
+        Whether the price moved by at least PRICE_CHANGE_THRESHOLD (a first price always counts)
+        """
+        new_price = result.get("new_price")
+        previous_price = result.get("previous_price")
+        if not new_price:
+            return False
+        if previous_price is None:
+            return True
+        if not previous_price:
             return False
+        return abs(new_price - previous_price) / previous_price >= settings.PRICE_CHANGE_THRESHOLD
 
     # ---------------------------------
     # Manual Monitoring
@@ -183,17 +216,18 @@ class PriceMonitorService:
         Manually monitor a single product by ID
         """
         try:
-            doc = self.products_ref.document(product_id).get()
-            if not doc.exists:
+            product = await product_cache.aget(product_id)
+            if product is None:
                 return {"success": False, "error": "Product not found"}
 
-            product = doc.to_dict()
-            result = await self.scraping_service.scrape_product(product, force=True)
+            result = await self.scraping_service.scrape_product(product)
 
             if result.get("success"):
-                price_changed = await self._check_price_change(product)
-                if price_changed:
-                    await self.alert_service.check_product_alerts(product_id)
+                price_changed = self._price_changed(result)
+                if price_changed and not result.get("shared"):
+                    await self.alert_service.check_product_alerts(
+                        product_id, product=result.get("product"), linked_ids=result.get("linked_ids") or ()
+                    )
                 return {
                     "success": True,
                     "price_changed": price_changed,
@@ -210,42 +244,20 @@ class PriceMonitorService:
     # ---------------------------------
     async def get_monitoring_stats(self) -> Dict[str, Any]:
         """
-        Gather global monitoring statistics from Firestore
+        Gather global monitoring statistics from the materialised counters and snapshot
         """
         try:
-            products = [doc.to_dict() for doc in self.products_ref.stream()]
-            alerts = [doc.to_dict() for doc in self.alerts_ref.stream()]
-            prices = [doc.to_dict() for doc in self.prices_ref.stream()]
-
-            total_products = len(products)
-            tracking_products = len([p for p in products if p.get("is_tracking")])
-            recent_cutoff = datetime.utcnow() - timedelta(hours=24)
-            recent_changes = len(
-                [
-                    pr
-                    for pr in prices
-                    if pr.get("created_at")
-                    and isinstance(pr["created_at"], datetime)
-                    and pr["created_at"] >= recent_cutoff
-                ]
-            )
-            active_alerts = len([a for a in alerts if a.get("is_active")])
-            triggered_today = len(
-                [
-                    a
-                    for a in alerts
-                    if a.get("is_triggered")
-                    and a.get("triggered_at")
-                    and str(datetime.utcnow().date()) in str(a["triggered_at"])
-                ]
-            )
+            stats = await self.monitoring_service.get_materialised_stats()
+            if not stats:
+                return {}
 
             return {
-                "total_products": total_products,
-                "tracking_products": tracking_products,
-                "recent_price_changes": recent_changes,
-                "active_alerts": active_alerts,
-                "triggered_today": triggered_today,
+                "total_products": stats["total_products"],
+                "tracking_products": stats["tracking_products"],
+                "recent_price_changes": stats["recent_price_changes_24h"],
+                "active_alerts": stats["active_alerts"],
+                "triggered_today": stats["triggered_today"],
+                "snapshot_generated_at": stats["snapshot_generated_at"],
                 "monitoring_status": "running" if self.is_running else "stopped",
             }
 
@@ -264,12 +276,9 @@ class PriceMonitorService:
             cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
             deleted_prices = 0
 
-            for doc in self.prices_ref.stream():
-                data = doc.to_dict()
-                created_at = data.get("created_at")
-                if created_at and isinstance(created_at, datetime) and created_at < cutoff_date:
-                    self.prices_ref.document(doc.id).delete()
-                    deleted_prices += 1
+            for doc in self.price_history.by_last_seen("<", cutoff_date, fields=[]):
+                doc.reference.delete()
+                deleted_prices += 1
 
             logger.info(f"🧹 Deleted {deleted_prices} old price records")
             return {
@@ -2,28 +2,41 @@
 Price service for managing price data and statistics (Firebase Firestore version)
 """
 
+from array import array
 from firebase_admin import firestore
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
 import statistics
 import logging
 
+from app.utils.cache import response_cache, product_tag
+from app.utils.price_runs import count_in_window, expand_price_runs
+from app.utils.tracing import traced
+from app.services.price_history import PriceHistoryService
+from app.services.product_cache import product_cache
+
 logger = logging.getLogger(__name__)
 db = firestore.client()
 
 
+def _product_tags(rows: List[Dict[str, Any]]) -> List[str]:
+    """Invalidation tags for a cached list of per-product rows"""
+    return [product_tag(row["product_id"]) for row in rows]
+
+
 class PriceService:
     """
     Firebase Firestore-based Price Service
     """
 
-    def __init__(self):
-        self.prices_ref = db.collection("prices")
+    def __init__(self, _db=None):
+        self.price_history = PriceHistoryService()
         self.products_ref = db.collection("products")
 
     # -----------------------------
     # List Prices
     # -----------------------------
+    @traced()
     async def list_prices(
         self,
         skip: int = 0,
@@ -34,10 +47,18 @@ class PriceService:
         List prices with filtering and pagination (Firestore)
         """
         try:
-            query = self.prices_ref
-            if filters:
-                if filters.get("product_id"):
-                    query = query.where("product_id", "==", filters["product_id"])
+            filters = filters or {}
+            product_id = filters.get("product_id")
+            if product_id:
+                # The product's own price documents and its listing's
+                product = await product_cache.aget(product_id)
+                queries = self.price_history.history_queries(product_id, product)
+            else:
+                queries = [self.price_history.all_prices()]
+            start, end = filters.get("start_date"), filters.get("end_date")
+
+            records = []
+            for query in queries:
                 if filters.get("platform"):
                     query = query.where("platform", "==", filters["platform"])
                 if filters.get("currency"):
@@ -46,9 +67,21 @@ class PriceService:
                     query = query.where("is_sale", "==", filters["is_sale"])
                 if filters.get("is_available") is not None:
                     query = query.where("is_available", "==", filters["is_available"])
-
-            docs = list(query.order_by("created_at", direction=firestore.Query.DESCENDING).stream())
-            prices = [doc.to_dict() for doc in docs]
+                # A run overlaps the window if it was last seen after its start and began before its end.
+                # Firestore wants a range-filtered field sorted first (and both window bounds need the
+                # composite index in firestore.indexes.json); points are re-sorted by time when expanded,
+                # so the result is ordered exactly as without a window.
+                if end:
+                    query = query.where("created_at", "<=", end)
+                if start:
+                    query = query.where("last_seen", ">=", start).order_by(
+                        "last_seen", direction=firestore.Query.DESCENDING
+                    )
+                docs = query.order_by("created_at", direction=firestore.Query.DESCENDING).stream()
+                records += [doc.to_dict() for doc in docs]
+            if product_id:
+                records = [{**record, "product_id": product_id} for record in records]
+            prices = expand_price_runs(records, start, end)
             return prices[skip : skip + limit]
         except Exception as e:
             logger.error(f"Failed to list prices: {e}")
@@ -57,13 +90,13 @@ class PriceService:
     # -----------------------------
     # Get Single Price
     # -----------------------------
+    @traced()
     async def get_price(self, price_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a price by ID (Firestore)
         """
         try:
-            doc = self.prices_ref.document(price_id).get()
-            return doc.to_dict() if doc.exists else None
+            return self.price_history.get(price_id)
         except Exception as e:
             logger.error(f"Failed to get price {price_id}: {e}")
             raise
@@ -71,6 +104,7 @@ class PriceService:
     # -----------------------------
     # Product Price History
     # -----------------------------
+    @traced()
     async def get_product_price_history(
         self, product_id: str, days: int = 30, limit: int = 100
     ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
@@ -80,19 +114,9 @@ class PriceService:
         try:
             end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=days)
-            query = (
-                self.prices_ref.where("product_id", "==", product_id)
-                .order_by("created_at", direction=firestore.Query.DESCENDING)
-                .limit(limit)
-            )
-            docs = list(query.stream())
-            prices = []
-            for doc in docs:
-                data = doc.to_dict()
-                created_at = data.get("created_at")
-                if created_at and isinstance(created_at, datetime):
-                    if start_date <= created_at <= end_date:
-                        prices.append(data)
+            product = await product_cache.aget(product_id)
+            runs = self.price_history.window(product_id, start_date, limit, product=product)
+            prices = expand_price_runs(runs, start_date, end_date, limit)
 
             stats = await self._calculate_price_stats(prices)
             return prices, stats
@@ -100,15 +124,23 @@ class PriceService:
             logger.error(f"Failed to get price history for {product_id}: {e}")
             raise
 
+    @traced()
     async def get_product_price_stats(self, product_id: str, days: int = 30) -> Dict[str, Any]:
         """
-        Get summary price stats for a product
+        Get summary price stats for a product (cached until the product changes)
         """
+        return await response_cache.get_or_load(
+            f"prices:stats:{product_id}:{days}",
+            lambda: self._compute_product_price_stats(product_id, days),
+            tags=[product_tag(product_id)],
+        )
+
+    @traced()
+    async def _compute_product_price_stats(self, product_id: str, days: int) -> Dict[str, Any]:
         try:
             prices, stats = await self.get_product_price_history(product_id, days)
-            product_doc = self.products_ref.document(product_id).get()
-            if product_doc.exists:
-                product = product_doc.to_dict()
+            product = await product_cache.aget(product_id)
+            if product is not None:
                 stats.update(
                     {
                         "product_id": product_id,
@@ -141,9 +173,20 @@ class PriceService:
                 }
 
             values = [p["price"] for p in prices if p.get("price")]
+            return self._stats_from_values(len(prices), values)
+        except Exception as e:
+            logger.error(f"Failed to calculate Firestore price stats: {e}")
+            return {}
+
+    @staticmethod
+    def _stats_from_values(total: int, values: Sequence[float]) -> Dict[str, Any]:
+        """
+        Stats for ``total`` price records whose non-zero prices are ``values``, newest first
+        """
+        try:
             if not values:
                 return {
-                    "total_prices": len(prices),
+                    "total_prices": total,
                     "min_price": None,
                     "max_price": None,
                     "avg_price": None,
@@ -162,7 +205,7 @@ class PriceService:
             )
             pct = ((last - first) / first) * 100 if first else 0.0
             return {
-                "total_prices": len(prices),
+                "total_prices": total,
                 "min_price": min_p,
                 "max_price": max_p,
                 "avg_price": round(avg_p, 2),
@@ -176,6 +219,7 @@ class PriceService:
     # -----------------------------
     # Popular Price Trends
     # -----------------------------
+    @traced()
     async def get_popular_price_trends(
         self,
         platform: Optional[str] = None,
@@ -186,28 +230,50 @@ class PriceService:
         """
         Get products with frequent price updates or popular trends
         """
+        return await response_cache.get_or_load(
+            f"prices:trends:{platform}:{category}:{days}:{limit}",
+            lambda: self._compute_popular_price_trends(platform, category, days, limit),
+            tags=_product_tags,
+        )
+
+    @traced()
+    async def _compute_popular_price_trends(
+        self, platform: Optional[str], category: Optional[str], days: int, limit: int
+    ) -> List[Dict[str, Any]]:
         try:
             end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=days)
-            products = [doc.to_dict() for doc in self.products_ref.stream()]
-            prices = [doc.to_dict() for doc in self.prices_ref.stream()]
 
+            # One price column per product instead of a dict per price record
+            counts: Dict[str, int] = {}
+            values: Dict[str, array] = {}
+            fields = ["product_id", "price", "created_at", "first_seen", "last_seen", "observations"]
+            prices = self.price_history.by_last_seen(">=", start_date, fields=fields)
+            for doc in prices:
+                pr = doc.to_dict()
+                # Listing runs count for every product on the listing
+                owner = pr.get("product_id") or pr.get("listing_id")
+                seen = count_in_window(pr, start_date, end_date) if owner else 0
+                if not seen:
+                    continue
+                counts[owner] = counts.get(owner, 0) + seen
+                if pr.get("price"):
+                    values.setdefault(owner, array("d")).extend([pr["price"]] * seen)
+
+            products_query = self.products_ref.select(
+                ["id", "name", "platform", "category", "current_price", "listing_id"]
+            )
             result = []
-            for p in products:
+            for doc in products_query.stream():
+                p = doc.to_dict()
                 if platform and p.get("platform") != platform:
                     continue
                 if category and p.get("category") != category:
                     continue
-                related_prices = [
-                    pr
-                    for pr in prices
-                    if pr.get("product_id") == p["id"]
-                    and pr.get("created_at")
-                    and start_date <= pr["created_at"] <= end_date
-                ]
-                if not related_prices:
+                price_count = counts.get(p["id"], 0)
+                if not price_count:
                     continue
-                stats = await self._calculate_price_stats(related_prices)
+                stats = self._stats_from_values(price_count, values.get(p["id"], ()))
                 result.append(
                     {
                         "product_id": p["id"],
@@ -215,7 +281,7 @@ class PriceService:
                         "platform": p.get("platform"),
                         "category": p.get("category"),
                         "current_price": p.get("current_price"),
-                        "price_count": len(related_prices),
+                        "price_count": price_count,
                         **stats,
                     }
                 )
@@ -228,12 +294,21 @@ class PriceService:
     # -----------------------------
     # Price Drops & Increases
     # -----------------------------
+    @traced()
     async def get_price_drops(
         self, threshold_percentage: float = 5.0, days: int = 7, limit: int = 50
     ) -> List[Dict[str, Any]]:
         """
         Get products with significant price drops
         """
+        return await response_cache.get_or_load(
+            f"prices:drops:{threshold_percentage}:{days}:{limit}",
+            lambda: self._compute_price_drops(threshold_percentage, limit),
+            tags=_product_tags,
+        )
+
+    @traced()
+    async def _compute_price_drops(self, threshold_percentage: float, limit: int) -> List[Dict[str, Any]]:
         try:
             products = [doc.to_dict() for doc in self.products_ref.stream()]
             result = []
@@ -260,12 +335,21 @@ class PriceService:
             logger.error(f"Failed to get price drops: {e}")
             raise
 
+    @traced()
     async def get_price_increases(
         self, threshold_percentage: float = 5.0, days: int = 7, limit: int = 50
     ) -> List[Dict[str, Any]]:
         """
         Get products with significant price increases
         """
+        return await response_cache.get_or_load(
+            f"prices:increases:{threshold_percentage}:{days}:{limit}",
+            lambda: self._compute_price_increases(threshold_percentage, limit),
+            tags=_product_tags,
+        )
+
+    @traced()
+    async def _compute_price_increases(self, threshold_percentage: float, limit: int) -> List[Dict[str, Any]]:
         try:
             products = [doc.to_dict() for doc in self.products_ref.stream()]
             result = []
@@ -295,6 +379,7 @@ class PriceService:
     # -----------------------------
     # Cleanup Old Prices
     # -----------------------------
+    @traced()
     async def cleanup_old_prices(self, days_to_keep: int = 90) -> int:
         """
         Delete old price records from Firestore
@@ -302,11 +387,9 @@ class PriceService:
         try:
             cutoff = datetime.utcnow() - timedelta(days=days_to_keep)
             deleted = 0
-            for doc in self.prices_ref.stream():
-                data = doc.to_dict()
-                if data.get("created_at") and data["created_at"] < cutoff:
-                    self.prices_ref.document(doc.id).delete()
-                    deleted += 1
+            for doc in self.price_history.by_last_seen("<", cutoff, fields=[]):
+                doc.reference.delete()
+                deleted += 1
             logger.info(f"Deleted {deleted} old price records")
             return deleted
         except Exception as e:
@@ -0,0 +1,208 @@
+"""
+Product document cache (Firebase Firestore version)
+A bounded, process-wide LRU of product documents filled on demand and kept coherent by
+an ``on_snapshot`` listener on ``products``, so repeated product reads on the API, alert
+and scrape paths are memory lookups instead of document reads
+"""
+
+import asyncio
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from firebase_admin import firestore
+from app.utils.metrics import PRODUCT_CACHE_REQUESTS
+from config import settings
+
+logger = logging.getLogger(__name__)
+db = firestore.client()
+
+LISTENER_RETRY_SECONDS = 30  # wait before re-subscribing after the listener stopped
+_RESULTS = {"hits": "hit", "misses": "miss", "bypassed": "bypass"}  # metric label per stat
+
+
+class ProductCache:
+    """
+    LRU of product documents (``None`` for products known not to exist).
+
+    Entries are only served while the snapshot listener is live: every change to a
+    cached product replaces its entry, and a write never rolls an entry back to an
+    older ``update_time``. Without a live listener lookups read straight through.
+    """
+
+    def __init__(self, max_entries: int = 5000, collection: str = "products"):
+        self.max_entries = max_entries
+        self.collection = collection
+        self._entries: "OrderedDict[str, Tuple[Optional[Dict[str, Any]], Any]]" = OrderedDict()
+        self._lock = threading.Lock()  # the listener calls back on its own thread
+        self._loading: Dict[str, int] = {}
+        self._watch = None
+        self._synced = False
+        self._retry_at = 0.0
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "updates": 0, "evictions": 0}
+
+    @property
+    def products_ref(self):
+        # Resolved per call: the process-wide instance is built at import time
+        return db.collection(self.collection)
+
+    # ---------------------------------
+    # Lookup
+    # ---------------------------------
+    def get(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The product document as a dict (a private copy), or None if it does not exist
+        """
+        if not product_id:
+            return None
+        if not self.is_live():
+            self._restart_listener()
+            self._count("bypassed")
+            snap = self.products_ref.document(product_id).get()
+            return snap.to_dict() if snap.exists else None
+
+        entry = self._hit(product_id)
+        if entry is not None:
+            return copy.deepcopy(entry[0])
+
+        self._count("misses")
+        with self._lock:
+            # Changes that arrive while the read is in flight are kept, not skipped
+            self._loading[product_id] = self._loading.get(product_id, 0) + 1
+        try:
+            snap = self.products_ref.document(product_id).get()
+            data = snap.to_dict() if snap.exists else None
+            version = getattr(snap, "update_time" if snap.exists else "read_time", None)
+            with self._lock:
+                self._store(product_id, data, version)
+        finally:
+            with self._lock:
+                self._loading[product_id] -= 1
+                if not self._loading[product_id]:
+                    del self._loading[product_id]
+        return copy.deepcopy(data)
+
+    async def aget(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """
+        ``get`` for the async paths: a hit is served inline, a document read runs in a
+        worker thread so it does not block the event loop
+        """
+        entry = self._hit(product_id) if product_id and self.is_live() else None
+        if entry is not None:
+            return copy.deepcopy(entry[0])
+        return await asyncio.to_thread(self.get, product_id)
+
+    def _hit(self, product_id: str) -> Optional[Tuple[Optional[Dict[str, Any]], Any]]:
+        with self._lock:
+            entry = self._entries.get(product_id)
+            if entry is not None:
+                self._entries.move_to_end(product_id)
+        if entry is not None:
+            self._count("hits")
+        return entry
+
+    def invalidate(self, product_id: str):
+        """
+        Drop a product this process just wrote, so its next read sees the write
+        before the listener delivers it
+        """
+        with self._lock:
+            self._entries.pop(product_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def is_live(self) -> bool:
+        watch = self._watch
+        return self._synced and watch is not None and getattr(watch, "is_active", True)
+
+    # ---------------------------------
+    # Storage
+    # ---------------------------------
+    def _store(self, product_id: str, data: Optional[Dict[str, Any]], version: Any):
+        current = self._entries.get(product_id)
+        # A slow read must not overwrite a newer version the listener already applied
+        if current is not None and current[1] is not None and version is not None and version < current[1]:
+            return
+        self._entries[product_id] = (data, version)
+        self._entries.move_to_end(product_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _count(self, stat: str):
+        self.stats[stat] += 1
+        PRODUCT_CACHE_REQUESTS.inc(result=_RESULTS[stat])
+
+    # ---------------------------------
+    # Snapshot listener
+    # ---------------------------------
+    def _on_snapshot(self, docs, changes, read_time):
+        with self._lock:
+            for change in changes:
+                snap = change.document
+                # Only cached products are kept; the rest are loaded when first read
+                if snap.id not in self._entries and snap.id not in self._loading:
+                    continue
+                if change.type.name == "REMOVED":
+                    self._store(snap.id, None, read_time)
+                else:
+                    self._store(snap.id, snap.to_dict(), getattr(snap, "update_time", None) or read_time)
+                self.stats["updates"] += 1
+            self._synced = True
+
+    def start(self):
+        """
+        Subscribe to product changes (no-op when PRODUCT_CACHE_SIZE is 0)
+        """
+        if self.max_entries <= 0 or self._watch is not None:
+            return
+        try:
+            self._watch = self.products_ref.on_snapshot(self._on_snapshot)
+            self._retry_at = 0.0
+            logger.info(f"Product cache listening for product changes (up to {self.max_entries} products)")
+        except Exception as e:
+            self._retry_at = time.time() + LISTENER_RETRY_SECONDS
+            logger.error(f"Failed to start product cache listener: {e}")
+
+    def _restart_listener(self):
+        # Entries may have missed changes while the listener was down: drop them and resubscribe
+        if time.time() < self._retry_at:
+            return
+        if self._watch is None:
+            if self._retry_at:  # the last subscribe attempt failed
+                self.start()
+            return
+        if getattr(self._watch, "is_active", True):
+            return
+        logger.warning("Product cache listener stopped; resubscribing")
+        self._retry_at = time.time() + LISTENER_RETRY_SECONDS
+        self.stop()
+        self.start()
+
+    def stop(self):
+        watch, self._watch = self._watch, None
+        self._synced = False
+        if watch is not None:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.warning(f"Failed to stop product cache listener: {e}")
+        self.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["bypassed"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "live": self.is_live(),
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Process-wide cache shared by the services
+product_cache = ProductCache(max_entries=settings.PRODUCT_CACHE_SIZE)
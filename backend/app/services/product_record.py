@@ -0,0 +1,105 @@
+"""
+Compact in-memory product records for monitoring runs
+The crawl scheduler holds one record per tracked product for as long as the process
+runs, so it keeps only the fields the scrape, schedule and alert path reads instead
+of the whole Firestore document.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, Tuple
+
+# Everything the scrape → store → reschedule → alert path reads from a product.
+# Queries that feed monitoring project to these with ``select(MONITORED_FIELDS)``.
+MONITORED_FIELDS: Tuple[str, ...] = (
+    "id",
+    "name",
+    "product_url",
+    "canonical_url",
+    "platform",
+    "currency",
+    "current_price",
+    "price_volatility",
+    "price_change_rate",
+    "last_price_change_at",
+    "scrape_interval",
+    "interval_reason",
+    "last_scraped",
+    "is_tracking",
+    "listing_id",
+    "availability",
+    "price_run_id",
+    "price_run_started",
+    "price_run_pending",
+    "price_run_flushed_at",
+    "recent_prices",
+)
+# Set in memory only: the other tracked products on the same listing, which take
+# this record's scraped price (see CrawlScheduler.load)
+RECORD_FIELDS: Tuple[str, ...] = MONITORED_FIELDS + ("linked_ids",)
+
+
+class ProductRecord:
+    """
+    Product with a fixed set of slots and dict-style access, so services written
+    against ``to_dict()`` products (``product["id"]``, ``product.get(...)``,
+    ``product.update(...)``) take records unchanged. Fields outside
+    ``RECORD_FIELDS`` are dropped on update: the Firestore document keeps them,
+    the run does not need them.
+    """
+
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, **fields: Any):
+        for name in RECORD_FIELDS:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any], product_id: Optional[str] = None) -> "ProductRecord":
+        record = cls(**{name: data.get(name) for name in MONITORED_FIELDS})
+        if record.id is None:
+            record.id = product_id
+        return record
+
+    @classmethod
+    def from_snapshot(cls, snap) -> "ProductRecord":
+        return cls.from_dict(snap.to_dict() or {}, snap.id)
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in RECORD_FIELDS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __setitem__(self, name: str, value: Any):
+        if name not in RECORD_FIELDS:
+            raise KeyError(name)
+        setattr(self, name, value)
+
+    def __contains__(self, name: object) -> bool:
+        return name in RECORD_FIELDS and getattr(self, name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in RECORD_FIELDS if getattr(self, name) is not None)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ProductRecord):
+            return all(getattr(self, n) == getattr(other, n) for n in RECORD_FIELDS)
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ProductRecord({self.to_dict()!r})"
+
+    def get(self, name: str, default: Any = None) -> Any:
+        value = getattr(self, name, None) if name in RECORD_FIELDS else None
+        return default if value is None else value
+
+    def keys(self) -> Iterable[str]:
+        return list(self)
+
+    def update(self, fields: Mapping[str, Any]):
+        for name, value in fields.items():
+            if name in RECORD_FIELDS:
+                setattr(self, name, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self}
@@ -2,10 +2,17 @@
 Product service using Firebase Firestore
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import uuid
 from app.firebase import db
+from app.utils.cache import response_cache
+from app.utils.price_runs import expand_price_runs
+from app.utils.timestamps import as_utc
+from app.services.counter_service import CounterService, PRODUCTS_TOTAL, PRODUCTS_TRACKING
+from app.services.listing_service import ListingService
+from app.services.price_history import PriceHistoryService
+from app.services.product_cache import product_cache
 
 
 
@@ -14,14 +21,21 @@ class ProductService:
 
     def __init__(self, _db=None):
         self.collection = db.collection(self.COLLECTION)
+        self.counters = CounterService()
+        self.listings = ListingService()
+        self.price_history = PriceHistoryService()
 
     async def create_product(self, data) -> Dict:
         product_id = str(uuid.uuid4())
+        # Products tracking the same retailer item share its listing (and its scrapes)
+        listing_id, canonical_url = self.listings.link(product_id, data.product_url, data.platform)
         product_data = {
             "id": product_id,
             "name": data.name,
             "description": getattr(data, "description", ""),
             "product_url": data.product_url,
+            "canonical_url": canonical_url,
+            "listing_id": listing_id,
             "platform": data.platform,
             "category": getattr(data, "category", ""),
             "brand": getattr(data, "brand", ""),
@@ -29,10 +43,11 @@ class ProductService:
             "currency": "INR",
             "is_tracking": True,
             "is_active": True,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
         }
         self.collection.document(product_id).set(product_data)
+        await self.counters.increment_many({PRODUCTS_TOTAL: 1, PRODUCTS_TRACKING: 1})
         return product_data
 
     async def list_products(
@@ -62,8 +77,7 @@ class ProductService:
         return all_products[skip : skip + limit], total
 
     async def get_product(self, product_id: str) -> Optional[Dict]:
-        doc = self.collection.document(product_id).get()
-        return doc.to_dict() if doc.exists else None
+        return await product_cache.aget(product_id)
 
     async def update_product(self, product_id: str, data) -> Optional[Dict]:
         ref = self.collection.document(product_id)
@@ -71,44 +85,68 @@ class ProductService:
         if not doc.exists:
             return None
 
-        update_data = {**doc.to_dict(), **data.dict(exclude_unset=True)}
-        update_data["updated_at"] = datetime.utcnow().isoformat()
+        previous = doc.to_dict()
+        update_data = {**previous, **data.dict(exclude_unset=True)}
+        update_data["updated_at"] = datetime.utcnow()
+        if update_data.get("product_url") != previous.get("product_url"):
+            listing_id, update_data["canonical_url"] = self.listings.link(
+                product_id, update_data["product_url"], update_data.get("platform")
+            )
+            if listing_id != previous.get("listing_id"):
+                self.listings.unlink(previous.get("listing_id"), product_id)
+            update_data["listing_id"] = listing_id
         ref.set(update_data)
+        if bool(update_data.get("is_tracking")) != bool(previous.get("is_tracking")):
+            await self.counters.increment(PRODUCTS_TRACKING, 1 if update_data.get("is_tracking") else -1)
+        product_cache.invalidate(product_id)
+        await response_cache.invalidate_product(product_id)
         return update_data
 
     async def delete_product(self, product_id: str) -> bool:
         doc_ref = self.collection.document(product_id)
-        if not doc_ref.get().exists:
+        doc = doc_ref.get()
+        if not doc.exists:
             return False
         doc_ref.delete()
+        self.price_history.delete_product_prices(product_id)
+        self.listings.unlink(doc.to_dict().get("listing_id"), product_id)
+        await self.counters.increment_many(
+            {
+                PRODUCTS_TOTAL: -1,
+                PRODUCTS_TRACKING: -1 if doc.to_dict().get("is_tracking") else 0,
+            }
+        )
+        product_cache.invalidate(product_id)
+        await response_cache.invalidate_product(product_id)
         return True
 
     async def update_tracking_status(self, product_id: str, new_status: bool):
         ref = self.collection.document(product_id)
-        if not ref.get().exists:
+        doc = ref.get()
+        if not doc.exists:
             return False
         ref.update(
             {
                 "is_tracking": new_status,
-                "updated_at": datetime.utcnow().isoformat(),
+                "updated_at": datetime.utcnow(),
             }
         )
+        if bool(doc.to_dict().get("is_tracking")) != bool(new_status):
+            await self.counters.increment(PRODUCTS_TRACKING, 1 if new_status else -1)
+        product_cache.invalidate(product_id)
+        await response_cache.invalidate_product(product_id)
         return True
 
     async def get_last_scraped_time(self, product_id: str):
-        doc = self.collection.document(product_id).get()
-        if doc.exists:
-            return datetime.fromisoformat(doc.to_dict().get("updated_at"))
+        product = await product_cache.aget(product_id)
+        if product:
+            return as_utc(product.get("updated_at"))
         return None
 
     async def get_price_history(
         self, product_id: str, days: int = 30, limit: int = 100
     ):
-        prices_ref = (
-            db.collection("prices")
-            .where("product_id", "==", product_id)
-            .order_by("created_at", direction=firestore.Query.DESCENDING)
-            .limit(limit)
-        )
-        prices = [doc.to_dict() for doc in prices_ref.stream()]
-        return prices
+        start = datetime.utcnow() - timedelta(days=days)
+        product = await product_cache.aget(product_id)
+        runs = self.price_history.window(product_id, start, limit, product=product)
+        return expand_price_runs(runs, start, limit=limit)
@@ -0,0 +1,104 @@
+"""
+Run time budget for price monitoring
+Estimates per-host scrape cost from recent latencies and admits work that fits the budget
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from app.services.listing_service import scrape_url
+
+logger = logging.getLogger(__name__)
+
+LATENCY_ALPHA = 0.3  # weight of the newest observation in the per-host average
+DEFAULT_COST_SECONDS = 3.0  # assumed cost for hosts we have not fetched from yet
+
+
+def product_host(product: Dict[str, Any]) -> str:
+    host = urlparse(scrape_url(product) or "").netloc.lower()
+    return host or product.get("platform") or "unknown"
+
+
+class HostCostEstimator:
+    """
+    Exponentially weighted average of scrape wall time per host
+    """
+
+    def __init__(self, alpha: float = LATENCY_ALPHA, default_seconds: float = DEFAULT_COST_SECONDS):
+        self.alpha = alpha
+        self.default_seconds = default_seconds
+        self.costs: Dict[str, float] = {}
+        self.samples: Dict[str, int] = {}
+
+    def observe(self, host: str, seconds: float):
+        previous = self.costs.get(host)
+        self.costs[host] = seconds if previous is None else (1 - self.alpha) * previous + self.alpha * seconds
+        self.samples[host] = self.samples.get(host, 0) + 1
+
+    def observe_results(self, products: List[Dict[str, Any]], results: List[Dict[str, Any]]):
+        """
+        Learn from a scraped batch (results in product order, with ``response_time_ms``)
+        """
+        for product, result in zip(products, results):
+            elapsed_ms = (result or {}).get("response_time_ms")
+            if elapsed_ms is not None:
+                self.observe(product_host(product), elapsed_ms / 1000)
+
+    def estimate(self, product: Dict[str, Any]) -> float:
+        return self.costs.get(product_host(product), self.default_seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            host: {"avg_seconds": round(cost, 3), "samples": self.samples.get(host, 0)}
+            for host, cost in sorted(self.costs.items())
+        }
+
+
+def admit_within_budget(
+    products: List[Dict[str, Any]],
+    estimator: HostCostEstimator,
+    budget_seconds: float,
+    concurrency: int,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], float]:
+    """
+    Take products in the given (priority) order while their estimated wall time fits.
+
+    Scrapes run ``concurrency`` at a time, so a product's share of the wall time is its
+    cost divided by the concurrency. Returns the admitted and deferred products and the
+    planned wall time. At least one product is always admitted so a slow host cannot
+    stall the queue forever.
+    """
+    admitted: List[Dict[str, Any]] = []
+    deferred: List[Dict[str, Any]] = []
+    planned = 0.0
+    slots = max(concurrency, 1)
+    for product in products:
+        share = estimator.estimate(product) / slots
+        if admitted and planned + share > budget_seconds:
+            deferred.append(product)
+            continue
+        admitted.append(product)
+        planned += share
+    return admitted, deferred, planned
+
+
+class RunBudget:
+    """
+    Deadline for one monitoring run
+    """
+
+    def __init__(self, budget_seconds: float, started: float):
+        self.budget_seconds = budget_seconds
+        self.started = started
+        self.planned_seconds: Optional[float] = None
+        self.carried_over = 0
+
+    def remaining(self, now: float) -> float:
+        return self.budget_seconds - (now - self.started)
+
+    def utilisation(self, now: float) -> float:
+        """
+        Share of the budget the run used (above 1.0 means it overran)
+        """
+        return round((now - self.started) / self.budget_seconds, 3) if self.budget_seconds else 0.0
@@ -0,0 +1,239 @@
+"""
+Checkpoint store for price monitoring runs (Firebase Firestore version)
+Persists each run's plan in chunks so an interrupted run resumes where it stopped
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from firebase_admin import firestore
+from config import settings
+
+logger = logging.getLogger(__name__)
+db = firestore.client()
+
+RUNS_COLLECTION = "monitoring_runs"
+CHUNKS_SUBCOLLECTION = "chunks"
+
+
+def new_run_id() -> str:
+    return f"run_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+class RunCheckpointStore:
+    """
+    ``monitoring_runs/{run_id}`` holds the run status and counters; the planned product
+    IDs live in ``chunks/{index}`` sub-documents (bounded size) that are marked done as
+    they complete. The completed chunks are the cursor: resuming a run only re-plans the
+    chunks that are not done yet.
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None):
+        self.chunk_size = chunk_size or settings.RUN_CHECKPOINT_CHUNK
+        self.runs_ref = db.collection(RUNS_COLLECTION)
+
+    # ---------------------------------
+    # Run Lifecycle
+    # ---------------------------------
+    def _start_run(self, run_id: str, product_ids: List[str], owner: str) -> List[List[str]]:
+        chunks = [product_ids[i:i + self.chunk_size] for i in range(0, len(product_ids), self.chunk_size)]
+        run_ref = self.runs_ref.document(run_id)
+        now = time.time()
+
+        batch = db.batch()
+        batch.set(
+            run_ref,
+            {
+                "run_id": run_id,
+                "owner": owner,
+                "mode": settings.SCRAPE_MODE,
+                "status": "running",
+                "planned": len(product_ids),
+                "chunks_total": len(chunks),
+                "chunks_done": 0,
+                "processed": 0,
+                "failed": 0,
+                "resumes": 0,
+                "started_at": datetime.utcnow(),
+                "started_ts": now,
+                "heartbeat_at": now,
+            },
+        )
+        writes = 1
+        for index, ids in enumerate(chunks):
+            if writes == 500:  # Firestore batch write limit
+                batch.commit()
+                batch = db.batch()
+                writes = 0
+            batch.set(
+                run_ref.collection(CHUNKS_SUBCOLLECTION).document(f"{index:05d}"),
+                {"index": index, "product_ids": ids, "done": False},
+            )
+            writes += 1
+        batch.commit()
+        return chunks
+
+    async def start_run(self, product_ids: List[str], owner: str) -> Dict[str, Any]:
+        """
+        Persist the plan for a new run; returns the run id and its chunks
+        """
+        run_id = new_run_id()
+        chunks = await asyncio.to_thread(self._start_run, run_id, product_ids, owner)
+        return {"run_id": run_id, "chunks": list(enumerate(chunks))}
+
+    def _complete_chunk(self, run_id: str, index: int, processed: int, failed: int):
+        run_ref = self.runs_ref.document(run_id)
+        batch = db.batch()
+        batch.update(
+            run_ref.collection(CHUNKS_SUBCOLLECTION).document(f"{index:05d}"),
+            {"done": True, "completed_at": datetime.utcnow()},
+        )
+        batch.update(
+            run_ref,
+            {
+                "chunks_done": firestore.Increment(1),
+                "processed": firestore.Increment(processed),
+                "failed": firestore.Increment(failed),
+                "heartbeat_at": time.time(),
+            },
+        )
+        batch.commit()
+
+    async def complete_chunk(self, run_id: str, index: int, processed: int, failed: int = 0):
+        """
+        Checkpoint one finished chunk
+        """
+        try:
+            await asyncio.to_thread(self._complete_chunk, run_id, index, processed, failed)
+        except Exception as e:
+            # A missed checkpoint only means the chunk is scraped again after a crash
+            logger.error(f"Failed to checkpoint chunk {index} of {run_id}: {e}")
+
+    async def finish_run(
+        self,
+        run_id: str,
+        status: str = "completed",
+        error: Optional[str] = None,
+        extra: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Close a run and record its throughput (plus any ``extra`` fields such as budget use)
+        """
+
+        def finish():
+            run_ref = self.runs_ref.document(run_id)
+            run = run_ref.get().to_dict() or {}
+            elapsed = max(time.time() - run.get("started_ts", time.time()), 0.001)
+            update = {
+                "status": status,
+                "finished_at": datetime.utcnow(),
+                "elapsed_seconds": round(elapsed, 2),
+                "products_per_minute": round(run.get("processed", 0) * 60 / elapsed, 2),
+            }
+            if error:
+                update["error"] = error
+            update.update(extra or {})
+            run_ref.update(update)
+            return update
+
+        try:
+            return await asyncio.to_thread(finish)
+        except Exception as e:
+            logger.error(f"Failed to finish run {run_id}: {e}")
+            return {}
+
+    # ---------------------------------
+    # Resume
+    # ---------------------------------
+    def _claim_interrupted(self, owner: str, stale_after: float) -> Optional[Dict[str, Any]]:
+        cutoff = time.time() - stale_after
+        candidates = (
+            self.runs_ref.where("status", "==", "running")
+            .where("heartbeat_at", "<", cutoff)
+            .limit(5)
+            .stream()
+        )
+        for doc in candidates:
+            claimed = self._claim(doc.reference, owner, cutoff)
+            if claimed:
+                pending = [
+                    (snap.get("index"), snap.get("product_ids"))
+                    for snap in doc.reference.collection(CHUNKS_SUBCOLLECTION).where("done", "==", False).stream()
+                ]
+                pending.sort()
+                return {"run_id": doc.id, "chunks": pending, "previous_owner": claimed}
+        return None
+
+    def _claim(self, run_ref, owner: str, cutoff: float) -> Optional[str]:
+        """
+        Take over a stale run in a transaction so two replicas cannot both resume it
+        """
+
+        @firestore.transactional
+        def attempt(transaction) -> Optional[str]:
+            run = run_ref.get(transaction=transaction).to_dict() or {}
+            if run.get("status") != "running" or run.get("heartbeat_at", 0) >= cutoff:
+                return None
+            transaction.update(
+                run_ref,
+                {"owner": owner, "heartbeat_at": time.time(), "resumes": firestore.Increment(1)},
+            )
+            return run.get("owner") or "unknown"
+
+        return attempt(db.transaction())
+
+    async def claim_interrupted(self, owner: str, stale_after: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Find a run whose owner stopped checkpointing and take it over
+        """
+        try:
+            return await asyncio.to_thread(
+                self._claim_interrupted, owner, stale_after or settings.RUN_STALE_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"Failed to look for interrupted runs: {e}")
+            return None
+
+    # ---------------------------------
+    # Reporting / Retention
+    # ---------------------------------
+    async def recent_runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        query = self.runs_ref.order_by("started_ts", direction=firestore.Query.DESCENDING).limit(limit)
+        docs = await asyncio.to_thread(lambda: list(query.stream()))
+        runs = []
+        for doc in docs:
+            run = doc.to_dict()
+            if run.get("status") == "running":
+                elapsed = max(time.time() - run.get("started_ts", time.time()), 0.001)
+                run["products_per_minute"] = round(run.get("processed", 0) * 60 / elapsed, 2)
+            chunks_total = run.get("chunks_total")
+            run["progress"] = round(run.get("chunks_done", 0) / chunks_total, 3) if chunks_total else 1.0
+            runs.append(run)
+        return runs
+
+    async def prune(self, keep_days: int = 7) -> int:
+        """
+        Delete finished runs (and their chunks) older than ``keep_days``
+        """
+
+        def prune():
+            cutoff = time.time() - keep_days * 86400
+            deleted = 0
+            for doc in self.runs_ref.where("started_ts", "<", cutoff).stream():
+                if (doc.to_dict() or {}).get("status") == "running":
+                    continue
+                for chunk in doc.reference.collection(CHUNKS_SUBCOLLECTION).stream():
+                    chunk.reference.delete()
+                doc.reference.delete()
+                deleted += 1
+            return deleted
+
+        try:
+            return await asyncio.to_thread(prune)
+        except Exception as e:
+            logger.error(f"Failed to prune monitoring runs: {e}")
+            return 0
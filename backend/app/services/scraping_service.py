@@ -6,18 +6,51 @@ import asyncio
 import httpx
 import re
 from bs4 import BeautifulSoup
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 import logging
 import time
 import random
+import uuid
 
 from firebase_admin import firestore
-from config import SCRAPING_CONFIG, SUPPORTED_PLATFORMS
+from app.utils.cache import response_cache
+from app.utils.metrics import EXTRACTED_FIELDS, SCRAPE_FETCH_SECONDS, SCRAPE_FETCHES
+from app.utils.parse_pool import parse_pool
+from app.utils.tracing import traced
+from app.services.run_budget import product_host
+from app.services.listing_service import ListingService, listing_key, scrape_url
+from app.services.price_history import PriceHistoryService, price_doc_id
+from app.services.product_cache import product_cache
+from app.services.interval_model import update_change_stats, change_stats_from_history
+from app.utils.price_runs import push_recent_price
+from app.utils.timestamps import as_utc
+from config import SCRAPING_CONFIG, SUPPORTED_PLATFORMS, settings
 
 logger = logging.getLogger(__name__)
 db = firestore.client()
 
+VOLATILITY_ALPHA = 0.2  # weight of the latest move in the volatility average
+BATCH_LIMIT = 500  # Firestore writes per batch
+# Product fields a listing starts from when it stores its first price (the run starts afresh)
+LISTING_SEED_FIELDS = (
+    "current_price", "availability", "price_volatility", "price_change_rate", "last_price_change_at", "recent_prices",
+)
+
+SHARED_SCRAPE_TIMEOUT = 120  # seconds a scrape waits for the one of its listing in progress
+
+# Scrapes in progress per listing (fetch, parse and store), shared by every ScrapingService
+# in the process: a scrape racing another of the same listing (a manual scrape and a
+# scheduled one, or two linked products) takes its stored result instead of repeating it
+_scrapes_in_flight: Dict[str, asyncio.Future] = {}
+
+
+def _finish_scrape(key: str, scrape: asyncio.Future, result: Dict[str, Any]):
+    if not scrape.done():
+        scrape.set_result(result)
+    if _scrapes_in_flight.get(key) is scrape:
+        del _scrapes_in_flight[key]
+
 
 class ScrapingService:
     """
@@ -28,13 +61,15 @@ class ScrapingService:
         self.config = SCRAPING_CONFIG
         self.platforms = SUPPORTED_PLATFORMS
         self.products_ref = db.collection("products")
-        self.prices_ref = db.collection("prices")
+        self.price_history = PriceHistoryService()
         self.sessions_ref = db.collection("scraping_sessions")
         self.errors_ref = db.collection("scraping_errors")
+        self.listings = ListingService()
 
     # ---------------------------------
     # Search Products (Amazon, eBay, Walmart)
     # ---------------------------------
+    @traced()
     async def search_products(
         self,
         query: str,
@@ -172,27 +207,151 @@ class ScrapingService:
     # ---------------------------------
     # Scrape Single Product
     # ---------------------------------
-    async def scrape_product(self, product: Dict[str, Any], force: bool = False) -> Dict[str, Any]:
+    @traced()
+    async def scrape_product(self, product: Dict[str, Any], run_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Scrape product data from its URL and store in Firestore
+        (``run_id`` links the scraping session to its monitoring run)
+        """
+        session = self.start_session(product, run_id)
+        result = await self._scrape_product_data(product)
+        return await self.store_result(product, result, session)
+
+    # ---------------------------------
+    # Scrape Stages (used one by one by the monitoring pipeline)
+    # ---------------------------------
+    def start_session(self, product: Dict[str, Any], run_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Record a pending scraping session; returns its id and document reference
         """
         session_id = f"scrape_{product['id']}_{int(time.time())}"
         session_ref = self.sessions_ref.document(session_id)
+        now = datetime.utcnow()
         session_ref.set(
             {
                 "session_id": session_id,
                 "product_id": product["id"],
                 "platform": product["platform"],
-                "url": product["product_url"],
+                "url": scrape_url(product),
                 "status": "pending",
-                "started_at": datetime.utcnow(),
+                "started_at": now,
+                "created_at": now,
+                "run_id": run_id,
             }
         )
+        return {"session_id": session_id, "ref": session_ref}
+
+    async def fetch_page(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Download the product page; ``content`` holds the raw bytes on success.
+
+        The first fetch of a listing starts its scrape, which ``store_result`` finishes.
+        While it is in progress, fetches of the same listing download nothing: their
+        page joins the scrape, and ``store_result`` hands them its stored result.
+        """
+        key = listing_key(product)
+        scrape = _scrapes_in_flight.get(key)
+        if scrape is not None:
+            return {"success": True, "joined": (key, scrape)}
+
+        scrape = asyncio.get_running_loop().create_future()
+        _scrapes_in_flight[key] = scrape
+        try:
+            page = await self._fetch_page(product)
+        except asyncio.CancelledError:
+            # Joined scrapes are not cancelled with us; they see a failed scrape and retry later
+            _finish_scrape(key, scrape, {"success": False, "error": "scrape cancelled"})
+            raise
+        page["scrape"] = (key, scrape)
+        return page
+
+    @traced()
+    async def _fetch_page(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            if product["platform"] not in self.platforms:
+                raise Exception(f"Unsupported platform: {product['platform']}")
+
+            host = product_host(product)
+            async with httpx.AsyncClient(
+                timeout=self.config["timeout"],
+                headers=self.config["headers"],
+                follow_redirects=True,
+            ) as client:
+                start = time.time()
+                try:
+                    response = await client.get(scrape_url(product))
+                except Exception:
+                    SCRAPE_FETCHES.inc(host=host, outcome="error")
+                    raise
+                response_time = int((time.time() - start) * 1000)
+                SCRAPE_FETCH_SECONDS.observe(response_time / 1000, host=host)
 
+                if response.status_code != 200:
+                    SCRAPE_FETCHES.inc(host=host, outcome="http_error")
+                    raise Exception(f"HTTP {response.status_code}: {response.reason_phrase}")
+                SCRAPE_FETCHES.inc(host=host, outcome="ok")
+
+                return {"success": True, "content": response.content, "response_time_ms": response_time}
+        except Exception as e:
+            logger.error(f"Scraping error for {product['id']}: {e}")
+            return {"success": False, "error": str(e)}
+
+    @traced()
+    async def parse_page(self, product: Dict[str, Any], page: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Turn a fetched page into the scrape result (failed fetches and pages that
+        joined another scrape pass through)
+        """
+        if not page.get("success") or "joined" in page:
+            return page
         try:
-            result = await self._scrape_product_data(product)
+            # Parsing is CPU-bound; hand the page to the parse pool so the loop keeps serving requests
+            base_url = self.platforms[product["platform"]].get("base_url", "")
+            parsed = await parse_pool.parse(page["content"], base_url)
+            result = {"success": True}
+            for field, value in parsed.items():
+                EXTRACTED_FIELDS.inc(field=field, outcome="missing" if value in (None, "") else "found")
+            result.update(parsed)
+            result["response_time_ms"] = page["response_time_ms"]
+        except asyncio.CancelledError:
+            _finish_scrape(*page["scrape"], {"success": False, "error": "scrape cancelled"})
+            raise
+        except Exception as e:
+            logger.error(f"Scraping error for {product['id']}: {e}")
+            result = {"success": False, "error": str(e)}
+        result["scrape"] = page["scrape"]
+        return result
+
+    @traced()
+    async def store_result(
+        self, product: Dict[str, Any], result: Dict[str, Any], session: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Close the scraping session and store the new price.
 
-            # Update Firestore
+        A stored price leaves the result carrying the updated product snapshot, the
+        previous and new price and the other products on the listing that received the
+        same price, so change detection and alert dispatch need no reads. A result that
+        joined another scrape of the listing waits for that scrape's stored result
+        instead (see ``_joined_result``).
+        """
+        if "joined" in result:
+            return await self._joined_result(product, result["joined"], session)
+        key, scrape = result.pop("scrape", (None, None))
+        stored = {"success": False, "error": "scrape cancelled"}
+        try:
+            stored = await self._store_result(product, result, session)
+            return stored
+        finally:
+            if scrape is not None:
+                _finish_scrape(key, scrape, stored)
+
+    async def _store_result(
+        self, product: Dict[str, Any], result: Dict[str, Any], session: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        session_id, session_ref = session["session_id"], session["ref"]
+        result["product_id"] = product["id"]
+        try:
             session_ref.update(
                 {
                     "status": "completed",
@@ -202,18 +361,30 @@ class ScrapingService:
             )
 
             if result.get("success") and result.get("price"):
-                await self._create_price_record(product, result)
+                previous_price = product.get("current_price")
+                linked_ids, updates = await self._create_price_record(product, result)
+                result.update(
+                    {
+                        "product": product,
+                        "previous_price": previous_price,
+                        "new_price": result["price"],
+                        "linked_ids": linked_ids,
+                        "updates": updates,
+                    }
+                )
 
             return result
 
         except Exception as e:
             logger.error(f"Scraping failed for {product['id']}: {e}")
+            now = datetime.utcnow()
             self.errors_ref.add(
                 {
                     "session_id": session_id,
                     "error_message": str(e),
                     "product_url": product.get("product_url"),
-                    "timestamp": datetime.utcnow(),
+                    "timestamp": now,
+                    "created_at": now,
                 }
             )
             session_ref.update(
@@ -223,123 +394,351 @@ class ScrapingService:
                     "error_message": str(e),
                 }
             )
-            return {"success": False, "error": str(e), "session_id": session_id}
+            return {"success": False, "error": str(e), "session_id": session_id, "product_id": product["id"]}
 
-    # ---------------------------------
-    # Core Scraping Logic
-    # ---------------------------------
-    async def _scrape_product_data(self, product: Dict[str, Any]) -> Dict[str, Any]:
+    async def _joined_result(
+        self, product: Dict[str, Any], joined: Tuple[str, asyncio.Future], session: Dict[str, Any]
+    ) -> Dict[str, Any]:
         """
-        Perform the actual scraping of product data
+        The result of the listing's scrape in progress, for ``product``: its session is
+        closed and its copy of the product takes the stored price fields. The result is
+        marked ``shared`` when the stored price already reached the product's document
+        and its alerts were checked with the scraping product's; a product the scrape
+        did not reach (not yet on the listing) is given the price here.
         """
+        key, scrape = joined
         try:
-            platform_config = self.platforms.get(product["platform"])
-            if not platform_config:
-                raise Exception(f"Unsupported platform: {product['platform']}")
-
-            async with httpx.AsyncClient(
-                timeout=self.config["timeout"],
-                headers=self.config["headers"],
-                follow_redirects=True,
-            ) as client:
-                start = time.time()
-                response = await client.get(product["product_url"])
-                response_time = int((time.time() - start) * 1000)
-
-                if response.status_code != 200:
-                    raise Exception(f"HTTP {response.status_code}: {response.reason_phrase}")
-
-                soup = BeautifulSoup(response.content, "html.parser")
-                result = {
-                    "success": True,
-                    "price": self._extract_price(soup),
-                    "title": self._extract_title(soup),
-                    "availability": self._extract_availability(soup),
-                    "image_url": self._extract_image_url(soup, platform_config),
-                    "rating": self._extract_rating(soup),
-                    "review_count": self._extract_review_count(soup),
-                    "response_time_ms": response_time,
-                }
+            stored = await asyncio.wait_for(asyncio.shield(scrape), SHARED_SCRAPE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # The scrape was dropped before storing its result; let the next one start afresh
+            _finish_scrape(key, scrape, {"success": False, "error": "shared scrape timed out"})
+            stored = scrape.result()
+        internal = ("product", "product_id", "previous_price", "linked_ids", "updates")
+        result = {field: value for field, value in stored.items() if field not in internal}
+        result["product_id"] = product["id"]
+        try:
+            session["ref"].update(
+                {"status": "completed", "completed_at": datetime.utcnow(), "success": result.get("success", False)}
+            )
+            if "updates" not in stored:
                 return result
+            updates = dict(stored["updates"])
+            shared = product["id"] == stored["product_id"] or product["id"] in stored["linked_ids"]
+            if not shared:
+                listing_id, canonical_url = self.listings.link(
+                    product["id"], product["product_url"], product.get("platform")
+                )
+                updates.update({"listing_id": listing_id, "canonical_url": canonical_url})
+                if not self._share_price(product, [product["id"]], updates, []):
+                    raise RuntimeError("the shared price could not be stored")
+                product_cache.invalidate(product["id"])
+                await response_cache.invalidate_product(product["id"])
+            previous_price = product.get("current_price")
+            product.update(updates)
+            result.update(
+                {
+                    "product": product,
+                    "previous_price": previous_price,
+                    "linked_ids": [],
+                    "updates": updates,
+                    "shared": shared,
+                }
+            )
+            return result
         except Exception as e:
-            logger.error(f"Scraping error for {product['id']}: {e}")
-            return {"success": False, "error": str(e)}
+            logger.error(f"Failed to take the shared scrape result for {product['id']}: {e}")
+            return {"success": False, "error": str(e), "session_id": session["session_id"], "product_id": product["id"]}
 
     # ---------------------------------
-    # Data Extraction Helpers
+    # Core Scraping Logic
     # ---------------------------------
-    def _extract_price(self, soup: BeautifulSoup) -> Optional[float]:
-        text = soup.get_text()
-        matches = re.findall(r"\$\s?(\d+(?:\.\d{1,2})?)", text)
-        return float(matches[0]) if matches else None
-
-    def _extract_title(self, soup: BeautifulSoup) -> Optional[str]:
-        h1 = soup.select_one("h1") or soup.title
-        return h1.get_text(strip=True) if h1 else None
-
-    def _extract_availability(self, soup: BeautifulSoup) -> Optional[str]:
-        txt = soup.get_text().lower()
-        if "out of stock" in txt:
-            return "Out of Stock"
-        if "in stock" in txt:
-            return "In Stock"
-        return None
-
-    def _extract_image_url(self, soup: BeautifulSoup, config: Dict) -> Optional[str]:
-        img = soup.select_one("img") or soup.select_one("#landingImage")
-        if img:
-            src = img.get("src") or img.get("data-src")
-            if src and src.startswith("//"):
-                src = "https:" + src
-            elif src and src.startswith("/"):
-                src = config.get("base_url", "") + src
-            return src
-        return None
-
-    def _extract_rating(self, soup: BeautifulSoup) -> Optional[float]:
-        match = re.search(r"(\d+(\.\d+)?)\s*out of\s*5", soup.get_text(), re.I)
-        return float(match.group(1)) if match else None
-
-    def _extract_review_count(self, soup: BeautifulSoup) -> Optional[int]:
-        match = re.search(r"(\d{1,3}(?:,\d{3})*)\s*(customer )?reviews?", soup.get_text(), re.I)
-        return int(match.group(1).replace(",", "")) if match else None
+    @traced()
+    async def _scrape_product_data(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Perform the actual scraping of product data: fetch here, parse in the parse pool
+        """
+        return await self.parse_page(product, await self.fetch_page(product))
 
     # ---------------------------------
     # Create Price Record
     # ---------------------------------
-    async def _create_price_record(self, product: Dict[str, Any], result: Dict[str, Any]):
+    @traced()
+    async def _create_price_record(
+        self, product: Dict[str, Any], result: Dict[str, Any]
+    ) -> Tuple[List[str], Dict[str, Any]]:
         """
-        Create or update price record in Firestore
+        Store a scraped price on the product's listing and give it to every product on
+        the listing; returns the ids of the other products and the fields they were given.
+
+        The listing owns the price history: one series of price documents under the
+        listing, and the run in progress, recent prices and change statistics in its
+        document, read fresh for every scrape. Price documents are runs: a change of
+        price or availability starts a new one, an unchanged price only extends the
+        current run (``recent_prices``, ``price_run_pending``) and the run's own document
+        is brought up to date every ``PRICE_RUN_FLUSH_SECONDS``. Products on the listing
+        take a copy of those fields in one blind update each (no reads, no runs of their
+        own), so product reads stay single-document.
         """
         try:
-            current_price = result.get("price")
-            product_ref = self.products_ref.document(product["id"])
-            product_ref.update(
-                {
-                    "current_price": current_price,
-                    "updated_at": datetime.utcnow(),
-                    "last_scraped": datetime.utcnow(),
+            now = datetime.utcnow()
+            listing_id, link, listing = self._listing_state(product)
+            linked_ids = [pid for pid in listing.pop("product_ids", None) or [] if pid != product["id"]]
+            closing = []
+            if not listing.get("price_run_id"):
+                # First price stored on the listing: carry on from the product's change statistics
+                # and recent prices, and close the runs its products kept before sharing one
+                closing = self._close_product_runs(product, linked_ids)
+                listing = {
+                    **{field: product.get(field) for field in LISTING_SEED_FIELDS},
+                    **{field: value for field, value in listing.items() if value is not None},
                 }
+            listing["id"] = product["id"]  # change statistics bootstrap from the product's history
+            updates = self._price_updates(listing, result.get("price"), result.get("availability"), now)
+            product_updates = {**updates, **link}
+
+            batch = db.batch()
+            self.listings.record_price(batch, listing_id, updates)
+            batch.update(self.products_ref.document(product["id"]), product_updates)
+            for price_ref, data in self._price_writes(listing, listing_id, updates, product):
+                batch.set(price_ref, data, merge=True)
+            batch.commit()
+            # Keep the caller's copy current so the crawl scheduler sees the new change stats
+            product.update(product_updates)
+            product_cache.invalidate(product["id"])
+            await response_cache.invalidate_product(product["id"])
+
+            linked_ids = self._share_price(product, linked_ids, product_updates, closing)
+            for product_id in linked_ids:
+                product_cache.invalidate(product_id)
+                await response_cache.invalidate_product(product_id)
+            return linked_ids, product_updates
+        except Exception as e:
+            logger.error(f"Failed to create price record for {product['id']}: {e}")
+            raise
+
+    def _listing_state(self, product: Dict[str, Any]) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        """
+        The product's listing id, the fields that link the product to it (empty unless
+        the product had no listing yet) and the listing document
+        """
+        listing_id, link = product.get("listing_id"), {}
+        if not listing_id:
+            # Products saved before listings existed join theirs (with the products the
+            # scheduler found on the same item) on their first scrape
+            listing_id, canonical_url = self.listings.link(
+                product["id"], product["product_url"], product.get("platform"), product.get("linked_ids") or ()
             )
+            link = {"listing_id": listing_id, "canonical_url": canonical_url}
+        return listing_id, link, self.listings.get(listing_id) or {}
 
-            self.prices_ref.add(
-                {
-                    "product_id": product["id"],
-                    "price": current_price,
-                    "currency": product.get("currency", "USD"),
-                    "created_at": datetime.utcnow(),
-                    "source_url": product.get("product_url"),
-                }
+    def _price_updates(
+        self, product: Dict[str, Any], price: Optional[float], availability: Optional[str], now: datetime
+    ) -> Dict[str, Any]:
+        """
+        Product fields for a scraped price, from the product's own price, change
+        statistics, run and recent prices
+        """
+        if product.get("price_change_rate") is None:
+            product.update(self._bootstrap_change_stats(product))
+
+        updates = {
+            "current_price": price,
+            "price_volatility": self._update_volatility(product, price),
+            "updated_at": now,
+            "last_scraped": now,
+            "last_monitored": now,
+        }
+        updates.update(update_change_stats(product, price, now))
+        updates.update(self._price_run(product, price, availability, now))
+        updates["recent_prices"] = push_recent_price(
+            product.get("recent_prices"),
+            {
+                "run_id": updates["price_run_id"],
+                "price": price,
+                "availability": updates["availability"],
+                "first_seen": updates["price_run_started"],
+                "last_seen": now,
+            },
+            settings.RECENT_PRICES_SIZE,
+        )
+        return updates
+
+    @staticmethod
+    def _price_run(
+        product: Dict[str, Any], price: Optional[float], availability: Optional[str], now: datetime
+    ) -> Dict[str, Any]:
+        """
+        Keep the product's current price run when price and availability are unchanged,
+        otherwise start a new one. ``price_run_pending`` counts the observations not yet
+        written to the run's document; ``price_run_flushed_at`` is set when they are.
+        """
+        if (
+            product.get("price_run_id")
+            and product.get("current_price") == price
+            and product.get("availability") == availability
+        ):
+            run = {
+                "price_run_id": product["price_run_id"],
+                "price_run_started": product.get("price_run_started") or now,
+                "availability": availability,
+            }
+            flushed = as_utc(product.get("price_run_flushed_at"))
+            if flushed is not None and (as_utc(now) - flushed).total_seconds() < settings.PRICE_RUN_FLUSH_SECONDS:
+                run["price_run_pending"] = int(product.get("price_run_pending") or 0) + 1
+            else:
+                run.update({"price_run_pending": 0, "price_run_flushed_at": now})
+            return run
+        return {
+            "price_run_id": uuid.uuid4().hex[:20],
+            "price_run_started": now,
+            "availability": availability,
+            "price_run_pending": 0,
+            "price_run_flushed_at": now,
+        }
+
+    def _price_writes(
+        self, listing: Dict[str, Any], listing_id: str, updates: Dict[str, Any], product: Dict[str, Any]
+    ):
+        """
+        Price document merges for one scrape, given the listing before ``updates``: a
+        new run is created, after closing the previous run with its unwritten
+        observations; a continuing run is written only when its flush is due
+        """
+        pending = int(listing.get("price_run_pending") or 0)
+        previous_run = listing.get("price_run_id")
+        if updates["price_run_id"] == previous_run:
+            if "price_run_flushed_at" not in updates:
+                return []
+            return [self._price_observation(product, listing_id, updates, pending + 1)]
+        writes = []
+        if previous_run and pending:
+            previous_id = price_doc_id(previous_run, listing_id)
+            writes.append(
+                (
+                    self.price_history.listing_price_ref(listing_id, previous_id),
+                    {"last_seen": listing.get("last_scraped"), "observations": firestore.Increment(pending)},
+                )
             )
+        writes.append(self._price_observation(product, listing_id, updates))
+        return writes
+
+    def _price_observation(
+        self, product: Dict[str, Any], listing_id: str, updates: Dict[str, Any], observations: int = 1
+    ):
+        """
+        Price document of the listing's current run and the merge that records
+        ``observations`` more observations (creating the run on its first)
+        """
+        started = updates["price_run_started"]
+        price_id = price_doc_id(updates["price_run_id"], listing_id)
+        return self.price_history.listing_price_ref(listing_id, price_id), {
+            "listing_id": listing_id,
+            "price": updates["current_price"],
+            "currency": product.get("currency", "USD"),
+            "platform": product.get("platform"),
+            "availability": updates["availability"],
+            "source_url": scrape_url(product),
+            "created_at": started,
+            "first_seen": started,
+            "last_seen": updates["last_scraped"],
+            "observations": firestore.Increment(observations),
+        }
+
+    def _close_product_runs(self, product: Dict[str, Any], linked_ids: List[str]):
+        """
+        Merges that close the runs the listing's products kept in their own price
+        history before the listing stored the price (once per listing): each run's
+        unwritten observations are added to its document
+        """
+        products = [product]
+        if linked_ids:
+            refs = [self.products_ref.document(pid) for pid in linked_ids]
+            fields = ["price_run_id", "price_run_pending", "last_scraped"]
+            snaps = db.get_all(refs, field_paths=fields)
+            products += [{**snap.to_dict(), "id": snap.id} for snap in snaps if snap.exists]
+        writes = []
+        for p in products:
+            pending = int(p.get("price_run_pending") or 0)
+            if p.get("price_run_id") and pending:
+                price_ref = self.price_history.price_ref(p["id"], price_doc_id(p["price_run_id"], p["id"]))
+                writes.append(
+                    (price_ref, {"last_seen": p.get("last_scraped"), "observations": firestore.Increment(pending)})
+                )
+        return writes
+
+    def _share_price(
+        self, product: Dict[str, Any], linked_ids: List[str], updates: Dict[str, Any], closing: List
+    ) -> List[str]:
+        """
+        Copy the listing's price fields to the other products on it (plus any ``closing``
+        run merges), in write batches; returns the ids of the products updated.
+
+        The updates are blind: linked products are not read and keep no run of their
+        own. A batch that fails (say, on a product deleted since the listing was read)
+        is retried one write at a time; failures are logged, never raised, as the
+        listing and the scraped product already hold the price.
+        """
+        writes = [(self.products_ref.document(pid), updates, False) for pid in linked_ids]
+        writes += [(ref, data, True) for ref, data in closing]
+        shared = []
+        for start in range(0, len(writes), BATCH_LIMIT):
+            chunk = writes[start:start + BATCH_LIMIT]
+            try:
+                batch = db.batch()
+                for ref, data, merge in chunk:
+                    if merge:
+                        batch.set(ref, data, merge=True)
+                    else:
+                        batch.update(ref, data)
+                batch.commit()
+                shared += [ref.id for ref, _, merge in chunk if not merge]
+                continue
+            except Exception as e:
+                logger.error(f"Failed to share the price of {product['id']} in one batch, retrying per product: {e}")
+            for ref, data, merge in chunk:
+                try:
+                    if merge:
+                        ref.set(data, merge=True)
+                    else:
+                        ref.update(data)
+                        shared.append(ref.id)
+                except Exception as e:
+                    logger.error(f"Failed to share the price of {product['id']} with {ref.id}: {e}")
+        return shared
+
+    def _bootstrap_change_stats(self, product: Dict[str, Any], limit: int = 50) -> Dict[str, Any]:
+        """
+        Seed change statistics the first time a product is scraped, from the runs
+        embedded in the product or else from its stored price history
+        """
+        recent = product.get("recent_prices")
+        if recent:
+            points = [{"price": r.get("price"), "created_at": r.get("first_seen")} for r in recent]
+            return change_stats_from_history(points)
+        try:
+            return change_stats_from_history(self.price_history.runs(product["id"], limit, product=product))
         except Exception as e:
-            logger.error(f"Failed to create price record for {product['id']}: {e}")
-            raise
+            logger.error(f"Failed to load price history for {product['id']}: {e}")
+            return {}
+
+    @staticmethod
+    def _update_volatility(product: Dict[str, Any], new_price: Optional[float]) -> float:
+        """
+        Exponentially weighted mean of the relative price move per scrape
+        """
+        previous = product.get("current_price")
+        volatility = product.get("price_volatility") or 0.0
+        if not previous or not new_price:
+            return volatility
+        move = abs(new_price - previous) / previous
+        return round((1 - VOLATILITY_ALPHA) * volatility + VOLATILITY_ALPHA * move, 6)
 
     # ---------------------------------
     # Multiple Products
     # ---------------------------------
+    @traced()
     async def scrape_multiple_products(
-        self, products: List[Dict[str, Any]], max_concurrent: int = 5
+        self, products: List[Dict[str, Any]], max_concurrent: int = 5, run_id: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Scrape multiple products concurrently
@@ -349,7 +748,7 @@ class ScrapingService:
 
             async def scrape_with_limit(p):
                 async with semaphore:
-                    return await self.scrape_product(p)
+                    return await self.scrape_product(p, run_id=run_id)
 
             results = await asyncio.gather(*[scrape_with_limit(p) for p in products])
             return results
@@ -0,0 +1,116 @@
+"""
+Shard membership for sharded price monitoring (Firebase Firestore version)
+Workers heartbeat into ``monitoring_workers`` and split listings by consistent hashing
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from firebase_admin import firestore
+from app.utils.hashring import ConsistentHashRing
+from app.utils.helpers import instance_id
+from config import settings
+
+logger = logging.getLogger(__name__)
+db = firestore.client()
+
+WORKERS_COLLECTION = "monitoring_workers"
+
+
+class ShardMembership:
+    """
+    One monitoring worker's view of the shard ring.
+
+    Every heartbeat writes this worker's progress document and reads the set of live
+    workers (heartbeat newer than ``heartbeat_ttl``). When that set changes the ring is
+    rebuilt; with consistent hashing only the products next to the joining or leaving
+    worker change owner, so the others keep their connections and caches warm.
+    """
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        heartbeat_ttl: Optional[int] = None,
+        vnodes: Optional[int] = None,
+    ):
+        self.worker_id = worker_id or instance_id()
+        self.heartbeat_ttl = heartbeat_ttl or settings.SHARD_HEARTBEAT_TTL
+        self.vnodes = vnodes or settings.SHARD_VNODES
+        self.workers_ref = db.collection(WORKERS_COLLECTION)
+        self.ring = ConsistentHashRing([self.worker_id], vnodes=self.vnodes)
+        self.started_at = time.time()
+        self.rebalances = 0
+
+    def owns(self, key: str) -> bool:
+        """
+        Whether this worker scrapes ``key`` (a listing key, so every product on a
+        listing lands on the same shard)
+        """
+        return self.ring.node_for(key) == self.worker_id
+
+    def set_members(self, members: List[str]) -> bool:
+        """
+        Rebuild the ring for a new member set; returns True when ownership changed
+        """
+        members = sorted(set(members) | {self.worker_id})
+        if members == self.ring.nodes:
+            return False
+        joined = set(members) - set(self.ring.nodes)
+        left = set(self.ring.nodes) - set(members)
+        self.ring = ConsistentHashRing(members, vnodes=self.vnodes)
+        self.rebalances += 1
+        logger.info(
+            f"🔀 Shard ring rebalanced: {len(members)} workers "
+            f"(joined {sorted(joined)}, left {sorted(left)})"
+        )
+        return True
+
+    def _heartbeat(self, progress: Dict[str, Any]) -> List[str]:
+        now = time.time()
+        self.workers_ref.document(self.worker_id).set(
+            {
+                "worker_id": self.worker_id,
+                "heartbeat_at": now,
+                "started_at": self.started_at,
+                "ownership": self.ring.ownership().get(self.worker_id),
+                "rebalances": self.rebalances,
+                "progress": progress,
+            }
+        )
+        live = (
+            self.workers_ref.where("heartbeat_at", ">", now - self.heartbeat_ttl)
+            .select(["worker_id"])
+            .stream()
+        )
+        return [doc.id for doc in live]
+
+    async def heartbeat(self, progress: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Publish progress and refresh membership; returns True when the ring changed
+        """
+        try:
+            members = await asyncio.to_thread(self._heartbeat, progress or {})
+            return self.set_members(members)
+        except Exception as e:
+            # Keep the last known ring; a worker that cannot heartbeat drops out for the others
+            logger.error(f"Shard heartbeat failed for {self.worker_id}: {e}")
+            return False
+
+    async def leave(self):
+        """
+        Remove this worker's document so the others take over its range right away
+        """
+        try:
+            await asyncio.to_thread(self.workers_ref.document(self.worker_id).delete)
+        except Exception as e:
+            logger.error(f"Failed to leave shard ring: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "workers": self.ring.nodes,
+            "ownership": self.ring.ownership().get(self.worker_id),
+            "rebalances": self.rebalances,
+        }
@@ -0,0 +1,93 @@
+"""
+Timestamp backfill (Firebase Firestore version)
+Rewrites timestamps that older documents hold as ISO strings into native Firestore
+timestamps, and fills the fields the date-window queries filter on, so ranges like
+``where("created_at", ">=", start)`` see every document.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Tuple
+
+from firebase_admin import firestore
+from app.services.price_history import PRICES
+from app.utils.timestamps import as_utc, needs_backfill
+
+logger = logging.getLogger(__name__)
+db = firestore.client()
+
+BACKFILL_BATCH_DOCS = 400  # document updates per write batch
+
+# Timestamp fields per collection
+TIMESTAMP_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "products": (
+        "created_at", "updated_at", "last_scraped", "last_monitored",
+        "last_price_change_at", "price_run_started",
+    ),
+    "alerts": ("created_at", "updated_at", "last_checked", "triggered_at"),
+    "scraping_sessions": ("created_at", "started_at", "completed_at"),
+    "scraping_errors": ("created_at", "timestamp"),
+    "listings": ("updated_at", "last_scraped"),
+    PRICES: ("created_at", "first_seen", "last_seen"),
+}
+# created_at for documents written before it was recorded
+CREATED_FROM = {"scraping_sessions": "started_at", "scraping_errors": "timestamp"}
+
+
+def backfill_updates(collection: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Field updates that bring one document onto the timestamp model (empty if none)
+    """
+    updates = {
+        name: as_utc(data[name]) for name in TIMESTAMP_FIELDS[collection] if needs_backfill(data.get(name))
+    }
+    current = {**data, **updates}
+    source = CREATED_FROM.get(collection)
+    if source and current.get("created_at") is None and current.get(source) is not None:
+        updates["created_at"] = as_utc(current[source])
+    if collection == PRICES and current.get("created_at") is not None:
+        # Price points written before runs existed become one-observation runs
+        created = as_utc(current["created_at"])
+        for name in ("first_seen", "last_seen"):
+            if current.get(name) is None:
+                updates[name] = created
+        if current.get("observations") is None:
+            updates["observations"] = 1
+    return updates
+
+
+class TimestampBackfill:
+    """
+    Batched, re-runnable rewrite of every collection in TIMESTAMP_FIELDS
+    """
+
+    def _sources(self) -> Iterable[Tuple[str, Any]]:
+        for collection in TIMESTAMP_FIELDS:
+            # Price documents live under each product (and, before migration, in the flat collection)
+            yield collection, db.collection_group(PRICES) if collection == PRICES else db.collection(collection)
+
+    async def run(self, batch_docs: int = BACKFILL_BATCH_DOCS, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+        """
+        Backfill every collection; returns scanned and updated counts per collection
+        """
+        report = {}
+        for collection, query in self._sources():
+            scanned = updated = 0
+            batch, pending = db.batch(), 0
+            for doc in query.stream():
+                scanned += 1
+                updates = backfill_updates(collection, doc.to_dict() or {})
+                if not updates:
+                    continue
+                updated += 1
+                if dry_run:
+                    continue
+                batch.update(doc.reference, updates)
+                pending += 1
+                if pending >= batch_docs:
+                    batch.commit()
+                    batch, pending = db.batch(), 0
+            if pending:
+                batch.commit()
+            report[collection] = {"scanned": scanned, "updated": updated}
+            logger.info(f"Timestamp backfill of {collection}: {updated} of {scanned} documents updated")
+        return report
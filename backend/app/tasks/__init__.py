@@ -6,10 +6,12 @@ from .scheduler import TaskScheduler
 from .price_monitor import PriceMonitoringTask
 from .alert_checker import AlertCheckingTask
 from .cleanup import CleanupTask
+from .snapshot import SnapshotTask
 
 __all__ = [
     "TaskScheduler",
     "PriceMonitoringTask", 
     "AlertCheckingTask",
-    "CleanupTask"
+    "CleanupTask",
+    "SnapshotTask"
 ]
@@ -8,7 +8,10 @@ from datetime import datetime, timedelta
 from typing import Dict, Any
 
 from firebase_admin import firestore
+from app.services.price_history import PriceHistoryService
 from app.services.price_service import PriceService
+from app.services.run_checkpoint import RunCheckpointStore
+from app.utils.aggregations import count_of, run_aggregations
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -24,6 +27,8 @@ class CleanupTask:
         self.last_run = None
         self.is_running = False
         self.price_service = PriceService()
+        self.price_history = PriceHistoryService()
+        self.run_store = RunCheckpointStore()
 
     # ---------------------------------------------------
     # Main Cleanup Runner
@@ -53,10 +58,14 @@ class CleanupTask:
             # Clean scraping errors
             deleted_errors = await self._cleanup_collection("scraping_errors", cutoff_date)
 
+            # Finished monitoring run checkpoints are only kept for a week
+            deleted_runs = await self.run_store.prune(keep_days=7)
+
             result = {
                 "deleted_prices": deleted_prices,
                 "deleted_sessions": deleted_sessions,
                 "deleted_errors": deleted_errors,
+                "deleted_runs": deleted_runs,
                 "cutoff_date": cutoff_date.isoformat(),
             }
 
@@ -106,16 +115,12 @@ class CleanupTask:
         Helper to delete old documents from a Firestore collection
         """
         try:
-            collection_ref = db.collection(collection_name)
-            docs = list(collection_ref.stream())
+            old = self._old_docs(collection_name, cutoff_date).select([])
             deleted_count = 0
 
-            for doc in docs:
-                data = doc.to_dict()
-                created_at = data.get("created_at")
-                if created_at and isinstance(created_at, datetime) and created_at < cutoff_date:
-                    collection_ref.document(doc.id).delete()
-                    deleted_count += 1
+            for doc in old.stream():
+                doc.reference.delete()
+                deleted_count += 1
 
             logger.info(f"🧽 Deleted {deleted_count} old docs from {collection_name}")
             return deleted_count
@@ -134,9 +139,16 @@ class CleanupTask:
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=settings.MAX_PRICE_HISTORY_DAYS)
 
-            old_prices = await self._count_old_docs("prices", cutoff_date)
-            old_sessions = await self._count_old_docs("scraping_sessions", cutoff_date)
-            old_errors = await self._count_old_docs("scraping_errors", cutoff_date)
+            # Price runs age out by when they were last seen, the rest by when they were created
+            counts, _ = await run_aggregations(
+                {
+                    "prices": count_of(self.price_history.all_prices().where("last_seen", "<", cutoff_date)),
+                    "sessions": count_of(self._old_docs("scraping_sessions", cutoff_date)),
+                    "errors": count_of(self._old_docs("scraping_errors", cutoff_date)),
+                }
+            )
+            old_prices, old_sessions, old_errors = counts["prices"], counts["sessions"], counts["errors"]
+            old_prices += sum(1 for _ in self.price_history.without_last_seen("<", cutoff_date, fields=[]))
 
             stats = {
                 "old_prices": old_prices,
@@ -152,22 +164,11 @@ class CleanupTask:
             return {"status": "failed", "error": str(e)}
 
     # ---------------------------------------------------
-    # Count Utility
+    # Query Utility
     # ---------------------------------------------------
-    async def _count_old_docs(self, collection_name: str, cutoff_date: datetime) -> int:
+    @staticmethod
+    def _old_docs(collection_name: str, cutoff_date: datetime):
         """
-        Count old documents for cleanup statistics
+        Documents of a collection created before the cutoff (an indexed range filter)
         """
-        try:
-            docs = list(db.collection(collection_name).stream())
-            count = sum(
-                1
-                for doc in docs
-                if doc.to_dict().get("created_at")
-                and isinstance(doc.to_dict()["created_at"], datetime)
-                and doc.to_dict()["created_at"] < cutoff_date
-            )
-            return count
-        except Exception as e:
-            logger.error(f"Failed to count old docs in {collection_name}: {e}")
-            return 0
+        return db.collection(collection_name).where("created_at", "<", cutoff_date)
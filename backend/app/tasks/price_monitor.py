@@ -4,23 +4,45 @@ Price monitoring background task (Firebase Firestore version)
 
 import asyncio
 import logging
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
+from firebase_admin import firestore
+
+from app.services.listing_service import listing_key
+from app.services.monitoring_pipeline import MonitoringPipeline
 from app.services.price_monitor_service import PriceMonitorService
+from app.services.product_record import MONITORED_FIELDS, ProductRecord
+from app.services.shard_service import ShardMembership
+from app.services.run_checkpoint import RunCheckpointStore
+from app.services.run_budget import RunBudget
+from app.utils.helpers import instance_id
+from app.utils.parse_pool import parse_pool
+from config import settings
 
 logger = logging.getLogger(__name__)
+db = firestore.client()
 
 
 class PriceMonitoringTask:
     """
-    Background task for monitoring product prices using Firebase Firestore
+    Background task for monitoring product prices using Firebase Firestore.
+
+    With SCRAPE_MODE=shard every replica runs this task, but each one only queues the
+    products it owns on the consistent-hash ring of live monitoring workers.
     """
 
-    def __init__(self):
+    def __init__(self, shard: Optional[ShardMembership] = None):
         self.last_run = None
         self.is_running = False
-        self.price_monitor = PriceMonitorService()
+        if shard is None and settings.SCRAPE_MODE == "shard":
+            shard = ShardMembership()
+        self.shard = shard
+        self.price_monitor = PriceMonitorService(shard=shard)
+        self.run_store = RunCheckpointStore()
+        self.owner = shard.worker_id if shard else instance_id()
+        self.progress = {"runs": 0, "scraped": 0, "failed": 0}
 
     # ---------------------------------------------------
     # Main Monitoring Runner
@@ -38,25 +60,51 @@ class PriceMonitoringTask:
             self.last_run = datetime.utcnow()
             logger.info("🚀 Starting Firestore price monitoring task")
 
-            # Fetch products needing monitoring
-            products = await self.price_monitor._get_products_for_monitoring()
+            await self._shard_heartbeat()
+
+            # Finish runs a crashed replica left behind before planning new work
+            resumed = None
+            budget = None
+            if settings.SCRAPE_MODE != "queue":
+                if settings.RUN_TIME_BUDGET_SECONDS > 0:
+                    budget = RunBudget(settings.RUN_TIME_BUDGET_SECONDS, time.monotonic())
+                resumed = await self._resume_interrupted_run(budget)
+
+            # Fetch products needing monitoring, cut to what fits the remaining budget
+            products = []
+            if budget is None or budget.remaining(time.monotonic()) > 0:
+                products = await self.price_monitor._get_products_for_monitoring(budget=budget)
             if not products:
                 logger.info("No products need monitoring at this time.")
                 return {
                     "status": "completed",
                     "products_monitored": 0,
                     "price_changes": 0,
+                    "resumed": resumed,
                 }
 
-            logger.info(f"Monitoring {len(products)} products...")
+            if settings.SCRAPE_MODE == "queue":
+                # API replicas only enqueue; `python -m app.tasks.worker` processes do the scraping
+                enqueued = await self.price_monitor.enqueue_products(products)
+                logger.info(f"📬 Enqueued {enqueued} of {len(products)} due products for scrape workers")
+                return {
+                    "status": "completed",
+                    "products_enqueued": enqueued,
+                    "scheduler": self.price_monitor.crawl_scheduler.get_stats(),
+                    "queue": await self.price_monitor.job_queue.get_stats(),
+                }
 
-            # Scrape product prices concurrently
-            scrape_results = await self.price_monitor.scraping_service.scrape_multiple_products(
-                products
-            )
+            logger.info(f"Monitoring {len(products)} products...")
 
-            # Process updates and trigger alerts
-            await self.price_monitor._process_monitoring_results(scrape_results)
+            # Checkpoint the plan so a crash only costs the unfinished chunks
+            try:
+                plan = await self.run_store.start_run([p["id"] for p in products], self.owner)
+            except Exception:
+                self.price_monitor.complete_batch(products, [])
+                raise
+            by_id = {p["id"]: p for p in products}
+            chunks = [(index, [by_id[pid] for pid in ids]) for index, ids in plan["chunks"]]
+            run = await self._run_chunks(plan["run_id"], chunks, budget)
 
             # Gather stats after run
             stats = await self.price_monitor.get_monitoring_stats()
@@ -64,7 +112,15 @@ class PriceMonitoringTask:
 
             return {
                 "status": "completed",
+                "run_id": plan["run_id"],
                 "products_monitored": len(products),
+                "products_per_minute": run.get("products_per_minute"),
+                "resumed": resumed,
+                "budget": {**self._budget_report(budget), "carried_over": budget.carried_over} if budget else None,
+                "host_costs": self.price_monitor.cost_estimator.get_stats(),
+                "scheduler": self.price_monitor.crawl_scheduler.get_stats(),
+                "parse_pool": parse_pool.get_stats(),
+                "shard": self.shard.get_status() if self.shard else None,
                 "stats": stats,
             }
 
@@ -73,8 +129,123 @@ class PriceMonitoringTask:
             return {"status": "failed", "error": str(e)}
 
         finally:
+            self.progress["runs"] += 1
+            await self._shard_heartbeat()
             self.is_running = False
 
+    # ---------------------------------------------------
+    # Checkpointed Runs
+    # ---------------------------------------------------
+    async def _run_chunks(
+        self,
+        run_id: str,
+        chunks: List[Tuple[int, List[Dict[str, Any]]]],
+        budget: Optional[RunBudget] = None,
+    ) -> Dict[str, Any]:
+        """
+        Stream a run through the monitoring pipeline, checkpointing each chunk as its
+        last product is done. When the next chunk, on top of the work still in flight,
+        is not expected to finish inside the budget, the rest is handed back to the
+        crawl scheduler and carried over to the next run.
+        """
+        async def chunk_done(index: int, products: List[Dict[str, Any]], results: List[Dict[str, Any]]):
+            self.price_monitor.complete_batch(products, results)
+            succeeded = sum(1 for r in results if r.get("success"))
+            self.progress["scraped"] += succeeded
+            self.progress["failed"] += len(results) - succeeded
+            await self.run_store.complete_chunk(run_id, index, succeeded, len(results) - succeeded)
+
+        pipeline = MonitoringPipeline(self.price_monitor, run_id=run_id, on_chunk=chunk_done)
+
+        def admit(products: List[Dict[str, Any]]) -> bool:
+            cost = self._chunk_cost(pipeline.in_flight() + products)
+            return cost <= budget.remaining(time.monotonic())
+
+        try:
+            remaining = await pipeline.run(chunks, admit if budget else None)
+        except Exception as e:
+            # Hand unfinished products back to the scheduler so they are retried rather than stuck in flight
+            self.price_monitor.complete_batch(pipeline.unfinished(), [])
+            await self.run_store.finish_run(run_id, "failed", str(e))
+            raise
+
+        carried = len(remaining)
+        if carried:
+            self.price_monitor.crawl_scheduler.release(p["id"] for p in remaining)
+            budget.carried_over += carried
+            logger.info(f"⏱️ Run budget reached, carrying {carried} products over to the next run")
+
+        extra = {"carried_over": carried}
+        if budget:
+            extra.update(self._budget_report(budget))
+        return await self.run_store.finish_run(run_id, extra=extra)
+
+    def _chunk_cost(self, products: List[Dict[str, Any]]) -> float:
+        estimate = self.price_monitor.cost_estimator.estimate
+        return sum(estimate(p) for p in products) / max(settings.SCRAPE_CONCURRENCY, 1)
+
+    def _budget_report(self, budget: RunBudget) -> Dict[str, Any]:
+        return {
+            "budget_seconds": budget.budget_seconds,
+            "planned_seconds": budget.planned_seconds,
+            "budget_utilisation": budget.utilisation(time.monotonic()),
+        }
+
+    async def _resume_interrupted_run(self, budget: Optional[RunBudget] = None) -> Optional[Dict[str, Any]]:
+        """
+        Take over a run whose owner stopped checkpointing and scrape its remaining chunks
+        """
+        claimed = await self.run_store.claim_interrupted(self.owner)
+        if not claimed:
+            return None
+
+        product_ids = [pid for _, ids in claimed["chunks"] for pid in ids]
+        products = await asyncio.to_thread(self._load_products, product_ids)
+        if self.shard:
+            products = {pid: p for pid, p in products.items() if self.shard.owns(listing_key(p))}
+        chunks = [
+            (index, [products[pid] for pid in ids if pid in products])
+            for index, ids in claimed["chunks"]
+        ]
+        logger.info(
+            f"♻️ Resuming run {claimed['run_id']} from {claimed['previous_owner']}: "
+            f"{len(chunks)} chunks, {len(products)} products left"
+        )
+        run = await self._run_chunks(claimed["run_id"], chunks, budget)
+        return {
+            "run_id": claimed["run_id"],
+            "products_monitored": len(products),
+            "products_per_minute": run.get("products_per_minute"),
+        }
+
+    def _load_products(self, product_ids: List[str]) -> Dict[str, ProductRecord]:
+        products_ref = self.price_monitor.products_ref
+        refs = [products_ref.document(pid) for pid in dict.fromkeys(product_ids)]
+        products = {}
+        for snap in db.get_all(refs, field_paths=list(MONITORED_FIELDS)):
+            if snap.exists:
+                record = ProductRecord.from_snapshot(snap)
+                if record.get("is_tracking", True):
+                    products[snap.id] = record
+        return products
+
+    async def _shard_heartbeat(self):
+        """
+        Publish this shard's progress; requeue from Firestore if ring ownership moved
+        """
+        if not self.shard:
+            return
+        scheduler = self.price_monitor.crawl_scheduler.get_stats()
+        progress = {
+            **self.progress,
+            "queued_products": scheduler["queued_products"],
+            "due_products": scheduler["due_products"],
+            "in_flight": scheduler["in_flight"],
+            "last_run": self.last_run,
+        }
+        if await self.shard.heartbeat(progress):
+            await self.price_monitor.crawl_scheduler.refresh(force=True)
+
     # ---------------------------------------------------
     # Manual Product Monitoring
     # ---------------------------------------------------
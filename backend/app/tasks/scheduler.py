@@ -4,7 +4,7 @@ Task scheduler for managing background tasks (Firebase Firestore version)
 
 import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Set
 from datetime import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
@@ -14,20 +14,43 @@ from app.tasks.price_monitor import PriceMonitoringTask
 
 from app.tasks.alert_checker import AlertCheckingTask
 from app.tasks.cleanup import CleanupTask
+from app.tasks.snapshot import SnapshotTask
 from app.services.notification_service import NotificationService
+from app.utils.locks import LeaderElector, create_lock_backend
+from app.utils.profiling import TaskProfiler
+from config import settings
 
 logger = logging.getLogger(__name__)
 
 
+class NotLeaderError(RuntimeError):
+    """Raised for requests that only the leader replica can serve"""
+
+
 class TaskScheduler:
     """
-    Centralized Firestore-based task scheduler for background operations
+    Centralized Firestore-based task scheduler for background operations.
+
+    Every replica starts its leader-only jobs paused and campaigns for the
+    ``task_scheduler`` lease; only the elected leader resumes them, so background work
+    is not multiplied when API replicas are scaled out. In shard mode the price monitor
+    runs on every replica, each scraping its own share of the products.
     """
 
-    def __init__(self):
+    LEADER_LOCK = "task_scheduler"
+
+    def __init__(self, lock_backend=None, profiler: Optional[TaskProfiler] = None):
         self.scheduler = AsyncIOScheduler()
         self.tasks: Dict[str, Any] = {}
         self.is_running = False
+        self.profiler = profiler or TaskProfiler()
+        self.profile_next: Set[str] = set()
+        self.elector = LeaderElector(
+            lock_backend or create_lock_backend(),
+            self.LEADER_LOCK,
+            on_elected=self._on_elected,
+            on_revoked=self._on_revoked,
+        )
 
     # ---------------------------------------------------
     # Start / Stop Scheduler
@@ -42,9 +65,12 @@ class TaskScheduler:
 
         try:
             self._initialize_tasks()
+            for job_id in self._leader_only_jobs():
+                self.scheduler.pause_job(job_id)
             self.scheduler.start()
             self.is_running = True
-            logger.info("✅ Firestore Task Scheduler started successfully")
+            self.elector.start()
+            logger.info("✅ Firestore Task Scheduler started successfully (waiting for leadership)")
         except Exception as e:
             logger.error(f"❌ Failed to start task scheduler: {e}")
             raise
@@ -57,6 +83,10 @@ class TaskScheduler:
             logger.warning("Task scheduler is not running")
             return
         try:
+            await self.elector.stop()
+            price_monitor = self.tasks.get("price_monitor")
+            if price_monitor and price_monitor.shard:
+                await price_monitor.shard.leave()
             self.scheduler.shutdown(wait=True)
             self.is_running = False
             logger.info("🛑 Task scheduler stopped")
@@ -64,6 +94,59 @@ class TaskScheduler:
             logger.error(f"Failed to stop task scheduler: {e}")
             raise
 
+    # ---------------------------------------------------
+    # Leadership
+    # ---------------------------------------------------
+    @property
+    def is_leader(self) -> bool:
+        return self.elector.is_leader
+
+    @property
+    def instance(self) -> str:
+        return self.elector.owner
+
+    async def leader_instance(self) -> Optional[str]:
+        """
+        Instance currently holding the scheduler lease, if any
+        """
+        if self.is_leader:
+            return self.instance
+        try:
+            lease = await self.elector.backend.holder(self.LEADER_LOCK)
+        except Exception as e:
+            logger.error(f"Failed to look up the scheduler leader: {e}")
+            return None
+        owner = (lease or {}).get("owner")
+        return owner.decode() if isinstance(owner, bytes) else owner
+
+    def _leader_only_jobs(self) -> List[str]:
+        jobs = [job.id for job in self.scheduler.get_jobs()]
+        if settings.SCRAPE_MODE == "shard":
+            jobs = [job_id for job_id in jobs if job_id != "price_monitor"]
+        return jobs
+
+    def _on_elected(self):
+        """
+        Resume the leader-only jobs on the replica that won the lease
+        """
+        if self.is_running:
+            for job_id in self._leader_only_jobs():
+                self.scheduler.resume_job(job_id)
+            # Resuming only computes the next interval; the new leader's snapshot should not wait for it
+            self.scheduler.modify_job("monitoring_snapshot", next_run_time=datetime.now())
+            logger.info("▶️ Background jobs resumed on this replica")
+
+    def _on_revoked(self):
+        """
+        Pause the leader-only jobs when another replica takes over (runs in progress finish)
+        """
+        if self.is_running:
+            for job_id in self._leader_only_jobs():
+                self.scheduler.pause_job(job_id)
+                # Its next run happens on the new leader, so a profile armed here would never fire
+                self.profile_next.discard(job_id)
+            logger.info("⏸️ Background jobs paused on this replica")
+
     # ---------------------------------------------------
     # Initialize Core Tasks
     # ---------------------------------------------------
@@ -72,11 +155,12 @@ class TaskScheduler:
         Initialize background tasks (Firestore-compatible)
         """
         try:
-            # Price monitoring task - hourly
+            # Price monitoring task - drains due products every crawl tick
             price_monitor = PriceMonitoringTask()
             self.scheduler.add_job(
-                price_monitor.run,
-                trigger=IntervalTrigger(hours=1),
+                self._execute,
+                args=["price_monitor"],
+                trigger=IntervalTrigger(seconds=settings.CRAWL_TICK_SECONDS),
                 id="price_monitor",
                 name="Price Monitoring",
                 max_instances=1,
@@ -87,7 +171,8 @@ class TaskScheduler:
             # Alert checking task - every 30 min
             alert_checker = AlertCheckingTask()
             self.scheduler.add_job(
-                alert_checker.run,
+                self._execute,
+                args=["alert_checker"],
                 trigger=IntervalTrigger(minutes=30),
                 id="alert_checker",
                 name="Alert Checking",
@@ -99,7 +184,8 @@ class TaskScheduler:
             # Cleanup task - daily at 2 AM
             cleanup_task = CleanupTask()
             self.scheduler.add_job(
-                cleanup_task.run,
+                self._execute,
+                args=["cleanup"],
                 trigger=CronTrigger(hour=2, minute=0),
                 id="cleanup",
                 name="Data Cleanup",
@@ -108,6 +194,19 @@ class TaskScheduler:
             )
             self.tasks["cleanup"] = cleanup_task
 
+            # Monitoring snapshot task - materialises overview stats, first run on election
+            snapshot_task = SnapshotTask()
+            self.scheduler.add_job(
+                self._execute,
+                args=["monitoring_snapshot"],
+                trigger=IntervalTrigger(minutes=settings.SNAPSHOT_INTERVAL_MINUTES),
+                id="monitoring_snapshot",
+                name="Monitoring Snapshot",
+                max_instances=1,
+                replace_existing=True,
+            )
+            self.tasks["monitoring_snapshot"] = snapshot_task
+
             # Weekly summary task - every Monday at 9 AM
             self.scheduler.add_job(
                 self._send_weekly_summaries,
@@ -123,19 +222,42 @@ class TaskScheduler:
             logger.error(f"Failed to initialize tasks: {e}")
             raise
 
+    # ---------------------------------------------------
+    # Profiling
+    # ---------------------------------------------------
+    def profile_next_run(self, task_name: str) -> str:
+        """
+        Profile the next scheduled execution of a task; returns the instance that will
+        hold the profile. Leader-only tasks can only be armed on the leader, where
+        their next run happens.
+        """
+        if task_name not in self.tasks:
+            raise ValueError(f"Task '{task_name}' not found")
+        if not self.is_leader and task_name in self._leader_only_jobs():
+            raise NotLeaderError(f"Task '{task_name}' runs on the leader replica")
+        self.profile_next.add(task_name)
+        logger.info(f"🔬 Next '{task_name}' run will be profiled")
+        return self.instance
+
+    async def _execute(self, task_name: str, profile: bool = False, **kwargs) -> Dict[str, Any]:
+        task = self.tasks[task_name]
+        if profile or task_name in self.profile_next:
+            self.profile_next.discard(task_name)
+            return await self.profiler.profile(task_name, lambda: task.run(**kwargs))
+        return await task.run(**kwargs)
+
     # ---------------------------------------------------
     # Manual Execution
     # ---------------------------------------------------
-    async def run_task(self, task_name: str, **kwargs) -> Dict[str, Any]:
+    async def run_task(self, task_name: str, profile: bool = False, **kwargs) -> Dict[str, Any]:
         """
-        Run a specific background task manually
+        Run a specific background task manually (under the profiler with ``profile=True``)
         """
         try:
             if task_name not in self.tasks:
                 raise ValueError(f"Task '{task_name}' not found")
 
-            task = self.tasks[task_name]
-            result = await task.run(**kwargs)
+            result = await self._execute(task_name, profile=profile, **kwargs)
 
             logger.info(f"🧠 Manually executed task '{task_name}'")
             return {"task_name": task_name, "success": True, "result": result}
@@ -153,6 +275,7 @@ class TaskScheduler:
         try:
             status = {
                 "scheduler_running": self.is_running,
+                "leadership": self.elector.get_status(),
                 "tasks": {},
             }
 
@@ -162,6 +285,7 @@ class TaskScheduler:
                     "last_run": getattr(task, "last_run", None),
                     "next_run": None,
                     "status": "idle",
+                    "profile_next_run": task_name in self.profile_next,
                 }
 
             if self.is_running:
@@ -0,0 +1,219 @@
+"""
+Standalone scrape worker (Firebase Firestore version)
+
+Run one or more of these next to the API with SCRAPE_MODE=queue:
+
+    python -m app.tasks.worker [--batch-size N] [--once]
+
+Each worker leases scrape jobs from the job queue, scrapes the products, writes prices
+and triggers alerts through the usual services, then acknowledges the jobs. Leases are
+extended while a batch is running; if the worker dies, its jobs become visible again
+after JOB_VISIBILITY_TIMEOUT and another worker picks them up.
+
+With ``--shard`` (SCRAPE_MODE=shard) the worker instead runs the price monitoring task
+for its own consistent-hash share of the products, joining the shard ring on start
+and leaving it on shutdown.
+"""
+
+import app.firebase  # noqa: F401  (initialise Firebase before the services create clients)
+
+import argparse
+import asyncio
+import logging
+import signal
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from firebase_admin import firestore
+from app.services.price_monitor_service import PriceMonitorService
+from app.services.product_record import MONITORED_FIELDS, ProductRecord
+from app.services.shard_service import ShardMembership
+from app.tasks.price_monitor import PriceMonitoringTask
+from app.utils.job_queue import Job, create_job_queue
+from app.utils.helpers import instance_id
+from app.utils.metrics import SCRAPE_RETRIES
+from app.utils.parse_pool import parse_pool
+from config import settings
+
+logger = logging.getLogger(__name__)
+db = firestore.client()
+
+RETRY_BACKOFF_SECONDS = 60  # first retry delay; doubles with every attempt
+
+
+class ScrapeWorker:
+    """
+    Queue consumer that scrapes leased products
+    """
+
+    def __init__(self, queue=None, worker_id: Optional[str] = None, batch_size: Optional[int] = None):
+        self.last_run = None
+        self.is_running = False
+        self.queue = queue or create_job_queue()
+        self.worker_id = worker_id or instance_id()
+        self.batch_size = batch_size or settings.SCRAPE_CONCURRENCY * 2
+        self.price_monitor = PriceMonitorService()
+        self.products_ref = db.collection("products")
+        self.stats = {"batches": 0, "scraped": 0, "failed": 0, "missing": 0}
+        self._stopping = asyncio.Event()
+
+    # ---------------------------------------------------
+    # Single Batch
+    # ---------------------------------------------------
+    async def run(self, **kwargs) -> Dict[str, Any]:
+        """
+        Lease and process one batch of jobs
+        """
+        block_seconds = kwargs.get("block_seconds", 5)
+        jobs = await self.queue.lease(self.worker_id, self.batch_size, block_seconds=block_seconds)
+        if not jobs:
+            return {"status": "idle"}
+
+        try:
+            self.is_running = True
+            self.last_run = datetime.utcnow()
+            keeper = asyncio.create_task(self._keep_leases(jobs))
+            try:
+                return await self._process(jobs)
+            finally:
+                keeper.cancel()
+        except Exception as e:
+            logger.error(f"❌ Scrape worker batch failed: {e}")
+            await self.queue.nack(self.worker_id, [j.id for j in jobs], delay=RETRY_BACKOFF_SECONDS, error=str(e))
+            SCRAPE_RETRIES.inc(len(jobs), source="queue")
+            return {"status": "failed", "error": str(e)}
+        finally:
+            self.is_running = False
+
+    async def _process(self, jobs: List[Job]) -> Dict[str, Any]:
+        products = self._load_products([job.payload["product_id"] for job in jobs])
+
+        missing = [job for job in jobs if job.payload["product_id"] not in products]
+        runnable = [job for job in jobs if job.payload["product_id"] in products]
+        # Deleted or untracked products are acknowledged without scraping
+        await self.queue.ack(self.worker_id, [job.id for job in missing])
+
+        batch = [products[job.payload["product_id"]] for job in runnable]
+        results = await self.price_monitor.scraping_service.scrape_multiple_products(
+            batch, max_concurrent=settings.SCRAPE_CONCURRENCY
+        )
+        await self.price_monitor._process_monitoring_results(results)
+
+        succeeded, failed = [], []
+        for job, result in zip(runnable, results):
+            (succeeded if result.get("success") else failed).append(job)
+        await self.queue.ack(self.worker_id, [job.id for job in succeeded])
+        for job in failed:
+            await self.queue.nack(
+                self.worker_id, [job.id],
+                delay=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1),
+                error="scrape failed",
+            )
+        SCRAPE_RETRIES.inc(len(failed), source="queue")
+
+        self.stats["batches"] += 1
+        self.stats["scraped"] += len(succeeded)
+        self.stats["failed"] += len(failed)
+        self.stats["missing"] += len(missing)
+        logger.info(f"✅ Worker {self.worker_id}: {len(succeeded)} scraped, {len(failed)} failed")
+        return {
+            "status": "completed",
+            "scraped": len(succeeded),
+            "failed": len(failed),
+            "skipped": len(missing),
+        }
+
+    def _load_products(self, product_ids: List[str]) -> Dict[str, ProductRecord]:
+        refs = [self.products_ref.document(pid) for pid in dict.fromkeys(product_ids)]
+        products = {}
+        for snap in db.get_all(refs, field_paths=list(MONITORED_FIELDS)):
+            if snap.exists:
+                record = ProductRecord.from_snapshot(snap)
+                if record.get("is_tracking", True):
+                    products[snap.id] = record
+        return products
+
+    async def _keep_leases(self, jobs: List[Job]):
+        interval = max(1.0, self.queue.visibility_timeout / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.queue.extend(self.worker_id, [job.id for job in jobs])
+            except Exception as e:
+                logger.error(f"Failed to extend job leases: {e}")
+
+    # ---------------------------------------------------
+    # Worker Loop
+    # ---------------------------------------------------
+    def stop(self):
+        self._stopping.set()
+
+    async def run_forever(self, once: bool = False):
+        """
+        Process batches until stopped; ``once`` drains the currently visible jobs and exits
+        """
+        logger.info(f"👷 Scrape worker {self.worker_id} started (batch size {self.batch_size})")
+        try:
+            while not self._stopping.is_set():
+                result = await self.run(block_seconds=0 if once else 5)
+                if once and result["status"] == "idle":
+                    break
+        finally:
+            parse_pool.shutdown()
+            await self.queue.close()
+            logger.info(f"🛑 Scrape worker {self.worker_id} stopped: {self.stats}")
+
+
+async def run_shard(stopping: asyncio.Event, once: bool = False):
+    """
+    Run the price monitor as one shard until stopped
+    """
+    task = PriceMonitoringTask(shard=ShardMembership())
+    logger.info(f"🧩 Shard worker {task.shard.worker_id} started")
+    try:
+        while not stopping.is_set():
+            result = await task.run()
+            if once:
+                break
+            logger.info(f"Shard run finished: {result.get('status')}")
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=settings.CRAWL_TICK_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await task.shard.leave()
+        parse_pool.shutdown()
+        logger.info(f"🛑 Shard worker {task.shard.worker_id} left the ring: {task.progress}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PricePick scrape worker")
+    parser.add_argument("--batch-size", type=int, default=None, help="jobs leased per batch")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty (or after one shard run)")
+    parser.add_argument("--shard", action="store_true", help="run as a monitoring shard instead of a queue consumer")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+
+    async def _run():
+        loop = asyncio.get_running_loop()
+        if args.shard:
+            stopping = asyncio.Event()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, stopping.set)
+            await run_shard(stopping, once=args.once)
+            return
+
+        worker = ScrapeWorker(batch_size=args.batch_size)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        await worker.run_forever(once=args.once)
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
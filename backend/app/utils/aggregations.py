@@ -0,0 +1,63 @@
+"""
+Firestore aggregation query helpers
+Run count()/sum()/avg() queries server-side and concurrently instead of downloading documents
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def count_of(query) -> Any:
+    """Server-side document count for a query"""
+    return query.count(alias="value")
+
+
+def sum_of(query, field: str) -> Any:
+    """Server-side sum of a numeric field"""
+    return query.sum(field, alias="value")
+
+
+def avg_of(query, field: str) -> Any:
+    """Server-side average of a numeric field"""
+    return query.avg(field, alias="value")
+
+
+def _aggregate_value(result) -> Any:
+    """
+    Unwrap the single value of an aggregation response (list of result rows)
+    """
+    for row in result or []:
+        for item in row:
+            return item.value
+    return None
+
+
+async def run_aggregations(
+    queries: Dict[str, Any], default: Any = 0
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Execute named aggregation queries concurrently.
+
+    Returns the values keyed by name and the per-query latency in milliseconds.
+    A failing query yields ``default`` so one missing index doesn't sink the whole report.
+    """
+
+    async def run_one(name: str, query) -> Tuple[str, Any, float]:
+        start = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(query.get)
+            value = _aggregate_value(result)
+        except Exception as e:
+            logger.error(f"Aggregation '{name}' failed: {e}")
+            value = None
+        elapsed = round((time.perf_counter() - start) * 1000, 2)
+        return name, default if value is None else value, elapsed
+
+    results = await asyncio.gather(*[run_one(name, q) for name, q in queries.items()])
+    values = {name: value for name, value, _ in results}
+    timings = {name: elapsed for name, _, elapsed in results}
+    return values, timings
@@ -0,0 +1,376 @@
+"""
+Response caching utilities
+In-process LRU tier, optional Redis tier, single-flight loading and stale-while-revalidate
+"""
+
+import asyncio
+import logging
+import pickle
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple, Union
+
+from app.utils.metrics import CACHE_REQUESTS
+from config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis tier is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+TagSpec = Union[Iterable[str], Callable[[Any], Iterable[str]], None]
+
+
+def product_tag(product_id: Any) -> str:
+    """
+    Build the invalidation tag used for product-scoped cache entries
+    """
+    return f"product:{product_id}"
+
+
+@dataclass
+class CacheEntry:
+    """A cached value with its freshness window"""
+    value: Any
+    fresh_until: float
+    stale_until: float
+    tags: Tuple[str, ...] = ()
+
+
+class LRUCache:
+    """
+    Bounded in-process LRU store for cache entries
+    """
+
+    def __init__(self, max_entries: int = 1024, on_evict: Optional[Callable[[str, CacheEntry], None]] = None):
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() >= entry.stale_until:
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(evicted_key, evicted)
+
+    def delete(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is not None and self.on_evict:
+            self.on_evict(key, entry)
+        return entry is not None
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+
+class RedisCacheTier:
+    """
+    Shared Redis tier behind the in-process LRU.
+    Invalidations are broadcast on a pub/sub channel so every replica drops its local copy.
+    """
+
+    def __init__(self, url: str, prefix: str = "pricepick:cache:"):
+        self.prefix = prefix
+        self.channel = f"{prefix}invalidate"
+        self.client = aioredis.from_url(url)
+        self._listener: Optional[asyncio.Task] = None
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        raw = await self.client.get(self._key(key))
+        return pickle.loads(raw) if raw else None
+
+    async def set(self, key: str, entry: CacheEntry):
+        ttl = max(1, int(entry.stale_until - time.time()))
+        pipe = self.client.pipeline()
+        pipe.set(self._key(key), pickle.dumps(entry), ex=ttl)
+        for tag in entry.tags:
+            pipe.sadd(self._tag_key(tag), key)
+            pipe.expire(self._tag_key(tag), ttl)
+        await pipe.execute()
+
+    async def invalidate_tag(self, tag: str) -> Set[str]:
+        members = await self.client.smembers(self._tag_key(tag))
+        keys = {m.decode() if isinstance(m, bytes) else m for m in members}
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.delete(self._key(key))
+        pipe.delete(self._tag_key(tag))
+        pipe.publish(self.channel, tag)
+        await pipe.execute()
+        return keys
+
+    def listen(self, on_invalidate: Callable[[str], None]):
+        """
+        Start the background subscriber that applies remote invalidations locally
+        """
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen(on_invalidate))
+
+    async def _listen(self, on_invalidate: Callable[[str], None]):
+        pubsub = self.client.pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                data = message.get("data")
+                on_invalidate(data.decode() if isinstance(data, bytes) else data)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Cache invalidation listener stopped: {e}")
+        finally:
+            await pubsub.close()
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.client.close()
+
+
+class ResponseCache:
+    """
+    Two-tier response cache with request coalescing and stale-while-revalidate.
+
+    Entries are fresh for ``ttl`` seconds and may then be served stale for another
+    ``stale_ttl`` seconds while a single background refresh recomputes them.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: int = 300,
+        stale_ttl: int = 60,
+        redis_url: Optional[str] = None,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.local = LRUCache(max_entries, on_evict=self._forget_tags)
+        self.remote: Optional[RedisCacheTier] = None
+        if redis_url:
+            if aioredis is None:
+                logger.warning("REDIS_URL is set but the redis package is not installed; using local cache only")
+            else:
+                self.remote = RedisCacheTier(redis_url)
+
+        self._tag_index: Dict[str, Set[str]] = {}
+        self._tag_epochs: Dict[str, float] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[str] = set()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    # ---------------------------------
+    # Lookup
+    # ---------------------------------
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        tags: TagSpec = None,
+    ) -> Any:
+        """
+        Return the cached value for ``key`` or load it once, however many callers are waiting.
+
+        ``tags`` is either an iterable of tags or a callable deriving tags from the loaded value.
+        """
+        entry = self.local.get(key)
+        if entry is None and self.remote:
+            entry = await self._remote_get(key)
+            if entry is not None:
+                self._store_local(key, entry)
+
+        if entry is not None:
+            now = time.time()
+            if now < entry.fresh_until:
+                self.stats["hits"] += 1
+                CACHE_REQUESTS.inc(result="hit")
+                return entry.value
+            if now < entry.stale_until:
+                self.stats["stale_hits"] += 1
+                CACHE_REQUESTS.inc(result="stale_hit")
+                self._refresh_in_background(key, loader, ttl, tags)
+                return entry.value
+
+        self.stats["misses"] += 1
+        CACHE_REQUESTS.inc(result="miss")
+        return await self._load(key, loader, ttl, tags)
+
+    async def _load(self, key: str, loader, ttl: Optional[int], tags: TagSpec) -> Any:
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            CACHE_REQUESTS.inc(result="coalesced")
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        started = time.time()
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        else:
+            await self._store(key, value, ttl, tags, started)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key: str, loader, ttl: Optional[int], tags: TagSpec):
+        if key in self._refreshing or key in self._inflight:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                await self._load(key, loader, ttl, tags)
+            except Exception as e:
+                logger.warning(f"Background cache refresh failed for {key}: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        asyncio.create_task(refresh())
+
+    # ---------------------------------
+    # Storage
+    # ---------------------------------
+    async def _store(self, key: str, value: Any, ttl: Optional[int], tags: TagSpec, started: float):
+        resolved_tags = tuple(tags(value) if callable(tags) else (tags or ()))
+        # Drop results computed from data that was invalidated while we were loading
+        if any(self._tag_epochs.get(tag, 0) >= started for tag in resolved_tags):
+            return
+
+        now = time.time()
+        fresh_until = now + (ttl if ttl is not None else self.ttl)
+        entry = CacheEntry(value, fresh_until, fresh_until + self.stale_ttl, resolved_tags)
+        self._store_local(key, entry)
+        if self.remote:
+            try:
+                await self.remote.set(key, entry)
+            except Exception as e:
+                logger.warning(f"Failed to write {key} to Redis cache: {e}")
+
+    def _store_local(self, key: str, entry: CacheEntry):
+        self.local.set(key, entry)
+        for tag in entry.tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+
+    async def _remote_get(self, key: str) -> Optional[CacheEntry]:
+        try:
+            return await self.remote.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to read {key} from Redis cache: {e}")
+            return None
+
+    def _forget_tags(self, key: str, entry: CacheEntry):
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    # ---------------------------------
+    # Invalidation
+    # ---------------------------------
+    def _invalidate_local(self, tag: str) -> int:
+        self._tag_epochs[tag] = time.time()
+        if len(self._tag_epochs) > self.local.max_entries:
+            horizon = time.time() - self.ttl - self.stale_ttl
+            self._tag_epochs = {t: e for t, e in self._tag_epochs.items() if e >= horizon}
+
+        removed = 0
+        for key in list(self._tag_index.pop(tag, ())):
+            if self.local.delete(key):
+                removed += 1
+        return removed
+
+    async def invalidate_tag(self, tag: str) -> int:
+        """
+        Drop every entry carrying ``tag`` from all tiers
+        """
+        self.stats["invalidations"] += 1
+        removed = self._invalidate_local(tag)
+        if self.remote:
+            try:
+                await self.remote.invalidate_tag(tag)
+            except Exception as e:
+                logger.warning(f"Failed to invalidate tag {tag} in Redis cache: {e}")
+        return removed
+
+    async def invalidate_product(self, product_id: Any) -> int:
+        """
+        Drop every cached response derived from the given product
+        """
+        return await self.invalidate_tag(product_tag(product_id))
+
+    def clear(self):
+        self.local.clear()
+        self._tag_index.clear()
+
+    # ---------------------------------
+    # Lifecycle
+    # ---------------------------------
+    def start(self):
+        """
+        Subscribe to remote invalidations (no-op without Redis)
+        """
+        if self.remote:
+            self.remote.listen(self._invalidate_local)
+
+    async def close(self):
+        if self.remote:
+            await self.remote.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.local),
+            "hit_rate": round((self.stats["hits"] + self.stats["stale_hits"]) / lookups, 4) if lookups else 0.0,
+            "redis_enabled": self.remote is not None,
+        }
+
+
+# Process-wide cache shared by the services
+response_cache = ResponseCache(
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    ttl=settings.CACHE_TTL,
+    stale_ttl=settings.CACHE_STALE_TTL,
+    redis_url=settings.REDIS_URL,
+)
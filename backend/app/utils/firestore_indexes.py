@@ -0,0 +1,397 @@
+"""
+Firestore index manifest
+Inventory of the query shapes the services issue, the ``firestore.indexes.json``
+generated from it, and the checks that keep the two in step: a startup comparison of
+the inventory against the committed manifest (plus a dry run of every hot query when
+``FIRESTORE_EMULATOR_HOST`` points at the emulator) and a runtime guard that reports
+query shapes no index backs. The emulator accepts every query whether or not an index
+exists, so index coverage is decided from the manifest, not from the emulator.
+"""
+
+import json
+import logging
+import os
+from dataclasses import dataclass
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.utils.metrics import FIRESTORE_UNINDEXED_QUERIES
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = Path(__file__).resolve().parents[2] / "firestore.indexes.json"
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+# Filter operators Firestore serves from the equality part of an index
+_EQUALITY_OPS = {"==", "in", "array-contains", "array-contains-any", "EQUAL", "IN",
+                 "ARRAY_CONTAINS", "ARRAY_CONTAINS_ANY", "IS_NULL", "IS_NAN"}
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    """
+    The parts of a query that decide which index serves it
+    """
+
+    collection: str
+    equality: Tuple[str, ...] = ()
+    ranges: Tuple[str, ...] = ()
+    order: Tuple[Tuple[str, str], ...] = ()
+    group: bool = False  # collection group query (every subcollection with this id)
+    name: str = ""
+
+    def __post_init__(self):
+        # Equality order does not matter to the index; keep one spelling per shape
+        object.__setattr__(self, "equality", tuple(sorted(set(self.equality))))
+        object.__setattr__(self, "ranges", tuple(dict.fromkeys(self.ranges)))
+
+    @property
+    def key(self) -> Tuple:
+        return (self.collection, self.group, self.equality, self.ranges, self.order)
+
+    @property
+    def scope(self) -> str:
+        return "COLLECTION_GROUP" if self.group else "COLLECTION"
+
+    def fields(self) -> Set[str]:
+        return set(self.equality) | set(self.ranges) | {field for field, _ in self.order}
+
+    def needs_composite(self) -> bool:
+        """
+        Whether the query filters or sorts on more than one field; a single field is
+        served by Firestore's automatic single-field indexes
+        """
+        return len(self.fields()) > 1
+
+    def index_fields(self) -> List[Tuple[str, str]]:
+        """
+        Composite index fields: equalities first, then the sort order, then any
+        range field not already sorted on
+        """
+        ordered = [field for field, _ in self.order]
+        tail = list(self.order) + [(field, ASCENDING) for field in self.ranges if field not in ordered]
+        return [(field, ASCENDING) for field in self.equality if field not in ordered] + tail
+
+    def describe(self) -> str:
+        parts = [f"{field} ==" for field in self.equality] + [f"{field} <>" for field in self.ranges]
+        parts += [f"order {field} {direction.lower()}" for field, direction in self.order]
+        target = f"group {self.collection}" if self.group else self.collection
+        return f"{target}: {', '.join(parts) or 'all'}"
+
+
+# ---------------------------------------------------
+# Query inventory
+# ---------------------------------------------------
+def _list_prices_shapes() -> List[QueryShape]:
+    # list_prices combines one optional equality filter with an optional date window,
+    # across all products (collection group) or one product's subcollection
+    shapes = []
+    windows = {
+        "": ((), ()),
+        "end": (("created_at",), ()),
+        "start": (("last_seen",), (("last_seen", DESCENDING),)),
+        "window": (("created_at", "last_seen"), (("last_seen", DESCENDING),)),
+    }
+    for equality, (window, (ranges, order)) in product(
+        ("", "platform", "currency", "is_sale", "is_available"), windows.items()
+    ):
+        shapes.append(QueryShape(
+            "prices",
+            equality=(equality,) if equality else (),
+            ranges=ranges,
+            order=order + (("created_at", DESCENDING),),
+            group=True,
+            name="_".join(filter(None, ("list_prices", equality, window))),
+        ))
+        if not equality:
+            shapes.append(QueryShape(
+                "prices", ranges=ranges, order=order + (("created_at", DESCENDING),),
+                name="_".join(filter(None, ("list_product_prices", window))),
+            ))
+            # With PRICE_HISTORY_LEGACY_READS one product's prices are a filtered collection group
+            shapes.append(QueryShape(
+                "prices", equality=("product_id",), ranges=ranges, order=order + (("created_at", DESCENDING),),
+                group=True, name="_".join(filter(None, ("legacy_list_product_prices", window))),
+            ))
+    return shapes
+
+
+# Hot query shapes issued by the services (collection names as in each service)
+HOT_QUERIES: Tuple[QueryShape, ...] = (
+    # Price history (price_history, price_service, monitoring_service, cleanup)
+    QueryShape("prices", order=(("created_at", DESCENDING),), name="product_price_runs"),
+    QueryShape("prices", ranges=("created_at",), order=(("created_at", DESCENDING),), name="product_price_window"),
+    QueryShape("prices", equality=("product_id",), order=(("created_at", DESCENDING),), group=True,
+               name="legacy_product_price_runs"),
+    QueryShape("prices", equality=("product_id",), ranges=("created_at",), order=(("created_at", DESCENDING),),
+               group=True, name="legacy_product_price_window"),
+    QueryShape("prices", ranges=("last_seen",), group=True, name="prices_last_seen"),
+    QueryShape("prices", ranges=("created_at",), group=True, name="prices_created_since"),
+    QueryShape("prices", equality=("product_id",), ranges=("created_at",), group=True,
+               name="products_prices_created_since"),
+    QueryShape("prices", equality=("listing_id",), ranges=("created_at",), group=True,
+               name="listings_prices_created_since"),
+    *_list_prices_shapes(),
+    # Alerts (alert_service, monitoring_service, crawl_scheduler)
+    QueryShape("alerts", equality=("user_id", "is_active"), name="user_active_alerts"),
+    QueryShape("alerts", equality=("user_id", "is_triggered"), name="user_triggered_alerts"),
+    QueryShape("alerts", equality=("user_id", "alert_type"), name="user_alerts_by_type"),
+    QueryShape("alerts", equality=("product_id", "is_active"), name="product_active_alerts"),
+    QueryShape("alerts", equality=("is_active",), name="active_alerts"),
+    QueryShape("alerts", equality=("is_triggered",), name="triggered_alerts"),
+    QueryShape("alerts", equality=("alert_type",), name="alerts_by_type"),
+    # Products (product_service, monitoring_service, crawl_scheduler)
+    QueryShape("products", equality=("is_tracking",), name="tracked_products"),
+    QueryShape("products", ranges=("last_price_change_at",), name="products_changed_since"),
+    QueryShape("products", ranges=("current_price",), name="priced_products"),
+    *(
+        QueryShape("products", equality=(field,), ranges=("current_price",), order=order,
+                   name=f"priced_products_by_{field}{suffix}")
+        for field in ("platform", "category")
+        for order, suffix in (((), ""), ((("current_price", DESCENDING),), "_desc"))
+    ),
+    QueryShape("products", equality=("platform",), name="products_by_platform"),
+    QueryShape("products", equality=("category",), name="products_by_category"),
+    QueryShape("products", equality=("brand",), name="products_by_brand"),
+    # Monitoring runs, workers and counters
+    QueryShape("monitoring_runs", equality=("status",), ranges=("heartbeat_at",), name="stale_runs"),
+    QueryShape("monitoring_runs", order=(("started_ts", DESCENDING),), name="recent_runs"),
+    QueryShape("monitoring_runs", ranges=("started_ts",), name="expired_runs"),
+    QueryShape("chunks", equality=("done",), name="pending_run_chunks"),
+    QueryShape("monitoring_workers", ranges=("heartbeat_at",), name="live_workers"),
+    QueryShape("counter_shards", ranges=("day",), name="expired_counter_shards"),
+    # Cleanup
+    QueryShape("scraping_sessions", ranges=("created_at",), name="old_scraping_sessions"),
+    QueryShape("scraping_errors", ranges=("created_at",), name="old_scraping_errors"),
+)
+
+
+# ---------------------------------------------------
+# Manifest
+# ---------------------------------------------------
+def _field_override(collection: str, field: str) -> Dict[str, Any]:
+    # An override replaces the automatic indexes, so keep the collection-scope ones too
+    indexes = [{"order": order, "queryScope": scope}
+               for scope in ("COLLECTION", "COLLECTION_GROUP") for order in (ASCENDING, DESCENDING)]
+    indexes.insert(2, {"arrayConfig": "CONTAINS", "queryScope": "COLLECTION"})
+    return {"collectionGroup": collection, "fieldPath": field, "indexes": indexes}
+
+
+def manifest(shapes: Iterable[QueryShape] = HOT_QUERIES) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    ``firestore.indexes.json`` content for the query shapes: a composite index per
+    multi-field shape and collection-group single-field indexes for group queries
+    """
+    indexes: Dict[Tuple, Dict[str, Any]] = {}
+    overrides: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for shape in shapes:
+        if shape.needs_composite():
+            fields = shape.index_fields()
+            indexes[(shape.collection, shape.scope, tuple(fields))] = {
+                "collectionGroup": shape.collection,
+                "queryScope": shape.scope,
+                "fields": [{"fieldPath": field, "order": direction} for field, direction in fields],
+            }
+        elif shape.group:
+            for field in shape.fields():
+                overrides[(shape.collection, field)] = _field_override(shape.collection, field)
+    return {
+        "indexes": [indexes[key] for key in sorted(indexes)],
+        "fieldOverrides": [overrides[key] for key in sorted(overrides)],
+    }
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> Dict[str, List[Dict[str, Any]]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(path: Path = MANIFEST_PATH) -> Dict[str, List[Dict[str, Any]]]:
+    content = manifest()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(content, f, indent=2)
+        f.write("\n")
+    return content
+
+
+def is_covered(shape: QueryShape, indexes: Dict[str, List[Dict[str, Any]]]) -> bool:
+    """
+    Whether an index in the manifest serves the query shape
+    """
+    if not shape.needs_composite():
+        if not shape.group:
+            return True
+        # Collection group queries need their single-field indexes enabled explicitly
+        enabled = {
+            (o["collectionGroup"], o["fieldPath"])
+            for o in indexes.get("fieldOverrides", [])
+            if any(i.get("queryScope") == "COLLECTION_GROUP" for i in o.get("indexes", []))
+        }
+        return all((shape.collection, field) in enabled for field in shape.fields())
+
+    equality = set(shape.equality) - {field for field, _ in shape.order}
+    tail = shape.index_fields()[len(equality):]
+    for index in indexes.get("indexes", []):
+        if index.get("collectionGroup") != shape.collection or index.get("queryScope", "COLLECTION") != shape.scope:
+            continue
+        fields = [(f["fieldPath"], f.get("order", ASCENDING)) for f in index.get("fields", [])]
+        # Equality fields may sit in the index in any order and direction
+        if {field for field, _ in fields[:len(equality)]} == equality and fields[len(equality):] == tail:
+            return True
+    return False
+
+
+def missing_indexes(
+    shapes: Iterable[QueryShape] = HOT_QUERIES, indexes: Optional[Dict[str, List[Dict[str, Any]]]] = None
+) -> List[QueryShape]:
+    indexes = load_manifest() if indexes is None else indexes
+    return [shape for shape in shapes if not is_covered(shape, indexes)]
+
+
+# ---------------------------------------------------
+# Query introspection
+# ---------------------------------------------------
+def _name(value: Any) -> str:
+    return getattr(value, "name", None) or str(value)
+
+
+def shape_of(query: Any) -> Optional[QueryShape]:
+    """
+    Shape of a Firestore SDK query (or an in-memory FakeQuery); None if unreadable
+    """
+    equality, ranges, order = [], [], []
+    if hasattr(query, "_field_filters"):
+        parent = getattr(query, "_parent", None)
+        collection = getattr(parent, "id", None)
+        for flt in query._field_filters or ():
+            field = getattr(getattr(flt, "field", None), "field_path", None)
+            if field is None:
+                continue  # composite (OR) filters are not inventoried
+            (equality if _name(flt.op) in _EQUALITY_OPS else ranges).append(field)
+        for item in query._orders or ():
+            order.append((item.field.field_path, _name(item.direction)))
+    elif hasattr(query, "_filters") and hasattr(query, "_path"):
+        collection = query._path[-1] if query._path else None
+        for field, op, _ in query._filters:
+            (equality if op in _EQUALITY_OPS else ranges).append(field)
+        order = [(field, _name(direction)) for field, direction in query._orders]
+    else:
+        return None
+    if not collection:
+        return None
+    return QueryShape(
+        collection, equality=tuple(equality), ranges=tuple(ranges), order=tuple(order),
+        group=bool(getattr(query, "_all_descendants", False)),
+    )
+
+
+# ---------------------------------------------------
+# Runtime guard
+# ---------------------------------------------------
+class IndexGuard:
+    """
+    Reports each executed query shape the loaded manifest does not back, once per
+    shape (warning log plus a metric), so a new slow shape shows up before production
+    """
+
+    def __init__(self):
+        self.indexes: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._seen: Dict[Tuple, bool] = {}
+
+    def enable(self, indexes: Dict[str, List[Dict[str, Any]]]):
+        self.indexes = indexes
+        self._seen.clear()
+
+    def disable(self):
+        self.indexes = None
+        self._seen.clear()
+
+    def observe(self, query: Any) -> bool:
+        """
+        Check one executed query; returns False when its shape is not index-backed
+        """
+        if self.indexes is None:
+            return True
+        try:
+            shape = shape_of(query)
+        except Exception as e:
+            logger.debug(f"Could not read query shape: {e}")
+            return True
+        if shape is None:
+            return True
+        covered = self._seen.get(shape.key)
+        if covered is None:
+            covered = self._seen[shape.key] = is_covered(shape, self.indexes)
+            if not covered:
+                FIRESTORE_UNINDEXED_QUERIES.inc(collection=shape.collection)
+                logger.warning(
+                    f"Firestore query not backed by firestore.indexes.json ({shape.describe()}); "
+                    f"add it to HOT_QUERIES and regenerate the manifest"
+                )
+        return covered
+
+
+index_guard = IndexGuard()
+
+
+# ---------------------------------------------------
+# Startup check
+# ---------------------------------------------------
+def _sample_query(client: Any, shape: QueryShape):
+    # Placeholder values: the emulator only needs the query to be well formed
+    query = client.collection_group(shape.collection) if shape.group else client.collection(shape.collection)
+    for field in shape.equality:
+        query = query.where(field, "==", "")
+    for field in shape.ranges:
+        query = query.where(field, ">=", 0)
+    for field, direction in shape.order:
+        query = query.order_by(field, direction=direction)
+    return query.limit(1)
+
+
+def run_against_emulator(client: Any, shapes: Iterable[QueryShape] = HOT_QUERIES) -> List[Tuple[QueryShape, str]]:
+    """
+    Execute every hot query once; returns the shapes Firestore rejected with the error
+    """
+    failures = []
+    for shape in shapes:
+        try:
+            list(_sample_query(client, shape).stream())
+        except Exception as e:
+            failures.append((shape, str(e)))
+    return failures
+
+
+def check_indexes(mode: str, client: Any = None) -> List[str]:
+    """
+    Startup index check: "off", "warn" (log and keep going) or "strict" (raise).
+    Compares the inventory with the committed manifest, arms the runtime guard and,
+    with FIRESTORE_EMULATOR_HOST set, dry-runs each hot query. Returns the problems found.
+    """
+    if mode == "off":
+        index_guard.disable()
+        return []
+    problems = []
+    try:
+        indexes = load_manifest()
+    except (OSError, ValueError) as e:
+        indexes = {}
+        problems.append(f"cannot read {MANIFEST_PATH.name}: {e}")
+    index_guard.enable(indexes)
+
+    problems += [f"no index for {shape.name} ({shape.describe()})" for shape in missing_indexes(indexes=indexes)]
+    if indexes and indexes != manifest():
+        problems.append(f"{MANIFEST_PATH.name} is out of date; run generate_firestore_indexes.py")
+    if client is not None and os.getenv("FIRESTORE_EMULATOR_HOST"):
+        problems += [f"{shape.name} failed on the emulator: {error}" for shape, error in run_against_emulator(client)]
+
+    for problem in problems:
+        logger.error(f"Firestore index check: {problem}")
+    if problems and mode == "strict":
+        raise RuntimeError(f"Firestore index check failed ({len(problems)} problems)")
+    if not problems:
+        logger.info(f"Firestore index check passed for {len(HOT_QUERIES)} query shapes")
+    return problems
@@ -0,0 +1,112 @@
+"""
+Firestore client instrumentation
+Times every document read/write, query stream, batch commit and ``get_all`` by
+collection and operation (metrics, plus a child span when the call is part of a
+sampled trace), without touching the call sites in the services. Query streams also
+pass through the index guard, which reports shapes no index backs
+"""
+
+import functools
+import logging
+import time
+
+from app.utils.firestore_indexes import index_guard
+from app.utils.metrics import FIRESTORE_OP_ERRORS, FIRESTORE_OP_SECONDS
+from app.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+_installed = False
+
+
+def _record(collection: str, op: str, start: float, failed: bool, started_at: float):
+    FIRESTORE_OP_SECONDS.observe(time.perf_counter() - start, collection=collection, op=op)
+    if failed:
+        FIRESTORE_OP_ERRORS.inc(collection=collection, op=op)
+    tracer.record_span(
+        f"firestore.{op}", started_at, time.time(), "failed" if failed else None, collection=collection
+    )
+
+
+def _document_collection(ref) -> str:
+    # Immediate parent collection, so subcollections (e.g. run chunks) are reported on their own
+    path = getattr(ref, "_path", ())
+    return path[-2] if len(path) >= 2 else "unknown"
+
+
+def _query_collection(query) -> str:
+    parent = getattr(query, "_parent", None)
+    if parent is not None and getattr(parent, "id", None):
+        return parent.id
+    return "unknown"
+
+
+def _timed_call(func, op: str, collection_of):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        start, started_at = time.perf_counter(), time.time()
+        failed = True
+        try:
+            result = func(self, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _record(collection_of(self), op, start, failed, started_at)
+
+    return wrapper
+
+
+def _timed_stream(func, op: str, collection_of, query_of=None):
+    # Streams are lazy: the round trips happen while the caller iterates, so time until exhausted
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if query_of is not None:
+            index_guard.observe(query_of(self))
+        start, started_at = time.perf_counter(), time.time()
+        failed = True
+        try:
+            result = yield from func(self, *args, **kwargs)
+            failed = False
+            return result
+        except GeneratorExit:
+            failed = False  # caller stopped iterating early
+            raise
+        finally:
+            _record(collection_of(self), op, start, failed, started_at)
+
+    return wrapper
+
+
+def instrument_firestore() -> bool:
+    """
+    Patch the synchronous Firestore client classes once per process
+    """
+    global _installed
+    if _installed:
+        return False
+    try:
+        from google.cloud.firestore_v1 import aggregation, batch, client, document, query
+    except ImportError as e:
+        logger.warning(f"Firestore instrumentation unavailable: {e}")
+        return False
+
+    doc_ref = document.DocumentReference
+    for op in ("get", "set", "update", "create", "delete"):
+        setattr(doc_ref, op, _timed_call(getattr(doc_ref, op), op, _document_collection))
+
+    # Query.get and CollectionReference.stream/get all go through Query._make_stream
+    # Query and aggregation streams are also checked against the index manifest
+    query.Query._make_stream = _timed_stream(
+        query.Query._make_stream, "query", _query_collection, query_of=lambda q: q
+    )
+    aggregation.AggregationQuery._make_stream = _timed_stream(
+        aggregation.AggregationQuery._make_stream,
+        "aggregate",
+        lambda agg: _query_collection(getattr(agg, "_nested_query", None)),
+        query_of=lambda agg: getattr(agg, "_nested_query", None),
+    )
+    batch.WriteBatch.commit = _timed_call(batch.WriteBatch.commit, "commit", lambda _: "batch")
+    client.Client.get_all = _timed_stream(client.Client.get_all, "get_all", lambda _: "multi")
+
+    _installed = True
+    return True
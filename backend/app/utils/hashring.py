@@ -0,0 +1,80 @@
+"""
+Consistent hash ring
+Maps keys (product IDs) to nodes (monitoring workers) so that a node joining or
+leaving only moves the keys in the ring ranges next to it
+"""
+
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class ConsistentHashRing:
+    """
+    Hash ring with virtual nodes. Each node is placed ``vnodes`` times around the
+    ring, which evens out the share of keys each node receives.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 64):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: set = set()
+        for node in nodes:
+            self.add_node(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    def _rebuild(self, points: List[Tuple[int, str]]):
+        points.sort()
+        self._points = [p for p, _ in points]
+        self._owners = [n for _, n in points]
+
+    def add_node(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        points = list(zip(self._points, self._owners))
+        points.extend((_hash(f"{node}#{i}"), node) for i in range(self.vnodes))
+        self._rebuild(points)
+
+    def remove_node(self, node: str):
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        self._rebuild([(p, n) for p, n in zip(self._points, self._owners) if n != node])
+
+    def node_for(self, key: str) -> Optional[str]:
+        """
+        Owner of a key: the first virtual node clockwise from the key's hash
+        """
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def ownership(self) -> Dict[str, float]:
+        """
+        Fraction of the hash space owned by each node
+        """
+        if not self._points:
+            return {}
+        space = 2 ** 64
+        shares: Dict[str, int] = {node: 0 for node in self._nodes}
+        previous = self._points[-1] - space
+        for point, owner in zip(self._points, self._owners):
+            shares[owner] += point - previous
+            previous = point
+        return {node: round(share / space, 4) for node, share in shares.items()}
@@ -6,6 +6,9 @@ import re
 import secrets
 import string
 import hashlib
+import os
+import socket
+import uuid
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 import logging
@@ -33,6 +36,13 @@ def generate_id(length: int = 8, prefix: str = "") -> str:
         return f"id_{int(datetime.utcnow().timestamp())}"
 
 
+def instance_id() -> str:
+    """
+    Identity of this process for lease ownership (host, pid and a random suffix)
+    """
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
 def sanitize_string(text: str, max_length: Optional[int] = None) -> str:
     """
     Sanitize string by removing unwanted characters and limiting length
@@ -0,0 +1,457 @@
+"""
+Job queue for distributed scrape workers
+Redis streams in production, a SQLite file as the local stand-in; both hand out
+leased jobs that reappear when a worker dies before acknowledging them
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional dependency, only needed for the Redis backend
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    """A leased job; ``id`` is the backend's receipt for ack/nack"""
+    id: str
+    payload: Dict[str, Any]
+    attempts: int = 1
+
+
+class SQLiteJobQueue:
+    """
+    File-backed queue. A lease marks the job with its owner and an expiry; expired
+    leases are handed out again, so a crashed worker's jobs are retried after the
+    visibility timeout. Leasing runs in an IMMEDIATE transaction, which makes it safe
+    for several worker processes sharing the file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        visibility_timeout: int = 300,
+        max_attempts: int = 5,
+        queue: str = "scrape",
+    ):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.queue = queue
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    queue TEXT NOT NULL,
+                    dedupe_key TEXT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'ready',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    lease_owner TEXT,
+                    lease_until REAL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, status, available_at);
+                CREATE UNIQUE INDEX IF NOT EXISTS jobs_pending_key
+                    ON jobs (queue, dedupe_key) WHERE status IN ('ready', 'leased');
+                """
+            )
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    # ---------------------------------
+    # Producer
+    # ---------------------------------
+    def _enqueue_many(self, payloads: List[Dict[str, Any]], key_field: Optional[str]) -> int:
+        now = time.time()
+        rows = [
+            (self.queue, str(p[key_field]) if key_field else None, json.dumps(p, default=str), now, now)
+            for p in payloads
+        ]
+        conn = self._connect()
+        try:
+            before = conn.total_changes
+            conn.execute("BEGIN")
+            # Jobs already waiting or leased for the same key are skipped, not duplicated
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (queue, dedupe_key, payload, available_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+            return conn.total_changes - before
+        finally:
+            conn.close()
+
+    async def enqueue_many(self, payloads: Iterable[Dict[str, Any]], key_field: Optional[str] = None) -> int:
+        """
+        Add jobs; returns how many were new
+        """
+        payloads = list(payloads)
+        if not payloads:
+            return 0
+        return await asyncio.to_thread(self._enqueue_many, payloads, key_field)
+
+    # ---------------------------------
+    # Consumer
+    # ---------------------------------
+    def _lease(self, owner: str, limit: int) -> List[Job]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Jobs whose lease expired too many times are parked as dead letters
+            conn.execute(
+                "UPDATE jobs SET status = 'dead', last_error = 'lease expired'"
+                " WHERE queue = ? AND status = 'leased' AND lease_until <= ? AND attempts >= ?",
+                (self.queue, now, self.max_attempts),
+            )
+            rows = conn.execute(
+                "SELECT id, payload, attempts FROM jobs WHERE queue = ? AND ("
+                " (status = 'ready' AND available_at <= ?) OR (status = 'leased' AND lease_until <= ?)"
+                ") ORDER BY available_at, id LIMIT ?",
+                (self.queue, now, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_until = ?, attempts = attempts + 1"
+                " WHERE id = ?",
+                [(owner, now + self.visibility_timeout, row[0]) for row in rows],
+            )
+            conn.execute("COMMIT")
+            return [Job(str(row[0]), json.loads(row[1]), row[2] + 1) for row in rows]
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    async def lease(self, owner: str, limit: int = 10, block_seconds: float = 0) -> List[Job]:
+        """
+        Lease up to ``limit`` jobs, polling for up to ``block_seconds`` when the queue is empty
+        """
+        deadline = time.monotonic() + block_seconds
+        while True:
+            jobs = await asyncio.to_thread(self._lease, owner, limit)
+            if jobs or time.monotonic() >= deadline:
+                return jobs
+            await asyncio.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+
+    def _execute(self, sql: str, params: List[tuple]) -> int:
+        conn = self._connect()
+        try:
+            cursor = conn.executemany(sql, params)
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    async def ack(self, owner: str, job_ids: Iterable[str]) -> int:
+        """
+        Mark jobs done; a lease that was lost to another worker is not acknowledged
+        """
+        params = [(int(job_id), owner) for job_id in job_ids]
+        if not params:
+            return 0
+        return await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = 'done', lease_until = NULL WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+            params,
+        )
+
+    async def nack(self, owner: str, job_ids: Iterable[str], delay: float = 0, error: Optional[str] = None) -> int:
+        """
+        Release jobs for retry after ``delay`` seconds (dead-lettered after ``max_attempts``)
+        """
+        available_at = time.time() + delay
+        params = [
+            (self.max_attempts, available_at, error, int(job_id), owner) for job_id in job_ids
+        ]
+        if not params:
+            return 0
+        return await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'dead' ELSE 'ready' END,"
+            " available_at = ?, last_error = ?, lease_owner = NULL, lease_until = NULL"
+            " WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+            params,
+        )
+
+    async def extend(self, owner: str, job_ids: Iterable[str]) -> int:
+        """
+        Push the lease expiry out by another visibility timeout
+        """
+        lease_until = time.time() + self.visibility_timeout
+        params = [(lease_until, int(job_id), owner) for job_id in job_ids]
+        if not params:
+            return 0
+        return await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+            params,
+        )
+
+    def _stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status", (self.queue,)
+            ).fetchall()
+            return {status: count for status, count in rows}
+        finally:
+            conn.close()
+
+    async def get_stats(self) -> Dict[str, Any]:
+        counts = await asyncio.to_thread(self._stats)
+        return {
+            "backend": "sqlite",
+            "ready": counts.get("ready", 0),
+            "leased": counts.get("leased", 0),
+            "done": counts.get("done", 0),
+            "dead": counts.get("dead", 0),
+        }
+
+    def _purge(self, older_than: float) -> int:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE queue = ? AND status = 'done' AND created_at < ?",
+                (self.queue, older_than),
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    async def purge_done(self, older_than_seconds: int = 86400) -> int:
+        """
+        Delete finished jobs older than the given age
+        """
+        return await asyncio.to_thread(self._purge, time.time() - older_than_seconds)
+
+    async def close(self):
+        return None
+
+
+class RedisStreamJobQueue:
+    """
+    Redis streams queue. Workers read through a consumer group; entries stay in the
+    pending list until XACK, and entries idle longer than the visibility timeout are
+    claimed by the next worker with XAUTOCLAIM. A per-key marker suppresses duplicate
+    enqueues while a job is outstanding.
+
+    A job's attempts are the entry's delivery count (from XPENDING) plus the
+    ``attempts`` field an immediate retry carries over to its fresh entry. After
+    ``max_attempts`` the entry is moved to the ``{stream}:dead`` stream and acknowledged.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        visibility_timeout: int = 300,
+        max_attempts: int = 5,
+        stream: str = "pricepick:jobs:scrape",
+        group: str = "scrape-workers",
+    ):
+        if aioredis is None:
+            raise RuntimeError("JOB_QUEUE_BACKEND=redis requires the 'redis' package")
+        self.client = aioredis.from_url(url)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.stream = stream
+        self.dead_stream = f"{stream}:dead"
+        self.group = group
+        self._group_ready = False
+
+    async def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            await self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def _marker(self, key: str) -> str:
+        return f"{self.stream}:pending:{key}"
+
+    @property
+    def _marker_ttl(self) -> int:
+        # Refreshed on every lease, so it outlives the job's remaining attempts
+        return self.visibility_timeout * self.max_attempts
+
+    async def enqueue_many(self, payloads: Iterable[Dict[str, Any]], key_field: Optional[str] = None) -> int:
+        await self._ensure_group()
+        added = 0
+        for payload in payloads:
+            key = str(payload[key_field]) if key_field else None
+            if key and not await self.client.set(self._marker(key), 1, nx=True, ex=self._marker_ttl):
+                continue
+            fields = {"payload": json.dumps(payload, default=str)}
+            if key:
+                fields["key"] = key
+            await self.client.xadd(self.stream, fields)
+            added += 1
+        return added
+
+    @staticmethod
+    def _field(fields, name: str) -> Optional[str]:
+        value = fields.get(name.encode()) or fields.get(name)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def _deliveries(self, entry_id: str) -> int:
+        pending = await self.client.xpending_range(self.stream, self.group, min=entry_id, max=entry_id, count=1)
+        return int(pending[0]["times_delivered"]) if pending else 1
+
+    async def _decode(self, entries, claimed: bool = False) -> List[Job]:
+        jobs = []
+        for entry_id, fields in entries or []:
+            if not fields:
+                continue  # entry trimmed from the stream while pending
+            entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+            # A first delivery through XREADGROUP is delivery 1; a claim bumped the count
+            deliveries = await self._deliveries(entry_id) if claimed else 1
+            attempts = int(self._field(fields, "attempts") or 0) + deliveries
+            if attempts > self.max_attempts:
+                # Its lease expired on the last allowed attempt
+                await self._dead_letter(entry_id, fields, attempts - 1, "lease expired")
+                continue
+            key = self._field(fields, "key")
+            if key:
+                await self.client.expire(self._marker(key), self._marker_ttl)
+            jobs.append(Job(entry_id, json.loads(self._field(fields, "payload")), attempts))
+        return jobs
+
+    async def lease(self, owner: str, limit: int = 10, block_seconds: float = 0) -> List[Job]:
+        await self._ensure_group()
+        # Reclaim entries whose consumer went quiet for longer than the visibility timeout
+        claimed = await self.client.xautoclaim(
+            self.stream, self.group, owner, min_idle_time=self.visibility_timeout * 1000, count=limit
+        )
+        jobs = await self._decode(claimed[1], claimed=True)
+        if len(jobs) < limit:
+            response = await self.client.xreadgroup(
+                self.group, owner, {self.stream: ">"}, count=limit - len(jobs),
+                block=int(block_seconds * 1000) or None,
+            )
+            for _, entries in response or []:
+                jobs.extend(await self._decode(entries))
+        return jobs
+
+    async def _release_marker(self, fields):
+        key = self._field(fields, "key")
+        if key:
+            await self.client.delete(self._marker(key))
+
+    async def _remove(self, job_id: str):
+        await self.client.xack(self.stream, self.group, job_id)
+        await self.client.xdel(self.stream, job_id)
+
+    async def _dead_letter(self, job_id: str, fields, attempts: int, error: Optional[str]):
+        dead = {
+            "payload": self._field(fields, "payload"),
+            "attempts": str(attempts),
+            "error": error or "",
+            "failed_at": str(time.time()),
+        }
+        key = self._field(fields, "key")
+        if key:
+            dead["key"] = key
+        await self.client.xadd(self.dead_stream, dead)
+        await self._release_marker(fields)
+        await self._remove(job_id)
+        logger.warning(f"Job {job_id} dead-lettered after {attempts} attempts: {error}")
+
+    async def ack(self, owner: str, job_ids: Iterable[str]) -> int:
+        job_ids = list(job_ids)
+        if not job_ids:
+            return 0
+        for job_id in job_ids:
+            for _, fields in await self.client.xrange(self.stream, job_id, job_id):
+                await self._release_marker(fields)
+        acked = await self.client.xack(self.stream, self.group, *job_ids)
+        await self.client.xdel(self.stream, *job_ids)
+        return acked
+
+    async def nack(self, owner: str, job_ids: Iterable[str], delay: float = 0, error: Optional[str] = None) -> int:
+        """
+        Release failed jobs, dead-lettering those that used their last attempt.
+        Streams have no delayed delivery, so a delayed retry leaves the entry pending
+        until XAUTOCLAIM picks it up after the visibility timeout (which counts as the
+        next delivery); an immediate retry re-adds it as a fresh entry carrying its attempts.
+        """
+        job_ids = list(job_ids)
+        released = 0
+        for job_id in job_ids:
+            entries = await self.client.xrange(self.stream, job_id, job_id)
+            if not entries:
+                continue
+            fields = entries[0][1]
+            attempts = int(self._field(fields, "attempts") or 0) + await self._deliveries(job_id)
+            if attempts >= self.max_attempts:
+                await self._dead_letter(job_id, fields, attempts, error)
+            elif not delay:
+                retry = {name: self._field(fields, name) for name in ("payload", "key") if self._field(fields, name)}
+                await self.client.xadd(self.stream, {**retry, "attempts": str(attempts)})
+                await self._remove(job_id)
+            # else leave pending: XAUTOCLAIM hands it out again after the visibility timeout
+            released += 1
+        return released
+
+    async def extend(self, owner: str, job_ids: Iterable[str]) -> int:
+        job_ids = list(job_ids)
+        if not job_ids:
+            return 0
+        # Re-claiming our own entries resets their idle time
+        claimed = await self.client.xclaim(self.stream, self.group, owner, 0, job_ids, justid=True)
+        return len(claimed)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        await self._ensure_group()
+        length = await self.client.xlen(self.stream)
+        pending = await self.client.xpending(self.stream, self.group)
+        leased = pending.get("pending", 0) if isinstance(pending, dict) else 0
+        dead = await self.client.xlen(self.dead_stream)
+        return {"backend": "redis", "ready": max(0, length - leased), "leased": leased, "dead": dead}
+
+    async def purge_done(self, older_than_seconds: int = 86400) -> int:
+        return 0  # acknowledged entries are deleted immediately
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_job_queue():
+    """
+    Build the queue configured by JOB_QUEUE_BACKEND
+    """
+    if settings.JOB_QUEUE_BACKEND == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("JOB_QUEUE_BACKEND=redis requires REDIS_URL")
+        return RedisStreamJobQueue(
+            settings.REDIS_URL, settings.JOB_VISIBILITY_TIMEOUT, settings.JOB_MAX_ATTEMPTS
+        )
+    return SQLiteJobQueue(
+        settings.JOB_QUEUE_PATH, settings.JOB_VISIBILITY_TIMEOUT, settings.JOB_MAX_ATTEMPTS
+    )
@@ -0,0 +1,292 @@
+"""
+Lease-based distributed locks and leader election
+A lease is held by one owner until it expires; the holder keeps it alive by renewing
+well before the TTL, and another replica takes over once renewals stop
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.utils.helpers import instance_id
+from config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional dependency, only needed for the Redis backend
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[], Optional[Awaitable[None]]]
+
+
+class InMemoryLockBackend:
+    """
+    Process-local lock table; stands in for the shared backends in tests and
+    single-replica deployments
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.leases: Dict[str, Dict[str, Any]] = {}
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """
+        Take the lease if it is free or expired, or renew it if ``owner`` already holds it
+        """
+        now = self.clock()
+        lease = self.leases.get(name)
+        if lease and lease["owner"] != owner and lease["expires_at"] > now:
+            return False
+        self.leases[name] = {"owner": owner, "expires_at": now + ttl}
+        return True
+
+    async def release(self, name: str, owner: str) -> bool:
+        lease = self.leases.get(name)
+        if lease and lease["owner"] == owner:
+            del self.leases[name]
+            return True
+        return False
+
+    async def holder(self, name: str) -> Optional[Dict[str, Any]]:
+        lease = self.leases.get(name)
+        if lease and lease["expires_at"] > self.clock():
+            return dict(lease)
+        return None
+
+    async def close(self):
+        return None
+
+
+class FirestoreLockBackend:
+    """
+    Lease documents in the ``locks`` collection, read and written in a transaction so
+    two replicas racing for an expired lease cannot both win
+    """
+
+    def __init__(self, collection: str = "locks"):
+        from firebase_admin import firestore
+
+        self._firestore = firestore
+        self.db = firestore.client()
+        self.locks_ref = self.db.collection(collection)
+
+    def _acquire(self, name: str, owner: str, ttl: float) -> bool:
+        ref = self.locks_ref.document(name)
+
+        @self._firestore.transactional
+        def attempt(transaction) -> bool:
+            snap = ref.get(transaction=transaction)
+            now = time.time()
+            lease = snap.to_dict() if snap.exists else None
+            if lease and lease.get("owner") != owner and lease.get("expires_at", 0) > now:
+                return False
+            transaction.set(
+                ref,
+                {
+                    "owner": owner,
+                    "expires_at": now + ttl,
+                    "renewed_at": now,
+                    "acquired_at": lease.get("acquired_at", now) if lease and lease.get("owner") == owner else now,
+                },
+            )
+            return True
+
+        return attempt(self.db.transaction())
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        return await asyncio.to_thread(self._acquire, name, owner, ttl)
+
+    def _release(self, name: str, owner: str) -> bool:
+        ref = self.locks_ref.document(name)
+
+        @self._firestore.transactional
+        def attempt(transaction) -> bool:
+            snap = ref.get(transaction=transaction)
+            if not snap.exists or (snap.to_dict() or {}).get("owner") != owner:
+                return False
+            transaction.delete(ref)
+            return True
+
+        return attempt(self.db.transaction())
+
+    async def release(self, name: str, owner: str) -> bool:
+        return await asyncio.to_thread(self._release, name, owner)
+
+    async def holder(self, name: str) -> Optional[Dict[str, Any]]:
+        snap = await asyncio.to_thread(self.locks_ref.document(name).get)
+        lease = snap.to_dict() if snap.exists else None
+        if lease and lease.get("expires_at", 0) > time.time():
+            return lease
+        return None
+
+    async def close(self):
+        return None
+
+
+class RedisLockBackend:
+    """
+    ``SET NX PX`` leases; renew and release compare the owner atomically in Lua
+    """
+
+    RENEW = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    RELEASE = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url: str, prefix: str = "pricepick:lock:"):
+        if aioredis is None:
+            raise RuntimeError("LOCK_BACKEND=redis requires the 'redis' package")
+        self.client = aioredis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        key = self.prefix + name
+        ttl_ms = int(ttl * 1000)
+        if await self.client.set(key, owner, nx=True, px=ttl_ms):
+            return True
+        return bool(await self.client.eval(self.RENEW, 1, key, owner, ttl_ms))
+
+    async def release(self, name: str, owner: str) -> bool:
+        return bool(await self.client.eval(self.RELEASE, 1, self.prefix + name, owner))
+
+    async def holder(self, name: str) -> Optional[Dict[str, Any]]:
+        key = self.prefix + name
+        owner = await self.client.get(key)
+        if owner is None:
+            return None
+        ttl_ms = await self.client.pttl(key)
+        return {"owner": owner, "expires_at": time.time() + max(ttl_ms, 0) / 1000}
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_lock_backend():
+    """
+    Build the lock backend configured by LOCK_BACKEND
+    """
+    if settings.LOCK_BACKEND == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("LOCK_BACKEND=redis requires REDIS_URL")
+        return RedisLockBackend(settings.REDIS_URL)
+    if settings.LOCK_BACKEND == "memory":
+        return InMemoryLockBackend()
+    return FirestoreLockBackend()
+
+
+class LeaderElector:
+    """
+    Keeps trying to hold the named lease and reports leadership changes.
+
+    The holder renews every ``renew_interval`` seconds. A holder that cannot renew
+    (backend unreachable) steps down on its own once its lease would have expired,
+    so two replicas never both believe they lead for longer than a renewal round.
+    """
+
+    def __init__(
+        self,
+        backend,
+        name: str,
+        owner: Optional[str] = None,
+        ttl: Optional[float] = None,
+        renew_interval: Optional[float] = None,
+        on_elected: Optional[Callback] = None,
+        on_revoked: Optional[Callback] = None,
+    ):
+        self.backend = backend
+        self.name = name
+        self.owner = owner or instance_id()
+        self.ttl = ttl or settings.LEADER_LEASE_SECONDS
+        self.renew_interval = renew_interval or self.ttl / 3
+        self.on_elected = on_elected
+        self.on_revoked = on_revoked
+        self.is_leader = False
+        self.lease_expires_at: Optional[float] = None
+        self.changes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _notify(self, callback: Optional[Callback]):
+        if callback is None:
+            return
+        try:
+            result = callback()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.error(f"Leadership callback for '{self.name}' failed: {e}")
+
+    async def _set_leader(self, leader: bool):
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        self.changes += 1
+        if leader:
+            logger.info(f"👑 {self.owner} is now leader for '{self.name}'")
+            await self._notify(self.on_elected)
+        else:
+            logger.warning(f"{self.owner} lost leadership for '{self.name}'")
+            await self._notify(self.on_revoked)
+
+    async def step(self) -> bool:
+        """
+        One election round: acquire or renew, then update leadership
+        """
+        now = time.time()
+        try:
+            held = await self.backend.acquire(self.name, self.owner, self.ttl)
+            if held:
+                self.lease_expires_at = now + self.ttl
+        except Exception as e:
+            logger.error(f"Leader election for '{self.name}' failed: {e}")
+            # Keep leading only while the last successful lease is still valid
+            held = self.is_leader and self.lease_expires_at is not None and time.time() < self.lease_expires_at
+        await self._set_leader(held)
+        return held
+
+    async def _run(self):
+        while True:
+            await self.step()
+            await asyncio.sleep(self.renew_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop campaigning and hand the lease over immediately
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            try:
+                await self.backend.release(self.name, self.owner)
+            except Exception as e:
+                logger.error(f"Failed to release leadership for '{self.name}': {e}")
+            await self._set_leader(False)
+        await self.backend.close()
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "lock": self.name,
+            "owner": self.owner,
+            "is_leader": self.is_leader,
+            "lease_expires_at": self.lease_expires_at if self.is_leader else None,
+            "leadership_changes": self.changes,
+        }
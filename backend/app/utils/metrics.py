@@ -0,0 +1,308 @@
+"""
+In-process metrics registry
+Counters, gauges and histograms rendered in the Prometheus text exposition format
+for the ``/metrics`` endpoint
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans fast Firestore reads up to slow page fetches
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, value in self.samples():
+            names = self.labelnames + (("le",) if suffix == "_bucket" else ())
+            lines.append(f"{self.name}{suffix}{_label_text(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield "", key, value
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down (queue depths, in-flight work)
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield "", key, value
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observations in cumulative buckets
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (last slot is +Inf), sum, count
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str):
+        """
+        Observe the wall time of the ``with`` block
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*counts], total, n)) for key, (counts, total, n) in self._values.items())
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                yield "_bucket", key + (_format_value(bound),), cumulative
+            yield "_sum", key, total
+            yield "_count", key, n
+
+
+class MetricsRegistry:
+    """
+    Named collection of metrics; ``render`` produces the scrape payload
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# ---------------------------------
+# Scrape pipeline
+# ---------------------------------
+SCRAPE_FETCH_SECONDS = registry.histogram(
+    "pricepick_scrape_fetch_seconds", "Product page fetch latency", ["host"]
+)
+SCRAPE_FETCHES = registry.counter(
+    "pricepick_scrape_fetches_total", "Product page fetches by outcome", ["host", "outcome"]
+)
+PARSE_SECONDS = registry.histogram(
+    "pricepick_parse_seconds",
+    "Product page parse time, including the wait for a parse pool slot",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+EXTRACTED_FIELDS = registry.counter(
+    "pricepick_extracted_fields_total", "Parsed product fields by whether a value was found", ["field", "outcome"]
+)
+PARSE_POOL_RESTARTS = registry.counter(
+    "pricepick_parse_pool_restarts_total", "Parse pool restarts after a worker process died"
+)
+PIPELINE_QUEUE_ITEMS = registry.gauge(
+    "pricepick_pipeline_queue_items", "Products waiting for each stage of the monitoring pipeline", ["stage"]
+)
+SCRAPE_RETRIES = registry.counter(
+    "pricepick_scrape_retries_total",
+    "Failed scrapes scheduled for another attempt (queue nacks or scheduler backoff)",
+    ["source"],
+)
+
+# ---------------------------------
+# Firestore
+# ---------------------------------
+FIRESTORE_OP_SECONDS = registry.histogram(
+    "pricepick_firestore_op_seconds", "Firestore call latency", ["collection", "op"]
+)
+FIRESTORE_OP_ERRORS = registry.counter(
+    "pricepick_firestore_op_errors_total", "Firestore calls that raised", ["collection", "op"]
+)
+FIRESTORE_UNINDEXED_QUERIES = registry.counter(
+    "pricepick_firestore_unindexed_queries_total",
+    "Distinct query shapes executed without an index in firestore.indexes.json",
+    ["collection"],
+)
+
+# ---------------------------------
+# Alerts / Cache
+# ---------------------------------
+ALERT_EVALUATION_SECONDS = registry.histogram(
+    "pricepick_alert_evaluation_seconds", "Time to evaluate price alerts", ["scope"]
+)
+ALERT_TRIGGERS = registry.counter("pricepick_alerts_triggered_total", "Price alerts triggered")
+CACHE_REQUESTS = registry.counter(
+    "pricepick_cache_requests_total", "Response cache lookups by result", ["result"]
+)
+PRODUCT_CACHE_REQUESTS = registry.counter(
+    "pricepick_product_cache_requests_total",
+    "Product document lookups by result (bypass: listener not live, read from Firestore)",
+    ["result"],
+)
+
+# ---------------------------------
+# Authentication
+# ---------------------------------
+AUTH_TOKEN_CACHE_REQUESTS = registry.counter(
+    "pricepick_auth_token_cache_requests_total",
+    "Firebase ID token lookups by result (coalesced: joined a verification already running)",
+    ["result"],
+)
+AUTH_VERIFY_SECONDS = registry.histogram(
+    "pricepick_auth_verify_seconds",
+    "Firebase ID token signature verification time (cache misses only)",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+# ---------------------------------
+# Queue depths (refreshed when /metrics is scraped)
+# ---------------------------------
+CRAWL_QUEUE_PRODUCTS = registry.gauge(
+    "pricepick_crawl_queue_products", "Products in the crawl scheduler by state", ["state"]
+)
+PARSE_POOL_QUEUE = registry.gauge(
+    "pricepick_parse_pool_pages", "Pages in the parse pool by state", ["state"]
+)
+JOB_QUEUE_JOBS = registry.gauge(
+    "pricepick_job_queue_jobs", "Scrape jobs in the shared queue by state", ["state"]
+)
+CACHE_ENTRIES = registry.gauge("pricepick_cache_entries", "Entries in the in-process response cache")
+PRODUCT_CACHE_ENTRIES = registry.gauge("pricepick_product_cache_entries", "Product documents in the in-process product cache")
+IS_LEADER = registry.gauge("pricepick_scheduler_leader", "1 while this replica holds the scheduler lease")
@@ -0,0 +1,114 @@
+"""
+Process pool for CPU-bound HTML parsing
+Async fetchers hand raw page bytes to worker processes so parsing never blocks the event loop
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from app.utils.metrics import PARSE_POOL_RESTARTS, PARSE_SECONDS
+from app.utils.scrapers import parse_product_page
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ParsePool:
+    """
+    Parse stage of the scrape pipeline.
+
+    Pages are parsed by ``parse_product_page`` in a ``ProcessPoolExecutor`` created on
+    first use. Submissions beyond ``max_pending`` wait, which applies backpressure to the
+    fetch stage instead of buffering an unbounded number of pages in memory.
+    A ``size`` of 0 uses one worker per CPU core; a negative size parses inline
+    in a thread (useful where worker processes are unavailable).
+    """
+
+    def __init__(self, size: int = 0, max_pending: Optional[int] = None):
+        self.size = size if size > 0 else (os.cpu_count() or 1)
+        self.inline = size < 0
+        self.max_pending = max_pending or self.size * 4
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.waiting = 0
+        self.stats = {"parsed": 0, "failed": 0, "restarts": 0, "parse_ms_total": 0.0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.size)
+            logger.info(f"🧵 Parse pool started with {self.size} workers")
+        return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    async def parse(self, content: bytes, base_url: str = "") -> Dict[str, Any]:
+        """
+        Parse a product page off the event loop
+        """
+        slots = self._get_slots()
+        wait_start = time.perf_counter()
+        self.waiting += 1
+        async with slots:
+            self.waiting -= 1
+            self.pending += 1
+            start = time.perf_counter()
+            try:
+                result = await self._run(content, base_url)
+                self.stats["parsed"] += 1
+                return result
+            except Exception:
+                self.stats["failed"] += 1
+                raise
+            finally:
+                self.pending -= 1
+                self.stats["parse_ms_total"] += (time.perf_counter() - start) * 1000
+                PARSE_SECONDS.observe(time.perf_counter() - wait_start)
+
+    async def _run(self, content: bytes, base_url: str) -> Dict[str, Any]:
+        if self.inline:
+            return await asyncio.to_thread(parse_product_page, content, base_url)
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), parse_product_page, content, base_url)
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in a parser); replace the pool and retry once
+            logger.error("Parse pool broken, restarting workers")
+            self.stats["restarts"] += 1
+            PARSE_POOL_RESTARTS.inc()
+            self._executor = None
+            return await loop.run_in_executor(self._get_executor(), parse_product_page, content, base_url)
+
+    def shutdown(self):
+        """
+        Stop the worker processes
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        parsed = self.stats["parsed"]
+        return {
+            "workers": 0 if self.inline else self.size,
+            "in_flight": self.pending,
+            # Pages waiting for a submission slot plus pages queued behind busy workers
+            "queue_depth": self.waiting + (0 if self.inline else max(0, self.pending - self.size)),
+            "max_pending": self.max_pending,
+            "parsed": parsed,
+            "failed": self.stats["failed"],
+            "restarts": self.stats["restarts"],
+            "avg_parse_ms": round(self.stats["parse_ms_total"] / parsed, 2) if parsed else None,
+        }
+
+
+parse_pool = ParsePool(size=settings.PARSE_POOL_SIZE)
@@ -0,0 +1,111 @@
+"""
+Run-length price history helpers
+A price document covers a run of identical observations, from ``first_seen`` to
+``last_seen`` (``observations`` scrapes); documents written before runs existed are
+single observations at ``created_at``. Readers expand runs back into points.
+
+Products also embed their latest runs (``recent_prices``, oldest first) so sparklines
+and change statistics need only the product document.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.utils.timestamps import as_utc
+
+
+def observation_times(
+    record: Dict[str, Any], start: Optional[datetime] = None, end: Optional[datetime] = None
+) -> Iterator[datetime]:
+    """
+    When the record's price was observed (aware UTC), newest first, inside [start, end];
+    observations of a run are spread evenly over it
+    """
+    first = as_utc(record.get("first_seen") or record.get("created_at"))
+    if first is None:
+        return
+    last = as_utc(record.get("last_seen")) or first
+    start, end = as_utc(start), as_utc(end)
+    count = max(int(record.get("observations") or 1), 1)
+    step = (last - first) / (count - 1) if count > 1 else None
+
+    for i in range(count - 1, -1, -1):
+        at = first + step * i if step is not None else first
+        if (start is None or at >= start) and (end is None or at <= end):
+            yield at
+
+
+def run_points(
+    record: Dict[str, Any], start: Optional[datetime] = None, end: Optional[datetime] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    The observations of one record as point copies whose ``created_at`` is the
+    observation time, newest first
+    """
+    for at in observation_times(record, start, end):
+        yield {**record, "created_at": at}
+
+
+def expand_price_runs(
+    records: Iterable[Dict[str, Any]],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Price points of the given records inside [start, end], newest first (whatever
+    order the records were read in)
+    """
+    points = [point for record in records for point in run_points(record, start, end)]
+    points.sort(key=lambda p: (p["created_at"], str(p.get("product_id") or p.get("listing_id") or "")), reverse=True)
+    return points[:limit] if limit is not None else points
+
+
+def count_in_window(record: Dict[str, Any], start: datetime, end: datetime) -> int:
+    """
+    Number of a record's observations inside [start, end], without building the points
+    """
+    return sum(1 for _ in observation_times(record, start, end))
+
+
+def push_recent_price(recent: Optional[List[Dict[str, Any]]], run: Dict[str, Any], size: int) -> List[Dict[str, Any]]:
+    """
+    A product's ``recent_prices`` after one more observation of ``run`` (``run_id``,
+    ``price``, ``availability``, ``first_seen``, ``last_seen``): the newest entry is
+    extended while the run continues, a new run is appended and the oldest dropped
+    beyond ``size``
+    """
+    entries = [dict(entry) for entry in recent or ()]
+    if entries and entries[-1].get("run_id") == run["run_id"]:
+        entries[-1]["last_seen"] = run["last_seen"]
+        entries[-1]["observations"] = int(entries[-1].get("observations") or 1) + 1
+    else:
+        entries.append({**run, "observations": 1})
+    return entries[-size:] if size > 0 else []
+
+
+def with_current_run(records: Iterable[Dict[str, Any]], product: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Price documents with the product's run in progress brought up to date from its
+    embedded newest ``recent_prices`` entry: an unchanged price only rewrites the run's
+    document every ``PRICE_RUN_FLUSH_SECONDS``, the product on every scrape
+    """
+    records = list(records)
+    recent = (product or {}).get("recent_prices") or []
+    if not recent:
+        return records
+    current = recent[-1]
+    started, seen = as_utc(current.get("first_seen")), as_utc(current.get("last_seen"))
+    if started is None or seen is None:
+        return records
+    for i, record in enumerate(records):
+        if as_utc(record.get("first_seen")) != started:
+            continue
+        last_seen = as_utc(record.get("last_seen"))
+        if last_seen is None or seen > last_seen:
+            records[i] = {
+                **record,
+                "last_seen": current["last_seen"],
+                "observations": max(int(record.get("observations") or 1), int(current.get("observations") or 1)),
+            }
+    return records
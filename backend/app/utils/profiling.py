@@ -0,0 +1,151 @@
+"""
+On-demand profiling of background task runs
+Runs one task execution under pyinstrument (HTML flame graph) when it is installed,
+or cProfile (pstats dump plus a text summary) otherwise, and keeps the reports on disk
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import settings
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:  # optional dependency; cProfile is the fallback
+    PyinstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+
+REPORT_SUFFIXES = (".html", ".prof", ".txt")
+
+
+class TaskProfiler:
+    """
+    Profiles awaited task runs into ``directory``.
+
+    Only one run is profiled at a time; a second request while one is active runs
+    unprofiled. cProfile sees everything executing on the event loop while the task
+    runs (including concurrent requests) but not work in ``asyncio.to_thread``;
+    pyinstrument's async mode attributes awaited time to the task itself.
+    """
+
+    def __init__(self, directory: Optional[str] = None, engine: Optional[str] = None, keep: Optional[int] = None):
+        self.directory = directory or settings.PROFILE_DIR
+        self.engine = self._resolve_engine(engine or settings.PROFILER)
+        self.keep = keep or settings.PROFILE_KEEP
+        self.active: Optional[str] = None
+
+    @staticmethod
+    def _resolve_engine(engine: str) -> str:
+        if engine == "pyinstrument" and PyinstrumentProfiler is None:
+            logger.warning("PROFILER=pyinstrument but pyinstrument is not installed; using cProfile")
+            return "cprofile"
+        if engine == "auto":
+            return "pyinstrument" if PyinstrumentProfiler is not None else "cprofile"
+        return engine
+
+    async def profile(self, name: str, run: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await ``run()`` under the profiler and write its report
+        """
+        if self.active is not None:
+            logger.warning(f"Profiler busy with '{self.active}', running '{name}' unprofiled")
+            return await run()
+
+        self.active = name
+        started = time.perf_counter()
+        try:
+            if self.engine == "pyinstrument":
+                profiler = PyinstrumentProfiler(async_mode="enabled")
+                profiler.start()
+                try:
+                    return await run()
+                finally:
+                    profiler.stop()
+                    self._write(name, started, html=profiler.output_html())
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return await run()
+            finally:
+                profiler.disable()
+                self._write(name, started, stats=profiler)
+        finally:
+            self.active = None
+
+    def _write(self, name: str, started: float, html: Optional[str] = None, stats: Optional[cProfile.Profile] = None):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            base = os.path.join(
+                self.directory,
+                f"{re.sub(r'[^A-Za-z0-9_-]', '_', name)}_{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}_{elapsed_ms}ms",
+            )
+            if html is not None:
+                with open(base + ".html", "w", encoding="utf-8") as handle:
+                    handle.write(html)
+            if stats is not None:
+                stats.dump_stats(base + ".prof")
+                summary = io.StringIO()
+                pstats.Stats(stats, stream=summary).sort_stats("cumulative").print_stats(60)
+                with open(base + ".txt", "w", encoding="utf-8") as handle:
+                    handle.write(summary.getvalue())
+            logger.info(f"🔬 Profile for '{name}' written to {base}.*")
+            self._prune()
+        except Exception as e:
+            logger.error(f"Failed to write profile for '{name}': {e}")
+
+    def _prune(self):
+        """
+        Keep the newest ``keep`` profiles (a cProfile run writes two files)
+        """
+        groups: Dict[str, float] = {}
+        for entry in os.scandir(self.directory):
+            stem, suffix = os.path.splitext(entry.name)
+            if suffix in REPORT_SUFFIXES:
+                groups[stem] = max(groups.get(stem, 0), entry.stat().st_mtime)
+        for stem in sorted(groups, key=groups.get, reverse=True)[self.keep:]:
+            for suffix in REPORT_SUFFIXES:
+                path = os.path.join(self.directory, stem + suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def list_profiles(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Most recent reports, newest first
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        reports = []
+        for entry in os.scandir(self.directory):
+            stem, suffix = os.path.splitext(entry.name)
+            if suffix not in REPORT_SUFFIXES:
+                continue
+            stat = entry.stat()
+            reports.append(
+                {
+                    "file": entry.name,
+                    "task": stem.rsplit("_", 2)[0],
+                    "format": suffix.lstrip("."),
+                    "size_bytes": stat.st_size,
+                    "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+                }
+            )
+        reports.sort(key=lambda r: (r["created_at"], r["file"]), reverse=True)
+        return reports[:limit]
+
+    def report_path(self, filename: str) -> Optional[str]:
+        """
+        Absolute path of a report in the profile directory (None for anything else)
+        """
+        if os.path.basename(filename) != filename or os.path.splitext(filename)[1] not in REPORT_SUFFIXES:
+            return None
+        path = os.path.join(self.directory, filename)
+        return path if os.path.isfile(path) else None
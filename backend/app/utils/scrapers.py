@@ -353,3 +353,47 @@ def extract_images(html: str, base_url: str = None) -> List[str]:
     except Exception as e:
         logger.error(f"Failed to extract images: {str(e)}")
         return []
+
+
+def parse_product_page(content: bytes, base_url: str = "") -> Dict[str, Any]:
+    """
+    Parse a fetched product page into its scraped fields.
+
+    Pure and picklable so it can run in a worker process: takes the raw response
+    bytes, returns plain data, and never touches the network or Firestore.
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    text = soup.get_text()
+    lowered = text.lower()
+
+    price_match = re.search(r"\$\s?(\d+(?:\.\d{1,2})?)", text)
+
+    title_el = soup.select_one("h1") or soup.title
+    title = title_el.get_text(strip=True) if title_el else None
+
+    availability = None
+    if "out of stock" in lowered:
+        availability = "Out of Stock"
+    elif "in stock" in lowered:
+        availability = "In Stock"
+
+    image_url = None
+    img = soup.select_one("img") or soup.select_one("#landingImage")
+    if img:
+        image_url = img.get("src") or img.get("data-src")
+        if image_url and image_url.startswith("//"):
+            image_url = "https:" + image_url
+        elif image_url and image_url.startswith("/"):
+            image_url = base_url + image_url
+
+    rating_match = re.search(r"(\d+(\.\d+)?)\s*out of\s*5", text, re.I)
+    reviews_match = re.search(r"(\d{1,3}(?:,\d{3})*)\s*(customer )?reviews?", text, re.I)
+
+    return {
+        "price": float(price_match.group(1)) if price_match else None,
+        "title": title,
+        "availability": availability,
+        "image_url": image_url,
+        "rating": float(rating_match.group(1)) if rating_match else None,
+        "review_count": int(reviews_match.group(1).replace(",", "")) if reviews_match else None,
+    }
@@ -0,0 +1,40 @@
+"""
+Timestamp model
+Every stored timestamp is a native Firestore timestamp: written as a naive
+``datetime.utcnow()`` (which Firestore stores as UTC) and read back as a timezone-aware
+UTC datetime, so date windows can be filtered server-side with ``where``. Python-side
+comparisons go through ``as_utc``, which also reads the ISO strings older documents
+hold, so naive, aware and string values never meet in a comparison.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+
+def as_utc(value: Any) -> Optional[datetime]:
+    """
+    A stored timestamp (datetime or ISO string) as an aware UTC datetime; None if unreadable
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def to_epoch(value: Any) -> Optional[float]:
+    """
+    Convert a stored timestamp (datetime or ISO string) to epoch seconds, treating naive values as UTC
+    """
+    at = as_utc(value)
+    return at.timestamp() if at else None
+
+
+def needs_backfill(value: Any) -> bool:
+    """
+    Whether a stored value is a timestamp kept as a string rather than a native timestamp
+    """
+    return isinstance(value, str) and as_utc(value) is not None
@@ -0,0 +1,326 @@
+"""
+Lightweight request tracing
+Spans are kept in a context variable so a request's service calls and Firestore
+round trips (including those in ``asyncio.to_thread``) nest under the request span.
+Finished traces go to a JSON-lines span log or to OpenTelemetry.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from config import settings
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # optional dependency, only needed for TRACE_EXPORTER=otel
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """
+    One timed operation inside a trace
+    """
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(((self.end or time.time()) - self.start) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """
+    Spans of one sampled request; exported together when the root span ends
+    """
+
+    __slots__ = ("trace_id", "spans", "_lock")
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        # Firestore spans may finish on worker threads
+        with self._lock:
+            if len(self.spans) < settings.TRACE_MAX_SPANS:
+                self.spans.append(span)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+# ---------------------------------
+# Exporters
+# ---------------------------------
+class JsonLinesSpanExporter:
+    """
+    Appends one JSON line per span to a local file from a background thread,
+    so request handlers never wait on disk I/O
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[List[Dict[str, Any]]]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, trace: Trace):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._write_loop, name="span-log", daemon=True)
+            self._thread.start()
+        self._queue.put([span.to_dict() for span in trace.spans])
+
+    def _write_loop(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        while True:
+            spans = self._queue.get()
+            if spans is None:
+                return
+            try:
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    for span in spans:
+                        handle.write(json.dumps(span, default=str) + "\n")
+            except Exception as e:
+                logger.error(f"Failed to write span log {self.path}: {e}")
+
+    def shutdown(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class OpenTelemetrySpanExporter:
+    """
+    Replays finished traces into the OpenTelemetry tracer provider configured for the
+    process (SDK and exporter are set up outside the app, e.g. ``opentelemetry-instrument``)
+    """
+
+    def __init__(self):
+        if otel_trace is None:
+            raise RuntimeError("TRACE_EXPORTER=otel requires the 'opentelemetry-api' package")
+        self.tracer = otel_trace.get_tracer("pricepick")
+
+    def export(self, trace: Trace):
+        by_id = {}
+        for span in sorted(trace.spans, key=lambda s: s.start):
+            parent = by_id.get(span.parent_id)
+            context = otel_trace.set_span_in_context(parent) if parent is not None else None
+            otel_span = self.tracer.start_span(
+                span.name,
+                context=context,
+                start_time=int(span.start * 1e9),
+                attributes={k: v for k, v in span.attributes.items() if isinstance(v, (str, bool, int, float))},
+            )
+            if span.error:
+                otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, span.error))
+            by_id[span.span_id] = otel_span
+        for span in trace.spans:
+            by_id[span.span_id].end(end_time=int((span.end or time.time()) * 1e9))
+
+    def shutdown(self):
+        return None
+
+
+def create_span_exporter():
+    """
+    Build the exporter configured by TRACE_EXPORTER ("jsonl", "otel" or "none")
+    """
+    if settings.TRACE_EXPORTER == "otel":
+        return OpenTelemetrySpanExporter()
+    if settings.TRACE_EXPORTER == "jsonl":
+        return JsonLinesSpanExporter(settings.TRACE_LOG_PATH)
+    return None
+
+
+class Tracer:
+    """
+    Starts root spans for a sampled share of requests and child spans beneath them.
+    Outside a sampled trace every call is a context variable lookup and nothing more.
+    """
+
+    def __init__(self, exporter=None, sample_rate: float = 0.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def start_trace(self, name: str, **attributes: Any):
+        """
+        Root span; yields None when the trace is not sampled
+        """
+        if current_span() is not None or not self.should_sample():
+            yield None
+            return
+        trace = Trace()
+        span = Span(trace, name, None, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end = time.time()
+            trace.add(span)
+            self._export(trace)
+
+    @contextmanager
+    def start_span(self, name: str, **attributes: Any):
+        """
+        Child of the current span; a no-op outside a sampled trace
+        """
+        parent = current_span()
+        if parent is None:
+            yield None
+            return
+        span = Span(parent.trace, name, parent.span_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end = time.time()
+            parent.trace.add(span)
+
+    def record_span(self, name: str, start: float, end: float, error: Optional[str] = None, **attributes: Any):
+        """
+        Add an already-finished leaf span under the current span (used where the
+        operation outlives a single context, e.g. lazily consumed Firestore streams)
+        """
+        parent = current_span()
+        if parent is None:
+            return
+        span = Span(parent.trace, name, parent.span_id, attributes)
+        span.start, span.end, span.error = start, end, error
+        parent.trace.add(span)
+
+    def _export(self, trace: Trace):
+        try:
+            self.exporter.export(trace)
+        except Exception as e:
+            logger.error(f"Failed to export trace {trace.trace_id}: {e}")
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def _build_tracer() -> Tracer:
+    try:
+        return Tracer(create_span_exporter(), settings.TRACE_SAMPLE_RATE)
+    except Exception as e:
+        logger.warning(f"Tracing disabled: {e}")
+        return Tracer()
+
+
+tracer = _build_tracer()
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """
+    Decorator: run the function (sync or async) inside a child span named after it
+    """
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if current_span() is None:
+                    return await func(*args, **kwargs)
+                with tracer.start_span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if current_span() is None:
+                return func(*args, **kwargs)
+            with tracer.start_span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a root span per sampled HTTP request; the trace id is
+    returned in the ``X-Trace-Id`` response header
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        with tracer.start_trace(f"{scope['method']} {scope['path']}", method=scope["method"], path=scope["path"]) as span:
+            if span is None:
+                return await self.app(scope, receive, send)
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("status_code", message["status"])
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-trace-id", span.trace.trace_id.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                # Group spans by route template rather than concrete IDs
+                span.name = f"{scope['method']} {route.path}"
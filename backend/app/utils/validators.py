@@ -4,8 +4,10 @@ Validation utility functions
 
 import re
 import logging
-from typing import Optional, Union
-from urllib.parse import urlparse
+from typing import Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from app.utils.helpers import hash_string
 
 logger = logging.getLogger(__name__)
 
@@ -208,3 +210,125 @@ def validate_asin(asin: str) -> bool:
         
     except Exception:
         return False
+
+
+# Query parameters that only track where a click came from, stripped on every host
+TRACKING_PARAMS = {"gclid", "fbclid"}
+TRACKING_PREFIXES = ("utm_",)
+# Referral and affiliate parameters of the marketplaces whose URLs we know: generic keys
+# like ``sid`` or ``from`` can select the item on other sites, so only strip them here
+PLATFORM_TRACKING_PARAMS = {
+    "amazon": (
+        {"tag", "ref", "ref_", "psc", "th", "smid", "linkcode", "linkid", "camp", "creative", "creativeasin",
+         "ascsubtag"},
+        ("pf_rd_", "pd_rd_"),
+    ),
+    "ebay": ({"mkevt", "mkcid", "mkrid", "campid", "customid", "toolid", "hash", "_trkparms", "_trksid"}, ()),
+    "walmart": (
+        {"athbdg", "from", "sid", "wmlspartner", "selectedsellerid", "irgwc", "clickid", "veh", "affiliates_ad_id"},
+        (),
+    ),
+}
+_ASIN_PATH = re.compile(r"/(?:dp|gp/product|gp/aw/d|product|exec/obidos/asin)/([A-Za-z0-9]{10})(?:[/?]|$)")
+_EBAY_ITEM_PATH = re.compile(r"/itm/(?:[^/]+/)?(\d{9,15})(?:[/?]|$)")
+_WALMART_ITEM_PATH = re.compile(r"/ip/(?:[^/]+/)?(\d{5,15})(?:[/?]|$)")
+
+
+def _bare_host(netloc: str) -> str:
+    host = netloc.lower().split("@")[-1].split(":")[0]
+    for prefix in ("www.", "m.", "smile."):
+        if host.startswith(prefix):
+            return host[len(prefix):]
+    return host
+
+
+def extract_asin(url: str) -> Optional[str]:
+    """
+    Extract the ASIN from an Amazon product URL
+    """
+    try:
+        match = _ASIN_PATH.search(urlparse(url).path)
+        asin = match.group(1).upper() if match else None
+        return asin if validate_asin(asin) else None
+    except Exception:
+        return None
+
+
+def extract_ebay_item_id(url: str) -> Optional[str]:
+    """
+    Extract the item number from an eBay listing URL
+    """
+    try:
+        match = _EBAY_ITEM_PATH.search(urlparse(url).path)
+        return match.group(1) if match else None
+    except Exception:
+        return None
+
+
+def extract_walmart_id(url: str) -> Optional[str]:
+    """
+    Extract the item id from a Walmart product URL
+    """
+    try:
+        match = _WALMART_ITEM_PATH.search(urlparse(url).path)
+        return match.group(1) if match else None
+    except Exception:
+        return None
+
+
+def _marketplace(host: str, platform: Optional[str] = None) -> Optional[str]:
+    """
+    The known marketplace (a PLATFORM_TRACKING_PARAMS key) of a URL's bare host
+    """
+    platform = (platform or "").lower()
+    if platform in PLATFORM_TRACKING_PARAMS:
+        return platform
+    return next((name for name in PLATFORM_TRACKING_PARAMS if host.startswith(f"{name}.")), None)
+
+
+def strip_tracking_params(url: str, platform: Optional[str] = None) -> str:
+    """
+    Normalise a URL: https, lower-case host, no fragment, no trailing slash and no
+    tracking query parameters (the rest are kept, sorted). Marketplace referral and
+    affiliate parameters are only stripped on that marketplace.
+    """
+    parsed = urlparse(url.strip())
+    names, prefixes = PLATFORM_TRACKING_PARAMS.get(_marketplace(_bare_host(parsed.netloc), platform), (set(), ()))
+    names, prefixes = TRACKING_PARAMS | names, TRACKING_PREFIXES + prefixes
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parsed.query, keep_blank_values=False)
+        if key.lower() not in names and not key.lower().startswith(prefixes)
+    )
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse(("https", parsed.netloc.lower(), path, "", urlencode(query), ""))
+
+
+def canonical_listing(url: str, platform: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Listing id and canonical URL for a product URL.
+
+    Amazon, eBay and Walmart URLs collapse to the item id on their marketplace host
+    (``amazon.in:B0C1234567``), whatever slug, referral path or tracking parameters
+    they carry. Other URLs are identified by a hash of the URL without tracking
+    parameters.
+    """
+    parsed = urlparse(url.strip())
+    host = _bare_host(parsed.netloc)
+    platform = (platform or "").lower()
+
+    if platform == "amazon" or host.startswith("amazon."):
+        asin = extract_asin(url)
+        if asin:
+            return f"{host}:{asin}", f"https://www.{host}/dp/{asin}"
+    if platform == "ebay" or host.startswith("ebay."):
+        item_id = extract_ebay_item_id(url)
+        if item_id:
+            return f"{host}:{item_id}", f"https://www.{host}/itm/{item_id}"
+    if platform == "walmart" or host.startswith("walmart."):
+        item_id = extract_walmart_id(url)
+        if item_id:
+            return f"{host}:{item_id}", f"https://www.{host}/ip/{item_id}"
+
+    canonical = strip_tracking_params(url, platform)
+    return f"{host}:{hash_string(canonical)[:16]}", canonical
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Timestamp backfill script for PricePick backend
+Rewrites timestamps stored as ISO strings into native Firestore timestamps and fills
+the fields date-window queries filter on, in write batches. Safe to re-run.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from app.services.timestamp_backfill import BACKFILL_BATCH_DOCS, TimestampBackfill  # noqa: E402
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main(batch_docs: int, dry_run: bool) -> bool:
+    """
+    Main backfill function
+    """
+    try:
+        logger.info(f"Backfilling timestamps (batch of {batch_docs}{', dry run' if dry_run else ''})...")
+        report = await TimestampBackfill().run(batch_docs=batch_docs, dry_run=dry_run)
+        for collection, counts in report.items():
+            action = "to update" if dry_run else "updated"
+            logger.info(f"  - {collection}: {counts['updated']} of {counts['scanned']} documents {action}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Timestamp backfill failed: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--batch-size", type=int, default=BACKFILL_BATCH_DOCS, help="document updates per batch (max 500)"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="count what would change without writing")
+    args = parser.parse_args()
+
+    success = asyncio.run(main(min(max(args.batch_size, 1), 500), args.dry_run))
+    sys.exit(0 if success else 1)
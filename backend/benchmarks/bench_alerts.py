@@ -0,0 +1,19 @@
+"""
+Alert benchmark: a forced check of every active alert against current prices
+"""
+
+from benchmarks.conftest import ROUNDS
+
+
+def test_check_all_alerts(benchmark, fake_db, dataset, run):
+    """AlertService.check_price_alerts over the whole alert collection (100k by default)"""
+    from app.services.alert_service import AlertService
+
+    def setup():
+        dataset()
+        return (AlertService(),), {}
+
+    result = benchmark.pedantic(lambda service: run(service.check_price_alerts(force=True)), setup=setup, rounds=ROUNDS)
+
+    assert result["success"] and result["checked_count"] > 0
+    benchmark.extra_info.update(checked=result["checked_count"], triggered=result["triggered_count"])
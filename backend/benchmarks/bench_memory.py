@@ -0,0 +1,70 @@
+"""
+Memory benchmarks: what a monitoring run keeps resident per product and what the
+price statistics allocate, measured with tracemalloc
+"""
+
+import gc
+import tracemalloc
+
+
+def measure(target):
+    """
+    Run ``target`` under tracemalloc; returns (result, bytes still held, peak bytes)
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = target()
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, retained, peak
+
+
+def test_scheduler_product_memory(benchmark, fake_db, dataset, run):
+    """Crawl scheduler holding every tracked product as a compact record vs whole documents"""
+    from app.services.crawl_scheduler import CrawlScheduler
+    from app.services.product_record import MONITORED_FIELDS, ProductRecord
+
+    dataset()
+    products_ref = fake_db.collection("products")
+    documents, document_bytes, _ = measure(lambda: [doc.to_dict() for doc in products_ref.stream()])
+    records, record_bytes, _ = measure(
+        lambda: [ProductRecord.from_snapshot(doc) for doc in products_ref.select(list(MONITORED_FIELDS)).stream()]
+    )
+
+    def refresh():
+        scheduler = CrawlScheduler()
+        run(scheduler.refresh(force=True))
+        return scheduler
+
+    scheduler, scheduler_bytes, peak = benchmark.pedantic(lambda: measure(refresh), rounds=1)
+
+    count = len(scheduler.entries)
+    assert count == len(documents) == len(records)
+    benchmark.extra_info.update(
+        {
+            "products": count,
+            "document_bytes_per_product": document_bytes // max(count, 1),
+            "record_bytes_per_product": record_bytes // max(count, 1),
+            "scheduler_bytes_per_product": scheduler_bytes // max(count, 1),
+            "refresh_peak_bytes": peak,
+        }
+    )
+    assert record_bytes < document_bytes
+
+
+def test_popular_price_trends_memory(benchmark, fake_db, dataset, run):
+    """Peak allocation of the trends report over the whole price history"""
+    from app.services.price_service import PriceService
+
+    dataset()
+    service = PriceService()
+
+    trends, _, peak = benchmark.pedantic(
+        lambda: measure(lambda: run(service._compute_popular_price_trends(None, None, 7, 20))), rounds=1
+    )
+
+    assert trends
+    benchmark.extra_info.update({"prices": dataset.sizes["prices"], "peak_bytes": peak})
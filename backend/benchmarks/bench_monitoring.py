@@ -0,0 +1,47 @@
+"""
+Monitoring run benchmark: every seeded product scraped through the checkpointed
+run loop, with price change detection and alert checks
+"""
+
+from benchmarks.conftest import ROUNDS
+
+
+def test_monitoring_run(benchmark, fake_db, dataset, stand_in, parse_pool, run):
+    """One PriceMonitoringTask run over all due products (1k by default)"""
+    from app.tasks.price_monitor import PriceMonitoringTask
+
+    def setup():
+        dataset()
+        return (PriceMonitoringTask(),), {}
+
+    result = benchmark.pedantic(lambda task: run(task.run()), setup=setup, rounds=ROUNDS)
+
+    assert result["status"] == "completed"
+    assert result["products_monitored"] == dataset.sizes["products"]
+    benchmark.extra_info["products"] = result["products_monitored"]
+
+
+def test_repeat_run_price_rows(benchmark, fake_db, dataset, stand_in, parse_pool, run):
+    """A second run over unchanged prices: runs are extended, no new price rows"""
+    from app.tasks.price_monitor import PriceMonitoringTask
+
+    def setup():
+        dataset()
+        task = PriceMonitoringTask()
+        run(task.run())
+        scheduler = task.price_monitor.crawl_scheduler
+        for product_id, entry in scheduler.entries.items():
+            entry.next_due = 0  # due again straight away
+            scheduler._push(product_id, entry)
+        return (task,), {"rows": fake_db.count_group("prices")}
+
+    def second_run(task, rows):
+        result = run(task.run())
+        return result, fake_db.count_group("prices") - rows
+
+    result, new_rows = benchmark.pedantic(second_run, setup=setup, rounds=ROUNDS)
+
+    assert result["status"] == "completed"
+    assert result["products_monitored"] == dataset.sizes["products"]
+    assert new_rows == 0
+    benchmark.extra_info.update({"products": result["products_monitored"], "new_price_rows": new_rows})
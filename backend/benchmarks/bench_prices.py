@@ -0,0 +1,34 @@
+"""
+Price history benchmarks: the trends report and the retention cleanup job
+"""
+
+from benchmarks.conftest import ROUNDS
+
+
+def test_popular_price_trends(benchmark, fake_db, dataset, run):
+    """Trends over the last 7 days, computed without the response cache"""
+    from app.services.price_service import PriceService
+
+    dataset()
+    service = PriceService()
+
+    trends = benchmark.pedantic(
+        lambda: run(service._compute_popular_price_trends(None, None, 7, 20)), rounds=ROUNDS
+    )
+
+    assert trends and trends[0]["price_count"] >= trends[-1]["price_count"]
+
+
+def test_cleanup_job(benchmark, fake_db, dataset, run):
+    """CleanupTask run deleting prices, sessions and errors past retention"""
+    from app.tasks.cleanup import CleanupTask
+
+    def setup():
+        dataset()
+        return (CleanupTask(),), {}
+
+    result = benchmark.pedantic(lambda task: run(task.run()), setup=setup, rounds=ROUNDS)
+
+    assert result["status"] == "completed"
+    assert result["result"]["deleted_prices"] > 0
+    benchmark.extra_info.update(result["result"])
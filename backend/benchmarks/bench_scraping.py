@@ -0,0 +1,51 @@
+"""
+Scraping benchmarks: one product scrape end to end, a search across every platform
+and the page parser on its own
+"""
+
+import pytest
+
+from app.utils.scrapers import parse_product_page
+from benchmarks.conftest import ROUNDS
+from benchmarks.stand_in import load_fixtures, render
+
+
+@pytest.fixture
+def scraping_service(fake_db, dataset, stand_in, parse_pool):
+    from app.services.scraping_service import ScrapingService
+
+    dataset()
+    return ScrapingService()
+
+
+def test_single_scrape(benchmark, scraping_service, fake_db, run):
+    """Fetch, parse and store one product (session, product update, price row)"""
+    product = fake_db.collection("products").document("prod_000000").get().to_dict()
+
+    result = benchmark.pedantic(
+        lambda: run(scraping_service.scrape_product(dict(product))), rounds=ROUNDS * 10, warmup_rounds=1
+    )
+
+    assert result["success"] and result["price"]
+
+
+def test_search_all_platforms(benchmark, scraping_service, run):
+    """Search results from Amazon, eBay and Walmart fetched and parsed concurrently"""
+    results = benchmark.pedantic(
+        lambda: run(scraping_service.search_products("lamp", limit_per_platform=20)),
+        rounds=ROUNDS * 10,
+        warmup_rounds=1,
+    )
+
+    assert {r["platform"] for r in results} == {"amazon", "ebay", "walmart"}
+
+
+@pytest.mark.parametrize("platform", ["amazon", "ebay", "walmart"])
+def test_parse_product_page(benchmark, platform):
+    """CPU cost of parsing one saved product page"""
+    host = {"amazon": "www.amazon.com", "ebay": "www.ebay.com", "walmart": "www.walmart.com"}[platform]
+    content = render(load_fixtures(), host, "/item/12345").encode()
+
+    parsed = benchmark(parse_product_page, content, f"https://{host}")
+
+    assert parsed["price"] and parsed["title"] == "Benchmark item 12345"
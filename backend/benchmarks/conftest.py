@@ -0,0 +1,152 @@
+"""
+Shared benchmark fixtures: the in-memory Firestore swapped in for every service module,
+the seeded data set, the local retailer stand-in and a single event loop for the session
+"""
+
+import asyncio
+import importlib
+import os
+import pkgutil
+import random
+import sys
+
+import firebase_admin.firestore
+import pytest
+
+from benchmarks.fake_firestore import FakeFirestore
+from benchmarks.seed import bench_size, seed
+from benchmarks.stand_in import StandInServer, stand_in_client
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:  # optional dependency; scenarios still run once as a smoke test
+
+    class SmokeBenchmark:
+        """
+        Minimal stand-in for the pytest-benchmark fixture: runs the target once, no timings
+        """
+
+        def __init__(self):
+            self.extra_info = {}
+
+        def __call__(self, target, *args, **kwargs):
+            return target(*args, **kwargs)
+
+        def pedantic(self, target, args=(), kwargs=None, setup=None, rounds=1, warmup_rounds=0, iterations=1):
+            if setup is not None:
+                prepared = setup()
+                if prepared is not None:
+                    args, kwargs = prepared
+            return target(*args, **(kwargs or {}))
+
+    @pytest.fixture
+    def benchmark():
+        return SmokeBenchmark()
+
+
+ROUNDS = bench_size("BENCH_ROUNDS", 3)
+
+
+def _service_modules():
+    import app.firebase  # noqa: F401  initialises the real client the modules bind to
+
+    for package_name in ("app.services", "app.tasks", "app.utils"):
+        package = importlib.import_module(package_name)
+        for info in pkgutil.iter_modules(package.__path__):
+            importlib.import_module(f"{package_name}.{info.name}")
+    return [module for name, module in list(sys.modules.items()) if name.startswith("app.") and module]
+
+
+@pytest.fixture(scope="session")
+def fake_db():
+    """
+    FakeFirestore bound as ``db`` in every module that captured the real client
+    """
+    import app.firebase
+
+    real = app.firebase.db
+    fake = FakeFirestore()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(firebase_admin.firestore, "client", lambda app=None: fake)
+        for module in _service_modules():
+            if getattr(module, "db", None) is real:
+                mp.setattr(module, "db", fake)
+        yield fake
+
+
+@pytest.fixture(scope="session")
+def dataset(fake_db):
+    """
+    Seed once and return a loader that restores the pristine data before each round
+    """
+    sizes = seed(
+        fake_db,
+        products=bench_size("BENCH_PRODUCTS", 1000),
+        alerts=bench_size("BENCH_ALERTS", 100_000),
+        prices=bench_size("BENCH_PRICES", 20_000),
+        users=bench_size("BENCH_USERS", 5000),
+    )
+    state = fake_db.dump()
+
+    def reset():
+        fake_db.load(state)
+        random.seed(0)
+
+    reset.sizes = sizes
+    return reset
+
+
+@pytest.fixture(scope="session")
+def stand_in():
+    """
+    Local retailer server; every ``httpx.AsyncClient`` in the session is routed to it
+    """
+    import httpx
+
+    server = StandInServer(latency=bench_size("BENCH_LATENCY_MS", 0) / 1000).start()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(httpx, "AsyncClient", stand_in_client(server.port))
+        yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def bench_settings():
+    """
+    Inline scraping with no run budget, scrape rate or cache TTL in the way
+    """
+    from config import settings
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "SCRAPE_MODE", "inline")
+        mp.setattr(settings, "RUN_TIME_BUDGET_SECONDS", 0)
+        mp.setattr(settings, "SCRAPE_RATE_PER_MINUTE", 10**6)
+        mp.setattr(settings, "SCRAPE_CONCURRENCY", bench_size("BENCH_CONCURRENCY", 20))
+        yield settings
+
+
+@pytest.fixture(scope="session")
+def parse_pool(bench_settings):
+    """
+    Fresh parse pool (BENCH_PARSE_POOL_SIZE, default as configured) for the session loop
+    """
+    from app.tasks import price_monitor
+    from app.services import scraping_service
+    from app.utils.parse_pool import ParsePool
+
+    pool = ParsePool(size=int(os.environ.get("BENCH_PARSE_POOL_SIZE", bench_settings.PARSE_POOL_SIZE)))
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(scraping_service, "parse_pool", pool)
+        mp.setattr(price_monitor, "parse_pool", pool)
+        yield pool
+    pool.shutdown()
+
+
+@pytest.fixture(scope="session")
+def run():
+    """
+    Run a coroutine to completion on one event loop shared by the whole session
+    """
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
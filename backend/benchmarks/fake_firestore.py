@@ -0,0 +1,694 @@
+"""
+In-memory stand-in for the synchronous Firestore client
+Covers the subset of the API the services use (documents, subcollections, collection
+group queries, filtered and ordered queries, projections, aggregations, batches,
+``get_all`` and field transforms)
+so benchmarks exercise the real service code without a network or an emulator.
+
+Equality filters are answered from per-field hash indexes, the way Firestore serves
+them from its single-field indexes, so query cost scales with the result size rather
+than with the collection size. Transactions are not supported.
+"""
+
+import itertools
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.watch import ChangeType
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+DESCENDING = "DESCENDING"
+
+_MISSING = object()
+
+
+def _copy(value: Any) -> Any:
+    # Callers get their own dicts/lists, like a fresh snapshot from the server
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _lookup(data: Dict[str, Any], field_path: str) -> Any:
+    value: Any = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _assign(data: Dict[str, Any], field_path: str, value: Any):
+    parts = field_path.split(".")
+    for part in parts[:-1]:
+        data = data.setdefault(part, {})
+    data[parts[-1]] = value
+
+
+def _remove(data: Dict[str, Any], field_path: str):
+    parts = field_path.split(".")
+    for part in parts[:-1]:
+        data = data.get(part)
+        if not isinstance(data, dict):
+            return
+    data.pop(parts[-1], None)
+
+
+def _index_key(value: Any) -> Any:
+    # Booleans must not collide with 0/1 in the equality index
+    try:
+        hash(value)
+    except TypeError:
+        return _MISSING
+    return (type(value) is bool, value)
+
+
+def _type_rank(value: Any) -> int:
+    # Firestore's cross-type ordering
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, list):
+        return 8
+    if isinstance(value, dict):
+        return 9
+    return 7
+
+
+def _comparable(value: Any) -> Any:
+    # Firestore reads naive datetimes as UTC, so naive and aware values compare
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _matches(value: Any, op: str, operand: Any) -> bool:
+    if value is _MISSING:
+        return False
+    value, operand = _comparable(value), _comparable(operand)
+    try:
+        if op == "==":
+            return value == operand
+        if op == "!=":
+            return value != operand and value is not None
+        if op == "in":
+            return value in operand
+        if op == "not-in":
+            return value not in operand and value is not None
+        if op == "array_contains":
+            return isinstance(value, list) and operand in value
+        if op == "array_contains_any":
+            return isinstance(value, list) and any(v in value for v in operand)
+        # Range filters only match values of the same type
+        if _type_rank(value) != _type_rank(operand):
+            return False
+        if op == "<":
+            return value < operand
+        if op == "<=":
+            return value <= operand
+        if op == ">":
+            return value > operand
+        if op == ">=":
+            return value >= operand
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+class _Collection:
+    """
+    Documents of one collection path plus the equality indexes built so far
+    """
+
+    __slots__ = ("docs", "indexes")
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.indexes: Dict[str, Dict[Any, Set[str]]] = {}
+
+    def index(self, field_path: str) -> Dict[Any, Set[str]]:
+        index = self.indexes.get(field_path)
+        if index is None:
+            index = {}
+            for doc_id, data in self.docs.items():
+                key = _index_key(_lookup(data, field_path))
+                if key is not _MISSING:
+                    index.setdefault(key, set()).add(doc_id)
+            self.indexes[field_path] = index
+        return index
+
+    def put(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        old = self.docs.get(doc_id)
+        for field_path, index in self.indexes.items():
+            if old is not None:
+                key = _index_key(_lookup(old, field_path))
+                if key is not _MISSING and key in index:
+                    index[key].discard(doc_id)
+            if data is not None:
+                key = _index_key(_lookup(data, field_path))
+                if key is not _MISSING:
+                    index.setdefault(key, set()).add(doc_id)
+        if data is None:
+            self.docs.pop(doc_id, None)
+        else:
+            self.docs[doc_id] = data
+
+
+class FakeFirestore:
+    """
+    Drop-in for ``firestore.client()`` backed by dicts.
+
+    Real Firestore hands back timestamps as timezone-aware UTC datetimes; with
+    ``aware_timestamps=False`` (the default) datetimes are returned exactly as written,
+    matching the naive ``datetime.utcnow()`` values the services compare against.
+    """
+
+    def __init__(self, aware_timestamps: bool = False):
+        self.aware_timestamps = aware_timestamps
+        self._collections: Dict[Tuple[str, ...], _Collection] = {}
+        self._listeners: Dict[Tuple[str, ...], List["FakeWatch"]] = {}
+        self.ops: Dict[str, int] = {}
+
+    # ---------------------------------
+    # Client API
+    # ---------------------------------
+    def collection(self, *path: str) -> "FakeCollectionReference":
+        parts = tuple(p for segment in path for p in segment.split("/"))
+        return FakeCollectionReference(self, parts)
+
+    def document(self, *path: str) -> "FakeDocumentReference":
+        parts = tuple(p for segment in path for p in segment.split("/"))
+        return FakeDocumentReference(self, parts[:-1], parts[-1])
+
+    def collection_group(self, collection_id: str) -> "FakeQuery":
+        return FakeQuery(self, (collection_id,), all_descendants=True)
+
+    def batch(self) -> "FakeWriteBatch":
+        return FakeWriteBatch(self)
+
+    def get_all(self, references: Iterable["FakeDocumentReference"], field_paths=None, transaction=None):
+        for ref in references:
+            yield ref.get(field_paths=field_paths)
+
+    def collections(self) -> List["FakeCollectionReference"]:
+        return [FakeCollectionReference(self, path) for path in self._collections if len(path) == 1]
+
+    def transaction(self, **kwargs):
+        raise NotImplementedError("FakeFirestore does not support transactions")
+
+    # ---------------------------------
+    # Bulk state (seeding and per-round resets)
+    # ---------------------------------
+    def reset(self):
+        self._collections.clear()
+        self.ops.clear()
+
+    def dump(self) -> Dict[Tuple[str, ...], Dict[str, Dict[str, Any]]]:
+        return {
+            path: {doc_id: _copy(data) for doc_id, data in coll.docs.items()}
+            for path, coll in self._collections.items()
+        }
+
+    def load(self, state: Dict[Tuple[str, ...], Dict[str, Dict[str, Any]]]):
+        """
+        Replace the contents with a ``dump()`` (copied, so the dump can be loaded again)
+        """
+        self.reset()
+        for path, docs in state.items():
+            coll = self._collection(path)
+            coll.docs = {doc_id: _copy(data) for doc_id, data in docs.items()}
+
+    def insert_many(self, collection: str, docs: Iterable[Tuple[str, Dict[str, Any]]]):
+        """
+        Seed documents directly, skipping transforms and op counting
+        """
+        coll = self._collection(tuple(collection.split("/")))
+        for doc_id, data in docs:
+            coll.put(doc_id, self._normalise(data))
+
+    def count(self, collection: str) -> int:
+        coll = self._collections.get(tuple(collection.split("/")))
+        return len(coll.docs) if coll else 0
+
+    def count_group(self, collection_id: str) -> int:
+        """
+        Documents in every collection named ``collection_id``, at any depth
+        """
+        return sum(len(coll.docs) for path, coll in self._collections.items() if path[-1] == collection_id)
+
+    # ---------------------------------
+    # Internals
+    # ---------------------------------
+    def _collection(self, path: Tuple[str, ...]) -> _Collection:
+        coll = self._collections.get(path)
+        if coll is None:
+            coll = self._collections[path] = _Collection()
+        return coll
+
+    def _count_op(self, op: str):
+        self.ops[op] = self.ops.get(op, 0) + 1
+
+    def _normalise(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {k: self._normalise(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._normalise(v) for v in value]
+        if self.aware_timestamps and isinstance(value, datetime):
+            return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+        return value
+
+    def _now(self) -> datetime:
+        now = datetime.now(timezone.utc)
+        return now if self.aware_timestamps else now.replace(tzinfo=None)
+
+    def _apply(self, current: Dict[str, Any], updates: Dict[str, Any], dotted: bool) -> Dict[str, Any]:
+        data = _copy(current)
+        for key, value in updates.items():
+            if not dotted and isinstance(value, dict) and isinstance(data.get(key), dict):
+                # merge=True merges nested maps
+                data[key] = self._apply(data[key], value, dotted=False)
+                continue
+            existing = _lookup(data, key) if dotted else data.get(key, _MISSING)
+            if value is transforms.DELETE_FIELD:
+                if dotted:
+                    _remove(data, key)
+                else:
+                    data.pop(key, None)
+                continue
+            if value is transforms.SERVER_TIMESTAMP:
+                value = self._now()
+            elif isinstance(value, transforms.Increment):
+                base = existing if isinstance(existing, (int, float)) and not isinstance(existing, bool) else 0
+                value = base + value.value
+            elif isinstance(value, transforms.ArrayUnion):
+                base = list(existing) if isinstance(existing, list) else []
+                value = base + [v for v in value.values if v not in base]
+            elif isinstance(value, transforms.ArrayRemove):
+                base = list(existing) if isinstance(existing, list) else []
+                value = [v for v in base if v not in value.values]
+            else:
+                value = self._resolve(value)
+            if dotted:
+                _assign(data, key, value)
+            else:
+                data[key] = value
+        return data
+
+    def _resolve(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return self._apply({}, value, dotted=False)
+        return self._normalise(_copy(value))
+
+    def _write(
+        self, ref: "FakeDocumentReference", kind: str, data: Optional[Dict[str, Any]] = None, merge: bool = False
+    ):
+        coll = self._collection(ref._parent_path)
+        current = coll.docs.get(ref.id)
+        if kind == "create":
+            if current is not None:
+                raise ValueError(f"Document already exists: {ref.path}")
+            coll.put(ref.id, self._apply({}, data, dotted=False))
+        elif kind == "set":
+            coll.put(ref.id, self._apply((current or {}) if merge else {}, data, dotted=False))
+        elif kind == "update":
+            if current is None:
+                raise ValueError(f"No document to update: {ref.path}")
+            coll.put(ref.id, self._apply(current, data, dotted=True))
+        elif kind == "delete":
+            coll.put(ref.id, None)
+        self._count_op(kind)
+        self._notify(ref, current)
+
+    def _notify(self, ref: "FakeDocumentReference", previous: Optional[Dict[str, Any]]):
+        # Listeners hear about each write as it lands (real listeners lag slightly behind)
+        watches = self._listeners.get(ref._parent_path)
+        if not watches:
+            return
+        data = self._collections[ref._parent_path].docs.get(ref.id)
+        if data is None and previous is None:
+            return
+        if data is None:
+            change = FakeDocumentChange(ChangeType.REMOVED, FakeDocumentSnapshot(ref, previous))
+        else:
+            kind = ChangeType.ADDED if previous is None else ChangeType.MODIFIED
+            change = FakeDocumentChange(kind, FakeDocumentSnapshot(ref, data))
+        for watch in list(watches):
+            watch.push([change])
+
+
+class FakeDocumentChange:
+    def __init__(self, type: ChangeType, document: "FakeDocumentSnapshot"):
+        self.type = type
+        self.document = document
+
+
+class FakeWatch:
+    """
+    Snapshot listener handle returned by ``on_snapshot``; callbacks run synchronously
+    """
+
+    def __init__(self, client: FakeFirestore, path: Tuple[str, ...], callback):
+        self._client = client
+        self._path = path
+        self._callback = callback
+        self.is_active = True
+
+    def push(self, changes: List[FakeDocumentChange]):
+        if self.is_active:
+            self._callback([change.document for change in changes], changes, datetime.now(timezone.utc))
+
+    def unsubscribe(self):
+        self.is_active = False
+        watches = self._client._listeners.get(self._path, [])
+        if self in watches:
+            watches.remove(self)
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self._data = data
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return _copy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str) -> Any:
+        if self._data is None:
+            return None
+        value = _lookup(self._data, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return _copy(value)
+
+
+class FakeDocumentReference:
+    def __init__(self, client: FakeFirestore, parent_path: Tuple[str, ...], doc_id: str):
+        self._client = client
+        self._parent_path = parent_path
+        self.id = doc_id
+
+    @property
+    def path(self) -> str:
+        return "/".join(self._parent_path + (self.id,))
+
+    @property
+    def parent(self) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._client, self._parent_path)
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._client, self._parent_path + (self.id, name))
+
+    def get(self, field_paths=None, transaction=None) -> FakeDocumentSnapshot:
+        self._client._count_op("get")
+        coll = self._client._collections.get(self._parent_path)
+        data = coll.docs.get(self.id) if coll else None
+        if data is not None and field_paths:
+            data = {f: _lookup(data, f) for f in field_paths if _lookup(data, f) is not _MISSING}
+        return FakeDocumentSnapshot(self, data)
+
+    def set(self, document_data: Dict[str, Any], merge: bool = False):
+        self._client._write(self, "set", document_data, merge=merge)
+
+    def update(self, field_updates: Dict[str, Any]):
+        self._client._write(self, "update", field_updates)
+
+    def create(self, document_data: Dict[str, Any]):
+        self._client._write(self, "create", document_data)
+
+    def delete(self):
+        self._client._write(self, "delete")
+
+    def __eq__(self, other):
+        return isinstance(other, FakeDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+class FakeAggregationResult:
+    def __init__(self, alias: str, value: Any):
+        self.alias = alias
+        self.value = value
+
+
+class FakeAggregationQuery:
+    def __init__(self, query: "FakeQuery"):
+        self._nested_query = query
+        self._aggregations: List[Tuple[str, Optional[str], str]] = []
+
+    def count(self, alias: Optional[str] = None) -> "FakeAggregationQuery":
+        self._aggregations.append(("count", None, alias or "count"))
+        return self
+
+    def sum(self, field_ref: str, alias: Optional[str] = None) -> "FakeAggregationQuery":
+        self._aggregations.append(("sum", field_ref, alias or "sum"))
+        return self
+
+    def avg(self, field_ref: str, alias: Optional[str] = None) -> "FakeAggregationQuery":
+        self._aggregations.append(("avg", field_ref, alias or "avg"))
+        return self
+
+    def get(self, transaction=None, **kwargs) -> List[List[FakeAggregationResult]]:
+        self._nested_query._client._count_op("aggregate")
+        rows = [data for _, _, data in self._nested_query._matching()]
+        results = []
+        for kind, field, alias in self._aggregations:
+            if kind == "count":
+                value: Any = len(rows)
+            else:
+                numbers = [
+                    v for v in (_lookup(row, field) for row in rows)
+                    if isinstance(v, (int, float)) and not isinstance(v, bool)
+                ]
+                if kind == "sum":
+                    value = sum(numbers)
+                else:
+                    value = sum(numbers) / len(numbers) if numbers else None
+            results.append(FakeAggregationResult(alias, value))
+        return [results]
+
+    def stream(self, transaction=None, **kwargs) -> Iterator[List[FakeAggregationResult]]:
+        yield from self.get(transaction)
+
+
+class FakeQuery:
+    DESCENDING = DESCENDING
+    ASCENDING = "ASCENDING"
+
+    def __init__(self, client: FakeFirestore, path: Tuple[str, ...], all_descendants: bool = False):
+        self._client = client
+        self._path = path
+        self._all_descendants = all_descendants
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._orders: List[Tuple[str, str]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._projection: Optional[List[str]] = None
+
+    @property
+    def id(self) -> str:
+        return self._path[-1]
+
+    def _clone(self) -> "FakeQuery":
+        query = FakeQuery(self._client, self._path, self._all_descendants)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        query._limit = self._limit
+        query._offset = self._offset
+        query._projection = self._projection
+        return query
+
+    # ---------------------------------
+    # Builders
+    # ---------------------------------
+    def where(
+        self,
+        field_path: Optional[str] = None,
+        op_string: Optional[str] = None,
+        value: Any = None,
+        *,
+        filter=None,
+    ) -> "FakeQuery":
+        if isinstance(filter, FieldFilter):
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        elif filter is not None:
+            raise NotImplementedError("Composite filters are not supported by FakeFirestore")
+        query = self._clone()
+        query._filters.append((field_path, op_string, value))
+        return query
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING") -> "FakeQuery":
+        query = self._clone()
+        query._orders.append((field_path, direction))
+        return query
+
+    def limit(self, count: int) -> "FakeQuery":
+        query = self._clone()
+        query._limit = count
+        return query
+
+    def offset(self, num_to_skip: int) -> "FakeQuery":
+        query = self._clone()
+        query._offset = num_to_skip
+        return query
+
+    def select(self, field_paths: Iterable[str]) -> "FakeQuery":
+        query = self._clone()
+        query._projection = list(field_paths)
+        return query
+
+    def count(self, alias: Optional[str] = None) -> FakeAggregationQuery:
+        return FakeAggregationQuery(self).count(alias)
+
+    def sum(self, field_ref: str, alias: Optional[str] = None) -> FakeAggregationQuery:
+        return FakeAggregationQuery(self).sum(field_ref, alias)
+
+    def avg(self, field_ref: str, alias: Optional[str] = None) -> FakeAggregationQuery:
+        return FakeAggregationQuery(self).avg(field_ref, alias)
+
+    # ---------------------------------
+    # Execution
+    # ---------------------------------
+    def _sources(self) -> List[Tuple[Tuple[str, ...], _Collection]]:
+        """
+        Collections the query reads: its own, or for a collection group every
+        collection with that id at any depth, in path order
+        """
+        if not self._all_descendants:
+            coll = self._client._collections.get(self._path)
+            return [(self._path, coll)] if coll is not None else []
+        return sorted(
+            (path, coll) for path, coll in self._client._collections.items() if path[-1] == self._path[-1]
+        )
+
+    def _matching(self) -> List[Tuple[Tuple[str, ...], str, Dict[str, Any]]]:
+        rows = []
+        for path, coll in self._sources():
+            candidates: Optional[Set[str]] = None
+            residual = []
+            for field_path, op, value in self._filters:
+                key = _index_key(value) if op == "==" else _MISSING
+                if key is _MISSING:
+                    residual.append((field_path, op, value))
+                    continue
+                ids = coll.index(field_path).get(key, set())
+                candidates = set(ids) if candidates is None else candidates & ids
+
+            # Without an ordering, results come back in document path order
+            doc_ids = sorted(candidates) if candidates is not None else sorted(coll.docs)
+            for doc_id in doc_ids:
+                data = coll.docs[doc_id]
+                if all(_matches(_lookup(data, f), op, v) for f, op, v in residual):
+                    rows.append((path, doc_id, data))
+
+        # Ordering by a field excludes documents that lack it
+        for field_path, _ in self._orders:
+            rows = [row for row in rows if _lookup(row[2], field_path) is not _MISSING]
+        for field_path, direction in reversed(self._orders):
+            rows.sort(
+                key=lambda row: (_type_rank(v := _lookup(row[2], field_path)), _comparable(v)),
+                reverse=direction == DESCENDING,
+            )
+
+        rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[: self._limit]
+        return rows
+
+    def stream(self, transaction=None, **kwargs) -> Iterator[FakeDocumentSnapshot]:
+        self._client._count_op("query")
+        for path, doc_id, data in self._matching():
+            if self._projection is not None:
+                data = {f: _lookup(data, f) for f in self._projection if _lookup(data, f) is not _MISSING}
+            yield FakeDocumentSnapshot(FakeDocumentReference(self._client, path, doc_id), data)
+
+    def get(self, transaction=None, **kwargs) -> List[FakeDocumentSnapshot]:
+        return list(self.stream(transaction))
+
+
+class FakeCollectionReference(FakeQuery):
+    def document(self, document_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, self._path, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, document_data: Dict[str, Any], document_id: Optional[str] = None):
+        ref = self.document(document_id)
+        ref.create(document_data)
+        return self._client._now(), ref
+
+    def list_documents(self, page_size: Optional[int] = None) -> List[FakeDocumentReference]:
+        coll = self._client._collections.get(self._path)
+        return [self.document(doc_id) for doc_id in sorted(coll.docs)] if coll else []
+
+    def on_snapshot(self, callback) -> FakeWatch:
+        """
+        Listen to the collection: an initial snapshot of every document, then each write
+        """
+        watch = FakeWatch(self._client, self._path, callback)
+        self._client._listeners.setdefault(self._path, []).append(watch)
+        coll = self._client._collections.get(self._path)
+        docs = sorted(coll.docs.items()) if coll else []
+        watch.push([
+            FakeDocumentChange(ChangeType.ADDED, FakeDocumentSnapshot(self.document(doc_id), data))
+            for doc_id, data in docs
+        ])
+        return watch
+
+
+class FakeWriteBatch:
+    """
+    Buffers writes and applies them together on ``commit``
+    """
+
+    MAX_WRITES = 500
+
+    def __init__(self, client: FakeFirestore):
+        self._client = client
+        self._writes: List[Tuple[FakeDocumentReference, str, Optional[Dict[str, Any]], bool]] = []
+
+    def _add(self, ref, kind, data=None, merge=False):
+        if len(self._writes) >= self.MAX_WRITES:
+            raise ValueError("maximum 500 writes allowed per request")
+        self._writes.append((ref, kind, data, merge))
+
+    def set(self, reference, document_data, merge=False):
+        self._add(reference, "set", document_data, merge)
+
+    def update(self, reference, field_updates):
+        self._add(reference, "update", field_updates)
+
+    def create(self, reference, document_data):
+        self._add(reference, "create", document_data)
+
+    def delete(self, reference):
+        self._add(reference, "delete")
+
+    def __len__(self):
+        return len(self._writes)
+
+    def commit(self):
+        self._client._count_op("commit")
+        for ref, kind, data, merge in self._writes:
+            self._client._write(ref, kind, data, merge)
+        results, self._writes = list(itertools.repeat(None, len(self._writes))), []
+        return results
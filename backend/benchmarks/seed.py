@@ -0,0 +1,168 @@
+"""
+Deterministic benchmark data set
+The same sizes and seed always produce the same documents, so timings from two
+commits are measured against identical data.
+"""
+
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from benchmarks.fake_firestore import FakeFirestore
+
+PLATFORM_URLS = {
+    "amazon": "https://www.amazon.com/dp/B{n:09d}",
+    "ebay": "https://www.ebay.com/itm/{n}",
+    "walmart": "https://www.walmart.com/ip/{n}",
+}
+CATEGORIES = ["electronics", "home", "toys", "books", "sports", "beauty"]
+BRANDS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark"]
+TIERS = ["free", "free", "free", "pro", "business"]
+
+
+def bench_size(name: str, default: int) -> int:
+    """
+    Data set size from a BENCH_* environment variable
+    """
+    return int(os.environ.get(name, default))
+
+
+def seed(
+    db: FakeFirestore,
+    products: int = 1000,
+    alerts: int = 100_000,
+    prices: int = 20_000,
+    users: int = 5000,
+    history_days: int = 120,
+    seed_value: int = 42,
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """
+    Fill ``db`` with products, users, alerts and price history.
+
+    Timestamps are fixed offsets from ``now`` (the services compare against the
+    current time) and prices spread over ``history_days``, so part of the history
+    is older than the cleanup retention window. Alerts have notifications switched
+    off so triggering them never leaves the process.
+    """
+    rng = random.Random(seed_value)
+    now = now or datetime.utcnow()
+    platforms = list(PLATFORM_URLS)
+
+    product_docs = []
+    base_prices = {}
+    for n in range(products):
+        product_id = f"prod_{n:06d}"
+        platform = platforms[n % len(platforms)]
+        price = round(rng.uniform(5, 500), 2)
+        base_prices[product_id] = price
+        created = now - timedelta(days=history_days, minutes=n)
+        product_docs.append(
+            (
+                product_id,
+                {
+                    "id": product_id,
+                    "name": f"Benchmark product {n}",
+                    "description": "",
+                    "product_url": PLATFORM_URLS[platform].format(n=n),
+                    "platform": platform,
+                    "category": CATEGORIES[n % len(CATEGORIES)],
+                    "brand": BRANDS[n % len(BRANDS)],
+                    "current_price": price,
+                    "original_price": round(price * rng.uniform(1.0, 1.3), 2),
+                    "currency": "USD",
+                    "is_tracking": True,
+                    "is_active": True,
+                    "price_volatility": round(rng.uniform(0, 0.1), 4),
+                    "created_at": created.isoformat(),
+                    "updated_at": created.isoformat(),
+                    "last_scraped": None,
+                },
+            )
+        )
+    db.insert_many("products", product_docs)
+
+    db.insert_many(
+        "users",
+        ((f"user_{n:06d}", {"id": f"user_{n:06d}", "tier": TIERS[n % len(TIERS)]}) for n in range(users)),
+    )
+
+    product_ids = list(base_prices)
+    alert_docs = []
+    for n in range(alerts):
+        product_id = product_ids[rng.randrange(len(product_ids))] if product_ids else "missing"
+        current = base_prices.get(product_id, 100.0)
+        kind = rng.choices(["target_price", "price_drop", "price_increase"], weights=[6, 3, 1])[0]
+        created = now - timedelta(days=rng.uniform(0, history_days))
+        alert_docs.append(
+            (
+                f"alert_{n:07d}",
+                {
+                    "user_id": f"user_{rng.randrange(max(users, 1)):06d}",
+                    "product_id": product_id,
+                    "alert_type": kind,
+                    "target_price": round(current * rng.uniform(0.7, 1.05), 2) if kind == "target_price" else None,
+                    "threshold_percentage": rng.choice([5, 10, 20]) if kind != "target_price" else None,
+                    "previous_price": current,
+                    "notify_email": False,
+                    "notify_push": False,
+                    "notify_sms": False,
+                    "notes": "",
+                    "is_active": rng.random() < 0.9,
+                    "is_triggered": False,
+                    "created_at": created,
+                    "updated_at": created,
+                    "last_checked": None,
+                },
+            )
+        )
+    db.insert_many("alerts", alert_docs)
+
+    price_docs: Dict[str, list] = {}
+    for n in range(prices):
+        product_id = product_ids[n % len(product_ids)] if product_ids else "missing"
+        base = base_prices.get(product_id, 100.0)
+        created = now - timedelta(days=rng.uniform(0, history_days))
+        price_docs.setdefault(product_id, []).append(
+            (
+                f"price{n:07d}_{product_id}",
+                {
+                    "product_id": product_id,
+                    "price": round(base * rng.uniform(0.85, 1.15), 2),
+                    "currency": "USD",
+                    "created_at": created,
+                    "first_seen": created,
+                    "last_seen": created,
+                    "observations": 1,
+                    "source_url": None,
+                },
+            )
+        )
+    for product_id, docs in price_docs.items():
+        db.insert_many(f"products/{product_id}/prices", docs)
+
+    # Old scraping sessions and errors for the cleanup job
+    db.insert_many(
+        "scraping_sessions",
+        (
+            (
+                f"session_{n:06d}",
+                {
+                    "session_id": f"session_{n:06d}",
+                    "status": "completed",
+                    "created_at": now - timedelta(days=n % history_days),
+                },
+            )
+            for n in range(products)
+        ),
+    )
+    db.insert_many(
+        "scraping_errors",
+        (
+            (f"error_{n:06d}", {"error_message": "timeout", "created_at": now - timedelta(days=n % history_days)})
+            for n in range(products // 10)
+        ),
+    )
+
+    return {"products": products, "alerts": alerts, "prices": prices, "users": users}
@@ -0,0 +1,146 @@
+"""
+Local HTTP stand-in for the retailer sites
+Serves the saved product and search pages from ``fixtures/`` with a deterministic
+price per URL, and an httpx transport that sends requests for the real hosts to it.
+"""
+
+import os
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+SEARCH_PATHS = {"/s": "k", "/sch/i.html": "_nkw", "/search": "q"}
+
+
+def load_fixtures() -> Dict[str, str]:
+    fixtures = {}
+    for name in os.listdir(FIXTURES_DIR):
+        if name.endswith(".html"):
+            with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as handle:
+                fixtures[name[: -len(".html")]] = handle.read()
+    return fixtures
+
+
+def platform_of(host: str) -> Optional[str]:
+    for platform in ("amazon", "ebay", "walmart"):
+        if platform in host:
+            return platform
+    return None
+
+
+def price_for(url: str, generation: int = 0) -> float:
+    """
+    Stable price for a URL; ``generation`` shifts it so repeated runs see price changes
+    """
+    return round(5 + (zlib.crc32(f"{url}|{generation}".encode()) % 49500) / 100, 2)
+
+
+def render(fixtures: Dict[str, str], host: str, target: str, generation: int = 0) -> Optional[str]:
+    """
+    Product or search page for a request to ``host`` (None if nothing matches)
+    """
+    platform = platform_of(host)
+    if platform is None:
+        return None
+    parts = urlsplit(target)
+    if parts.path in SEARCH_PATHS:
+        query = parse_qs(parts.query).get(SEARCH_PATHS[parts.path], [""])[0]
+        return fixtures[f"{platform}_search"].replace("{{QUERY}}", query)
+
+    item_id = parts.path.rstrip("/").rsplit("/", 1)[-1]
+    price = price_for(f"{host}{parts.path}", generation)
+    return (
+        fixtures[f"{platform}_product"]
+        .replace("{{TITLE}}", f"Benchmark item {item_id}")
+        .replace("{{ITEM_ID}}", item_id)
+        .replace("{{PRICE}}", f"{price:.2f}")
+        .replace("{{PRICE_WHOLE}}", f"{int(price)}.")
+        .replace("{{PRICE_FRACTION}}", f"{round(price * 100) % 100:02d}")
+    )
+
+
+class StandInServer:
+    """
+    Threaded HTTP server on 127.0.0.1. Requests arrive as ``/{original host}{path}``
+    (see ``StandInTransport``); ``latency`` adds a fixed delay per response to mimic
+    the network.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.fixtures = load_fixtures()
+        self.latency = latency
+        self.generation = 0
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests += 1
+                host, _, target = self.path.lstrip("/").partition("/")
+                body = render(server.fixtures, host, "/" + target, server.generation)
+                if server.latency:
+                    time.sleep(server.latency)
+                if body is None:
+                    self.send_error(404)
+                    return
+                payload = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                return None
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="bench-stand-in", daemon=True)
+
+    def start(self) -> "StandInServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class StandInTransport(httpx.AsyncHTTPTransport):
+    """
+    Rewrites ``https://www.amazon.com/dp/X`` to ``http://127.0.0.1:{port}/www.amazon.com/dp/X``
+    """
+
+    def __init__(self, port: int, **kwargs):
+        super().__init__(**kwargs)
+        self.port = port
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        request.url = url.copy_with(
+            scheme="http", host="127.0.0.1", port=self.port, raw_path=f"/{url.host}{url.raw_path.decode()}".encode()
+        )
+        return await super().handle_async_request(request)
+
+
+def stand_in_client(port: int):
+    """
+    ``httpx.AsyncClient`` replacement whose clients all talk to the stand-in server
+    """
+
+    class StandInAsyncClient(httpx.AsyncClient):
+        def __init__(self, *args, **kwargs):
+            kwargs["transport"] = StandInTransport(port)
+            super().__init__(*args, **kwargs)
+
+    return StandInAsyncClient
@@ -35,6 +35,9 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ALGORITHM: str = "HS256"
+    FIREBASE_PROJECT_ID: Optional[str] = None  # audience of Firebase ID tokens; defaults to the service account's project
+    AUTH_TOKEN_CACHE_SIZE: int = 10000  # verified ID tokens cached until they expire
+    AUTH_CERT_REFRESH_SECONDS: int = 3600  # longest Firebase signing certificates are kept before refetching
     
     # CORS settings
     # Add your frontend URLs here (comma-separated or JSON array)
@@ -50,8 +53,34 @@ class Settings(BaseSettings):
     
     # Price monitoring settings
     PRICE_CHECK_INTERVAL: int = 3600  # 1 hour in seconds
+    ADAPTIVE_MIN_INTERVAL: int = 900  # volatile / near-alert products
+    ADAPTIVE_MAX_INTERVAL: int = 7 * 86400  # ceiling for products that haven't changed in weeks
     MAX_PRICE_HISTORY_DAYS: int = 90
     PRICE_CHANGE_THRESHOLD: float = 0.05  # 5% change threshold
+    RECENT_PRICES_SIZE: int = 20  # latest price runs embedded in each product document
+    PRICE_RUN_FLUSH_SECONDS: int = 21600  # how often an unchanged price rewrites its run's price document
+    PRICE_HISTORY_LEGACY_READS: bool = True  # also read the flat prices collection; off once migrated
+    PRICE_TIMESTAMPS_BACKFILLED: bool = False  # every price document has last_seen (backfill_timestamps.py has run)
+    CRAWL_TICK_SECONDS: int = 60  # how often the crawl scheduler hands out due products
+    CRAWL_REFRESH_SECONDS: int = 600  # how often the scheduler reloads products/alerts
+    SCRAPE_RATE_PER_MINUTE: int = 60  # sustained scrape capacity the scheduler drains at
+    SCRAPE_CONCURRENCY: int = 5
+    SCRAPE_MODE: str = "inline"  # "inline" (leader scrapes), "queue" (workers pull jobs), "shard" (hash-partitioned)
+    JOB_QUEUE_BACKEND: str = "sqlite"  # "sqlite" (local file) or "redis" (streams, needs REDIS_URL)
+    JOB_QUEUE_PATH: str = "data/jobs.sqlite3"
+    JOB_VISIBILITY_TIMEOUT: int = 300  # seconds before an unacknowledged job is redelivered
+    JOB_MAX_ATTEMPTS: int = 5
+    SHARD_HEARTBEAT_TTL: int = 180  # a shard worker silent for longer leaves the ring
+    SHARD_VNODES: int = 64  # virtual nodes per worker on the consistent-hash ring
+    RUN_TIME_BUDGET_SECONDS: int = 50  # wall time per monitoring run, 0 disables (keep under the 60 s tick)
+    RUN_CHECKPOINT_CHUNK: int = 25  # products per checkpointed chunk of a monitoring run
+    RUN_STALE_SECONDS: int = 600  # a run not checkpointed for this long is resumed elsewhere
+    PARSE_POOL_SIZE: int = 0  # HTML parse worker processes; 0 = one per CPU core, -1 = parse in a thread
+    PIPELINE_QUEUE_SIZE: int = 50  # products buffered between monitoring pipeline stages
+    PIPELINE_PERSIST_WORKERS: int = 4  # concurrent price writes in the monitoring pipeline
+    PIPELINE_ALERT_WORKERS: int = 2  # concurrent alert checks in the monitoring pipeline
+    SNAPSHOT_INTERVAL_MINUTES: int = 15  # monitoring overview snapshot refresh
+    COUNTER_SHARDS: int = 10  # shards per materialised counter
     
     # Web scraping settings
     REQUEST_TIMEOUT: int = 30
@@ -75,7 +104,28 @@ class Settings(BaseSettings):
     # Cache settings
     REDIS_URL: Optional[str] = None
     CACHE_TTL: int = 300  # 5 minutes
+    CACHE_STALE_TTL: int = 60  # serve stale for up to 1 minute while refreshing
+    CACHE_MAX_ENTRIES: int = 1024
+    PRODUCT_CACHE_SIZE: int = 5000  # product documents cached per process (kept fresh by a listener), 0 disables
     
+    # Coordination between replicas
+    LOCK_BACKEND: str = "firestore"  # "firestore", "redis" or "memory" (single replica)
+    LEADER_LEASE_SECONDS: int = 30  # scheduler leadership lease, renewed every third of it
+    
+    # Firestore indexes
+    FIRESTORE_INDEX_CHECK: str = "warn"  # startup check of firestore.indexes.json: "warn", "strict" (fail startup) or "off"
+
+    # Tracing
+    TRACE_EXPORTER: str = "none"  # "jsonl" (local span log), "otel" (OpenTelemetry) or "none"
+    TRACE_SAMPLE_RATE: float = 0.05  # share of requests traced
+    TRACE_LOG_PATH: str = "data/spans.jsonl"
+    TRACE_MAX_SPANS: int = 2000  # spans kept per trace; long loops are truncated
+
+    # Profiling
+    PROFILER: str = "auto"  # "auto" (pyinstrument if installed), "pyinstrument" or "cprofile"
+    PROFILE_DIR: str = "data/profiles"
+    PROFILE_KEEP: int = 20  # newest task profiles kept on disk
+
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FILE: Optional[str] = None
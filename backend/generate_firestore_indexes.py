@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Firestore index manifest generator for PricePick backend
+Writes ``firestore.indexes.json`` from the query inventory in
+``app/utils/firestore_indexes.py``; ``--check`` only reports whether the committed
+file is up to date.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from app.utils.firestore_indexes import (  # noqa: E402
+    HOT_QUERIES,
+    MANIFEST_PATH,
+    load_manifest,
+    manifest,
+    write_manifest,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main(check: bool) -> bool:
+    """
+    Main generator function
+    """
+    try:
+        if check:
+            if load_manifest() != manifest():
+                logger.error(f"{MANIFEST_PATH.name} is out of date; run generate_firestore_indexes.py")
+                return False
+            logger.info(f"{MANIFEST_PATH.name} is up to date")
+            return True
+
+        content = write_manifest()
+        logger.info(
+            f"Wrote {len(content['indexes'])} composite indexes and {len(content['fieldOverrides'])} "
+            f"field overrides for {len(HOT_QUERIES)} query shapes to {MANIFEST_PATH}"
+        )
+        return True
+
+    except Exception as e:
+        logger.error(f"Index manifest generation failed: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="exit 1 if firestore.indexes.json is out of date")
+    args = parser.parse_args()
+
+    sys.exit(0 if main(args.check) else 1)
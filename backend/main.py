@@ -5,6 +5,7 @@ Inspired by iShopBot architecture for price tracking and monitoring
 
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from contextlib import asynccontextmanager
 import uvicorn
 import logging
@@ -13,7 +14,14 @@ from typing import List
 from app.routes import products, prices, monitoring, search
 from app.database import init_db, get_db_session
 from app.services.price_monitor_service import PriceMonitorService
+from app.services.auth_service import token_verifier
+from app.services.product_cache import product_cache
 from app.tasks.scheduler import TaskScheduler
+from app.utils.cache import response_cache
+from app.utils.firestore_indexes import check_indexes
+from app.utils.parse_pool import parse_pool
+from app.utils import metrics
+from app.utils.tracing import TracingMiddleware, tracer
 from config import settings
 
 # Configure logging
@@ -33,6 +41,10 @@ async def lifespan(app: FastAPI):
     logger.info("Starting PricePick backend...")
     await init_db()
     
+    # Every hot query shape must have an index in firestore.indexes.json
+    from app.firebase import db as firestore_db
+    check_indexes(settings.FIRESTORE_INDEX_CHECK, firestore_db)
+    
     # Initialize price monitoring service (it will get its own db sessions when needed)
     # Create a db session for initialization - the service manages its own sessions for operations
     db = get_db_session()
@@ -44,6 +56,15 @@ async def lifespan(app: FastAPI):
         db.close()
         raise
     
+    # Subscribe to cross-replica cache invalidations (no-op without Redis)
+    response_cache.start()
+    
+    # Keep cached product documents in step with Firestore
+    product_cache.start()
+    
+    # Preload the ID token signing certificates and keep them fresh
+    await token_verifier.start()
+    
     # Start background task scheduler
     scheduler = TaskScheduler()
     app.state.scheduler = scheduler
@@ -56,6 +77,11 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down PricePick backend...")
     await scheduler.stop()
+    await response_cache.close()
+    product_cache.stop()
+    await token_verifier.stop()
+    parse_pool.shutdown()
+    tracer.shutdown()
     logger.info("PricePick backend shutdown complete!")
 
 
@@ -77,6 +103,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Root span per sampled request (TRACE_EXPORTER / TRACE_SAMPLE_RATE)
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(products.router, prefix="/api/v1/products", tags=["products"])
 app.include_router(prices.router, prefix="/api/v1/prices", tags=["prices"])
@@ -119,6 +148,44 @@ async def health_check():
         raise HTTPException(status_code=503, detail="Service unhealthy")
 
 
+async def _refresh_queue_gauges():
+    """
+    Sample queue depths into their gauges right before Prometheus collects them
+    """
+    scheduler = getattr(app.state, "scheduler", None)
+    if scheduler is not None:
+        metrics.IS_LEADER.set(1 if scheduler.is_leader else 0)
+        task = scheduler.tasks.get("price_monitor")
+        if task is not None:
+            crawl = task.price_monitor.crawl_scheduler.get_stats()
+            metrics.CRAWL_QUEUE_PRODUCTS.set(crawl["queued_products"], state="queued")
+            metrics.CRAWL_QUEUE_PRODUCTS.set(crawl["due_products"], state="due")
+            metrics.CRAWL_QUEUE_PRODUCTS.set(crawl["in_flight"], state="in_flight")
+            if settings.SCRAPE_MODE == "queue":
+                try:
+                    jobs = await task.price_monitor.job_queue.get_stats()
+                    for state in ("ready", "leased", "dead"):
+                        if state in jobs:
+                            metrics.JOB_QUEUE_JOBS.set(jobs[state], state=state)
+                except Exception as e:
+                    logger.error(f"Failed to read job queue depth: {e}")
+
+    pool = parse_pool.get_stats()
+    metrics.PARSE_POOL_QUEUE.set(pool["queue_depth"], state="queued")
+    metrics.PARSE_POOL_QUEUE.set(pool["in_flight"], state="in_flight")
+    metrics.CACHE_ENTRIES.set(len(response_cache.local))
+    metrics.PRODUCT_CACHE_ENTRIES.set(product_cache.get_stats()["entries"])
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Prometheus scrape endpoint: latency histograms, counters and queue depth gauges
+    """
+    await _refresh_queue_gauges()
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
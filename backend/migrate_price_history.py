@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Price history migration script for PricePick backend
+Moves the flat Firestore ``prices`` collection into per-product
+``products/{id}/prices`` subcollections in write batches and seeds each product's
+``recent_prices``. Re-running continues where an interrupted run stopped.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from app.services.price_history import MIGRATION_BATCH_DOCS, PriceHistoryService  # noqa: E402
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main(batch_docs: int, dry_run: bool) -> bool:
+    """
+    Main migration function
+    """
+    try:
+        logger.info(f"Migrating price history (batch of {batch_docs}{', dry run' if dry_run else ''})...")
+        result = await PriceHistoryService().migrate_legacy(batch_docs=batch_docs, dry_run=dry_run)
+        logger.info(f"Moved {result['moved']} price documents for {result['products']} products")
+        if result["skipped"]:
+            logger.warning(f"{result['skipped']} price documents have no product_id and were left in place")
+        if not dry_run:
+            logger.info(f"Seeded recent_prices on {result['recent_seeded']} products")
+            logger.info("Set PRICE_HISTORY_LEGACY_READS=false once every replica runs this version")
+        return True
+
+    except Exception as e:
+        logger.error(f"Price history migration failed: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--batch-size", type=int, default=MIGRATION_BATCH_DOCS, help="price documents moved per batch (max 250)"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="count what would move without writing")
+    args = parser.parse_args()
+
+    success = asyncio.run(main(min(max(args.batch_size, 1), 250), args.dry_run))
+    sys.exit(0 if success else 1)
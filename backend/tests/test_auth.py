@@ -0,0 +1,166 @@
+"""
+Tests for Firebase ID token verification and its cache
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from fastapi import HTTPException
+
+from app.services.auth_service import AuthService, FirebaseTokenVerifier
+
+PROJECT = "pricepick-test"
+
+
+def make_signing_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.system.gserviceaccount.com")])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return key, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+KEY, CERT = make_signing_key()
+OTHER_KEY, _ = make_signing_key()
+
+
+class StubCertSource:
+    """Cert source serving fixed certificates and counting fetches"""
+
+    def __init__(self, certs):
+        self._certs = certs
+        self.refreshes = 0
+        self.expires_at = time.time() + 3600
+
+    def certs(self):
+        return self._certs
+
+    def refresh(self):
+        self.refreshes += 1
+        return self._certs
+
+
+def mint(key=KEY, kid="k1", lifetime=3600, **claims):
+    now = int(time.time())
+    payload = {
+        "iss": f"https://securetoken.google.com/{PROJECT}",
+        "aud": PROJECT,
+        "sub": "user-1",
+        "auth_time": now - 10,
+        "iat": now,
+        "exp": now + lifetime,
+        "email": "user@example.com",
+        **claims,
+    }
+    return jwt.encode(payload, key, algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def certs():
+    return StubCertSource({"k1": CERT})
+
+
+@pytest.fixture
+def verifier(certs):
+    return FirebaseTokenVerifier(certs, project_id=PROJECT, max_entries=2)
+
+
+class TestTokenVerification:
+    """Test cases for verifying locally minted Firebase ID tokens"""
+
+    @pytest.mark.asyncio
+    async def test_valid_token_is_verified_once_then_cached(self, verifier):
+        """Test that repeated requests with one token verify its signature only once"""
+        token = mint()
+
+        claims = await verifier.verify(token)
+        claims["uid"] = "tampered"
+        again = await verifier.verify(token)
+
+        assert again["uid"] == "user-1" and again["email"] == "user@example.com"
+        assert verifier.get_stats()["misses"] == 1 and verifier.get_stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_verification(self, verifier):
+        """Test that a burst of requests carrying an uncached token verifies it once"""
+        token = mint()
+
+        results = await asyncio.gather(*(verifier.verify(token) for _ in range(20)))
+
+        assert {r["uid"] for r in results} == {"user-1"}
+        stats = verifier.get_stats()
+        assert stats["misses"] == 1 and stats["coalesced"] == 19
+
+    @pytest.mark.asyncio
+    async def test_cached_token_expires_with_exp(self, certs):
+        """Test that a cached token is verified again (and rejected) once past its exp"""
+        now = [time.time()]
+        verifier = FirebaseTokenVerifier(certs, project_id=PROJECT, clock=lambda: now[0])
+        token = mint(lifetime=60)
+        await verifier.verify(token)
+
+        now[0] += 120
+        with pytest.raises(jwt.InvalidTokenError):
+            await verifier.verify(token)
+        assert verifier.get_stats()["misses"] == 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "token",
+        [
+            mint(key=OTHER_KEY),
+            mint(aud="another-project"),
+            mint(iss="https://securetoken.google.com/another-project"),
+            mint(sub=""),
+            mint(lifetime=-10),
+            mint(auth_time=int(time.time()) + 3600),
+        ],
+        ids=["signature", "audience", "issuer", "subject", "expired", "auth_time"],
+    )
+    async def test_invalid_tokens_are_rejected_and_not_cached(self, verifier, token):
+        """Test that forged or mis-addressed tokens fail every time"""
+        for _ in range(2):
+            with pytest.raises(jwt.InvalidTokenError):
+                await verifier.verify(token)
+        assert verifier.get_stats()["entries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_unknown_key_refetches_certs_at_most_once_a_minute(self, verifier, certs):
+        """Test that a rotated key id triggers one cert refresh, not one per request"""
+        for _ in range(3):
+            with pytest.raises(jwt.InvalidTokenError):
+                await verifier.verify(mint(kid="rotated"))
+        assert certs.refreshes == 1
+
+        certs._certs = {"k1": CERT, "rotated": CERT}
+        verifier._forced_refresh_at = 0
+        assert (await verifier.verify(mint(kid="rotated")))["uid"] == "user-1"
+
+    @pytest.mark.asyncio
+    async def test_auth_service_maps_failures_to_401(self, verifier):
+        """Test that the route-facing service keeps its HTTP error contract"""
+        service = AuthService(verifier)
+
+        assert (await service.verify_firebase_token(mint()))["uid"] == "user-1"
+        with pytest.raises(HTTPException) as expired:
+            await service.verify_firebase_token(mint(lifetime=-10))
+        with pytest.raises(HTTPException) as invalid:
+            await service.verify_firebase_token("not-a-token")
+        assert (expired.value.status_code, expired.value.detail) == (401, "Token expired")
+        assert (invalid.value.status_code, invalid.value.detail) == (401, "Invalid token")
@@ -0,0 +1,106 @@
+"""
+Tests for the response cache
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.utils.cache import CacheEntry, LRUCache, ResponseCache, product_tag
+
+
+class TestLRUCache:
+    """Test cases for the in-process LRU tier"""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest untouched entry is evicted first"""
+        cache = LRUCache(max_entries=2)
+        far = time.time() + 60
+        cache.set("a", CacheEntry(1, far, far))
+        cache.set("b", CacheEntry(2, far, far))
+        cache.get("a")
+        cache.set("c", CacheEntry(3, far, far))
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert len(cache) == 2
+
+    def test_expired_entries_are_dropped(self):
+        """Test that entries past their stale window are not returned"""
+        cache = LRUCache()
+        past = time.time() - 1
+        cache.set("a", CacheEntry(1, past, past))
+
+        assert cache.get("a") is None
+
+
+class TestResponseCache:
+    """Test cases for the two-tier response cache"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_load_once(self):
+        """Test that concurrent callers share a single load"""
+        cache = ResponseCache(ttl=60)
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"value": 42}
+
+        results = await asyncio.gather(*[cache.get_or_load("k", loader) for _ in range(5)])
+
+        assert calls == 1
+        assert all(r == {"value": 42} for r in results)
+        assert cache.stats["coalesced"] == 4
+
+    @pytest.mark.asyncio
+    async def test_stale_entry_served_while_refreshing(self):
+        """Test stale-while-revalidate behaviour"""
+        cache = ResponseCache(ttl=0, stale_ttl=60)
+        values = iter([1, 2])
+
+        async def loader():
+            return next(values)
+
+        assert await cache.get_or_load("k", loader) == 1
+        assert await cache.get_or_load("k", loader) == 1
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        assert cache.local.get("k").value == 2
+        assert cache.stats["stale_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidate_product_drops_tagged_entries(self):
+        """Test that product invalidation removes entries derived from that product"""
+        cache = ResponseCache(ttl=60)
+
+        async def rows():
+            return [{"product_id": "p1"}, {"product_id": "p2"}]
+
+        async def stats():
+            return {"product_id": "p3"}
+
+        await cache.get_or_load(
+            "list", rows, tags=lambda value: [product_tag(r["product_id"]) for r in value]
+        )
+        await cache.get_or_load("stats", stats, tags=[product_tag("p3")])
+
+        assert await cache.invalidate_product("p2") == 1
+        assert "list" not in cache.local
+        assert "stats" in cache.local
+
+    @pytest.mark.asyncio
+    async def test_loader_errors_are_not_cached(self):
+        """Test that a failing load propagates and leaves no entry behind"""
+        cache = ResponseCache(ttl=60)
+
+        async def failing():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load("k", failing)
+        assert "k" not in cache.local
@@ -0,0 +1,160 @@
+"""
+Tests for the sharded counters and the monitoring snapshot task that reconciles them
+"""
+
+import pytest
+from datetime import datetime, timedelta
+
+from app.services import counter_service, monitoring_service, price_history
+from app.services.counter_service import (
+    ALERTS_ACTIVE,
+    ALERTS_TOTAL,
+    ALERTS_TRIGGERED,
+    PRODUCTS_TOTAL,
+    PRODUCTS_TRACKING,
+    CounterService,
+    daily_counter,
+)
+from app.services.monitoring_service import OVERVIEW_SNAPSHOT, SNAPSHOT_COLLECTION
+from app.tasks.snapshot import SnapshotTask
+from benchmarks.fake_firestore import FakeFirestore
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeFirestore()
+    for module in (counter_service, monitoring_service, price_history):
+        monkeypatch.setattr(module, "db", fake)
+    return fake
+
+
+class TestShardedCounters:
+    """Test cases for counter increments spread over shards"""
+
+    @pytest.mark.asyncio
+    async def test_increments_spread_over_shards_and_sum(self, fake_db):
+        """Test that increments land on several shards and reads add them back up"""
+        counters = CounterService(num_shards=4)
+
+        for _ in range(40):
+            await counters.increment(PRODUCTS_TOTAL)
+        await counters.increment_many({PRODUCTS_TRACKING: 3, ALERTS_TOTAL: 0})
+
+        shards = [d.to_dict() for d in fake_db.collection("counter_shards").stream()]
+        assert 1 < len([s for s in shards if s["name"] == PRODUCTS_TOTAL]) <= 4
+        assert all(s["name"] != ALERTS_TOTAL for s in shards)
+        counts = await counters.get_counts([PRODUCTS_TOTAL, PRODUCTS_TRACKING, ALERTS_TOTAL])
+        assert counts == {PRODUCTS_TOTAL: 40, PRODUCTS_TRACKING: 3, ALERTS_TOTAL: 0}
+
+    @pytest.mark.asyncio
+    async def test_reconcile_applies_the_difference(self, fake_db):
+        """Test that reconcile moves a drifted counter to the exact value and keeps later increments"""
+        counters = CounterService(num_shards=4)
+        await counters.increment_many({ALERTS_ACTIVE: 7})
+
+        assert await counters.reconcile(ALERTS_ACTIVE, 5) == -2
+        assert await counters.reconcile(ALERTS_ACTIVE, 5) == 0
+        await counters.increment(ALERTS_ACTIVE)
+        assert (await counters.get_counts([ALERTS_ACTIVE]))[ALERTS_ACTIVE] == 6
+
+    @pytest.mark.asyncio
+    async def test_daily_buckets_are_pruned(self, fake_db):
+        """Test that per-day buckets carry their day and old ones are deleted"""
+        counters = CounterService(num_shards=2)
+        old = datetime.utcnow() - timedelta(days=10)
+        await counters.increment_many({daily_counter(ALERTS_TRIGGERED, old): 2, daily_counter(ALERTS_TRIGGERED): 1})
+
+        assert await counters.prune_daily(keep_days=8) == 1
+        (remaining,) = [d.to_dict() for d in fake_db.collection("counter_shards").stream()]
+        assert remaining["day"] == datetime.utcnow().strftime("%Y-%m-%d")
+
+
+class TestSnapshotTask:
+    """Test cases for the monitoring snapshot background task"""
+
+    @pytest.mark.asyncio
+    async def test_snapshot_stores_overview_and_reconciles_counters(self, fake_db):
+        """Test that a run stores the overview counts and corrects drifted counters to them"""
+        fake_db.insert_many(
+            "products",
+            [
+                ("p1", {"id": "p1", "is_tracking": True, "current_price": 10.0, "platform": "amazon"}),
+                ("p2", {"id": "p2", "is_tracking": False, "current_price": 20.0, "platform": "ebay"}),
+            ],
+        )
+        fake_db.insert_many("alerts", [("a1", {"is_active": True, "is_triggered": False})])
+        task = SnapshotTask()
+        await task.monitoring_service.counters.increment_many({PRODUCTS_TOTAL: 5, ALERTS_TRIGGERED: 1})
+
+        result = await task.run()
+
+        expected = {PRODUCTS_TOTAL: 2, PRODUCTS_TRACKING: 1, ALERTS_TOTAL: 1, ALERTS_ACTIVE: 1, ALERTS_TRIGGERED: 0}
+        assert result["status"] == "completed" and result["counts"] == expected
+        stored = fake_db.document(f"{SNAPSHOT_COLLECTION}/{OVERVIEW_SNAPSHOT}").get().to_dict()
+        assert stored["counts"] == expected
+        assert set(stored["platforms"]) == {"amazon", "ebay"}
+        assert await task.monitoring_service.counters.get_counts(expected) == expected
+        assert not task.is_running
+
+    @pytest.mark.asyncio
+    async def test_snapshot_without_reconcile_leaves_counters(self, fake_db):
+        """Test that reconcile=False only stores the snapshot"""
+        task = SnapshotTask()
+        await task.monitoring_service.counters.increment(PRODUCTS_TOTAL, 3)
+
+        result = await task.run(reconcile=False)
+
+        assert result["counts"][PRODUCTS_TOTAL] == 0
+        assert (await task.monitoring_service.counters.get_counts([PRODUCTS_TOTAL]))[PRODUCTS_TOTAL] == 3
+
+    @pytest.mark.asyncio
+    async def test_snapshot_breakdowns_come_from_aggregations(self, fake_db):
+        """Test that platform/category stats match the priced products, with unset values grouped"""
+        fake_db.insert_many(
+            "products",
+            [
+                ("p1", {"platform": "amazon", "category": "Audio", "current_price": 10.0}),
+                ("p2", {"platform": "amazon", "category": "Audio", "current_price": 30.0}),
+                ("p3", {"platform": "ebay", "category": None, "current_price": 5.0}),
+                ("p4", {"platform": "ebay", "category": "", "current_price": 7.0}),
+                ("p5", {"platform": "walmart", "category": "Toys", "current_price": None}),
+            ],
+        )
+
+        snapshot = await monitoring_service.MonitoringService()._scan_monitoring_overview()
+
+        assert snapshot["platforms"] == {
+            "amazon": {"product_count": 2, "avg_price": 20.0, "min_price": 10.0, "max_price": 30.0},
+            "ebay": {"product_count": 2, "avg_price": 6.0, "min_price": 5.0, "max_price": 7.0},
+        }
+        assert snapshot["categories"] == {
+            "Audio": {"product_count": 2, "avg_price": 20.0, "min_price": 10.0, "max_price": 30.0},
+            "Uncategorized": {"product_count": 2, "avg_price": 6.0, "min_price": 5.0, "max_price": 7.0},
+        }
+
+
+class TestUserMonitoringStats:
+    """Test cases for the per-user monitoring summary"""
+
+    @pytest.mark.asyncio
+    async def test_recent_price_changes_cover_only_the_users_products(self, fake_db):
+        """Test that price changes are counted over the user's alerted products and their listings"""
+        recent, old = datetime.utcnow() - timedelta(days=1), datetime.utcnow() - timedelta(days=30)
+        fake_db.insert_many(
+            "alerts",
+            [(f"a{n}", {"user_id": "u1", "product_id": f"p{n}", "alert_type": "price_drop"}) for n in range(35)]
+            + [("other", {"user_id": "u2", "product_id": "q1", "alert_type": "price_drop"})],
+        )
+        for product_id, created in (("p0", recent), ("p0", old), ("p34", recent), ("q1", recent)):
+            fake_db.insert_many(
+                f"products/{product_id}/prices",
+                [(f"r{created.day}_{product_id}", {"product_id": product_id, "created_at": created})],
+            )
+        # p1's prices are stored on its listing
+        fake_db.insert_many("products", [("p1", {"id": "p1", "listing_id": "l1"})])
+        fake_db.insert_many("listings/l1/prices", [("r1_l1", {"listing_id": "l1", "created_at": recent})])
+
+        stats = await monitoring_service.MonitoringService().get_user_monitoring_stats("u1")
+
+        assert stats["recent_price_changes"] == 3
+        assert stats["total_alerts"] == 35 and stats["alert_types"] == {"price_drop": 35}
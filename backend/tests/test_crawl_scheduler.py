@@ -0,0 +1,186 @@
+"""
+Tests for the crawl scheduler
+"""
+
+import app.firebase  # noqa: F401  (initialises the default Firebase app)
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.crawl_scheduler import CrawlScheduler, compute_priority
+from app.services.interval_model import (
+    AdaptiveIntervalModel,
+    change_stats_from_history,
+    update_change_stats,
+)
+from app.services.product_record import ProductRecord
+
+
+class TestCrawlScheduler:
+    """Test cases for CrawlScheduler queue behaviour"""
+
+    def make_scheduler(self, products, alert_weights=None):
+        scheduler = CrawlScheduler(interval=3600, refresh_seconds=0)
+        scheduler.load(products, alert_weights or {})
+        return scheduler
+
+    def test_priority_orders_due_products(self):
+        """Test that products with alerts and volatility are taken first"""
+        products = [
+            {"id": "plain"},
+            {"id": "alerted"},
+            {"id": "volatile", "price_volatility": 0.05},
+        ]
+        scheduler = self.make_scheduler(products, {"alerted": 3.0})
+
+        batch = scheduler.pop_due(2, now=scheduler.entries["plain"].next_due + 1)
+
+        assert [p["id"] for p in batch] == ["alerted", "volatile"]
+        assert scheduler.entries["alerted"].in_flight
+        assert not scheduler.entries["plain"].in_flight
+
+    def test_deferred_products_are_not_starved(self):
+        """Test that deferred products stay queued and come back in the next batch"""
+        products = [{"id": f"p{i}"} for i in range(5)]
+        scheduler = self.make_scheduler(products)
+        now = max(e.next_due for e in scheduler.entries.values()) + 1
+
+        first = scheduler.pop_due(3, now=now)
+        second = scheduler.pop_due(3, now=now)
+
+        ids = {p["id"] for p in first} | {p["id"] for p in second}
+        assert ids == {f"p{i}" for i in range(5)}
+
+    def test_complete_reschedules(self):
+        """Test that success waits a full interval and failures retry sooner"""
+        scheduler = self.make_scheduler([{"id": "a"}, {"id": "b"}])
+        now = 1_000_000_000.0
+        scheduler.pop_due(2, now=now + 10 ** 10)
+
+        scheduler.complete("a", True, now=now)
+        scheduler.complete("b", False, now=now)
+
+        assert scheduler.entries["a"].next_due == now + 3600
+        assert scheduler.entries["b"].next_due < now + 3600
+        assert scheduler.pop_due(10, now=now + 1) == []
+
+    def test_untracked_products_are_dropped(self):
+        """Test that reloading without a product removes it from the queue"""
+        scheduler = self.make_scheduler([{"id": "a"}, {"id": "b"}])
+        scheduler.load([{"id": "a"}], {})
+
+        assert set(scheduler.entries) == {"a"}
+        assert [p["id"] for p in scheduler.pop_due(10, now=10 ** 12)] == ["a"]
+
+    def test_products_on_one_listing_are_scheduled_once(self):
+        """Test that products tracking the same item share one queue entry and its alerts"""
+        url = "https://www.amazon.com/dp/B0C1234567"
+        products = [
+            {"id": "b", "product_url": f"{url}?tag=aff-20", "platform": "amazon"},
+            {"id": "a", "product_url": url, "platform": "amazon"},
+            {"id": "c", "product_url": "https://www.amazon.com/dp/B0C7654321", "platform": "amazon"},
+        ]
+        scheduler = self.make_scheduler(products, {"a": 1.0, "b": 2.0})
+
+        assert set(scheduler.entries) == {"a", "c"}
+        assert scheduler.entries["a"].product["linked_ids"] == ["b"]
+        assert scheduler.entries["a"].alert_weight == 3.0
+
+    def test_compute_priority(self):
+        """Test that alerts and volatility raise priority"""
+        assert compute_priority(0, 0) == 1.0
+        assert compute_priority(2, 0) > compute_priority(1, 0)
+        assert compute_priority(0, 0.05) > compute_priority(0, 0.01)
+
+
+class TestProductRecord:
+    """Test cases for the compact product record used by monitoring runs"""
+
+    def test_keeps_only_monitored_fields(self):
+        """Test that a record drops document fields the monitoring path does not read"""
+        record = ProductRecord.from_dict(
+            {"name": "Kettle", "current_price": 20.0, "description": "x" * 1000, "images": ["a.jpg"]}, "p1"
+        )
+
+        assert record["id"] == "p1"
+        assert record.get("current_price") == 20.0
+        assert record.get("description") is None
+        assert "description" not in record and "name" in record
+        assert record.to_dict() == {"id": "p1", "name": "Kettle", "current_price": 20.0}
+
+    def test_dict_style_updates(self):
+        """Test that services can update a record like a product dict"""
+        record = ProductRecord(id="p1")
+        record.update({"current_price": 9.5, "updated_at": "ignored"})
+        record["scrape_interval"] = 900
+
+        assert record == {"id": "p1", "current_price": 9.5, "scrape_interval": 900}
+        assert record.get("interval_reason", "base") == "base"
+        with pytest.raises(KeyError):
+            record["description"] = "too big"
+
+    def test_scheduler_reschedules_records(self):
+        """Test that records go through the scheduler and interval model like dicts"""
+        scheduler = CrawlScheduler(interval=3600, refresh_seconds=0)
+        scheduler.load([ProductRecord(id="a", price_change_rate=0.5)], {})
+
+        batch = scheduler.pop_due(1, now=10 ** 12)
+        scheduler.complete("a", True, now=1_000_000_000.0)
+
+        assert isinstance(batch[0], ProductRecord)
+        assert batch[0]["interval_reason"] == "volatile"
+        assert scheduler.entries["a"].interval < 3600
+
+
+class TestAdaptiveIntervalModel:
+    """Test cases for the adaptive scrape interval"""
+
+    now = datetime(2026, 1, 31, tzinfo=timezone.utc)
+
+    def make_model(self):
+        return AdaptiveIntervalModel(base_interval=3600, min_interval=900, max_interval=7 * 86400)
+
+    def test_volatile_products_are_checked_sooner(self):
+        """Test that a high change rate shortens the interval"""
+        decision = self.make_model().decide(
+            {"price_change_rate": 0.5, "last_price_change_at": self.now}, now=self.now
+        )
+        assert decision.reason == "volatile"
+        assert 900 <= decision.interval < 3600
+
+    def test_near_alert_threshold_uses_minimum(self):
+        """Test that a price within 5% of a target price is checked at the minimum interval"""
+        product = {"current_price": 102.0, "last_price_change_at": self.now - timedelta(days=30)}
+        decision = self.make_model().decide(product, [100.0], now=self.now)
+        assert decision.near_threshold
+        assert decision.interval == 900
+
+    def test_stable_products_back_off_exponentially(self):
+        """Test that the interval doubles per stable week and is capped"""
+        model = self.make_model()
+        two_weeks = model.decide({"last_price_change_at": self.now - timedelta(days=14)}, now=self.now)
+        a_year = model.decide({"last_price_change_at": self.now - timedelta(days=365)}, now=self.now)
+
+        assert two_weeks.reason == "stable_backoff"
+        assert two_weeks.interval == 4 * 3600
+        assert a_year.interval == 7 * 86400
+
+    def test_change_stats_from_history_and_incremental_update(self):
+        """Test bootstrapping from stored history and updating per scrape"""
+        start = self.now - timedelta(days=10)
+        history = [
+            {"price": 10.0, "created_at": start},
+            {"price": 10.0, "created_at": start + timedelta(days=1)},
+            {"price": 12.0, "created_at": start + timedelta(days=2)},
+        ]
+        stats = change_stats_from_history(list(reversed(history)))
+        assert stats["last_price_change_at"] == start + timedelta(days=2)
+        assert stats["price_change_rate"] > 0
+
+        product = {"current_price": 12.0, **stats}
+        unchanged = update_change_stats(product, 12.0, self.now)
+        changed = update_change_stats(product, 9.0, self.now)
+        assert "last_price_change_at" not in unchanged
+        assert unchanged["price_change_rate"] < stats["price_change_rate"]
+        assert changed["last_price_change_at"] == self.now
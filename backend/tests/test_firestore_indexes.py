@@ -0,0 +1,154 @@
+"""
+Tests for the Firestore query inventory, index manifest and index guard
+"""
+
+import pytest
+from datetime import datetime
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import firestore as gcloud_firestore
+
+from app.services import price_history, price_service, product_cache
+from app.services.price_history import PriceHistoryService
+from app.services.price_service import PriceService
+from app.utils import firestore_indexes
+from app.utils.firestore_indexes import (
+    DESCENDING,
+    HOT_QUERIES,
+    IndexGuard,
+    QueryShape,
+    check_indexes,
+    is_covered,
+    load_manifest,
+    manifest,
+    missing_indexes,
+    shape_of,
+)
+from benchmarks.fake_firestore import FakeFirestore, FakeQuery
+from config import settings
+
+
+@pytest.fixture
+def sdk_client():
+    # Queries are only built, never sent
+    return gcloud_firestore.Client(project="demo", credentials=AnonymousCredentials())
+
+
+class TestIndexManifest:
+    """Test cases for generating and checking firestore.indexes.json"""
+
+    def test_single_field_queries_need_no_index(self):
+        """Test that one-field collection queries rely on the automatic indexes"""
+        content = manifest([
+            QueryShape("alerts", equality=("is_active",)),
+            QueryShape("monitoring_runs", order=(("started_ts", DESCENDING),)),
+        ])
+        assert content == {"indexes": [], "fieldOverrides": []}
+
+    def test_composite_index_puts_equalities_before_order(self):
+        """Test that equality fields lead and the sort order and ranges follow"""
+        shape = QueryShape(
+            "prices", equality=("product_id",), ranges=("created_at",),
+            order=(("created_at", DESCENDING),), group=True,
+        )
+        content = manifest([shape])
+
+        assert content["indexes"] == [{
+            "collectionGroup": "prices",
+            "queryScope": "COLLECTION_GROUP",
+            "fields": [
+                {"fieldPath": "product_id", "order": "ASCENDING"},
+                {"fieldPath": "created_at", "order": "DESCENDING"},
+            ],
+        }]
+        assert is_covered(shape, content)
+        # The same fields at collection scope are a different index
+        assert not is_covered(QueryShape("prices", equality=("product_id",), order=(("created_at", DESCENDING),)), content)
+
+    def test_group_single_field_queries_get_field_overrides(self):
+        """Test that collection group range queries enable the group-scope single-field index"""
+        shape = QueryShape("prices", ranges=("last_seen",), group=True)
+        content = manifest([shape])
+
+        assert content["indexes"] == []
+        assert [o["fieldPath"] for o in content["fieldOverrides"]] == ["last_seen"]
+        assert is_covered(shape, content)
+        assert not is_covered(QueryShape("prices", ranges=("created_at",), group=True), content)
+
+    def test_committed_manifest_is_up_to_date(self):
+        """Test that firestore.indexes.json matches the inventory and covers every hot query"""
+        assert load_manifest() == manifest()
+        assert missing_indexes() == []
+        assert len({shape.name for shape in HOT_QUERIES}) == len(HOT_QUERIES)
+
+    def test_strict_check_fails_on_missing_index(self, monkeypatch):
+        """Test that strict mode refuses to start when the manifest lacks an index"""
+        monkeypatch.setattr(firestore_indexes, "load_manifest", lambda: {"indexes": [], "fieldOverrides": []})
+        with pytest.raises(RuntimeError):
+            check_indexes("strict")
+        assert check_indexes("warn")
+        assert check_indexes("off") == []
+
+
+class TestQueryShapes:
+    """Test cases for reading the shape of executed queries"""
+
+    def test_shape_of_sdk_query(self, sdk_client):
+        """Test that filters and orders are read from a google-cloud-firestore query"""
+        query = (
+            sdk_client.collection_group("prices")
+            .where(filter=gcloud_firestore.FieldFilter("product_id", "in", ["a", "b"]))
+            .where(filter=gcloud_firestore.FieldFilter("created_at", ">=", 0))
+            .order_by("created_at", direction=gcloud_firestore.Query.DESCENDING)
+            .limit(5)
+        )
+        shape = shape_of(query)
+
+        assert shape.key == QueryShape(
+            "prices", equality=("product_id",), ranges=("created_at",),
+            order=(("created_at", DESCENDING),), group=True,
+        ).key
+        assert shape_of(sdk_client.collection("alerts").where(filter=gcloud_firestore.FieldFilter("x", "==", None))).equality == ("x",)
+
+    @pytest.mark.asyncio
+    async def test_service_queries_are_inventoried(self, monkeypatch):
+        """Test that the price history reads run against the fake client match inventoried shapes"""
+        fake = FakeFirestore()
+        monkeypatch.setattr(price_history, "db", fake)
+        monkeypatch.setattr(price_service, "db", fake)
+        monkeypatch.setattr(product_cache, "db", fake)
+        product_cache.product_cache.clear()
+        fake.insert_many("products", [("p1", {"id": "p1", "listing_id": "amazon.com:B0C1234567"})])
+        executed = []
+        original = FakeQuery.stream
+
+        def recording_stream(self, *args, **kwargs):
+            executed.append(shape_of(self))
+            return original(self, *args, **kwargs)
+
+        monkeypatch.setattr(FakeQuery, "stream", recording_stream)
+        service = PriceHistoryService()
+        start, end = datetime(2026, 1, 1), datetime(2026, 2, 1)
+        for legacy in (True, False):
+            monkeypatch.setattr(settings, "PRICE_HISTORY_LEGACY_READS", legacy)
+            service.runs("p1")
+            service.window("p1", datetime(2026, 1, 1))
+            # list_prices date windows: a range on both fields needs a multi-field composite index
+            for filters in ({}, {"product_id": "p1"}, {"platform": "amazon"}):
+                for window in ({}, {"start_date": start}, {"end_date": end}, {"start_date": start, "end_date": end}):
+                    await PriceService().list_prices(filters={**filters, **window})
+
+        indexes = manifest()
+        assert executed and all(is_covered(shape, indexes) for shape in executed)
+
+    def test_guard_reports_each_unindexed_shape_once(self, caplog):
+        """Test that the runtime guard warns once per shape not backed by the manifest"""
+        guard = IndexGuard()
+        fake = FakeFirestore()
+        unindexed = fake.collection("alerts").where("user_id", "==", "u").order_by("created_at")
+        assert guard.observe(unindexed)  # disabled until a manifest is loaded
+
+        guard.enable(manifest())
+        assert guard.observe(fake.collection("alerts").where("user_id", "==", "u").where("is_active", "==", True))
+        assert not guard.observe(unindexed)
+        assert not guard.observe(unindexed.limit(1))
+        assert len([r for r in caplog.records if "not backed" in r.getMessage()]) == 1
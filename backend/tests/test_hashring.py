@@ -0,0 +1,76 @@
+"""
+Tests for consistent hashing and shard ownership
+"""
+
+import app.firebase  # noqa: F401  (initialises the default Firebase app)
+
+from app.utils.hashring import ConsistentHashRing
+from app.services.crawl_scheduler import CrawlScheduler
+from app.services.shard_service import ShardMembership
+
+PRODUCT_IDS = [f"product-{i}" for i in range(5000)]
+
+
+class TestConsistentHashRing:
+    """Test cases for key placement"""
+
+    def test_keys_spread_evenly(self):
+        """Test that virtual nodes give each worker a similar share"""
+        ring = ConsistentHashRing(["w1", "w2", "w3", "w4"], vnodes=128)
+        counts = {}
+        for key in PRODUCT_IDS:
+            node = ring.node_for(key)
+            counts[node] = counts.get(node, 0) + 1
+
+        assert set(counts) == {"w1", "w2", "w3", "w4"}
+        assert max(counts.values()) < 1.5 * len(PRODUCT_IDS) / 4
+        assert abs(sum(ring.ownership().values()) - 1.0) < 0.01
+
+    def test_join_and_leave_move_only_neighbouring_keys(self):
+        """Test that adding a worker only takes keys from others and removing it gives them back"""
+        ring = ConsistentHashRing(["w1", "w2", "w3"])
+        before = {key: ring.node_for(key) for key in PRODUCT_IDS}
+
+        ring.add_node("w4")
+        after = {key: ring.node_for(key) for key in PRODUCT_IDS}
+        moved = [key for key in PRODUCT_IDS if before[key] != after[key]]
+        assert all(after[key] == "w4" for key in moved)
+        assert len(moved) < len(PRODUCT_IDS) / 2
+
+        ring.remove_node("w4")
+        assert {key: ring.node_for(key) for key in PRODUCT_IDS} == before
+
+
+class TestShardMembership:
+    """Test cases for splitting products between monitoring workers"""
+
+    def test_workers_partition_products(self):
+        """Test that every product is queued by exactly one of several workers"""
+        members = ["w1", "w2", "w3"]
+        shards = [ShardMembership(worker_id=w, vnodes=64) for w in members]
+        for shard in shards:
+            assert shard.set_members(members)
+            assert not shard.set_members(members)
+
+        products = [{"id": pid} for pid in PRODUCT_IDS[:600]]
+        queued = []
+        for shard in shards:
+            scheduler = CrawlScheduler(interval=3600, refresh_seconds=0, owns=shard.owns)
+            scheduler.load(products, {})
+            queued.append(set(scheduler.entries))
+
+        assert sum(len(q) for q in queued) == len(products)
+        assert set().union(*queued) == {p["id"] for p in products}
+
+    def test_rebalance_drops_products_that_moved(self):
+        """Test that a worker stops queueing products a new worker took over"""
+        shard = ShardMembership(worker_id="w1", vnodes=64)
+        products = [{"id": pid} for pid in PRODUCT_IDS[:600]]
+        scheduler = CrawlScheduler(interval=3600, refresh_seconds=0, owns=shard.owns)
+        scheduler.load(products, {})
+        assert len(scheduler.entries) == len(products)
+
+        shard.set_members(["w1", "w2"])
+        scheduler.load(products, {})
+        assert 0 < len(scheduler.entries) < len(products)
+        assert all(shard.owns(pid) for pid in scheduler.entries)
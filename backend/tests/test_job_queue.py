@@ -0,0 +1,192 @@
+"""
+Tests for the SQLite and Redis streams job queue backends
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import job_queue
+from app.utils.job_queue import RedisStreamJobQueue, SQLiteJobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / "jobs.sqlite3"), visibility_timeout=60, max_attempts=2)
+
+
+class TestSQLiteJobQueue:
+    """Test cases for leasing, acknowledgement and redelivery"""
+
+    @pytest.mark.asyncio
+    async def test_enqueue_skips_outstanding_duplicates(self, queue):
+        """Test that a product already waiting in the queue is not enqueued twice"""
+        jobs = [{"product_id": "a"}, {"product_id": "b"}]
+        assert await queue.enqueue_many(jobs, key_field="product_id") == 2
+        assert await queue.enqueue_many(jobs, key_field="product_id") == 0
+
+        leased = await queue.lease("w1", 10)
+        await queue.ack("w1", [j.id for j in leased])
+        assert await queue.enqueue_many(jobs, key_field="product_id") == 2
+
+    @pytest.mark.asyncio
+    async def test_leases_are_exclusive_until_they_expire(self, queue):
+        """Test that a leased job is hidden from other workers until its visibility timeout"""
+        await queue.enqueue_many([{"product_id": "a"}], key_field="product_id")
+
+        first = await queue.lease("w1", 10)
+        assert [j.payload["product_id"] for j in first] == ["a"]
+        assert await queue.lease("w2", 10) == []
+
+        queue.visibility_timeout = 0
+        await queue.extend("w1", [first[0].id])
+        redelivered = await queue.lease("w2", 10)
+        assert [j.id for j in redelivered] == [first[0].id]
+        assert redelivered[0].attempts == 2
+
+        # The first worker lost its lease, so its late ack is ignored
+        assert await queue.ack("w1", [first[0].id]) == 0
+        assert await queue.ack("w2", [first[0].id]) == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_jobs_retry_then_dead_letter(self, queue):
+        """Test that nack releases a job for retry and parks it after max attempts"""
+        await queue.enqueue_many([{"product_id": "a"}], key_field="product_id")
+
+        job = (await queue.lease("w1", 1))[0]
+        await queue.nack("w1", [job.id], error="HTTP 503")
+        job = (await queue.lease("w1", 1))[0]
+        await queue.nack("w1", [job.id], error="HTTP 503")
+
+        assert await queue.lease("w1", 1) == []
+        stats = await queue.get_stats()
+        assert stats["dead"] == 1
+        assert stats["ready"] == 0
+
+
+class FakeStreamRedis:
+    """Just enough of a Redis stream and one consumer group for the queue, on a manual clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.keys = {}
+        self.streams = {}
+        self.pending = {}
+        self.last_delivered = 0
+        self.seq = 0
+
+    async def xgroup_create(self, stream, group, id="0", mkstream=False):
+        self.streams.setdefault(stream, {})
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    async def expire(self, key, seconds):
+        return key in self.keys
+
+    async def delete(self, key):
+        return 1 if self.keys.pop(key, None) is not None else 0
+
+    async def xadd(self, stream, fields):
+        self.seq += 1
+        self.streams.setdefault(stream, {})[f"{self.seq}-0"] = dict(fields)
+        return f"{self.seq}-0"
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        (stream,) = streams
+        entries = [(i, f) for i, f in self.streams[stream].items() if int(i.split("-")[0]) > self.last_delivered]
+        entries = entries[:count]
+        for entry_id, _ in entries:
+            self.last_delivered = int(entry_id.split("-")[0])
+            self.pending[entry_id] = {"consumer": consumer, "at": self.now, "times": 1}
+        return [[stream, entries]] if entries else []
+
+    async def xautoclaim(self, stream, group, consumer, min_idle_time=0, count=100):
+        claimed = []
+        for entry_id, state in list(self.pending.items())[:count]:
+            if (self.now - state["at"]) * 1000 >= min_idle_time:
+                state.update(consumer=consumer, at=self.now, times=state["times"] + 1)
+                claimed.append((entry_id, self.streams[stream].get(entry_id)))
+        return ["0-0", claimed, []]
+
+    async def xpending_range(self, stream, group, min, max, count):
+        state = self.pending.get(min)
+        return [{"message_id": min, "times_delivered": state["times"]}] if state else []
+
+    async def xpending(self, stream, group):
+        return {"pending": len(self.pending)}
+
+    async def xack(self, stream, group, *ids):
+        return sum(1 for i in ids if self.pending.pop(i, None) is not None)
+
+    async def xdel(self, stream, *ids):
+        return sum(1 for i in ids if self.streams[stream].pop(i, None) is not None)
+
+    async def xrange(self, stream, min, max):
+        fields = self.streams.get(stream, {}).get(min)
+        return [(min, fields)] if fields is not None else []
+
+    async def xlen(self, stream):
+        return len(self.streams.get(stream, {}))
+
+
+@pytest.fixture
+def redis_queue(monkeypatch):
+    client = FakeStreamRedis()
+    monkeypatch.setattr(job_queue, "aioredis", SimpleNamespace(from_url=lambda url: client))
+    return RedisStreamJobQueue("redis://fake", visibility_timeout=60, max_attempts=2)
+
+
+class TestRedisStreamJobQueue:
+    """Test cases for attempt counting and dead-lettering on the Redis streams backend"""
+
+    @pytest.mark.asyncio
+    async def test_expired_leases_dead_letter_after_max_attempts(self, redis_queue):
+        """Test that a job whose lease keeps expiring is reclaimed, then parked and its key freed"""
+        await redis_queue.enqueue_many([{"product_id": "a"}], key_field="product_id")
+
+        first = await redis_queue.lease("w1", 10)
+        redis_queue.client.now += 61
+        second = await redis_queue.lease("w2", 10)
+        assert [(j.id, j.attempts) for j in second] == [(first[0].id, 2)]
+
+        redis_queue.client.now += 61
+        assert await redis_queue.lease("w3", 10) == []
+        stats = await redis_queue.get_stats()
+        assert (stats["leased"], stats["dead"]) == (0, 1)
+        assert await redis_queue.enqueue_many([{"product_id": "a"}], key_field="product_id") == 1
+
+    @pytest.mark.asyncio
+    async def test_delayed_retries_count_attempts(self, redis_queue):
+        """Test that a nacked job comes back with a growing attempt count and is parked at the limit"""
+        await redis_queue.enqueue_many([{"product_id": "a"}], key_field="product_id")
+
+        job = (await redis_queue.lease("w1", 1))[0]
+        await redis_queue.nack("w1", [job.id], delay=30, error="HTTP 503")
+        assert await redis_queue.lease("w1", 1) == []
+        redis_queue.client.now += 61
+        job = (await redis_queue.lease("w1", 1))[0]
+        assert job.attempts == 2
+        await redis_queue.nack("w1", [job.id], delay=60, error="HTTP 503")
+
+        redis_queue.client.now += 61
+        assert await redis_queue.lease("w1", 1) == []
+        (dead,) = redis_queue.client.streams[redis_queue.dead_stream].values()
+        assert (dead["attempts"], dead["error"]) == ("2", "HTTP 503")
+
+    @pytest.mark.asyncio
+    async def test_immediate_retry_carries_attempts_and_key(self, redis_queue):
+        """Test that a job re-added for an immediate retry keeps its attempts and still blocks duplicates"""
+        await redis_queue.enqueue_many([{"product_id": "a"}], key_field="product_id")
+
+        job = (await redis_queue.lease("w1", 1))[0]
+        await redis_queue.nack("w1", [job.id])
+        assert await redis_queue.enqueue_many([{"product_id": "a"}], key_field="product_id") == 0
+
+        retry = (await redis_queue.lease("w1", 1))[0]
+        assert retry.id != job.id and retry.payload == {"product_id": "a"} and retry.attempts == 2
+        await redis_queue.ack("w1", [retry.id])
+        assert await redis_queue.enqueue_many([{"product_id": "a"}], key_field="product_id") == 1
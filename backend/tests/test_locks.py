@@ -0,0 +1,136 @@
+"""
+Tests for lease locks and scheduler leader election
+"""
+
+import asyncio
+
+import pytest
+
+from app.utils.locks import InMemoryLockBackend, LeaderElector
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestInMemoryLockBackend:
+    """Test cases for lease semantics"""
+
+    @pytest.mark.asyncio
+    async def test_lease_is_exclusive_until_expiry(self):
+        """Test that a held lease blocks others and can be taken once it expires"""
+        clock = FakeClock()
+        backend = InMemoryLockBackend(clock=clock)
+
+        assert await backend.acquire("job", "a", ttl=30)
+        assert not await backend.acquire("job", "b", ttl=30)
+        assert await backend.acquire("job", "a", ttl=30)  # renewal
+
+        clock.now += 31
+        assert await backend.acquire("job", "b", ttl=30)
+        assert not await backend.release("job", "a")
+        assert (await backend.holder("job"))["owner"] == "b"
+
+
+class TestLeaderElector:
+    """Test cases for leadership hand-over"""
+
+    @pytest.mark.asyncio
+    async def test_single_leader_and_failover(self):
+        """Test that only one replica leads and a follower takes over when renewals stop"""
+        clock = FakeClock()
+        backend = InMemoryLockBackend(clock=clock)
+        events = []
+        first = LeaderElector(backend, "scheduler", owner="a", ttl=30, on_elected=lambda: events.append("a+"))
+        second = LeaderElector(backend, "scheduler", owner="b", ttl=30, on_elected=lambda: events.append("b+"))
+
+        assert await first.step()
+        assert not await second.step()
+
+        clock.now += 31  # "a" stopped renewing
+        assert await second.step()
+        assert not await first.step()
+        assert not first.is_leader
+        assert events == ["a+", "b+"]
+
+    @pytest.mark.asyncio
+    async def test_stop_releases_leadership(self):
+        """Test that a stopping leader hands the lease over immediately"""
+        backend = InMemoryLockBackend()
+        revoked = []
+        leader = LeaderElector(backend, "scheduler", owner="a", ttl=30, on_revoked=lambda: revoked.append(True))
+        follower = LeaderElector(backend, "scheduler", owner="b", ttl=30)
+
+        await leader.step()
+        await leader.stop()
+
+        assert revoked == [True]
+        assert await follower.step()
+
+    @pytest.mark.asyncio
+    async def test_leader_steps_down_when_backend_unreachable(self):
+        """Test that renew failures keep leadership only until the lease would expire"""
+
+        class FlakyBackend(InMemoryLockBackend):
+            fail = False
+
+            async def acquire(self, name, owner, ttl):
+                if self.fail:
+                    raise ConnectionError("backend down")
+                return await super().acquire(name, owner, ttl)
+
+        backend = FlakyBackend()
+        elector = LeaderElector(backend, "scheduler", owner="a", ttl=30)
+        await elector.step()
+
+        backend.fail = True
+        assert await elector.step()
+        elector.lease_expires_at = 0
+        assert not await elector.step()
+
+
+class SnapshotStub:
+    def __init__(self):
+        self.ran = asyncio.Event()
+
+    async def run(self, **kwargs):
+        self.ran.set()
+        return {"status": "completed"}
+
+
+class TestSchedulerLeadership:
+    """Test cases for gating TaskScheduler jobs on leadership"""
+
+    @pytest.mark.asyncio
+    async def test_jobs_run_only_on_leader(self):
+        """Test that background jobs stay paused until this replica is elected"""
+        import app.firebase  # noqa: F401
+        from app.tasks.scheduler import TaskScheduler
+
+        def paused_jobs(scheduler):
+            return {job.id for job in scheduler.scheduler.get_jobs() if job.next_run_time is None}
+
+        backend = InMemoryLockBackend()
+        await backend.acquire(TaskScheduler.LEADER_LOCK, "other-replica", ttl=60)
+        scheduler = TaskScheduler(lock_backend=backend)
+        snapshot = SnapshotStub()
+        await scheduler.start()
+        scheduler.tasks["monitoring_snapshot"] = snapshot
+        try:
+            await scheduler.elector.step()
+            assert "cleanup" in paused_jobs(scheduler)
+            assert "price_monitor" in paused_jobs(scheduler)
+
+            await backend.release(TaskScheduler.LEADER_LOCK, "other-replica")
+            await scheduler.elector.step()
+            assert scheduler.is_leader
+            assert paused_jobs(scheduler) == set()
+            # The overview snapshot is rebuilt right away instead of one interval later
+            await asyncio.wait_for(snapshot.ran.wait(), timeout=5)
+        finally:
+            await scheduler.stop()
+        assert not scheduler.is_leader
@@ -0,0 +1,96 @@
+"""
+Tests for the metrics registry and Firestore instrumentation
+"""
+
+import pytest
+
+from app.utils.firestore_metrics import _timed_call, _timed_stream
+from app.utils.metrics import FIRESTORE_OP_ERRORS, FIRESTORE_OP_SECONDS, MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """Test cases for the Prometheus text rendering"""
+
+    def test_counter_and_gauge_render(self):
+        """Test that labelled samples render with escaped label values"""
+        registry = MetricsRegistry()
+        fetches = registry.counter("fetches_total", "Fetches", ["host"])
+        depth = registry.gauge("queue_depth", "Depth")
+        fetches.inc(host="a.example")
+        fetches.inc(2, host='b"x')
+        depth.set(7)
+
+        text = registry.render()
+        assert "# TYPE fetches_total counter" in text
+        assert 'fetches_total{host="a.example"} 1' in text
+        assert 'fetches_total{host="b\\"x"} 2' in text
+        assert "queue_depth 7" in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that histogram buckets, sum and count follow the exposition format"""
+        registry = MetricsRegistry()
+        latency = registry.histogram("latency_seconds", "Latency", ["op"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            latency.observe(value, op="get")
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{op="get",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{op="get",le="1"} 3' in text
+        assert 'latency_seconds_bucket{op="get",le="+Inf"} 4' in text
+        assert 'latency_seconds_count{op="get"} 4' in text
+        assert 'latency_seconds_sum{op="get"} 4.05' in text
+
+    def test_labels_must_match(self):
+        """Test that a metric rejects unknown or missing labels"""
+        registry = MetricsRegistry()
+        counter = registry.counter("things_total", "Things", ["kind"])
+        with pytest.raises(ValueError):
+            counter.inc(other="x")
+        with pytest.raises(ValueError):
+            registry.counter("things_total", "Duplicate")
+
+
+class TestFirestoreInstrumentation:
+    """Test cases for the Firestore call wrappers"""
+
+    def test_calls_are_timed_per_collection(self):
+        """Test that direct calls record latency and errors under their collection"""
+
+        class FakeRef:
+            def __init__(self, fail=False):
+                self.fail = fail
+
+            def update(self, data):
+                if self.fail:
+                    raise RuntimeError("unavailable")
+                return "ok"
+
+        wrapped = _timed_call(FakeRef.update, "update", lambda ref: "test_fake_docs")
+        before = FIRESTORE_OP_SECONDS.count(collection="test_fake_docs", op="update")
+
+        assert wrapped(FakeRef(), {"a": 1}) == "ok"
+        with pytest.raises(RuntimeError):
+            wrapped(FakeRef(fail=True), {"a": 1})
+
+        assert FIRESTORE_OP_SECONDS.count(collection="test_fake_docs", op="update") == before + 2
+        assert FIRESTORE_OP_ERRORS.value(collection="test_fake_docs", op="update") >= 1
+
+    def test_streams_are_timed_until_exhausted(self):
+        """Test that a stream is recorded once, when the caller finishes iterating"""
+
+        def stream(query):
+            yield from range(3)
+
+        wrapped = _timed_stream(stream, "query", lambda q: "test_fake_stream")
+        before = FIRESTORE_OP_SECONDS.count(collection="test_fake_stream", op="query")
+
+        results = wrapped(object())
+        assert FIRESTORE_OP_SECONDS.count(collection="test_fake_stream", op="query") == before
+        assert list(results) == [0, 1, 2]
+        assert FIRESTORE_OP_SECONDS.count(collection="test_fake_stream", op="query") == before + 1
+
+        early = wrapped(object())
+        next(early)
+        early.close()
+        assert FIRESTORE_OP_SECONDS.count(collection="test_fake_stream", op="query") == before + 2
+        assert FIRESTORE_OP_ERRORS.value(collection="test_fake_stream", op="query") == 0
@@ -0,0 +1,577 @@
+"""
+Tests for checkpointed, resumable monitoring runs
+"""
+
+import app.firebase  # noqa: F401  (initialises the default Firebase app)
+
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.monitoring_pipeline import MonitoringPipeline
+from app.services.price_monitor_service import PriceMonitorService
+from app.services.run_budget import HostCostEstimator, RunBudget, admit_within_budget
+from app.services import counter_service, listing_service, price_history, product_service, scraping_service
+from app.services.listing_service import scrape_url
+from app.services.product_service import ProductService
+from app.services.scraping_service import ScrapingService
+from app.tasks.price_monitor import PriceMonitoringTask
+from benchmarks.fake_firestore import FakeDocumentReference, FakeFirestore
+from config import settings
+
+
+class FakeRunStore:
+    def __init__(self, interrupted=None):
+        self.interrupted = interrupted
+        self.checkpoints = []
+        self.finished = []
+
+    async def claim_interrupted(self, owner, stale_after=None):
+        claimed, self.interrupted = self.interrupted, None
+        return claimed
+
+    async def start_run(self, product_ids, owner):
+        return {"run_id": "run_new", "chunks": [(0, product_ids[:2]), (1, product_ids[2:])]}
+
+    async def complete_chunk(self, run_id, index, processed, failed=0):
+        self.checkpoints.append((run_id, index, processed, failed))
+
+    async def finish_run(self, run_id, status="completed", error=None, extra=None):
+        self.finished.append((run_id, status))
+        self.extra = extra
+        return {"products_per_minute": 1.0}
+
+
+class FakeScrapingService:
+    def __init__(self, fail_on=None):
+        self.scraped = []
+        self.fail_on = fail_on
+
+    def start_session(self, product, run_id=None):
+        return {"session_id": f"scrape_{product['id']}", "run_id": run_id}
+
+    async def fetch_page(self, product):
+        if product["id"] == self.fail_on:
+            raise RuntimeError("process died")
+        return {"success": True, "content": b"<html></html>", "response_time_ms": 10}
+
+    async def parse_page(self, product, page):
+        return {"success": True, "price": 10.0, "response_time_ms": page["response_time_ms"]}
+
+    async def store_result(self, product, result, session):
+        self.scraped.append((session["run_id"], product["id"]))
+        return {**result, "product_id": product["id"]}
+
+
+@pytest.fixture
+def task(monkeypatch):
+    task = PriceMonitoringTask()
+    task.run_store = FakeRunStore()
+    task.price_monitor.scraping_service = FakeScrapingService()
+
+    async def no_result(result):
+        return None
+
+    async def no_stats():
+        return {}
+
+    monkeypatch.setattr(task.price_monitor, "_process_result", no_result)
+    monkeypatch.setattr(task.price_monitor, "get_monitoring_stats", no_stats)
+    monkeypatch.setattr(task.price_monitor.crawl_scheduler, "persist_intervals", lambda: 0)
+    return task
+
+
+class TestMonitoringRuns:
+    """Test cases for run checkpointing and resume"""
+
+    @pytest.mark.asyncio
+    async def test_run_checkpoints_each_chunk(self, task):
+        """Test that every chunk is checkpointed and scraping sessions carry the run id"""
+        scheduler = task.price_monitor.crawl_scheduler
+        scheduler.load([{"id": f"p{i}"} for i in range(3)], {})
+
+        async def no_refresh(force=False):
+            return None
+
+        scheduler.refresh = no_refresh
+        result = await task.run()
+
+        assert result["status"] == "completed"
+        assert [c[1] for c in task.run_store.checkpoints] == [0, 1]
+        assert {run_id for run_id, _ in task.price_monitor.scraping_service.scraped} == {"run_new"}
+        assert task.run_store.finished == [("run_new", "completed")]
+
+    @pytest.mark.asyncio
+    async def test_resume_scrapes_only_unfinished_chunks(self, task, monkeypatch):
+        """Test that an interrupted run continues with its remaining chunks only"""
+        task.run_store.interrupted = {
+            "run_id": "run_old",
+            "previous_owner": "crashed-replica",
+            "chunks": [(3, ["p3", "p4"]), (4, ["p5"])],
+        }
+        monkeypatch.setattr(
+            task, "_load_products", lambda ids: {pid: {"id": pid} for pid in ids if pid != "p4"}
+        )
+
+        resumed = await task._resume_interrupted_run()
+
+        assert resumed["run_id"] == "run_old"
+        assert sorted(task.price_monitor.scraping_service.scraped) == [("run_old", "p3"), ("run_old", "p5")]
+        assert [c[1] for c in task.run_store.checkpoints] == [3, 4]
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk_returns_rest_to_scheduler(self, task):
+        """Test that a crash mid-run marks the run failed and requeues the remaining products"""
+        task.price_monitor.scraping_service = FakeScrapingService(fail_on="p2")
+        scheduler = task.price_monitor.crawl_scheduler
+        scheduler.load([{"id": f"p{i}"} for i in range(3)], {})
+        products = scheduler.pop_due(3, now=10 ** 12)
+
+        with pytest.raises(RuntimeError):
+            await task._run_chunks("run_x", [(0, products[:2]), (1, products[2:])])
+
+        assert all(index == 0 for _, index, _, _ in task.run_store.checkpoints)
+        assert task.run_store.finished == [("run_x", "failed")]
+        assert not any(entry.in_flight for entry in scheduler.entries.values())
+
+
+class TestRunBudget:
+    """Test cases for time-budgeted monitoring runs"""
+
+    def test_estimator_tracks_hosts_separately(self):
+        """Test that cost estimates are per host, with a default for unseen hosts"""
+        estimator = HostCostEstimator(alpha=0.5, default_seconds=3.0)
+        estimator.observe_results(
+            [{"product_url": "https://slow.example/a"}, {"product_url": "https://fast.example/b"}],
+            [{"response_time_ms": 8000}, {"response_time_ms": 500}],
+        )
+        estimator.observe("slow.example", 4.0)
+
+        assert estimator.estimate({"product_url": "https://slow.example/x"}) == 6.0
+        assert estimator.estimate({"product_url": "https://fast.example/y"}) == 0.5
+        assert estimator.estimate({"product_url": "https://new.example/z"}) == 3.0
+
+    def test_admits_in_priority_order_until_budget(self):
+        """Test that work past the budget is deferred, but never the whole batch"""
+        estimator = HostCostEstimator(default_seconds=4.0)
+        products = [{"id": f"p{i}", "platform": "amazon"} for i in range(5)]
+
+        admitted, deferred, planned = admit_within_budget(products, estimator, 5.0, concurrency=2)
+        assert [p["id"] for p in admitted] == ["p0", "p1"]
+        assert [p["id"] for p in deferred] == ["p2", "p3", "p4"]
+        assert planned == 4.0
+
+        admitted, deferred, _ = admit_within_budget(products, estimator, 0.5, concurrency=1)
+        assert [p["id"] for p in admitted] == ["p0"]
+
+    @pytest.mark.asyncio
+    async def test_deferred_products_stay_queued(self, task, monkeypatch):
+        """Test that products cut by the budget go back to the scheduler still due"""
+        scheduler = task.price_monitor.crawl_scheduler
+        scheduler.load([{"id": f"p{i}"} for i in range(4)], {})
+        pop_due = scheduler.pop_due
+
+        async def no_refresh(force=False):
+            return None
+
+        monkeypatch.setattr(scheduler, "refresh", no_refresh)
+        monkeypatch.setattr(scheduler, "pop_due", lambda limit: pop_due(limit, now=10 ** 12))
+        task.price_monitor.cost_estimator.default_seconds = 10.0
+        monkeypatch.setattr(settings, "SCRAPE_CONCURRENCY", 5)
+        budget = RunBudget(5, time.monotonic())
+
+        products = await task.price_monitor._get_products_for_monitoring(limit=4, budget=budget)
+
+        assert len(products) == 2
+        assert budget.carried_over == 2
+        assert scheduler.get_stats()["in_flight"] == 2
+        assert len(pop_due(4, now=10 ** 12)) == 2
+
+    @pytest.mark.asyncio
+    async def test_run_stops_at_deadline_and_carries_over(self, task):
+        """Test that chunks that no longer fit the budget are carried over, not scraped"""
+        scheduler = task.price_monitor.crawl_scheduler
+        scheduler.load([{"id": f"p{i}"} for i in range(4)], {})
+        products = scheduler.pop_due(4, now=10 ** 12)
+        budget = RunBudget(1, time.monotonic() - 0.9)
+
+        await task._run_chunks("run_b", [(0, products[:2]), (1, products[2:])], budget)
+
+        assert sorted(pid for _, pid in task.price_monitor.scraping_service.scraped) == ["p0", "p1"]
+        assert task.run_store.extra["carried_over"] == 2
+        assert task.run_store.extra["budget_utilisation"] >= 0.9
+        assert scheduler.get_stats()["in_flight"] == 0
+
+
+class FakePriceMonitor:
+    def __init__(self, scraping_service):
+        self.scraping_service = scraping_service
+        self.processed = []
+
+    async def _process_result(self, result):
+        self.processed.append(result["product_id"])
+
+
+class TestMonitoringPipeline:
+    """Test cases for the streaming monitoring pipeline"""
+
+    @pytest.mark.asyncio
+    async def test_alerts_run_before_the_slowest_scrape_finishes(self):
+        """Test that finished products reach the alert stage while another fetch is still waiting"""
+        fast_done = asyncio.Event()
+
+        class SlowScraping(FakeScrapingService):
+            async def fetch_page(self, product):
+                if product["id"] == "slow":
+                    await fast_done.wait()
+                return await super().fetch_page(product)
+
+        monitor = FakePriceMonitor(SlowScraping())
+
+        async def process(result):
+            monitor.processed.append(result["product_id"])
+            if {"a", "b", "c"} <= set(monitor.processed):
+                fast_done.set()
+
+        monitor._process_result = process
+        chunks = [(0, [{"id": "slow"}, {"id": "a"}]), (1, [{"id": "b"}, {"id": "c"}])]
+        reported = []
+
+        async def on_chunk(index, products, results):
+            reported.append(index)
+
+        await asyncio.wait_for(MonitoringPipeline(monitor, on_chunk=on_chunk).run(chunks), timeout=5)
+
+        assert monitor.processed[-1] == "slow"
+        assert reported == [1, 0]
+
+    @pytest.mark.asyncio
+    async def test_in_flight_products_are_bounded(self, monkeypatch):
+        """Test that bounded queues keep the number of products in flight independent of run size"""
+        monkeypatch.setattr(settings, "SCRAPE_CONCURRENCY", 2)
+        monkeypatch.setattr(settings, "PIPELINE_PERSIST_WORKERS", 1)
+        monkeypatch.setattr(settings, "PIPELINE_ALERT_WORKERS", 1)
+        started, peak = 0, 0
+
+        class CountingScraping(FakeScrapingService):
+            async def fetch_page(self, product):
+                nonlocal started, peak
+                started += 1
+                peak = max(peak, started - len(monitor.processed))
+                await asyncio.sleep(0)
+                return await super().fetch_page(product)
+
+        monitor = FakePriceMonitor(CountingScraping())
+        pipeline = MonitoringPipeline(monitor, queue_size=2)
+        chunks = [(i, [{"id": f"p{i}_{j}"} for j in range(10)]) for i in range(30)]
+
+        await pipeline.run(chunks)
+
+        assert len(monitor.processed) == 300
+        assert peak <= 4 * 2 + sum(pipeline.workers.values())
+        assert pipeline.pending == {}
+
+
+class FakeSessionRef:
+    def __init__(self):
+        self.updates = []
+
+    def update(self, data):
+        self.updates.append(data)
+
+
+class TestFusedResultProcessing:
+    """Test cases for change detection and alert dispatch from the scrape result"""
+
+    @pytest.mark.asyncio
+    async def test_stored_price_carries_snapshot_and_prices(self, monkeypatch):
+        """Test that a stored price leaves the product snapshot and both prices on the result"""
+        service = ScrapingService()
+
+        async def store_price(product, result):
+            product["current_price"] = result["price"]
+            return [], {"current_price": result["price"]}
+
+        monkeypatch.setattr(service, "_create_price_record", store_price)
+        product = {"id": "p1", "current_price": 100.0}
+
+        result = await service.store_result(
+            product, {"success": True, "price": 90.0}, {"session_id": "s1", "ref": FakeSessionRef()}
+        )
+
+        assert result["product_id"] == "p1"
+        assert result["previous_price"] == 100.0 and result["new_price"] == 90.0
+        assert result["product"]["current_price"] == 90.0
+
+    @pytest.mark.asyncio
+    async def test_alerts_dispatched_without_reads(self, monkeypatch):
+        """Test that a price move triggers alerts from the snapshot, with no product or price reads"""
+        monitor = PriceMonitorService()
+        monitor.products_ref = None
+        monitor.prices_ref = None
+        dispatched = []
+
+        async def check_product_alerts(product_id, product=None, linked_ids=()):
+            dispatched.append((product_id, product["current_price"]))
+            return []
+
+        monkeypatch.setattr(monitor.alert_service, "check_product_alerts", check_product_alerts)
+        monkeypatch.setattr(settings, "PRICE_CHANGE_THRESHOLD", 0.05)
+        product = {"id": "p1", "current_price": 90.0}
+
+        await monitor._process_monitoring_results(
+            [
+                {"success": True, "product_id": "p1", "product": product, "previous_price": 100.0, "new_price": 90.0},
+                {"success": True, "product_id": "p2", "product": {}, "previous_price": 100.0, "new_price": 99.0},
+                {"success": False, "product_id": "p3"},
+            ]
+        )
+
+        assert dispatched == [("p1", 90.0)]
+
+
+class FakeDocRef:
+    def __init__(self, writes, path):
+        self.writes = writes
+        self.path = path
+
+    def update(self, data):
+        self.writes.append(("update", self.path, data))
+
+    def set(self, data, merge=False):
+        self.writes.append(("set", self.path, data))
+
+    def collection(self, name):
+        return FakeCollection(f"{self.path}/{name}", self.writes)
+
+
+class FakeCollection:
+    def __init__(self, name, writes):
+        self.name = name
+        self.writes = writes
+
+    def document(self, doc_id=None):
+        return FakeDocRef(self.writes, f"{self.name}/{doc_id or 'auto'}")
+
+    def add(self, data):
+        self.writes.append(("set", f"{self.name}/auto", data))
+
+
+class TestListingFanOut:
+    """Test cases for products that share a canonical listing"""
+
+    @pytest.fixture
+    def listing(self, monkeypatch):
+        fake = FakeFirestore()
+        for module in (scraping_service, listing_service, price_history):
+            monkeypatch.setattr(module, "db", fake)
+        service = ScrapingService()
+        seen = datetime(2026, 1, 1)
+        listing_id = "amazon.com:B0C1234567"
+        # c was deleted after the listing was read
+        fake.insert_many("listings", [(listing_id, {"listing_id": listing_id, "product_ids": ["a", "b", "c"]})])
+        fake.insert_many(
+            "products",
+            [
+                ("a", {"id": "a", "listing_id": listing_id, "current_price": 20.0, "price_change_rate": 0.0}),
+                (
+                    "b",
+                    {
+                        "id": "b",
+                        "listing_id": listing_id,
+                        "current_price": 20.0,
+                        "price_change_rate": 0.5,
+                        "price_run_id": "run-b",
+                        "price_run_pending": 2,
+                        "last_scraped": seen,
+                    },
+                ),
+            ],
+        )
+        fake.insert_many(
+            "products/b/prices",
+            [("run-b_b", {"product_id": "b", "price": 20.0, "created_at": seen, "last_seen": seen, "observations": 1})],
+        )
+        product = {
+            "id": "a",
+            "listing_id": listing_id,
+            "current_price": 20.0,
+            "price_change_rate": 0.0,
+            "platform": "amazon",
+        }
+        return fake, service, product
+
+    @pytest.mark.asyncio
+    async def test_price_is_stored_once_on_the_listing(self, listing):
+        """Test that one scrape stores one run on the listing and copies its price to the other products"""
+        fake, service, product = listing
+        listing_path = f"listings/{product['listing_id']}"
+
+        result = await service.store_result(
+            product, {"success": True, "price": 18.0}, {"session_id": "s1", "ref": FakeSessionRef()}
+        )
+
+        assert result["success"] and result["linked_ids"] == ["b"]
+        (run,) = [d.to_dict() for d in fake.collection(f"{listing_path}/prices").stream()]
+        assert run["listing_id"] == product["listing_id"] and run["price"] == 18.0 and "product_id" not in run
+        stored = fake.document(listing_path).get().to_dict()
+        assert stored["current_price"] == 18.0 and stored["price_run_id"] == product["price_run_id"]
+        linked = fake.document("products/b").get().to_dict()
+        assert linked["current_price"] == 18.0 and linked["price_run_id"] == product["price_run_id"]
+        assert linked["recent_prices"] == stored["recent_prices"]
+        # b's own run was closed with its unwritten observations and gets no new one
+        (closed,) = [d.to_dict() for d in fake.collection("products/b/prices").stream()]
+        assert closed["observations"] == 3
+        assert not list(fake.collection("listings/l1/prices").stream())
+        assert not fake.document("products/c").get().exists
+
+        # Later scrapes read the listing only; nothing per linked product but its update
+        fake.ops.clear()
+        result = await service.store_result(
+            product, {"success": True, "price": 17.0}, {"session_id": "s2", "ref": FakeSessionRef()}
+        )
+        assert result["linked_ids"] == ["b"]
+        assert fake.ops.get("get") == 1 and "query" not in fake.ops
+        linked = fake.document("products/b").get().to_dict()
+        history = service.price_history.window("b", datetime(2026, 1, 1), product=linked)
+        assert [(r["product_id"], r["price"]) for r in history] == [("b", 17.0), ("b", 18.0), ("b", 20.0)]
+
+    @pytest.mark.asyncio
+    async def test_racing_scrapes_of_a_listing_store_once(self, listing, monkeypatch):
+        """Test that a scrape of a linked product racing one in progress takes its stored result"""
+        fake, service, product = listing
+        calls = []
+
+        async def fetch(product):
+            calls.append(("fetch", product["id"]))
+            await asyncio.sleep(0.01)
+            return {"success": True, "content": b"<html></html>", "response_time_ms": 10}
+
+        async def parse(content, base_url):
+            calls.append(("parse", None))
+            return {"price": 18.0, "availability": "In Stock"}
+
+        monkeypatch.setattr(ScrapingService, "_fetch_page", lambda self, product: fetch(product))
+        monkeypatch.setattr(scraping_service.parse_pool, "parse", parse)
+        url = "https://www.amazon.com/dp/B0C1234567"
+        scheduled = {**product, "product_url": url}
+        linked = fake.document("products/b").get().to_dict()
+        linked.update({"platform": "amazon", "product_url": f"{url}?tag=aff-20"})
+
+        first, second = await asyncio.gather(
+            service.scrape_product(scheduled), ScrapingService().scrape_product(linked)
+        )
+
+        assert calls == [("fetch", "a"), ("parse", None)]
+        assert len(list(fake.collection(f"listings/{product['listing_id']}/prices").stream())) == 1
+        assert first["linked_ids"] == ["b"] and not first.get("shared")
+        assert second["success"] and second["shared"] and second["product_id"] == "b"
+        assert second["previous_price"] == 20.0 and second["new_price"] == 18.0
+        assert linked["current_price"] == 18.0 and linked["price_run_id"] == scheduled["price_run_id"]
+        sessions = [d.to_dict()["status"] for d in fake.collection("scraping_sessions").stream()]
+        assert sessions == ["completed", "completed"]
+        assert not scraping_service._scrapes_in_flight
+
+    @pytest.mark.asyncio
+    async def test_failed_fan_out_keeps_the_scraped_price(self, listing, monkeypatch):
+        """Test that a linked-product write failure does not fail the scrape that stored the price"""
+        fake, service, product = listing
+
+        batches = []
+
+        def batch():
+            batches.append(None)
+            if len(batches) > 1:  # the scraped product's own write goes through
+                raise RuntimeError("deadline exceeded")
+            return FakeFirestore.batch(fake)
+
+        def update(self, data):
+            raise RuntimeError("deadline exceeded")
+
+        monkeypatch.setattr(fake, "batch", batch)
+        monkeypatch.setattr(FakeDocumentReference, "update", update)
+        result = await service.store_result(
+            product, {"success": True, "price": 18.0}, {"session_id": "s1", "ref": FakeSessionRef()}
+        )
+
+        assert result["success"] and result["linked_ids"] == []
+        assert fake.document("products/a").get().to_dict()["current_price"] == 18.0
+        assert fake.document(f"listings/{product['listing_id']}").get().to_dict()["current_price"] == 18.0
+        assert fake.document("products/b").get().to_dict()["current_price"] == 20.0
+
+    @pytest.mark.asyncio
+    async def test_product_keeps_the_submitted_url(self, monkeypatch):
+        """Test that a product stores the user's URL and is scraped from the listing's canonical one"""
+        fake = FakeFirestore()
+        for module in (product_service, listing_service, counter_service, price_history):
+            monkeypatch.setattr(module, "db", fake)
+        url = "https://www.amazon.com/Some-Kettle/dp/B0C1234567/ref=sr_1_1?tag=aff-20"
+
+        product = await ProductService().create_product(SimpleNamespace(name="Kettle", product_url=url, platform="amazon"))
+
+        stored = fake.document(f"products/{product['id']}").get().to_dict()
+        assert stored["product_url"] == url
+        assert stored["canonical_url"] == "https://www.amazon.com/dp/B0C1234567"
+        assert scrape_url(stored) == stored["canonical_url"]
+        assert scrape_url({"product_url": url}) == url
+
+
+class TestChangeOnlyPrices:
+    """Test cases for run-length price storage"""
+
+    @pytest.fixture
+    def service(self, monkeypatch):
+        fake = FakeFirestore()
+        monkeypatch.setattr(scraping_service, "db", fake)
+        monkeypatch.setattr(price_history, "db", fake)
+        monkeypatch.setattr(listing_service, "db", fake)
+        service = ScrapingService()
+        fake.insert_many("listings", [("l1", {"listing_id": "l1", "product_ids": ["a"]})])
+        fake.insert_many("products", [("a", {"id": "a", "listing_id": "l1"})])
+        return service
+
+    @pytest.mark.asyncio
+    async def test_unchanged_price_extends_the_run(self, service):
+        """Test that repeated prices extend one run and a change starts a new one"""
+        fake = scraping_service.db
+        product = {"id": "a", "listing_id": "l1", "price_change_rate": 0.0}
+
+        for price in (20.0, 20.0, 18.0):
+            await service._create_price_record(product, {"price": price, "availability": "In Stock"})
+
+        runs = sorted(
+            (d.to_dict() for d in fake.collection("listings/l1/prices").stream()), key=lambda r: r["first_seen"]
+        )
+        assert [(r["price"], r["observations"]) for r in runs] == [(20.0, 2), (18.0, 1)]
+        assert product["current_price"] == 18.0 and product["price_run_pending"] == 0
+        recent = product["recent_prices"]
+        assert [(r["price"], r["observations"]) for r in recent] == [(20.0, 2), (18.0, 1)]
+
+    @pytest.mark.asyncio
+    async def test_unchanged_price_skips_the_run_document(self, service, monkeypatch):
+        """Test that a continuing run is written to its price document only when its flush is due"""
+        fake = scraping_service.db
+        product = {"id": "a", "listing_id": "l1", "price_change_rate": 0.0}
+        await service._create_price_record(product, {"price": 20.0})
+        fake.ops.clear()
+
+        for _ in range(3):
+            await service._create_price_record(product, {"price": 20.0})
+
+        # Each scrape reads the listing and writes the listing and the product, not the run
+        assert fake.ops == {"get": 3, "set": 3, "update": 3, "commit": 3}
+        (run,) = [d.to_dict() for d in fake.collection("listings/l1/prices").stream()]
+        assert run["observations"] == 1 and product["price_run_pending"] == 3
+
+        # History reads take the run's progress from the product document
+        history = service.price_history.window("a", datetime(2026, 1, 1), product=product)
+        assert history[0]["observations"] == 4 and history[0]["last_seen"] == product["last_scraped"]
+
+        monkeypatch.setattr(settings, "PRICE_RUN_FLUSH_SECONDS", 0)
+        await service._create_price_record(product, {"price": 20.0})
+        (run,) = [d.to_dict() for d in fake.collection("listings/l1/prices").stream()]
+        assert run["observations"] == 5 and run["last_seen"] == product["last_scraped"]
+        assert product["price_run_pending"] == 0
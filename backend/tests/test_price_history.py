@@ -0,0 +1,165 @@
+"""
+Tests for per-product price history storage and its migration
+"""
+
+import pytest
+from datetime import datetime, timedelta
+
+from app.services import price_history
+from app.services.price_history import PriceHistoryService
+from benchmarks.fake_firestore import FakeFirestore
+from config import settings
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeFirestore()
+    monkeypatch.setattr(price_history, "db", fake)
+    monkeypatch.setattr(settings, "PRICE_HISTORY_LEGACY_READS", True)
+    return fake
+
+
+def price(product_id, value, hour):
+    return {"product_id": product_id, "price": value, "created_at": datetime(2026, 1, 1, hour)}
+
+
+class TestPriceHistoryMigration:
+    """Test cases for moving the flat prices collection into product subcollections"""
+
+    @pytest.mark.asyncio
+    async def test_legacy_prices_move_into_subcollections(self, fake_db, monkeypatch):
+        """Test that every price moves once, in batches, and products get their recent runs"""
+        fake_db.insert_many("products", [("p1", {"id": "p1"}), ("p2", {"id": "p2", "recent_prices": [{"run_id": "x"}]})])
+        fake_db.insert_many(
+            "prices",
+            [("old1", price("p1", 10.0, 1)), ("old2", price("p1", 9.0, 2)), ("old3", price("p2", 5.0, 1)), ("orphan", {"price": 1.0})],
+        )
+        service = PriceHistoryService()
+        assert [r["price"] for r in service.runs("p1")] == [9.0, 10.0]
+
+        result = await service.migrate_legacy(batch_docs=1)
+
+        assert result == {"moved": 3, "skipped": 1, "products": 2, "recent_seeded": 1}
+        assert fake_db.count("prices") == 1
+        assert fake_db.count("products/p1/prices") == 2
+        recent = fake_db.document("products/p1").get().to_dict()["recent_prices"]
+        assert [(r["run_id"], r["price"]) for r in recent] == [("old1", 10.0), ("old2", 9.0)]
+        assert fake_db.document("products/p2").get().to_dict()["recent_prices"] == [{"run_id": "x"}]
+
+        monkeypatch.setattr(settings, "PRICE_HISTORY_LEGACY_READS", False)
+        assert [r["price"] for r in service.runs("p1")] == [9.0, 10.0]
+        assert service.get("old2_p1")["price"] == 9.0
+        assert (await service.migrate_legacy())["moved"] == 0
+
+    def test_window_reads_only_overlapping_runs(self, fake_db):
+        """Test that a date window reads the runs started in it plus the one in progress when it opened"""
+        fake_db.insert_many(
+            "products/p1/prices",
+            [(f"r{hour}_p1", price("p1", float(hour), hour)) for hour in (1, 3, 5, 7)],
+        )
+        fake_db.ops.clear()
+
+        runs = PriceHistoryService().window("p1", datetime(2026, 1, 1, 4))
+
+        assert [r["price"] for r in runs] == [7.0, 5.0, 3.0]
+        assert fake_db.ops == {"query": 2}
+
+
+class TestLastSeenFallback:
+    """Test cases for cross-product reads of price points written before runs had last_seen"""
+
+    @pytest.mark.asyncio
+    async def test_legacy_points_age_out_by_created_at(self, fake_db, monkeypatch):
+        """Test that retention deletes old points without last_seen until the backfill is marked done"""
+        from app.services import price_service
+        from app.services.price_service import PriceService
+
+        monkeypatch.setattr(price_service, "db", fake_db)
+        monkeypatch.setattr(settings, "PRICE_TIMESTAMPS_BACKFILLED", False)
+        old, new = datetime.utcnow() - timedelta(days=100), datetime.utcnow() - timedelta(days=1)
+        fake_db.insert_many(
+            "prices",
+            [
+                ("legacy_old", {"product_id": "p1", "price": 1.0, "created_at": old}),
+                ("legacy_new", {"product_id": "p1", "price": 2.0, "created_at": new}),
+            ],
+        )
+        fake_db.insert_many(
+            "products/p1/prices",
+            [
+                ("r1_p1", {"product_id": "p1", "price": 3.0, "created_at": old, "last_seen": old}),
+                ("r2_p1", {"product_id": "p1", "price": 4.0, "created_at": old, "last_seen": new}),
+            ],
+        )
+        history = PriceHistoryService()
+        assert sorted(d.id for d in history.by_last_seen(">=", new - timedelta(hours=1))) == ["legacy_new", "r2_p1"]
+
+        monkeypatch.setattr(settings, "PRICE_TIMESTAMPS_BACKFILLED", True)
+        assert [d.id for d in history.by_last_seen("<", old + timedelta(hours=1), fields=[])] == ["r1_p1"]
+
+        monkeypatch.setattr(settings, "PRICE_TIMESTAMPS_BACKFILLED", False)
+        assert await PriceService().cleanup_old_prices(days_to_keep=90) == 2
+        assert fake_db.count("prices") == 1 and fake_db.count("products/p1/prices") == 1
+
+
+class TestListPrices:
+    """Test cases for listing expanded price points"""
+
+    @pytest.mark.asyncio
+    async def test_date_window_keeps_the_unbounded_order(self, fake_db, monkeypatch):
+        """Test that a start-bounded listing returns the unbounded listing's points in the same order"""
+        from app.services import price_service
+        from app.services.price_service import PriceService
+
+        monkeypatch.setattr(price_service, "db", fake_db)
+        runs = {
+            "a": [(10.0, 1, 5, 3), (9.0, 6, 8, 2)],
+            "b": [(20.0, 2, 8, 4), (19.0, 9, 9, 1)],  # b's first run ends where a's second does
+        }
+        for product_id, product_runs in runs.items():
+            fake_db.insert_many(
+                f"products/{product_id}/prices",
+                [
+                    (
+                        f"r{first}_{product_id}",
+                        {
+                            "product_id": product_id,
+                            "price": value,
+                            "created_at": datetime(2026, 1, 1, first),
+                            "first_seen": datetime(2026, 1, 1, first),
+                            "last_seen": datetime(2026, 1, 1, last),
+                            "observations": observations,
+                        },
+                    )
+                    for value, first, last, observations in product_runs
+                ],
+            )
+        start = datetime(2026, 1, 1, 6)
+        service = PriceService()
+
+        everything = await service.list_prices(limit=1000)
+        windowed = await service.list_prices(limit=1000, filters={"start_date": start})
+
+        expected = [
+            (p["product_id"], p["created_at"]) for p in everything if p["created_at"].replace(tzinfo=None) >= start
+        ]
+        assert [(p["product_id"], p["created_at"]) for p in windowed] == expected
+        assert len(expected) == 5
+
+    @pytest.mark.asyncio
+    async def test_product_prices_include_its_listing(self, fake_db, monkeypatch):
+        """Test that a product's prices are its own runs plus its listing's, all under its id"""
+        from app.services import price_service, product_cache
+        from app.services.price_service import PriceService
+
+        monkeypatch.setattr(price_service, "db", fake_db)
+        monkeypatch.setattr(product_cache, "db", fake_db)
+        monkeypatch.setattr(settings, "PRICE_HISTORY_LEGACY_READS", False)
+        product_cache.product_cache.clear()
+        fake_db.insert_many("products", [("p1", {"id": "p1", "listing_id": "l1"})])
+        fake_db.insert_many("products/p1/prices", [("r1_p1", price("p1", 10.0, 1))])
+        fake_db.insert_many("listings/l1/prices", [("r2_l1", {**price(None, 9.0, 2), "listing_id": "l1"})])
+
+        prices = await PriceService().list_prices(filters={"product_id": "p1"})
+
+        assert [(p["product_id"], p["price"]) for p in prices] == [("p1", 9.0), ("p1", 10.0)]
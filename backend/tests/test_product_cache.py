@@ -0,0 +1,121 @@
+"""
+Tests for the listener-backed product document cache
+"""
+
+import asyncio
+import threading
+
+import pytest
+from datetime import datetime
+
+from app.services import product_cache as product_cache_module
+from app.services.product_cache import ProductCache
+from benchmarks.fake_firestore import FakeFirestore
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeFirestore()
+    monkeypatch.setattr(product_cache_module, "db", fake)
+    fake.insert_many("products", [(f"p{i}", {"id": f"p{i}", "current_price": 10.0 * i}) for i in range(1, 4)])
+    return fake
+
+
+@pytest.fixture
+def cache(fake_db):
+    cache = ProductCache(max_entries=2)
+    cache.start()
+    yield cache
+    cache.stop()
+
+
+class TestProductCache:
+    """Test cases for the product cache and its snapshot listener"""
+
+    def test_reads_through_without_listener(self, fake_db):
+        """Test that nothing is cached until the listener has delivered its first snapshot"""
+        cache = ProductCache(max_entries=2)
+
+        assert cache.get("p1")["current_price"] == 10.0
+        assert cache.get("p1")["current_price"] == 10.0
+        assert fake_db.ops == {"get": 2}
+        assert cache.get_stats()["bypassed"] == 2 and cache.get_stats()["entries"] == 0
+
+    def test_repeated_reads_are_memory_lookups(self, fake_db, cache):
+        """Test that a product is read once and served from memory afterwards, as a private copy"""
+        first = cache.get("p1")
+        first["current_price"] = 0.0
+
+        assert cache.get("p1")["current_price"] == 10.0
+        assert cache.get("missing") is None
+        assert cache.get("missing") is None
+        assert fake_db.ops == {"get": 2}
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 2, 0.5)
+
+    @pytest.mark.asyncio
+    async def test_async_reads_leave_the_event_loop(self, fake_db, cache, monkeypatch):
+        """Test that aget reads a missing entry in a worker thread and serves hits inline"""
+        loop_thread = threading.get_ident()
+        read_threads = []
+        original = type(cache).get
+
+        def recording_get(self, product_id):
+            read_threads.append(threading.get_ident())
+            return original(self, product_id)
+
+        monkeypatch.setattr(type(cache), "get", recording_get)
+
+        first, second = await asyncio.gather(cache.aget("p1"), cache.aget("p2"))
+        assert (first["current_price"], second["current_price"]) == (10.0, 20.0)
+        assert len(read_threads) == 2 and loop_thread not in read_threads
+
+        assert (await cache.aget("p1"))["current_price"] == 10.0
+        assert len(read_threads) == 2 and fake_db.ops == {"get": 2}
+
+    def test_listener_keeps_cached_products_current(self, fake_db, cache):
+        """Test that writes by anyone reach cached entries, including deletes and creates"""
+        cache.get("p1")
+        cache.get("p4")
+
+        fake_db.document("products/p1").update({"current_price": 12.5})
+        fake_db.document("products/p4").set({"id": "p4", "current_price": 4.0})
+        fake_db.ops.clear()
+
+        assert cache.get("p1")["current_price"] == 12.5
+        assert cache.get("p4")["current_price"] == 4.0
+        fake_db.document("products/p1").delete()
+        assert cache.get("p1") is None
+        assert fake_db.ops == {"delete": 1}
+
+    def test_least_recently_used_product_is_evicted(self, fake_db, cache):
+        """Test that the cache holds at most max_entries products"""
+        cache.get("p1")
+        cache.get("p2")
+        cache.get("p1")
+        cache.get("p3")  # evicts p2
+        fake_db.ops.clear()
+
+        cache.get("p1")
+        cache.get("p2")
+        assert fake_db.ops == {"get": 1}
+        assert cache.get_stats()["evictions"] == 2
+
+    def test_older_version_never_replaces_newer(self, cache):
+        """Test that a slow read landing after a listener update is ignored"""
+        cache._store("p1", {"current_price": 2.0}, datetime(2026, 1, 1, 12))
+        cache._store("p1", {"current_price": 1.0}, datetime(2026, 1, 1, 11))
+
+        assert cache.get("p1")["current_price"] == 2.0
+
+    def test_stopped_listener_resubscribes_and_drops_entries(self, fake_db, cache):
+        """Test that entries are not served once the listener dies, and it is restarted"""
+        cache.get("p1")
+        old_watch = cache._watch
+        old_watch.is_active = False
+        fake_db.ops.clear()
+
+        assert cache.get("p1")["current_price"] == 10.0
+        assert fake_db.ops == {"get": 1}
+        assert cache._watch is not old_watch and cache.is_live()
+        assert cache.get_stats()["entries"] == 0
@@ -0,0 +1,118 @@
+"""
+Tests for on-demand task profiling
+"""
+
+import os
+
+import pytest
+
+from app.utils.profiling import TaskProfiler
+
+
+class FakeTask:
+    def __init__(self):
+        self.runs = 0
+
+    async def run(self, **kwargs):
+        self.runs += 1
+        sum(i * i for i in range(10000))
+        return {"status": "completed"}
+
+
+class TestTaskProfiler:
+    """Test cases for writing and listing task profiles"""
+
+    @pytest.mark.asyncio
+    async def test_cprofile_writes_reports(self, tmp_path):
+        """Test that a profiled run writes a pstats dump and a text summary"""
+        profiler = TaskProfiler(str(tmp_path), engine="cprofile", keep=5)
+        task = FakeTask()
+
+        result = await profiler.profile("price_monitor", task.run)
+
+        assert result == {"status": "completed"}
+        profiles = profiler.list_profiles()
+        assert {p["format"] for p in profiles} == {"prof", "txt"}
+        assert {p["task"] for p in profiles} == {"price_monitor"}
+        summary = next(p for p in profiles if p["format"] == "txt")
+        assert "function calls" in (tmp_path / summary["file"]).read_text()
+
+    @pytest.mark.asyncio
+    async def test_keeps_newest_profiles(self, tmp_path):
+        """Test that old profiles are pruned beyond the retention count"""
+        profiler = TaskProfiler(str(tmp_path), engine="cprofile", keep=2)
+        for i in range(3):
+            stale = tmp_path / f"cleanup_2020010{i}T000000_1ms.prof"
+            stale.write_text("x")
+            os.utime(stale, (i, i))
+
+        await profiler.profile("cleanup", FakeTask().run)
+
+        stems = {os.path.splitext(name)[0] for name in os.listdir(tmp_path)}
+        assert len(stems) == 2
+        assert "cleanup_20200102T000000_1ms" in stems
+
+    def test_report_path_stays_in_directory(self, tmp_path):
+        """Test that only report files inside the profile directory are served"""
+        profiler = TaskProfiler(str(tmp_path), engine="cprofile")
+        (tmp_path / "alert_checker_20260101T000000_5ms.txt").write_text("ok")
+
+        assert profiler.report_path("alert_checker_20260101T000000_5ms.txt")
+        assert profiler.report_path("../secrets.txt") is None
+        assert profiler.report_path("notes.md") is None
+
+
+class TestSchedulerProfiling:
+    """Test cases for arming the profiler on scheduler tasks"""
+
+    @pytest.mark.asyncio
+    async def test_profile_next_run_only_once(self, tmp_path):
+        """Test that an armed task is profiled on its next run and then runs normally"""
+        import app.firebase  # noqa: F401
+        from app.tasks.scheduler import TaskScheduler
+        from app.utils.locks import InMemoryLockBackend
+
+        scheduler = TaskScheduler(
+            lock_backend=InMemoryLockBackend(),
+            profiler=TaskProfiler(str(tmp_path), engine="cprofile"),
+        )
+        task = FakeTask()
+        scheduler.tasks["cleanup"] = task
+
+        with pytest.raises(ValueError):
+            scheduler.profile_next_run("missing")
+        scheduler.profile_next_run("cleanup")
+        await scheduler._execute("cleanup")
+        await scheduler._execute("cleanup")
+
+        assert task.runs == 2
+        assert len({p["file"].rsplit(".", 1)[0] for p in scheduler.profiler.list_profiles()}) == 1
+        assert scheduler.profile_next == set()
+
+    @pytest.mark.asyncio
+    async def test_leader_only_tasks_are_armed_on_the_leader(self, tmp_path):
+        """Test that a follower refuses to arm a leader-only task and names the leader"""
+        import app.firebase  # noqa: F401
+        from app.tasks.scheduler import NotLeaderError, TaskScheduler
+        from app.utils.locks import InMemoryLockBackend
+
+        backend = InMemoryLockBackend()
+        await backend.acquire(TaskScheduler.LEADER_LOCK, "other-replica", ttl=60)
+        scheduler = TaskScheduler(lock_backend=backend, profiler=TaskProfiler(str(tmp_path), engine="cprofile"))
+        await scheduler.start()
+        scheduler.tasks["monitoring_snapshot"] = FakeTask()  # runs on election
+        try:
+            await scheduler.elector.step()
+            with pytest.raises(NotLeaderError):
+                scheduler.profile_next_run("cleanup")
+            assert await scheduler.leader_instance() == "other-replica"
+
+            await backend.release(TaskScheduler.LEADER_LOCK, "other-replica")
+            await scheduler.elector.step()
+            assert scheduler.profile_next_run("cleanup") == scheduler.instance
+            assert await scheduler.leader_instance() == scheduler.instance
+
+            await scheduler.elector._set_leader(False)
+            assert "cleanup" not in scheduler.profile_next
+        finally:
+            await scheduler.stop()
@@ -0,0 +1,59 @@
+"""
+Tests for the timestamp model and its backfill
+"""
+
+import pytest
+from datetime import datetime, timezone
+
+from app.services import price_history, timestamp_backfill
+from app.services.timestamp_backfill import TimestampBackfill, backfill_updates
+from app.utils.timestamps import as_utc, to_epoch
+from benchmarks.fake_firestore import FakeFirestore
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeFirestore()
+    monkeypatch.setattr(timestamp_backfill, "db", fake)
+    monkeypatch.setattr(price_history, "db", fake)
+    return fake
+
+
+class TestTimestamps:
+    """Test cases for reading stored timestamps"""
+
+    def test_strings_naive_and_aware_values_agree(self):
+        """Test that ISO strings, naive and aware datetimes normalise to the same UTC instant"""
+        aware = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+        assert as_utc("2026-01-01T12:00:00") == as_utc(datetime(2026, 1, 1, 12)) == aware
+        assert as_utc("2026-01-01T12:00:00Z") == aware
+        assert as_utc("yesterday") is None and as_utc(None) is None
+        assert to_epoch("2026-01-01T12:00:00") == aware.timestamp()
+
+
+class TestTimestampBackfill:
+    """Test cases for moving stored timestamps onto native Firestore timestamps"""
+
+    def test_updates_for_legacy_documents(self):
+        """Test that strings become timestamps and missing window fields are filled"""
+        updates = backfill_updates("products", {"created_at": "2026-01-01T00:00:00", "last_scraped": datetime(2026, 1, 2)})
+        assert updates == {"created_at": datetime(2026, 1, 1, tzinfo=timezone.utc)}
+        assert backfill_updates("scraping_errors", {"timestamp": datetime(2026, 1, 2)})["created_at"].day == 2
+        point = backfill_updates("prices", {"created_at": datetime(2026, 1, 3)})
+        assert point["first_seen"] == point["last_seen"] and point["observations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_backfilled_documents_match_range_filters(self, fake_db):
+        """Test that documents stored with string timestamps are found by server-side windows"""
+        fake_db.insert_many("products", [("p1", {"created_at": "2026-01-05T00:00:00"}), ("p2", {"created_at": "2025-12-01T00:00:00"})])
+        fake_db.insert_many("prices", [("old1", {"product_id": "p1", "price": 5.0, "created_at": datetime(2026, 1, 5)})])
+        start = datetime(2026, 1, 1)
+        assert not list(fake_db.collection("products").where("created_at", ">=", start).stream())
+
+        report = await TimestampBackfill().run(batch_docs=1)
+
+        assert report["products"] == {"scanned": 2, "updated": 2}
+        assert report["prices"] == {"scanned": 1, "updated": 1}
+        assert [d.id for d in fake_db.collection("products").where("created_at", ">=", start).stream()] == ["p1"]
+        assert len(list(fake_db.collection_group("prices").where("last_seen", ">=", start).stream())) == 1
+        assert (await TimestampBackfill().run())["products"]["updated"] == 0
@@ -0,0 +1,119 @@
+"""
+Tests for request tracing spans
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils import tracing
+from app.utils.tracing import JsonLinesSpanExporter, Tracer, TracingMiddleware, current_span, traced
+
+
+class ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+    def shutdown(self):
+        return None
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = ListExporter()
+    monkeypatch.setattr(tracing, "tracer", Tracer(exporter, sample_rate=1.0))
+    return exporter
+
+
+class Service:
+    @traced()
+    async def outer(self):
+        await self.inner()
+        return await asyncio.to_thread(self.blocking)
+
+    @traced()
+    async def inner(self):
+        await asyncio.sleep(0)
+
+    def blocking(self):
+        # Stands in for a Firestore call made from a worker thread
+        tracing.tracer.record_span("firestore.query", 0.0, 0.001, collection="prices")
+        return "done"
+
+
+class TestTracing:
+    """Test cases for span nesting, sampling and export"""
+
+    @pytest.mark.asyncio
+    async def test_spans_nest_across_awaits_and_threads(self, exporter):
+        """Test that service and thread-side spans hang off the root span"""
+        with tracing.tracer.start_trace("GET /x") as root:
+            assert await Service().outer() == "done"
+
+        assert current_span() is None
+        (trace,) = exporter.traces
+        spans = {span.name: span for span in trace.spans}
+        assert set(spans) == {"GET /x", "Service.outer", "Service.inner", "firestore.query"}
+        assert spans["Service.outer"].parent_id == root.span_id
+        assert spans["Service.inner"].parent_id == spans["Service.outer"].span_id
+        assert spans["firestore.query"].parent_id == spans["Service.outer"].span_id
+
+    @pytest.mark.asyncio
+    async def test_unsampled_requests_record_nothing(self, monkeypatch):
+        """Test that tracing is inert when the request is not sampled"""
+        exporter = ListExporter()
+        monkeypatch.setattr(tracing, "tracer", Tracer(exporter, sample_rate=0.0))
+
+        with tracing.tracer.start_trace("GET /x") as root:
+            assert root is None
+            assert await Service().outer() == "done"
+        assert exporter.traces == []
+
+    def test_errors_are_recorded(self, exporter):
+        """Test that an exception marks the span and still exports the trace"""
+        with pytest.raises(ValueError):
+            with tracing.tracer.start_trace("job"):
+                with tracing.tracer.start_span("step"):
+                    raise ValueError("boom")
+
+        spans = {span.name: span for span in exporter.traces[0].spans}
+        assert "boom" in spans["step"].error
+        assert "boom" in spans["job"].error
+
+    def test_middleware_names_span_by_route(self, exporter):
+        """Test that the request span uses the route template and returns the trace id"""
+        app = FastAPI()
+        app.add_middleware(TracingMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: str):
+            return {"id": item_id}
+
+        response = TestClient(app).get("/items/42")
+
+        (trace,) = exporter.traces
+        root = next(span for span in trace.spans if span.parent_id is None)
+        assert root.name == "GET /items/{item_id}"
+        assert root.attributes["status_code"] == 200
+        assert response.headers["x-trace-id"] == trace.trace_id
+
+    def test_jsonl_exporter_writes_spans(self, tmp_path, monkeypatch):
+        """Test that the span log gets one JSON line per span"""
+        path = tmp_path / "spans.jsonl"
+        exporter = JsonLinesSpanExporter(str(path))
+        monkeypatch.setattr(tracing, "tracer", Tracer(exporter, sample_rate=1.0))
+
+        with tracing.tracer.start_trace("job"):
+            with tracing.tracer.start_span("step", products=3):
+                pass
+        exporter.shutdown()
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert {line["name"] for line in lines} == {"job", "step"}
+        assert {line["trace_id"] for line in lines} == {lines[0]["trace_id"]}
@@ -2,12 +2,18 @@
 Tests for utility functions
 """
 
+import asyncio
 import pytest
 from datetime import datetime
+from types import SimpleNamespace
 
-from app.utils.validators import validate_url, validate_price, validate_currency
+from app.utils.validators import validate_url, validate_price, validate_currency, canonical_listing
 from app.utils.formatters import format_price, format_percentage, format_currency
 from app.utils.helpers import calculate_price_change, calculate_savings
+from app.utils.aggregations import run_aggregations
+from app.utils.scrapers import parse_product_page
+from app.utils.parse_pool import ParsePool
+from app.utils.price_runs import count_in_window, expand_price_runs, push_recent_price
 
 
 class TestValidators:
@@ -41,6 +47,68 @@ class TestValidators:
         assert validate_currency("") == False
         assert validate_currency(None) == False
 
+    def test_canonical_listing(self):
+        """Test that URLs for the same retailer item collapse to one listing"""
+        amazon = [
+            "https://www.amazon.com/Some-Kettle/dp/b0c1234567/ref=sr_1_1?tag=aff-20&th=1",
+            "https://amazon.com/gp/product/B0C1234567?utm_source=mail",
+            "https://smile.amazon.com/dp/B0C1234567/",
+        ]
+        assert {canonical_listing(url, "amazon") for url in amazon} == {
+            ("amazon.com:B0C1234567", "https://www.amazon.com/dp/B0C1234567")
+        }
+        assert canonical_listing("https://www.amazon.in/dp/B0C1234567")[0] == "amazon.in:B0C1234567"
+        assert canonical_listing("https://www.ebay.com/itm/Lamp/123456789012?_trksid=p1&hash=item1")[1] == (
+            "https://www.ebay.com/itm/123456789012"
+        )
+        assert canonical_listing("https://www.walmart.com/ip/Lamp/55555555?athbdg=L1600")[0] == "walmart.com:55555555"
+
+        listing_id, url = canonical_listing("https://www.target.com/p/lamp/-/A-123/?utm_source=x&preselect=9#reviews")
+        assert url == "https://www.target.com/p/lamp/-/A-123?preselect=9"
+        assert listing_id == canonical_listing("https://www.target.com/p/lamp/-/A-123?preselect=9&gclid=1")[0]
+
+    def test_marketplace_params_are_kept_on_other_hosts(self):
+        """Test that referral keys are only stripped on their marketplace, ad click ids everywhere"""
+        shop = "https://shop.example.com/item?sid=42&from=home&tag=red&ref=x&utm_medium=mail&fbclid=1"
+        assert canonical_listing(shop)[1] == "https://shop.example.com/item?from=home&ref=x&sid=42&tag=red"
+        assert canonical_listing("https://www.walmart.com/search?q=lamp&sid=42&from=home")[1] == (
+            "https://www.walmart.com/search?q=lamp"
+        )
+        assert canonical_listing("https://www.amazon.com/s?k=lamp&ref=nb&tag=aff-20")[1] == (
+            "https://www.amazon.com/s?k=lamp"
+        )
+
+
+class TestPriceRuns:
+    """Test cases for expanding run-length price documents"""
+
+    def test_runs_expand_to_their_observations(self):
+        """Test that a run expands to evenly spaced points and legacy rows stay single points"""
+        day = datetime(2026, 1, 1)
+        run = {"price": 10.0, "created_at": day, "first_seen": day, "last_seen": day.replace(hour=12), "observations": 3}
+        legacy = {"price": 12.0, "created_at": day.replace(hour=18)}
+
+        points = expand_price_runs([run, legacy])
+
+        assert [p["created_at"].hour for p in points] == [18, 12, 6, 0]
+        assert [p["price"] for p in points] == [12.0, 10.0, 10.0, 10.0]
+        assert count_in_window(run, day.replace(hour=5), day.replace(hour=23)) == 2
+        assert len(expand_price_runs([run, legacy], limit=2)) == 2
+
+    def test_recent_prices_ring_buffer(self):
+        """Test that the embedded recent runs extend the current run and keep the newest N"""
+        day = datetime(2026, 1, 1)
+        recent = None
+        for hour, (run_id, price) in enumerate([("r1", 10.0), ("r1", 10.0), ("r2", 9.0), ("r3", 11.0)]):
+            at = day.replace(hour=hour)
+            recent = push_recent_price(
+                recent, {"run_id": run_id, "price": price, "first_seen": at, "last_seen": at}, size=2
+            )
+
+        assert [r["run_id"] for r in recent] == ["r2", "r3"]
+        assert push_recent_price(recent[:1], {"run_id": "r2", "last_seen": day.replace(hour=5)}, 2)[0]["observations"] == 2
+        assert recent[0]["observations"] == 1
+
 
 class TestFormatters:
     """Test cases for formatting utilities"""
@@ -97,3 +165,66 @@ class TestHelpers:
         assert result["savings_amount"] == 0.0
         assert result["savings_percentage"] == 0.0
         assert result["is_on_sale"] == False
+
+
+class TestAggregations:
+    """Test cases for aggregation query helpers"""
+
+    class FakeAggregation:
+        def __init__(self, value=None, error=None):
+            self.value = value
+            self.error = error
+
+        def get(self):
+            if self.error:
+                raise self.error
+            return [[SimpleNamespace(value=self.value)]]
+
+    @pytest.mark.asyncio
+    async def test_run_aggregations(self):
+        """Test that values and per-query timings are returned by name"""
+        values, timings = await run_aggregations(
+            {
+                "total": self.FakeAggregation(7),
+                "broken": self.FakeAggregation(error=RuntimeError("missing index")),
+            }
+        )
+        assert values == {"total": 7, "broken": 0}
+        assert set(timings) == {"total", "broken"}
+
+
+class TestParsePool:
+    """Test cases for the HTML parse stage"""
+
+    page = (
+        b"<html><head><title>Fallback</title></head><body>"
+        b"<h1>Noise Cancelling Headphones</h1><span>$249.99</span>"
+        b"<p>In Stock</p>\n<p>4.6 out of 5</p>\n<p>1,234 reviews</p>"
+        b"<img src='/images/hp.jpg'></body></html>"
+    )
+
+    def test_parse_product_page(self):
+        """Test extraction of all scraped fields from raw bytes"""
+        result = parse_product_page(self.page, "https://shop.example")
+        assert result == {
+            "price": 249.99,
+            "title": "Noise Cancelling Headphones",
+            "availability": "In Stock",
+            "image_url": "https://shop.example/images/hp.jpg",
+            "rating": 4.6,
+            "review_count": 1234,
+        }
+
+    @pytest.mark.asyncio
+    async def test_process_pool_parse(self):
+        """Test that pages parse in worker processes and stats are reported"""
+        pool = ParsePool(size=2)
+        try:
+            results = await asyncio.gather(*[pool.parse(self.page) for _ in range(6)])
+        finally:
+            pool.shutdown()
+
+        assert all(r["price"] == 249.99 for r in results)
+        stats = pool.get_stats()
+        assert stats["parsed"] == 6
+        assert stats["queue_depth"] == 0